@@ -23,12 +23,14 @@ def create_app():
     from modules.routes.main import main_bp
     from modules.routes.analysis import analysis_bp
     from modules.routes.referral import referral_bp
+    from modules.routes.jobs import jobs_bp
     from modules.auth.routes import auth_bp
     from modules.academy import academy_bp  # اضافه کردن Blueprint آموزشگاه
     
     app.register_blueprint(main_bp)
     app.register_blueprint(analysis_bp)
     app.register_blueprint(referral_bp)
+    app.register_blueprint(jobs_bp)
     app.register_blueprint(auth_bp)
     app.register_blueprint(academy_bp)  # ثبت Blueprint آموزشگاه
     
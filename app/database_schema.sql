@@ -9,6 +9,8 @@ DROP TABLE IF EXISTS weaknesses;
 DROP TABLE IF EXISTS strengths;
 DROP TABLE IF EXISTS top_customers;
 DROP TABLE IF EXISTS active_users;
+DROP VIEW IF EXISTS analyses_all;
+DROP TABLE IF EXISTS analyses_archive;
 DROP TABLE IF EXISTS analyses;
 
 
@@ -59,7 +61,8 @@ CREATE TABLE IF NOT EXISTS activity_logs (
     ip_address VARCHAR(45),
     user_agent TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL,
+    INDEX idx_user_created (user_id, created_at)
 );
 
 -- جدول تنظیمات کاربر
@@ -79,8 +82,10 @@ CREATE TABLE IF NOT EXISTS user_settings (
 
 
 
+-- پارتیشن‌بندی ماهانه روی analyzed_at (scripts/manage_partitions.py):
+-- کلید اصلی باید ستون پارتیشن را داشته باشد و MySQL کلید خارجی به جدول پارتیشن‌شده را نمی‌پذیرد
 CREATE TABLE analyses (
-    id INT AUTO_INCREMENT PRIMARY KEY,
+    id INT AUTO_INCREMENT,
     
     -- اطلاعات فایل
     file_name VARCHAR(255) NOT NULL,
@@ -187,16 +192,35 @@ CREATE TABLE analyses (
     best_customer TEXT,
     best_customer_reason TEXT,
     
-    -- JSON کامل تحلیل
-    full_analysis JSON NOT NULL,
+    -- JSON کامل تحلیل (متنی، یا فشرده در full_analysis_z - modules/analysis_codec.py)
+    full_analysis JSON NULL,
+    full_analysis_z LONGBLOB NULL,
     
     -- ایندکس‌ها
+    PRIMARY KEY (id, analyzed_at),
     INDEX idx_created_at (created_at),
+    INDEX idx_analyzed_at (analyzed_at),
     INDEX idx_file_name (file_name),
     INDEX idx_seller_name (seller_name),
     INDEX idx_customer_name (customer_name),
     INDEX idx_score_total (score_total)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+PARTITION BY RANGE COLUMNS(analyzed_at) (
+    PARTITION p_history VALUES LESS THAN ('2025-01-01'),
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
+
+-- آرشیو ماه‌های قدیمی (scripts/manage_partitions.py archive)
+CREATE TABLE analyses_archive LIKE analyses;
+ALTER TABLE analyses_archive REMOVE PARTITIONING;
+
+-- همه تحلیل‌ها (فعال + آرشیو) برای گزارش‌های کل تاریخچه
+CREATE OR REPLACE VIEW analyses_all AS
+    SELECT * FROM analyses
+    UNION ALL
+    SELECT * FROM analyses_archive;
+
+-- جداول جزئیات: حذف فرزندان در routes/analysis.py انجام می‌شود (کلید خارجی به جدول پارتیشن‌شده ممکن نیست)
 
 -- جدول کاربران فعال
 CREATE TABLE active_users (
@@ -206,7 +230,6 @@ CREATE TABLE active_users (
     call_count INT DEFAULT 1,
     performance_note TEXT,
     
-    FOREIGN KEY (analysis_id) REFERENCES analyses(id) ON DELETE CASCADE,
     INDEX idx_analysis_id (analysis_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -218,7 +241,6 @@ CREATE TABLE top_customers (
     contact_count INT DEFAULT 1,
     interaction_quality TEXT,
     
-    FOREIGN KEY (analysis_id) REFERENCES analyses(id) ON DELETE CASCADE,
     INDEX idx_analysis_id (analysis_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -229,7 +251,6 @@ CREATE TABLE strengths (
     strength TEXT NOT NULL,
     example TEXT,
     
-    FOREIGN KEY (analysis_id) REFERENCES analyses(id) ON DELETE CASCADE,
     INDEX idx_analysis_id (analysis_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -240,7 +261,6 @@ CREATE TABLE weaknesses (
     weakness TEXT NOT NULL,
     improvement_suggestion TEXT,
     
-    FOREIGN KEY (analysis_id) REFERENCES analyses(id) ON DELETE CASCADE,
     INDEX idx_analysis_id (analysis_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -251,7 +271,6 @@ CREATE TABLE objections (
     objection TEXT NOT NULL,
     response_quality VARCHAR(50),
     
-    FOREIGN KEY (analysis_id) REFERENCES analyses(id) ON DELETE CASCADE,
     INDEX idx_analysis_id (analysis_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -262,7 +281,6 @@ CREATE TABLE techniques (
     technique TEXT NOT NULL,
     effectiveness VARCHAR(50),
     
-    FOREIGN KEY (analysis_id) REFERENCES analyses(id) ON DELETE CASCADE,
     INDEX idx_analysis_id (analysis_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -273,7 +291,6 @@ CREATE TABLE positive_keywords (
     keyword VARCHAR(255) NOT NULL,
     context TEXT,
     
-    FOREIGN KEY (analysis_id) REFERENCES analyses(id) ON DELETE CASCADE,
     INDEX idx_analysis_id (analysis_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -284,7 +301,6 @@ CREATE TABLE negative_keywords (
     keyword VARCHAR(255) NOT NULL,
     context TEXT,
     
-    FOREIGN KEY (analysis_id) REFERENCES analyses(id) ON DELETE CASCADE,
     INDEX idx_analysis_id (analysis_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -296,7 +312,6 @@ CREATE TABLE risks (
     severity VARCHAR(50),
     mitigation TEXT,
     
-    FOREIGN KEY (analysis_id) REFERENCES analyses(id) ON DELETE CASCADE,
     INDEX idx_analysis_id (analysis_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -307,7 +322,6 @@ CREATE TABLE missed_parameters (
     parameter TEXT NOT NULL,
     impact TEXT,
     
-    FOREIGN KEY (analysis_id) REFERENCES analyses(id) ON DELETE CASCADE,
     INDEX idx_analysis_id (analysis_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -319,18 +333,17 @@ CREATE TABLE common_mistakes (
     frequency INT DEFAULT 1,
     correction TEXT,
     
-    FOREIGN KEY (analysis_id) REFERENCES analyses(id) ON DELETE CASCADE,
     INDEX idx_analysis_id (analysis_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 
 -- جدول اصلی ارجاعیات
 CREATE TABLE referral_analyses (
-    id INT PRIMARY KEY AUTO_INCREMENT,
+    id INT AUTO_INCREMENT,
     file_name VARCHAR(255),
     file_path VARCHAR(500),
     file_size INT,
-    analyzed_at DATETIME,
+    analyzed_at DATETIME NOT NULL,
     
     -- آمار کلی
     total_referrals INT,
@@ -344,19 +357,35 @@ CREATE TABLE referral_analyses (
     completion_rate FLOAT,
     pending_rate FLOAT,
     
-    -- JSON کامل برای ذخیره تمام جزئیات
+    -- JSON کامل برای ذخیره تمام جزئیات (یا نسخه فشرده در full_analysis_z)
     full_analysis JSON,
+    full_analysis_z LONGBLOB NULL,
     
-    created_at DATETIME DEFAULT NOW()
+    created_at DATETIME DEFAULT NOW(),
+    
+    PRIMARY KEY (id, analyzed_at),
+    INDEX idx_analyzed_at (analyzed_at)
+)
+PARTITION BY RANGE COLUMNS(analyzed_at) (
+    PARTITION p_history VALUES LESS THAN ('2025-01-01'),
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
 );
 
+CREATE TABLE referral_analyses_archive LIKE referral_analyses;
+ALTER TABLE referral_analyses_archive REMOVE PARTITIONING;
+
+CREATE OR REPLACE VIEW referral_analyses_all AS
+    SELECT * FROM referral_analyses
+    UNION ALL
+    SELECT * FROM referral_analyses_archive;
+
 -- جدول جزئیات وضعیت‌ها
 CREATE TABLE referral_status_details (
     id INT PRIMARY KEY AUTO_INCREMENT,
     analysis_id INT,
     status_name VARCHAR(50),
     status_count INT,
-    FOREIGN KEY (analysis_id) REFERENCES referral_analyses(id)
+    INDEX idx_analysis_id (analysis_id)
 );
 
 -- جدول موضوعات
@@ -367,7 +396,7 @@ CREATE TABLE referral_subjects (
     frequency INT,
     avg_response_time FLOAT,
     pending_count INT,
-    FOREIGN KEY (analysis_id) REFERENCES referral_analyses(id)
+    INDEX idx_analysis_id (analysis_id)
 );
 
 -- جدول فرستنده‌ها و گیرنده‌ها
@@ -378,7 +407,7 @@ CREATE TABLE referral_units (
     role ENUM('sender', 'receiver'),
     referral_count INT,
     pending_count INT,
-    FOREIGN KEY (analysis_id) REFERENCES referral_analyses(id)
+    INDEX idx_analysis_id (analysis_id)
 );
 
 -- جدول مشتریان
@@ -389,7 +418,7 @@ CREATE TABLE referral_customers (
     subscription_code VARCHAR(50),
     referral_count INT,
     subjects TEXT,
-    FOREIGN KEY (analysis_id) REFERENCES referral_analyses(id)
+    INDEX idx_analysis_id (analysis_id)
 );
 
 -- جدول بینش‌ها و توصیه‌ها
@@ -399,10 +428,110 @@ CREATE TABLE referral_insights (
     insight_type ENUM('pattern', 'factor', 'recommendation'),
     insight_text TEXT,
     frequency INT,
-    FOREIGN KEY (analysis_id) REFERENCES referral_analyses(id)
+    INDEX idx_analysis_id (analysis_id)
 );
 
+-- کش نتایج تحلیل OpenAI (modules/llm_cache.py)
+-- کلید: sha256 متن استخراج‌شده + نسخه پرامپت + مدل + temperature
+CREATE TABLE IF NOT EXISTS llm_cache (
+    cache_key CHAR(64) PRIMARY KEY,
+    analysis_type VARCHAR(20) NOT NULL,
+    model VARCHAR(100) NOT NULL,
+    prompt_version VARCHAR(20) NOT NULL,
+    result LONGBLOB NOT NULL,
+    hits INT DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at DATETIME NOT NULL,
+    INDEX idx_last_used (last_used_at),
+    INDEX idx_expires (expires_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- صف کارهای تحلیل (modules/job_queue.py و worker.py)
+-- کارگرها با SELECT ... FOR UPDATE SKIP LOCKED کار برمی‌دارند؛ locked_until مهلت دیده‌نشدن است
+CREATE TABLE IF NOT EXISTS analysis_jobs (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    job_type ENUM('crm', 'referral') NOT NULL,
+    status ENUM('queued', 'running', 'done', 'failed') DEFAULT 'queued',
+    user_id INT,
+    file_name VARCHAR(255),
+    file_path VARCHAR(500),
+    file_size INT,
+    file_type VARCHAR(20),
+    use_cache BOOLEAN DEFAULT TRUE,
+    attempts INT DEFAULT 0,
+    max_attempts INT DEFAULT 3,
+    run_after DATETIME NOT NULL,
+    locked_by VARCHAR(100),
+    locked_until DATETIME,
+    result_id INT,
+    error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at DATETIME,
+    finished_at DATETIME,
+    INDEX idx_status_run_after (status, run_after),
+    INDEX idx_status_locked_until (status, locked_until),
+    INDEX idx_user_created (user_id, created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- مصرف توکن هر فراخوانی OpenAI (modules/llm_usage.py)؛ ref_id = شناسه تحلیل یا مکالمه بر اساس feature
+CREATE TABLE IF NOT EXISTS llm_usage (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    feature VARCHAR(20) NOT NULL,
+    ref_id INT,
+    model VARCHAR(100) NOT NULL,
+    prompt_tokens INT DEFAULT 0,
+    completion_tokens INT DEFAULT 0,
+    cached_tokens INT DEFAULT 0,
+    estimated_prompt_tokens INT DEFAULT 0,
+    is_estimated BOOLEAN DEFAULT FALSE,
+    latency_ms INT DEFAULT 0,
+    status VARCHAR(20) DEFAULT 'ok',
+    created_at DATETIME NOT NULL,
+    INDEX idx_created (created_at),
+    INDEX idx_feature_created (feature, created_at),
+    INDEX idx_feature_ref (feature, ref_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- تحلیل مجدد انبوه با Batch API (modules/batch_analysis.py و scripts/batch_reanalyze.py)
+CREATE TABLE IF NOT EXISTS analysis_batches (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    job_type ENUM('crm', 'referral') NOT NULL,
+    backend VARCHAR(20) NOT NULL,
+    status VARCHAR(20) DEFAULT 'building',
+    remote_id VARCHAR(100),
+    input_path VARCHAR(500),
+    model VARCHAR(100),
+    prompt_version VARCHAR(20),
+    item_count INT DEFAULT 0,
+    request_count INT DEFAULT 0,
+    succeeded INT DEFAULT 0,
+    failed INT DEFAULT 0,
+    error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    submitted_at DATETIME,
+    finished_at DATETIME,
+    INDEX idx_status (status)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+-- هر فایل یک item است؛ custom_id درخواست‌ها: {item_id}:{part}:{parts}
+CREATE TABLE IF NOT EXISTS analysis_batch_items (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    batch_id INT NOT NULL,
+    source_id INT,
+    file_name VARCHAR(255),
+    file_path VARCHAR(500),
+    file_size INT,
+    file_type VARCHAR(20),
+    cache_key CHAR(64),
+    parts INT DEFAULT 1,
+    estimated_tokens INT DEFAULT 0,
+    status ENUM('pending', 'done', 'failed') DEFAULT 'pending',
+    result_id INT,
+    error TEXT,
+    INDEX idx_batch_status (batch_id, status),
+    INDEX idx_cache_key (cache_key)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 
 -- ====================================================
@@ -428,7 +557,8 @@ CREATE TABLE IF NOT EXISTS `academy_masters` (
     `created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     `updated_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     INDEX `idx_department` (`department`),
-    INDEX `idx_is_active` (`is_active`)
+    INDEX `idx_is_active` (`is_active`),
+    INDEX `idx_department_active` (`department`, `is_active`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_persian_ci;
 
 -- 2. جدول کارگاه‌های آموزشی (Academy Workshops)
@@ -454,7 +584,9 @@ CREATE TABLE IF NOT EXISTS `academy_workshops` (
     FOREIGN KEY (`master_id`) REFERENCES `academy_masters`(`id`) ON DELETE SET NULL,
     INDEX `idx_department` (`department`),
     INDEX `idx_status` (`status`),
-    INDEX `idx_dates` (`start_date`, `end_date`)
+    INDEX `idx_dates` (`start_date`, `end_date`),
+    INDEX `idx_workshop_type` (`workshop_type`),
+    INDEX `idx_department_status_start` (`department`, `status`, `start_date`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_persian_ci;
 
 -- 3. جدول جلسات کارگاه (Workshop Sessions)
@@ -519,7 +651,8 @@ CREATE TABLE IF NOT EXISTS `academy_assessments` (
     FOREIGN KEY (`workshop_id`) REFERENCES `academy_workshops`(`id`) ON DELETE CASCADE,
     INDEX `idx_department` (`department`),
     INDEX `idx_status` (`status`),
-    INDEX `idx_dates` (`start_date`, `end_date`)
+    INDEX `idx_dates` (`start_date`, `end_date`),
+    INDEX `idx_department_status_start` (`department`, `status`, `start_date`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_persian_ci;
 
 -- 6. جدول نتایج سنجش (Assessment Results)
@@ -570,7 +703,8 @@ CREATE TABLE IF NOT EXISTS `chat_sessions` (
     `updated_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (`user_id`) REFERENCES `users`(`id`) ON DELETE CASCADE,
     INDEX `idx_user` (`user_id`),
-    INDEX `idx_updated` (`updated_at`)
+    INDEX `idx_updated` (`updated_at`),
+    INDEX `idx_user_updated` (`user_id`, `updated_at`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_persian_ci;
 
 -- 9. جدول پیام‌های چت (Chat Messages)
@@ -582,7 +716,8 @@ CREATE TABLE IF NOT EXISTS `chat_messages` (
     `created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (`session_id`) REFERENCES `chat_sessions`(`id`) ON DELETE CASCADE,
     INDEX `idx_session` (`session_id`),
-    INDEX `idx_created` (`created_at`)
+    INDEX `idx_created` (`created_at`),
+    INDEX `idx_session_created` (`session_id`, `created_at`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_persian_ci;
 
 -- 10. جدول تقویم آموزشی (Schedule)
@@ -599,22 +734,10 @@ CREATE TABLE IF NOT EXISTS `academy_schedule` (
     `updated_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     INDEX `idx_department` (`department`),
     INDEX `idx_date` (`event_date`),
-    INDEX `idx_type` (`event_type`)
+    INDEX `idx_type` (`event_type`),
+    INDEX `idx_department_date` (`department`, `event_date`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_persian_ci;
 
 -- ====================================================
--- درج داده‌های نمونه (Optional)
+-- داده‌های نمونه آموزشگاه: migrations/011_academy_seed.sql (قابل اجرای دوباره)
 -- ====================================================
-
--- اساتید نمونه
-INSERT INTO `academy_masters` (`full_name`, `expertise`, `department`, `bio`, `courses_count`, `students_count`, `rating`) VALUES
-('دکتر علی محمدی', 'فروش و بازاریابی پیشرفته', 'sales', 'دکترای مدیریت بازاریابی با ۱۵ سال سابقه تدریس در سازمان‌های بزرگ', 12, 450, 4.8),
-('مهندس سارا احمدی', 'مذاکرات فروش حرفه‌ای', 'sales', 'مشاور فروش شرکت‌های بزرگ با سابقه بیش از ۱۰۰۰ ساعت کارگاه آموزشی', 8, 320, 4.9),
-('دکتر رضا حسینی', 'مدیریت ارتباط با مشتری', 'services', 'دکترای مدیریت خدمات با سابقه اجرایی در شرکت‌های بین‌المللی', 10, 380, 4.7),
-('مهندس مریم کریمی', 'خدمات پس از فروش', 'services', 'کارشناس ارشد مدیریت خدمات با ۱۲ سال سابقه در صنعت خودرو', 6, 210, 4.6);
-
--- کارگاه‌های نمونه
-INSERT INTO `academy_workshops` (`title`, `department`, `master_id`, `description`, `start_date`, `end_date`, `capacity`, `workshop_type`, `status`, `price`, `location`) VALUES
-('کارگاه فروش حرفه‌ای', 'sales', 1, 'آموزش تکنیک‌های پیشرفته فروش و مذاکره', '2025-03-15 10:00:00', '2025-03-17 18:00:00', 30, 'online', 'upcoming', 'رایگان', 'آنلاین - اسکای روم'),
-('مدیریت ارتباط با مشتری', 'services', 3, 'اصول و تکنیک‌های مدیریت ارتباط با مشتری', '2025-03-20 09:00:00', '2025-03-22 17:00:00', 25, 'practical', 'upcoming', '450,000 تومان', 'مشهد - بلوار وکیل‌آباد'),
-('مذاکرات فروش پیشرفته', 'sales', 2, 'تکنیک‌های مذاکره در فروش B2B', '2025-02-10 10:00:00', '2025-02-12 18:00:00', 20, 'online', 'completed', 'رایگان', 'آنلاین - اسکای روم');
\ No newline at end of file
@@ -0,0 +1,16 @@
+-- ایندکس‌های مورد نیاز کوئری‌های API (خروجی scripts/check_query_plans.py)
+-- برای دیتابیس‌هایی که قبل از اضافه شدن این ایندکس‌ها به database_schema.sql ساخته شده‌اند
+USE crm_analyzer;
+
+-- همه لیست‌ها و داشبوردها بر اساس analyzed_at مرتب/فیلتر می‌شوند
+ALTER TABLE analyses ADD INDEX idx_analyzed_at (analyzed_at);
+ALTER TABLE referral_analyses ADD INDEX idx_analyzed_at (analyzed_at);
+
+-- لاگ‌های کاربر: WHERE user_id = ? ORDER BY created_at DESC
+ALTER TABLE activity_logs ADD INDEX idx_user_created (user_id, created_at);
+
+-- تاریخچه چت: WHERE user_id = ? ORDER BY updated_at DESC
+ALTER TABLE chat_sessions ADD INDEX idx_user_updated (user_id, updated_at);
+
+-- پیام‌های چت: WHERE session_id = ? ORDER BY created_at
+ALTER TABLE chat_messages ADD INDEX idx_session_created (session_id, created_at);
@@ -0,0 +1,15 @@
+-- ایندکس فیلترهای لیست‌های آموزشگاه (modules/academy/models.py)
+USE crm_analyzer;
+
+-- اساتید: WHERE department = ? AND is_active = TRUE
+ALTER TABLE academy_masters ADD INDEX idx_department_active (department, is_active);
+
+-- کارگاه‌ها: WHERE department = ? AND status = ? ORDER BY start_date / WHERE workshop_type = ?
+ALTER TABLE academy_workshops ADD INDEX idx_workshop_type (workshop_type);
+ALTER TABLE academy_workshops ADD INDEX idx_department_status_start (department, status, start_date);
+
+-- سنجش‌ها: WHERE department = ? AND status = ? ORDER BY start_date
+ALTER TABLE academy_assessments ADD INDEX idx_department_status_start (department, status, start_date);
+
+-- تقویم: WHERE department = ? ORDER BY event_date
+ALTER TABLE academy_schedule ADD INDEX idx_department_date (department, event_date);
@@ -0,0 +1,8 @@
+-- ستون فشرده full_analysis (modules/analysis_codec.py)
+-- بعد از اجرا، ردیف‌های موجود با scripts/compress_full_analysis.py تبدیل می‌شوند
+USE crm_analyzer;
+
+ALTER TABLE analyses ADD COLUMN full_analysis_z LONGBLOB NULL AFTER full_analysis;
+ALTER TABLE analyses MODIFY full_analysis JSON NULL;
+
+ALTER TABLE referral_analyses ADD COLUMN full_analysis_z LONGBLOB NULL AFTER full_analysis;
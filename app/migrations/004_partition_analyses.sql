@@ -0,0 +1,155 @@
+-- پارتیشن‌بندی ماهانه analyses و referral_analyses روی analyzed_at + جداول آرشیو
+-- بعد از اجرا: python scripts/manage_partitions.py ensure  (ساخت پارتیشن‌های ماهانه)
+-- نکته: از این به بعد هر ستونی که به analyses اضافه شود باید به analyses_archive هم اضافه شود
+USE crm_analyzer;
+
+-- 1. MySQL کلید خارجی به جدول پارتیشن‌شده را نمی‌پذیرد؛ حذف جزئیات در AnalysisModel.delete انجام می‌شود.
+--    نام constraintها از information_schema خوانده می‌شود (ممکن است با نام پیش‌فرض *_ibfk_1 فرق کند)
+--    و جدولی که کلید خارجی ندارد (اجرای دوباره) نادیده گرفته می‌شود.
+SET @fk = (SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+           WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'active_users' AND REFERENCED_TABLE_NAME = 'analyses' LIMIT 1);
+SET @sql = IF(@fk IS NULL, 'DO 0', CONCAT('ALTER TABLE active_users DROP FOREIGN KEY `', @fk, '`'));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+SET @fk = (SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+           WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'top_customers' AND REFERENCED_TABLE_NAME = 'analyses' LIMIT 1);
+SET @sql = IF(@fk IS NULL, 'DO 0', CONCAT('ALTER TABLE top_customers DROP FOREIGN KEY `', @fk, '`'));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+SET @fk = (SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+           WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'strengths' AND REFERENCED_TABLE_NAME = 'analyses' LIMIT 1);
+SET @sql = IF(@fk IS NULL, 'DO 0', CONCAT('ALTER TABLE strengths DROP FOREIGN KEY `', @fk, '`'));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+SET @fk = (SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+           WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'weaknesses' AND REFERENCED_TABLE_NAME = 'analyses' LIMIT 1);
+SET @sql = IF(@fk IS NULL, 'DO 0', CONCAT('ALTER TABLE weaknesses DROP FOREIGN KEY `', @fk, '`'));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+SET @fk = (SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+           WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'objections' AND REFERENCED_TABLE_NAME = 'analyses' LIMIT 1);
+SET @sql = IF(@fk IS NULL, 'DO 0', CONCAT('ALTER TABLE objections DROP FOREIGN KEY `', @fk, '`'));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+SET @fk = (SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+           WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'techniques' AND REFERENCED_TABLE_NAME = 'analyses' LIMIT 1);
+SET @sql = IF(@fk IS NULL, 'DO 0', CONCAT('ALTER TABLE techniques DROP FOREIGN KEY `', @fk, '`'));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+SET @fk = (SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+           WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'positive_keywords' AND REFERENCED_TABLE_NAME = 'analyses' LIMIT 1);
+SET @sql = IF(@fk IS NULL, 'DO 0', CONCAT('ALTER TABLE positive_keywords DROP FOREIGN KEY `', @fk, '`'));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+SET @fk = (SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+           WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'negative_keywords' AND REFERENCED_TABLE_NAME = 'analyses' LIMIT 1);
+SET @sql = IF(@fk IS NULL, 'DO 0', CONCAT('ALTER TABLE negative_keywords DROP FOREIGN KEY `', @fk, '`'));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+SET @fk = (SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+           WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'risks' AND REFERENCED_TABLE_NAME = 'analyses' LIMIT 1);
+SET @sql = IF(@fk IS NULL, 'DO 0', CONCAT('ALTER TABLE risks DROP FOREIGN KEY `', @fk, '`'));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+SET @fk = (SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+           WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'missed_parameters' AND REFERENCED_TABLE_NAME = 'analyses' LIMIT 1);
+SET @sql = IF(@fk IS NULL, 'DO 0', CONCAT('ALTER TABLE missed_parameters DROP FOREIGN KEY `', @fk, '`'));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+SET @fk = (SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+           WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'common_mistakes' AND REFERENCED_TABLE_NAME = 'analyses' LIMIT 1);
+SET @sql = IF(@fk IS NULL, 'DO 0', CONCAT('ALTER TABLE common_mistakes DROP FOREIGN KEY `', @fk, '`'));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+SET @fk = (SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+           WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'referral_status_details' AND REFERENCED_TABLE_NAME = 'referral_analyses' LIMIT 1);
+SET @sql = IF(@fk IS NULL, 'DO 0', CONCAT('ALTER TABLE referral_status_details DROP FOREIGN KEY `', @fk, '`'));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+SET @fk = (SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+           WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'referral_subjects' AND REFERENCED_TABLE_NAME = 'referral_analyses' LIMIT 1);
+SET @sql = IF(@fk IS NULL, 'DO 0', CONCAT('ALTER TABLE referral_subjects DROP FOREIGN KEY `', @fk, '`'));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+SET @fk = (SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+           WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'referral_units' AND REFERENCED_TABLE_NAME = 'referral_analyses' LIMIT 1);
+SET @sql = IF(@fk IS NULL, 'DO 0', CONCAT('ALTER TABLE referral_units DROP FOREIGN KEY `', @fk, '`'));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+SET @fk = (SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+           WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'referral_customers' AND REFERENCED_TABLE_NAME = 'referral_analyses' LIMIT 1);
+SET @sql = IF(@fk IS NULL, 'DO 0', CONCAT('ALTER TABLE referral_customers DROP FOREIGN KEY `', @fk, '`'));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+SET @fk = (SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+           WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'referral_insights' AND REFERENCED_TABLE_NAME = 'referral_analyses' LIMIT 1);
+SET @sql = IF(@fk IS NULL, 'DO 0', CONCAT('ALTER TABLE referral_insights DROP FOREIGN KEY `', @fk, '`'));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 2. ستون پارتیشن باید در کلید اصلی باشد (و NOT NULL)
+UPDATE referral_analyses SET analyzed_at = COALESCE(created_at, NOW()) WHERE analyzed_at IS NULL;
+ALTER TABLE referral_analyses MODIFY analyzed_at DATETIME NOT NULL;
+
+ALTER TABLE analyses DROP PRIMARY KEY, ADD PRIMARY KEY (id, analyzed_at);
+ALTER TABLE referral_analyses DROP PRIMARY KEY, ADD PRIMARY KEY (id, analyzed_at);
+
+-- 3. پارتیشن‌ها: p_history برای داده‌های قدیمی، p_future بعداً به ماه‌ها شکسته می‌شود
+ALTER TABLE analyses PARTITION BY RANGE COLUMNS(analyzed_at) (
+    PARTITION p_history VALUES LESS THAN ('2025-01-01'),
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
+ALTER TABLE referral_analyses PARTITION BY RANGE COLUMNS(analyzed_at) (
+    PARTITION p_history VALUES LESS THAN ('2025-01-01'),
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
+
+-- 4. جداول آرشیو و viewهای کل تاریخچه
+CREATE TABLE IF NOT EXISTS analyses_archive LIKE analyses;
+ALTER TABLE analyses_archive REMOVE PARTITIONING;
+CREATE TABLE IF NOT EXISTS referral_analyses_archive LIKE referral_analyses;
+ALTER TABLE referral_analyses_archive REMOVE PARTITIONING;
+
+-- جداول آرشیو جزئیات (scripts/manage_partitions.py archive)
+CREATE TABLE IF NOT EXISTS active_users_archive LIKE active_users;
+CREATE TABLE IF NOT EXISTS top_customers_archive LIKE top_customers;
+CREATE TABLE IF NOT EXISTS strengths_archive LIKE strengths;
+CREATE TABLE IF NOT EXISTS weaknesses_archive LIKE weaknesses;
+CREATE TABLE IF NOT EXISTS objections_archive LIKE objections;
+CREATE TABLE IF NOT EXISTS techniques_archive LIKE techniques;
+CREATE TABLE IF NOT EXISTS positive_keywords_archive LIKE positive_keywords;
+CREATE TABLE IF NOT EXISTS negative_keywords_archive LIKE negative_keywords;
+CREATE TABLE IF NOT EXISTS risks_archive LIKE risks;
+CREATE TABLE IF NOT EXISTS missed_parameters_archive LIKE missed_parameters;
+CREATE TABLE IF NOT EXISTS common_mistakes_archive LIKE common_mistakes;
+CREATE TABLE IF NOT EXISTS referral_status_details_archive LIKE referral_status_details;
+CREATE TABLE IF NOT EXISTS referral_subjects_archive LIKE referral_subjects;
+CREATE TABLE IF NOT EXISTS referral_units_archive LIKE referral_units;
+CREATE TABLE IF NOT EXISTS referral_customers_archive LIKE referral_customers;
+CREATE TABLE IF NOT EXISTS referral_insights_archive LIKE referral_insights;
+
+CREATE OR REPLACE VIEW analyses_all AS
+    SELECT * FROM analyses
+    UNION ALL
+    SELECT * FROM analyses_archive;
+
+CREATE OR REPLACE VIEW referral_analyses_all AS
+    SELECT * FROM referral_analyses
+    UNION ALL
+    SELECT * FROM referral_analyses_archive;
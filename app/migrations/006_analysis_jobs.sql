@@ -0,0 +1,27 @@
+-- صف کارهای تحلیل پس‌زمینه (modules/job_queue.py، اجرای کارگر: python worker.py)
+USE crm_analyzer;
+
+CREATE TABLE IF NOT EXISTS analysis_jobs (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    job_type ENUM('crm', 'referral') NOT NULL,
+    status ENUM('queued', 'running', 'done', 'failed') DEFAULT 'queued',
+    user_id INT,
+    file_name VARCHAR(255),
+    file_path VARCHAR(500),
+    file_size INT,
+    file_type VARCHAR(20),
+    use_cache BOOLEAN DEFAULT TRUE,
+    attempts INT DEFAULT 0,
+    max_attempts INT DEFAULT 3,
+    run_after DATETIME NOT NULL,
+    locked_by VARCHAR(100),
+    locked_until DATETIME,
+    result_id INT,
+    error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at DATETIME,
+    finished_at DATETIME,
+    INDEX idx_status_run_after (status, run_after),
+    INDEX idx_status_locked_until (status, locked_until),
+    INDEX idx_user_created (user_id, created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,19 @@
+-- ثبت مصرف توکن و تاخیر فراخوانی‌های OpenAI (modules/llm_usage.py)
+USE crm_analyzer;
+
+CREATE TABLE IF NOT EXISTS llm_usage (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    feature VARCHAR(20) NOT NULL,
+    ref_id INT,
+    model VARCHAR(100) NOT NULL,
+    prompt_tokens INT DEFAULT 0,
+    completion_tokens INT DEFAULT 0,
+    estimated_prompt_tokens INT DEFAULT 0,
+    is_estimated BOOLEAN DEFAULT FALSE,
+    latency_ms INT DEFAULT 0,
+    status VARCHAR(20) DEFAULT 'ok',
+    created_at DATETIME NOT NULL,
+    INDEX idx_created (created_at),
+    INDEX idx_feature_created (feature, created_at),
+    INDEX idx_feature_ref (feature, ref_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
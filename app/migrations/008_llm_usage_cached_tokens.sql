@@ -0,0 +1,4 @@
+-- توکن‌های prompt که از کش پیشوند OpenAI خوانده شده‌اند (usage.prompt_tokens_details.cached_tokens)
+USE crm_analyzer;
+
+ALTER TABLE llm_usage ADD COLUMN cached_tokens INT DEFAULT 0 AFTER completion_tokens;
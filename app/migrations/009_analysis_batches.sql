@@ -0,0 +1,41 @@
+-- تحلیل مجدد انبوه با Batch API (modules/batch_analysis.py و scripts/batch_reanalyze.py)
+USE crm_analyzer;
+
+CREATE TABLE IF NOT EXISTS analysis_batches (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    job_type ENUM('crm', 'referral') NOT NULL,
+    backend VARCHAR(20) NOT NULL,
+    status VARCHAR(20) DEFAULT 'building',
+    remote_id VARCHAR(100),
+    input_path VARCHAR(500),
+    model VARCHAR(100),
+    prompt_version VARCHAR(20),
+    item_count INT DEFAULT 0,
+    request_count INT DEFAULT 0,
+    succeeded INT DEFAULT 0,
+    failed INT DEFAULT 0,
+    error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    submitted_at DATETIME,
+    finished_at DATETIME,
+    INDEX idx_status (status)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- هر فایل یک item است؛ custom_id درخواست‌ها: {item_id}:{part}:{parts}
+CREATE TABLE IF NOT EXISTS analysis_batch_items (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    batch_id INT NOT NULL,
+    source_id INT,
+    file_name VARCHAR(255),
+    file_path VARCHAR(500),
+    file_size INT,
+    file_type VARCHAR(20),
+    cache_key CHAR(64),
+    parts INT DEFAULT 1,
+    estimated_tokens INT DEFAULT 0,
+    status ENUM('pending', 'done', 'failed') DEFAULT 'pending',
+    result_id INT,
+    error TEXT,
+    INDEX idx_batch_status (batch_id, status),
+    INDEX idx_cache_key (cache_key)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,5 @@
+-- نوع تحلیل و نسخه پرامپت هر فایل در batch (crm یا crm_insights با آمار محلی، referral یا referral_insights)
+USE crm_analyzer;
+
+ALTER TABLE analysis_batch_items ADD COLUMN analysis_type VARCHAR(30) AFTER file_type;
+ALTER TABLE analysis_batch_items ADD COLUMN prompt_version VARCHAR(20) AFTER analysis_type;
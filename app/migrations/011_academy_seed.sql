@@ -0,0 +1,135 @@
+-- داده‌های نمونه آموزشگاه: اساتید، کارگاه‌ها، جلسات، سنجش‌ها و تقویم (modules/academy/models.py)
+-- قابل اجرای دوباره: هر سطر فقط اگر با همان عنوان/نام نباشد درج و جزئیات فقط اگر خالی باشد پر می‌شود.
+-- بعد از اجرا روی سرور در حال کار، لیست‌ها با انقضای ACADEMY_CACHE_TTL به‌روز می‌شوند.
+USE crm_analyzer;
+
+-- اساتید
+INSERT INTO academy_masters (full_name, expertise, department, bio, courses_count, students_count, rating)
+SELECT v.full_name, v.expertise, v.department, v.bio, v.courses_count, v.students_count, v.rating
+FROM (
+    SELECT 'دکتر علی محمدی' AS full_name, 'فروش و بازاریابی پیشرفته' AS expertise, 'sales' AS department,
+           'دکترای مدیریت بازاریابی با ۱۵ سال سابقه تدریس در سازمان‌های بزرگ' AS bio,
+           12 AS courses_count, 450 AS students_count, 4.8 AS rating
+    UNION ALL SELECT 'مهندس سارا احمدی', 'مذاکرات فروش حرفه‌ای', 'sales',
+           'مشاور فروش شرکت‌های بزرگ با سابقه بیش از ۱۰۰۰ ساعت کارگاه آموزشی', 8, 320, 4.9
+    UNION ALL SELECT 'دکتر رضا حسینی', 'مدیریت ارتباط با مشتری', 'services',
+           'دکترای مدیریت خدمات با سابقه اجرایی در شرکت‌های بین‌المللی', 10, 380, 4.7
+    UNION ALL SELECT 'مهندس مریم کریمی', 'خدمات پس از فروش', 'services',
+           'کارشناس ارشد مدیریت خدمات با ۱۲ سال سابقه در صنعت خودرو', 6, 210, 4.6
+) v
+WHERE NOT EXISTS (SELECT 1 FROM academy_masters m WHERE m.full_name = v.full_name);
+
+UPDATE academy_masters
+SET email = 'a.mohammadi@academy.ir',
+    education = '[{"degree": "دکترای مدیریت بازاریابی", "university": "دانشگاه تهران", "year": "1390"}, {"degree": "کارشناسی ارشد مدیریت اجرایی", "university": "دانشگاه صنعتی شریف", "year": "1385"}]',
+    experience = '[{"position": "مدیر آموزش فروش", "company": "شرکت بازرگانی البرز", "years": "1395-1400"}, {"position": "مشاور ارشد فروش", "company": "هلدینگ توسعه تجارت", "years": "1400-اکنون"}]'
+WHERE full_name = 'دکتر علی محمدی' AND education IS NULL;
+
+UPDATE academy_masters
+SET email = 's.ahmadi@academy.ir',
+    education = '[{"degree": "کارشناسی ارشد مدیریت بازرگانی", "university": "دانشگاه علامه طباطبایی", "year": "1388"}]',
+    experience = '[{"position": "مدیر فروش سازمانی", "company": "گروه صنعتی پارس", "years": "1390-1398"}, {"position": "مشاور مذاکرات فروش", "company": "مستقل", "years": "1398-اکنون"}]'
+WHERE full_name = 'مهندس سارا احمدی' AND education IS NULL;
+
+UPDATE academy_masters
+SET email = 'r.hosseini@academy.ir',
+    education = '[{"degree": "دکترای مدیریت خدمات", "university": "دانشگاه فردوسی مشهد", "year": "1392"}]',
+    experience = '[{"position": "مدیر تجربه مشتری", "company": "شرکت ارتباطات سیار", "years": "1393-1401"}]'
+WHERE full_name = 'دکتر رضا حسینی' AND education IS NULL;
+
+UPDATE academy_masters
+SET email = 'm.karimi@academy.ir',
+    education = '[{"degree": "کارشناسی ارشد مهندسی صنایع", "university": "دانشگاه صنعتی اصفهان", "year": "1389"}]',
+    experience = '[{"position": "سرپرست خدمات پس از فروش", "company": "ایران خودرو", "years": "1390-1402"}]'
+WHERE full_name = 'مهندس مریم کریمی' AND education IS NULL;
+
+-- کارگاه‌ها (استاد با نام پیدا می‌شود)
+INSERT INTO academy_workshops (title, department, master_id, description, start_date, end_date,
+                               capacity, workshop_type, status, price, location)
+SELECT v.title, v.department,
+       (SELECT MIN(m.id) FROM academy_masters m WHERE m.full_name = v.master_name),
+       v.description, v.start_date, v.end_date, v.capacity, v.workshop_type, v.status, v.price, v.location
+FROM (
+    SELECT 'کارگاه فروش حرفه‌ای' AS title, 'sales' AS department, 'دکتر علی محمدی' AS master_name,
+           'آموزش تکنیک‌های پیشرفته فروش و مذاکره' AS description,
+           '2025-03-15 10:00:00' AS start_date, '2025-03-17 18:00:00' AS end_date, 30 AS capacity,
+           'online' AS workshop_type, 'upcoming' AS status, 'رایگان' AS price, 'آنلاین - اسکای روم' AS location
+    UNION ALL SELECT 'مدیریت ارتباط با مشتری', 'services', 'دکتر رضا حسینی',
+           'اصول و تکنیک‌های مدیریت ارتباط با مشتری',
+           '2025-03-20 09:00:00', '2025-03-22 17:00:00', 25,
+           'practical', 'upcoming', '450,000 تومان', 'مشهد - بلوار وکیل‌آباد'
+    UNION ALL SELECT 'مذاکرات فروش پیشرفته', 'sales', 'مهندس سارا احمدی',
+           'تکنیک‌های مذاکره در فروش B2B',
+           '2025-02-10 10:00:00', '2025-02-12 18:00:00', 20,
+           'online', 'completed', 'رایگان', 'آنلاین - اسکای روم'
+) v
+WHERE NOT EXISTS (SELECT 1 FROM academy_workshops w WHERE w.title = v.title);
+
+UPDATE academy_workshops
+SET syllabus = '[{"day": 1, "title": "مقدمات فروش حرفه‌ای", "topics": ["شناخت مشتری", "نیازسنجی", "ارزش‌آفرینی"]}, {"day": 2, "title": "تکنیک‌های مذاکره", "topics": ["اصول مذاکره", "مدیریت اعتراضات", "بستن قرارداد"]}, {"day": 3, "title": "فروش در عصر دیجیتال", "topics": ["CRM", "فروش آنلاین", "تحلیل داده‌های فروش"]}]',
+    prerequisites = '["آشنایی مقدماتی با مفاهیم فروش", "گذراندن دوره مقدماتی"]',
+    target_audience = '["مدیران فروش", "کارشناسان فروش", "بازاریابان"]'
+WHERE title = 'کارگاه فروش حرفه‌ای' AND syllabus IS NULL;
+
+UPDATE academy_workshops
+SET syllabus = '[{"day": 1, "title": "شناخت سفر مشتری", "topics": ["نقاط تماس", "انتظارات مشتری"]}, {"day": 2, "title": "رسیدگی به شکایات", "topics": ["شنیدن فعال", "پیگیری تا حل مشکل"]}, {"day": 3, "title": "سنجش رضایت", "topics": ["NPS", "تحلیل بازخورد"]}]',
+    prerequisites = '["سابقه کار در واحد خدمات"]',
+    target_audience = '["کارشناسان خدمات", "سرپرستان پشتیبانی"]'
+WHERE title = 'مدیریت ارتباط با مشتری' AND syllabus IS NULL;
+
+UPDATE academy_workshops
+SET syllabus = '[{"day": 1, "title": "آماده‌سازی مذاکره", "topics": ["BATNA", "تعیین اهداف"]}, {"day": 2, "title": "مذاکره B2B", "topics": ["تصمیم‌گیرندگان خرید", "مذاکره قیمت"]}, {"day": 3, "title": "بستن قرارداد", "topics": ["امتیازدهی", "پیگیری پس از قرارداد"]}]',
+    prerequisites = '["گذراندن کارگاه فروش حرفه‌ای"]',
+    target_audience = '["کارشناسان فروش سازمانی", "مدیران حساب"]'
+WHERE title = 'مذاکرات فروش پیشرفته' AND syllabus IS NULL;
+
+-- جلسات کارگاه‌ها (استاد جلسه همان استاد کارگاه)
+INSERT INTO academy_sessions (workshop_id, master_id, title, date, duration, status)
+SELECT w.id, w.master_id, v.title, v.session_date, v.duration, v.status
+FROM (
+    SELECT 'کارگاه فروش حرفه‌ای' AS workshop, 'جلسه اول - مقدمات فروش' AS title,
+           '2025-03-15 10:00:00' AS session_date, 180 AS duration, 'upcoming' AS status
+    UNION ALL SELECT 'کارگاه فروش حرفه‌ای', 'جلسه دوم - تکنیک‌های مذاکره', '2025-03-16 10:00:00', 180, 'upcoming'
+    UNION ALL SELECT 'کارگاه فروش حرفه‌ای', 'جلسه سوم - فروش در عصر دیجیتال', '2025-03-17 10:00:00', 180, 'upcoming'
+    UNION ALL SELECT 'مدیریت ارتباط با مشتری', 'جلسه اول - سفر مشتری', '2025-03-20 09:00:00', 240, 'upcoming'
+    UNION ALL SELECT 'مدیریت ارتباط با مشتری', 'جلسه دوم - رسیدگی به شکایات', '2025-03-21 09:00:00', 240, 'upcoming'
+    UNION ALL SELECT 'مذاکرات فروش پیشرفته', 'جلسه اول - آماده‌سازی مذاکره', '2025-02-10 10:00:00', 180, 'completed'
+    UNION ALL SELECT 'مذاکرات فروش پیشرفته', 'جلسه دوم - مذاکره B2B', '2025-02-11 10:00:00', 180, 'completed'
+) v, academy_workshops w
+WHERE w.id = (SELECT MIN(w2.id) FROM academy_workshops w2 WHERE w2.title = v.workshop)
+  AND NOT EXISTS (SELECT 1 FROM academy_sessions s WHERE s.workshop_id = w.id AND s.title = v.title);
+
+-- سنجش‌ها؛ answer شماره گزینه درست (از صفر) است و در API به کاربر برگردانده نمی‌شود
+INSERT INTO academy_assessments (title, department, master_id, workshop_id, assessment_type, description,
+                                 questions, max_score, passing_score, duration, start_date, end_date, status)
+SELECT v.title, w.department, w.master_id, w.id, v.assessment_type, v.description,
+       v.questions, 100, 70, v.duration, v.start_date, v.end_date, v.status
+FROM (
+    SELECT 'آزمون فروش مقدماتی' AS title, 'کارگاه فروش حرفه‌ای' AS workshop, 'quiz' AS assessment_type,
+           'آزمون چهارگزینه‌ای از مباحث کارگاه فروش حرفه‌ای' AS description,
+           '[{"id": 1, "text": "کدام یک از موارد زیر جزو مراحل فروش حرفه‌ای محسوب می‌شود؟", "options": ["شناسایی نیاز", "ارائه محصول", "مدیریت اعتراضات", "همه موارد"], "score": 5, "answer": 3}, {"id": 2, "text": "در مذاکره فروش، BATNA به چه معناست؟", "options": ["بهترین جایگزین توافق", "قدرت چانه‌زنی", "نقطه توقف", "استراتژی مذاکره"], "score": 5, "answer": 0}, {"id": 3, "text": "اولین قدم در برخورد با اعتراض مشتری چیست؟", "options": ["ارائه تخفیف", "شنیدن کامل اعتراض", "تغییر موضوع", "ارجاع به مدیر"], "score": 5, "answer": 1}]' AS questions,
+           60 AS duration, '2025-03-20 10:00:00' AS start_date, '2025-03-25 18:00:00' AS end_date, 'active' AS status
+    UNION ALL SELECT 'آزمون ارتباط با مشتری', 'مدیریت ارتباط با مشتری', 'quiz',
+           'سنجش مفاهیم خدمات و رسیدگی به شکایات',
+           '[{"id": 1, "text": "شاخص NPS چه چیزی را می‌سنجد؟", "options": ["تمایل به معرفی به دیگران", "تعداد تماس‌ها", "زمان پاسخ‌گویی", "میزان فروش"], "score": 5, "answer": 0}, {"id": 2, "text": "بهترین زمان پیگیری شکایت حل‌شده چه زمانی است؟", "options": ["هرگز", "پس از چند روز برای اطمینان از رضایت", "فقط در صورت تماس دوباره", "پایان سال"], "score": 5, "answer": 1}]',
+           45, '2025-03-23 09:00:00', '2025-03-30 17:00:00', 'active'
+    UNION ALL SELECT 'سنجش نهایی مذاکره', 'مذاکرات فروش پیشرفته', 'final',
+           'سنجش نهایی کارگاه مذاکرات فروش پیشرفته',
+           '[{"id": 1, "text": "در مذاکره B2B تصمیم‌گیرنده نهایی معمولاً کیست؟", "options": ["کاربر محصول", "کمیته خرید", "نماینده فروش", "پشتیبانی"], "score": 10, "answer": 1}]',
+           30, '2025-02-13 10:00:00', '2025-02-15 18:00:00', 'completed'
+) v, academy_workshops w
+WHERE w.id = (SELECT MIN(w2.id) FROM academy_workshops w2 WHERE w2.title = v.workshop)
+  AND NOT EXISTS (SELECT 1 FROM academy_assessments a WHERE a.title = v.title);
+
+-- تقویم: شروع کارگاه‌ها و سنجش‌های نمونه
+INSERT INTO academy_schedule (department, title, description, event_date, event_type, related_id, color)
+SELECT w.department, w.title, w.description, w.start_date, 'workshop', w.id, '#4f46e5'
+FROM academy_workshops w
+WHERE w.title IN ('کارگاه فروش حرفه‌ای', 'مدیریت ارتباط با مشتری', 'مذاکرات فروش پیشرفته')
+  AND NOT EXISTS (SELECT 1 FROM academy_schedule s WHERE s.event_type = 'workshop' AND s.related_id = w.id);
+
+INSERT INTO academy_schedule (department, title, description, event_date, event_type, related_id, color)
+SELECT a.department, a.title, a.description, a.start_date, 'assessment', a.id, '#f59e0b'
+FROM academy_assessments a
+WHERE a.title IN ('آزمون فروش مقدماتی', 'آزمون ارتباط با مشتری', 'سنجش نهایی مذاکره')
+  AND NOT EXISTS (SELECT 1 FROM academy_schedule s WHERE s.event_type = 'assessment' AND s.related_id = a.id);
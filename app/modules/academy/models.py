@@ -1,187 +1,549 @@
 # modules/academy/models.py
-from modules.database import db
-from datetime import datetime
-
-class AcademyMaster(db.Model):
-    __tablename__ = 'academy_masters'
-    
-    id = db.Column(db.Integer, primary_key=True)
-    full_name = db.Column(db.String(100), nullable=False)
-    expertise = db.Column(db.String(200))
-    department = db.Column(db.Enum('sales', 'services'), nullable=False)
-    bio = db.Column(db.Text)
-    image_url = db.Column(db.String(500))
-    email = db.Column(db.String(100))
-    phone = db.Column(db.String(20))
-    education = db.Column(db.JSON)
-    experience = db.Column(db.JSON)
-    courses_count = db.Column(db.Integer, default=0)
-    students_count = db.Column(db.Integer, default=0)
-    rating = db.Column(db.Numeric(2,1), default=0)
-    is_active = db.Column(db.Boolean, default=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    
-    # روابط
-    workshops = db.relationship('AcademyWorkshop', backref='master', lazy=True)
-    sessions = db.relationship('AcademySession', backref='master', lazy=True)
-    assessments = db.relationship('AcademyAssessment', backref='master', lazy=True)
-    qas = db.relationship('AcademyQA', backref='master', lazy=True)
-
-
-class AcademyWorkshop(db.Model):
-    __tablename__ = 'academy_workshops'
-    
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
-    department = db.Column(db.Enum('sales', 'services'), nullable=False)
-    master_id = db.Column(db.Integer, db.ForeignKey('academy_masters.id'))
-    description = db.Column(db.Text)
-    start_date = db.Column(db.DateTime)
-    end_date = db.Column(db.DateTime)
-    capacity = db.Column(db.Integer, default=0)
-    registered_count = db.Column(db.Integer, default=0)
-    workshop_type = db.Column(db.Enum('online', 'practical', 'theoretical'), default='online')
-    status = db.Column(db.Enum('upcoming', 'ongoing', 'completed', 'cancelled'), default='upcoming')
-    price = db.Column(db.String(50))
-    location = db.Column(db.String(200))
-    syllabus = db.Column(db.JSON)
-    prerequisites = db.Column(db.JSON)
-    target_audience = db.Column(db.JSON)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    
-    # روابط
-    sessions = db.relationship('AcademySession', backref='workshop', lazy=True, cascade='all, delete-orphan')
-    registrations = db.relationship('AcademyRegistration', backref='workshop', lazy=True, cascade='all, delete-orphan')
-    assessments = db.relationship('AcademyAssessment', backref='workshop', lazy=True)
-    qas = db.relationship('AcademyQA', backref='workshop', lazy=True, cascade='all, delete-orphan')
-
-
-class AcademySession(db.Model):
-    __tablename__ = 'academy_sessions'
-    
-    id = db.Column(db.Integer, primary_key=True)
-    workshop_id = db.Column(db.Integer, db.ForeignKey('academy_workshops.id'), nullable=False)
-    master_id = db.Column(db.Integer, db.ForeignKey('academy_masters.id'))
-    title = db.Column(db.String(200))
-    description = db.Column(db.Text)
-    date = db.Column(db.DateTime)
-    duration = db.Column(db.Integer)  # به دقیقه
-    material_url = db.Column(db.String(500))
-    video_url = db.Column(db.String(500))
-    meeting_link = db.Column(db.String(500))
-    status = db.Column(db.Enum('upcoming', 'completed', 'cancelled'), default='upcoming')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-
-
-class AcademyRegistration(db.Model):
-    __tablename__ = 'academy_registrations'
-    
-    id = db.Column(db.Integer, primary_key=True)
-    workshop_id = db.Column(db.Integer, db.ForeignKey('academy_workshops.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    registration_date = db.Column(db.DateTime, default=datetime.utcnow)
-    status = db.Column(db.Enum('registered', 'attended', 'completed', 'cancelled'), default='registered')
-    attendance_percentage = db.Column(db.Numeric(5,2), default=0)
-    certificate_issued = db.Column(db.Boolean, default=False)
-    certificate_url = db.Column(db.String(500))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    
-    __table_args__ = (db.UniqueConstraint('workshop_id', 'user_id', name='unique_registration'),)
-
-
-class AcademyAssessment(db.Model):
-    __tablename__ = 'academy_assessments'
-    
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
-    department = db.Column(db.Enum('sales', 'services'), nullable=False)
-    master_id = db.Column(db.Integer, db.ForeignKey('academy_masters.id'))
-    workshop_id = db.Column(db.Integer, db.ForeignKey('academy_workshops.id'))
-    assessment_type = db.Column(db.Enum('quiz', 'practical', 'survey', 'final'), default='quiz')
-    description = db.Column(db.Text)
-    questions = db.Column(db.JSON)
-    max_score = db.Column(db.Integer, default=100)
-    passing_score = db.Column(db.Integer, default=70)
-    duration = db.Column(db.Integer)
-    start_date = db.Column(db.DateTime)
-    end_date = db.Column(db.DateTime)
-    status = db.Column(db.Enum('draft', 'active', 'completed', 'archived'), default='draft')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    
-    # روابط
-    results = db.relationship('AcademyAssessmentResult', backref='assessment', lazy=True, cascade='all, delete-orphan')
-
-
-class AcademyAssessmentResult(db.Model):
-    __tablename__ = 'academy_assessment_results'
-    
-    id = db.Column(db.Integer, primary_key=True)
-    assessment_id = db.Column(db.Integer, db.ForeignKey('academy_assessments.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    score = db.Column(db.Numeric(5,2))
-    answers = db.Column(db.JSON)
-    status = db.Column(db.Enum('passed', 'failed', 'pending'), default='pending')
-    started_at = db.Column(db.DateTime)
-    completed_at = db.Column(db.DateTime)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    
-    __table_args__ = (db.UniqueConstraint('assessment_id', 'user_id', name='unique_assessment_user'),)
-
-
-class AcademyQA(db.Model):
-    __tablename__ = 'academy_qa'
-    
-    id = db.Column(db.Integer, primary_key=True)
-    workshop_id = db.Column(db.Integer, db.ForeignKey('academy_workshops.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    master_id = db.Column(db.Integer, db.ForeignKey('academy_masters.id'))
-    question = db.Column(db.Text, nullable=False)
-    answer = db.Column(db.Text)
-    is_answered = db.Column(db.Boolean, default=False)
-    answered_at = db.Column(db.DateTime)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-
-
-class ChatSession(db.Model):
-    __tablename__ = 'chat_sessions'
-    
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    title = db.Column(db.String(200))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    
-    # روابط
-    messages = db.relationship('ChatMessage', backref='session', lazy=True, cascade='all, delete-orphan')
-
-
-class ChatMessage(db.Model):
-    __tablename__ = 'chat_messages'
-    
-    id = db.Column(db.Integer, primary_key=True)
-    session_id = db.Column(db.Integer, db.ForeignKey('chat_sessions.id'), nullable=False)
-    role = db.Column(db.Enum('user', 'assistant', 'system'), nullable=False)
-    content = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-
-class AcademySchedule(db.Model):
-    __tablename__ = 'academy_schedule'
-    
-    id = db.Column(db.Integer, primary_key=True)
-    department = db.Column(db.Enum('sales', 'services'), nullable=False)
-    title = db.Column(db.String(200), nullable=False)
-    description = db.Column(db.Text)
-    event_date = db.Column(db.DateTime, nullable=False)
-    event_type = db.Column(db.Enum('workshop', 'assessment', 'session', 'holiday', 'other'), default='workshop')
-    related_id = db.Column(db.Integer)
-    color = db.Column(db.String(20))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
\ No newline at end of file
+"""مدل‌های آموزشگاه روی جداول academy_* (خواندن با execute_query، نوشتن در transaction)"""
+import json
+from datetime import datetime, date
+from decimal import Decimal
+from modules.database import execute_query, transaction
+
+DEPARTMENTS = ('sales', 'services')
+WORKSHOP_TYPES = ('online', 'practical', 'theoretical')
+WORKSHOP_STATUSES = ('upcoming', 'ongoing', 'completed', 'cancelled')
+ASSESSMENT_STATUSES = ('draft', 'active', 'completed', 'archived')
+
+# ستون‌های قابل ثبت از بدنه درخواست (ستون‌های JSON به متن تبدیل می‌شوند)
+MASTER_FIELDS = ('full_name', 'expertise', 'department', 'bio', 'image_url', 'email', 'phone',
+                 'education', 'experience')
+WORKSHOP_FIELDS = ('title', 'department', 'master_id', 'description', 'start_date', 'end_date', 'capacity',
+                   'workshop_type', 'status', 'price', 'location', 'syllabus', 'prerequisites', 'target_audience')
+JSON_FIELDS = ('education', 'experience', 'syllabus', 'prerequisites', 'target_audience')
+
+# کوئری‌های خواندنی؛ scripts/check_query_plans.py پلن همین‌ها را بررسی می‌کند
+# {where} از _where و {dept}/{w_dept}/{a_dept} از AcademyStats.get می‌آیند
+MASTERS_QUERY = """
+    SELECT id, full_name, expertise, department, bio, image_url,
+           courses_count, students_count, rating
+    FROM academy_masters{where}
+    ORDER BY rating DESC, id
+"""
+MASTER_QUERY = """
+    SELECT id, full_name, expertise, department, bio, image_url, email, phone,
+           education, experience, courses_count, students_count, rating
+    FROM academy_masters
+    WHERE id = %s AND is_active = TRUE
+"""
+MASTER_COURSES_QUERY = """
+    SELECT id, title, start_date as date, registered_count as students, status
+    FROM academy_workshops
+    WHERE master_id = %s
+    ORDER BY start_date DESC
+"""
+WORKSHOPS_QUERY = """
+    SELECT w.id, w.title, w.department, m.full_name as master_name, w.master_id,
+           w.description, w.start_date, w.end_date, w.capacity, w.registered_count,
+           w.workshop_type, w.status, w.price, w.location
+    FROM academy_workshops w
+    LEFT JOIN academy_masters m ON m.id = w.master_id{where}
+    ORDER BY w.start_date DESC
+"""
+WORKSHOP_QUERY = """
+    SELECT w.id, w.title, w.department, m.full_name as master_name, w.master_id, m.bio as master_bio,
+           w.description, w.start_date, w.end_date, w.capacity, w.registered_count,
+           w.workshop_type, w.status, w.price, w.location,
+           w.syllabus, w.prerequisites, w.target_audience
+    FROM academy_workshops w
+    LEFT JOIN academy_masters m ON m.id = w.master_id
+    WHERE w.id = %s
+"""
+WORKSHOP_SESSIONS_QUERY = """
+    SELECT s.id, s.title, s.date, s.duration, m.full_name as master_name,
+           s.material_url, s.video_url, s.status
+    FROM academy_sessions s
+    LEFT JOIN academy_masters m ON m.id = s.master_id
+    WHERE s.workshop_id = %s
+    ORDER BY s.date, s.id
+"""
+USER_WORKSHOPS_QUERY = """
+    SELECT w.id, w.title, m.full_name as master_name, w.start_date, w.end_date, w.status,
+           r.attendance_percentage as progress, r.certificate_issued as certificate_available
+    FROM academy_registrations r
+    JOIN academy_workshops w ON w.id = r.workshop_id
+    LEFT JOIN academy_masters m ON m.id = w.master_id
+    WHERE r.user_id = %s AND r.status != 'cancelled'
+    ORDER BY w.start_date DESC
+"""
+ASSESSMENTS_QUERY = """
+    SELECT a.id, a.title, a.department, m.full_name as master_name, a.workshop_id,
+           w.title as workshop_title, a.assessment_type, a.max_score, a.passing_score,
+           a.start_date, a.end_date, a.duration,
+           COALESCE(JSON_LENGTH(a.questions), 0) as questions_count, a.status
+    FROM academy_assessments a
+    LEFT JOIN academy_masters m ON m.id = a.master_id
+    LEFT JOIN academy_workshops w ON w.id = a.workshop_id{where}
+    ORDER BY a.start_date DESC
+"""
+ASSESSMENT_QUERY = """
+    SELECT a.id, a.title, a.department, m.full_name as master_name, a.workshop_id,
+           w.title as workshop_title, a.assessment_type, a.description, a.questions,
+           a.max_score, a.passing_score, a.start_date, a.end_date, a.duration, a.status,
+           COALESCE(r.status, 'not_started') as user_status
+    FROM academy_assessments a
+    LEFT JOIN academy_masters m ON m.id = a.master_id
+    LEFT JOIN academy_workshops w ON w.id = a.workshop_id
+    LEFT JOIN academy_assessment_results r ON r.assessment_id = a.id AND r.user_id = %s
+    WHERE a.id = %s
+"""
+ASSESSMENT_RESULT_QUERY = """
+    SELECT id, assessment_id, user_id, score, status, completed_at, answers
+    FROM academy_assessment_results
+    WHERE assessment_id = %s AND user_id = %s
+"""
+USER_ASSESSMENTS_QUERY = """
+    SELECT a.id, a.title, w.title as workshop_title,
+           CASE WHEN res.status IN ('passed', 'failed') THEN 'completed' ELSE 'pending' END as status,
+           res.score, a.end_date as deadline
+    FROM academy_registrations reg
+    JOIN academy_assessments a ON a.workshop_id = reg.workshop_id
+    JOIN academy_workshops w ON w.id = a.workshop_id
+    LEFT JOIN academy_assessment_results res ON res.assessment_id = a.id AND res.user_id = reg.user_id
+    WHERE reg.user_id = %s AND reg.status != 'cancelled' AND a.status IN ('active', 'completed')
+    ORDER BY a.end_date DESC
+"""
+WORKSHOP_QA_QUERY = """
+    SELECT q.id, q.question, q.answer, q.is_answered, q.created_at,
+           COALESCE(u.full_name, u.username) as user_name,
+           m.full_name as master_name, q.answered_at
+    FROM academy_qa q
+    LEFT JOIN users u ON u.id = q.user_id
+    LEFT JOIN academy_masters m ON m.id = q.master_id
+    WHERE q.workshop_id = %s
+    ORDER BY q.created_at DESC, q.id DESC
+"""
+SCHEDULE_QUERY = """
+    SELECT id, title, description, event_date, event_type, department, related_id, color
+    FROM academy_schedule{where}
+    ORDER BY event_date
+"""
+STATS_QUERY = """
+    SELECT
+        (SELECT COUNT(*) FROM academy_masters WHERE is_active = TRUE{dept}) as total_masters,
+        (SELECT COALESCE(AVG(rating), 0) FROM academy_masters WHERE is_active = TRUE{dept}) as avg_rating,
+        (SELECT COUNT(*) FROM academy_workshops WHERE 1 = 1{dept}) as total_workshops,
+        (SELECT COUNT(*) FROM academy_workshops WHERE status = 'upcoming'{dept}) as upcoming_workshops,
+        (SELECT COUNT(*) FROM academy_assessments WHERE 1 = 1{dept}) as total_assessments,
+        (SELECT COUNT(DISTINCT r.user_id) FROM academy_registrations r
+            JOIN academy_workshops w ON w.id = r.workshop_id
+            WHERE r.status != 'cancelled'{w_dept}) as total_students,
+        (SELECT COUNT(*) FROM academy_assessment_results ar
+            JOIN academy_assessments a ON a.id = ar.assessment_id
+            WHERE ar.status IN ('passed', 'failed'){a_dept}) as completed_assessments,
+        (SELECT COUNT(*) FROM academy_assessment_results ar
+            JOIN academy_assessments a ON a.id = ar.assessment_id
+            WHERE ar.status = 'passed'{a_dept}) as passed_assessments
+"""
+
+# مکالمه‌های استاد فروش (routes)
+CHAT_HISTORY_QUERY = """
+    SELECT cs.*, 
+           (SELECT content FROM chat_messages WHERE session_id = cs.id ORDER BY created_at DESC LIMIT 1) as last_message
+    FROM chat_sessions cs
+    WHERE cs.user_id = %s
+    ORDER BY cs.updated_at DESC
+    LIMIT 10
+"""
+CHAT_FIRST_MESSAGE_QUERY = """
+    SELECT content FROM chat_messages 
+    WHERE session_id = %s AND role = 'user' 
+    ORDER BY created_at ASC LIMIT 1
+"""
+CHAT_ACCESS_QUERY = "SELECT id FROM chat_sessions WHERE id = %s AND user_id = %s"
+CHAT_MESSAGES_QUERY = """
+    SELECT role, content, created_at 
+    FROM chat_messages 
+    WHERE session_id = %s 
+    ORDER BY created_at ASC
+"""
+CHAT_CONTEXT_QUERY = """
+    SELECT role, content FROM chat_messages 
+    WHERE session_id = %s 
+    ORDER BY created_at DESC 
+    LIMIT 10
+"""
+
+
+def _serialize(row):
+    """تبدیل تاریخ‌ها به ISO و Decimal به float برای خروجی JSON"""
+    if row is None:
+        return None
+    for key, value in row.items():
+        if isinstance(value, (datetime, date)):
+            row[key] = value.isoformat()
+        elif isinstance(value, Decimal):
+            row[key] = float(value)
+    return row
+
+
+def _load_json(row, *keys):
+    """باز کردن ستون‌های JSON (mysql.connector و SQLite متن برمی‌گردانند)؛ مقدار خالی ← لیست خالی"""
+    for key in keys:
+        value = row.get(key)
+        if isinstance(value, (str, bytes, bytearray)):
+            row[key] = json.loads(value) if value else []
+        elif value is None:
+            row[key] = []
+    return row
+
+
+def _columns(data, fields):
+    """(ستون‌ها، مقادیر) فیلدهای مجاز موجود در data"""
+    columns = [field for field in fields if field in data]
+    values = tuple(
+        json.dumps(data[column], ensure_ascii=False) if column in JSON_FIELDS else data[column]
+        for column in columns
+    )
+    return columns, values
+
+
+def _insert(table, data, fields):
+    """درج یک سطر از فیلدهای مجاز و برگرداندن شناسه آن"""
+    columns, values = _columns(data, fields)
+    query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    with transaction() as cursor:
+        cursor.execute(query, values)
+        return cursor.lastrowid
+
+
+def exists(table, row_id):
+    """آیا سطری با این شناسه در جدول هست؟"""
+    query = f"SELECT 1 as found FROM {table} WHERE id = %s"
+    return execute_query(query, (row_id,), fetch_one=True) is not None
+
+
+def _where(conditions):
+    """ساخت WHERE از روی شرط‌های (ستون، مقدار) با مقدار غیر خالی"""
+    clauses = [f"{column} = %s" for column, value in conditions if value]
+    params = tuple(value for _, value in conditions if value)
+    return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+
+class AcademyMaster:
+    """اساتید آموزشگاه"""
+
+    @staticmethod
+    def get_all(department=None):
+        """اساتید فعال (ایندکس idx_department_active)"""
+        where, params = _where([('department', department)])
+        where += (' AND ' if where else ' WHERE ') + 'is_active = TRUE'
+        query = MASTERS_QUERY.format(where=where)
+        return [_serialize(row) for row in execute_query(query, params, fetch_all=True) or []]
+
+    @staticmethod
+    def get_by_id(master_id):
+        """جزئیات استاد فعال همراه با کارگاه‌هایش (None اگر نیست)"""
+        master = execute_query(MASTER_QUERY, (master_id,), fetch_one=True)
+        if not master:
+            return None
+
+        courses = execute_query(MASTER_COURSES_QUERY, (master_id,), fetch_all=True) or []
+        master['courses'] = [_serialize(row) for row in courses]
+        return _serialize(_load_json(master, 'education', 'experience'))
+
+    @staticmethod
+    def create(data):
+        """ثبت استاد جدید؛ شناسه استاد"""
+        return _insert('academy_masters', data, MASTER_FIELDS)
+
+    @staticmethod
+    def update(master_id, data):
+        """ویرایش فیلدهای داده‌شده؛ False اگر استاد فعالی با این شناسه نیست"""
+        columns, values = _columns(data, MASTER_FIELDS)
+        with transaction() as cursor:
+            cursor.execute(
+                "SELECT id FROM academy_masters WHERE id = %s AND is_active = TRUE FOR UPDATE", (master_id,)
+            )
+            if not cursor.fetchone():
+                return False
+            assignments = ', '.join(f"{column} = %s" for column in columns)
+            cursor.execute(f"UPDATE academy_masters SET {assignments} WHERE id = %s", values + (master_id,))
+        return True
+
+    @staticmethod
+    def delete(master_id):
+        """غیرفعال کردن استاد (کارگاه‌ها و سنجش‌های قبلی نام او را نگه می‌دارند)"""
+        with transaction() as cursor:
+            cursor.execute(
+                "UPDATE academy_masters SET is_active = FALSE WHERE id = %s AND is_active = TRUE", (master_id,)
+            )
+            return cursor.rowcount > 0
+
+
+class AcademyWorkshop:
+    """کارگاه‌های آموزشی"""
+
+    @staticmethod
+    def get_all(department=None, workshop_type=None, status=None):
+        """کارگاه‌ها با فیلتر بخش، نوع و وضعیت (ایندکس idx_department_status_start)"""
+        where, params = _where([
+            ('w.department', department),
+            ('w.status', status),
+            ('w.workshop_type', workshop_type)
+        ])
+        query = WORKSHOPS_QUERY.format(where=where)
+        return [_serialize(row) for row in execute_query(query, params, fetch_all=True) or []]
+
+    @staticmethod
+    def get_by_id(workshop_id):
+        """جزئیات کارگاه با سرفصل‌ها و معرفی استاد (None اگر نیست)"""
+        workshop = execute_query(WORKSHOP_QUERY, (workshop_id,), fetch_one=True)
+        if not workshop:
+            return None
+        return _serialize(_load_json(workshop, 'syllabus', 'prerequisites', 'target_audience'))
+
+    @staticmethod
+    def get_sessions(workshop_id):
+        """جلسات کارگاه به ترتیب تاریخ (ایندکس idx_workshop)"""
+        rows = execute_query(WORKSHOP_SESSIONS_QUERY, (workshop_id,), fetch_all=True) or []
+        return [_serialize(row) for row in rows]
+
+    @staticmethod
+    def get_for_user(user_id):
+        """کارگاه‌هایی که کاربر در آن‌ها ثبت‌نام کرده (ایندکس idx_user)"""
+        rows = execute_query(USER_WORKSHOPS_QUERY, (user_id,), fetch_all=True) or []
+        courses = [_serialize(row) for row in rows]
+        for course in courses:
+            course['certificate_available'] = bool(course['certificate_available'])
+        return courses
+
+    @staticmethod
+    def create(data):
+        """ثبت کارگاه جدید؛ شناسه کارگاه"""
+        return _insert('academy_workshops', data, WORKSHOP_FIELDS)
+
+    @staticmethod
+    def register(workshop_id, user_id):
+        """ثبت‌نام کاربر با قفل سطر کارگاه تا ظرفیت بیش از حد پر نشود
+
+        خروجی: 'registered'، 'not_found'، 'closed' (کارگاه تمام یا لغو شده)، 'exists' یا 'full'
+        ظرفیت صفر یعنی بدون سقف.
+        """
+        with transaction() as cursor:
+            cursor.execute(
+                "SELECT capacity, registered_count, status FROM academy_workshops WHERE id = %s FOR UPDATE",
+                (workshop_id,)
+            )
+            workshop = cursor.fetchone()
+            if not workshop:
+                return 'not_found'
+            capacity, registered_count, status = workshop
+            if status not in ('upcoming', 'ongoing'):
+                return 'closed'
+
+            cursor.execute(
+                "SELECT id, status FROM academy_registrations WHERE workshop_id = %s AND user_id = %s",
+                (workshop_id, user_id)
+            )
+            registration = cursor.fetchone()
+            if registration and registration[1] != 'cancelled':
+                return 'exists'
+            if capacity and registered_count >= capacity:
+                return 'full'
+
+            if registration:
+                cursor.execute(
+                    "UPDATE academy_registrations SET status = 'registered', registration_date = NOW() WHERE id = %s",
+                    (registration[0],)
+                )
+            else:
+                cursor.execute(
+                    "INSERT INTO academy_registrations (workshop_id, user_id) VALUES (%s, %s)",
+                    (workshop_id, user_id)
+                )
+            cursor.execute(
+                "UPDATE academy_workshops SET registered_count = registered_count + 1 WHERE id = %s", (workshop_id,)
+            )
+        return 'registered'
+
+    @staticmethod
+    def unregister(workshop_id, user_id):
+        """لغو ثبت‌نام فعال کاربر؛ False اگر ثبت‌نام قابل لغوی نیست"""
+        with transaction() as cursor:
+            # همان ترتیب قفل register (اول کارگاه) تا بن‌بست پیش نیاید
+            cursor.execute("SELECT id FROM academy_workshops WHERE id = %s FOR UPDATE", (workshop_id,))
+            if not cursor.fetchone():
+                return False
+            cursor.execute(
+                "UPDATE academy_registrations SET status = 'cancelled' "
+                "WHERE workshop_id = %s AND user_id = %s AND status = 'registered'",
+                (workshop_id, user_id)
+            )
+            if cursor.rowcount == 0:
+                return False
+            cursor.execute(
+                "UPDATE academy_workshops SET registered_count = registered_count - 1 "
+                "WHERE id = %s AND registered_count > 0",
+                (workshop_id,)
+            )
+        return True
+
+
+class AcademyAssessment:
+    """سنجش‌ها"""
+
+    @staticmethod
+    def get_all(department=None, status=None):
+        """سنجش‌ها با فیلتر بخش و وضعیت (ایندکس idx_department_status_start)"""
+        where, params = _where([('a.department', department), ('a.status', status)])
+        query = ASSESSMENTS_QUERY.format(where=where)
+        return [_serialize(row) for row in execute_query(query, params, fetch_all=True) or []]
+
+    @staticmethod
+    def get_by_id(assessment_id, user_id):
+        """سنجش با سوالات (بدون پاسخ درست) و وضعیت کاربر جاری (None اگر نیست)"""
+        assessment = execute_query(ASSESSMENT_QUERY, (user_id, assessment_id), fetch_one=True)
+        if not assessment:
+            return None
+        _load_json(assessment, 'questions')
+        assessment['questions'] = [
+            {key: value for key, value in question.items() if key != 'answer'}
+            for question in assessment['questions']
+        ]
+        return _serialize(assessment)
+
+    @staticmethod
+    def submit(assessment_id, user_id, answers):
+        """تصحیح و ثبت پاسخ‌ها {شناسه سوال: شماره گزینه}
+
+        نمره = سهم امتیاز سوال‌های درست از کل امتیازها × max_score.
+        خروجی (وضعیت، نتیجه): وضعیت 'done'، 'not_found'، 'closed' (سنجش فعال نیست) یا 'submitted' (قبلاً ثبت شده)
+        """
+        answers = {str(key): value for key, value in answers.items()}
+        with transaction() as cursor:
+            cursor.execute(
+                "SELECT questions, max_score, passing_score, status FROM academy_assessments WHERE id = %s",
+                (assessment_id,)
+            )
+            assessment = cursor.fetchone()
+            if not assessment:
+                return 'not_found', None
+            questions, max_score, passing_score, status = assessment
+            if status != 'active':
+                return 'closed', None
+
+            cursor.execute(
+                "SELECT id, status FROM academy_assessment_results "
+                "WHERE assessment_id = %s AND user_id = %s FOR UPDATE",
+                (assessment_id, user_id)
+            )
+            result = cursor.fetchone()
+            if result and result[1] != 'pending':
+                return 'submitted', None
+
+            questions = _load_json({'questions': questions}, 'questions')['questions']
+            total = sum(question.get('score', 1) for question in questions)
+            earned = sum(
+                question.get('score', 1) for question in questions
+                if 'answer' in question and answers.get(str(question['id'])) == question['answer']
+            )
+            score = round(earned / total * max_score, 2) if total else 0
+            result_status = 'passed' if score >= passing_score else 'failed'
+            answers_json = json.dumps(answers, ensure_ascii=False)
+
+            if result:
+                cursor.execute(
+                    "UPDATE academy_assessment_results SET score = %s, answers = %s, status = %s, "
+                    "completed_at = NOW() WHERE id = %s",
+                    (score, answers_json, result_status, result[0])
+                )
+            else:
+                cursor.execute(
+                    "INSERT INTO academy_assessment_results "
+                    "(assessment_id, user_id, score, answers, status, completed_at) "
+                    "VALUES (%s, %s, %s, %s, %s, NOW())",
+                    (assessment_id, user_id, score, answers_json, result_status)
+                )
+        return 'done', {'score': score, 'status': result_status}
+
+    @staticmethod
+    def get_result(assessment_id, user_id):
+        """نتیجه سنجش کاربر (None اگر پاسخی ثبت نکرده)"""
+        result = execute_query(ASSESSMENT_RESULT_QUERY, (assessment_id, user_id), fetch_one=True)
+        if not result:
+            return None
+        result['answers'] = json.loads(result['answers']) if result['answers'] else {}
+        return _serialize(result)
+
+    @staticmethod
+    def get_for_user(user_id):
+        """سنجش‌های کارگاه‌هایی که کاربر در آن‌ها ثبت‌نام کرده، با نمره در صورت پاسخ"""
+        rows = execute_query(USER_ASSESSMENTS_QUERY, (user_id,), fetch_all=True) or []
+        return [_serialize(row) for row in rows]
+
+
+class AcademyQA:
+    """پرسش و پاسخ کارگاه‌ها"""
+
+    @staticmethod
+    def get_for_workshop(workshop_id):
+        """پرسش‌های یک کارگاه، جدیدترین اول (ایندکس idx_workshop)"""
+        rows = execute_query(WORKSHOP_QA_QUERY, (workshop_id,), fetch_all=True) or []
+        qas = [_serialize(row) for row in rows]
+        for qa in qas:
+            qa['is_answered'] = bool(qa['is_answered'])
+        return qas
+
+    @staticmethod
+    def ask(workshop_id, user_id, question):
+        """ثبت پرسش جدید؛ شناسه پرسش"""
+        return _insert('academy_qa', {'workshop_id': workshop_id, 'user_id': user_id, 'question': question},
+                       ('workshop_id', 'user_id', 'question'))
+
+    @staticmethod
+    def answer(qa_id, answer, master_id=None):
+        """ثبت پاسخ؛ False اگر پرسشی با این شناسه نیست"""
+        with transaction() as cursor:
+            cursor.execute("SELECT id FROM academy_qa WHERE id = %s FOR UPDATE", (qa_id,))
+            if not cursor.fetchone():
+                return False
+            cursor.execute(
+                "UPDATE academy_qa SET answer = %s, master_id = %s, is_answered = TRUE, answered_at = NOW() "
+                "WHERE id = %s",
+                (answer, master_id, qa_id)
+            )
+        return True
+
+
+class AcademySchedule:
+    """تقویم آموزشی"""
+
+    @staticmethod
+    def get_all(department=None):
+        """رویدادهای تقویم به ترتیب تاریخ (ایندکس idx_department_date)"""
+        where, params = _where([('department', department)])
+        query = SCHEDULE_QUERY.format(where=where)
+        return [_serialize(row) for row in execute_query(query, params, fetch_all=True) or []]
+
+
+class AcademyStats:
+    """آمار تجمیعی آموزشگاه"""
+
+    @staticmethod
+    def get(department=None):
+        """آمار کلی یا یک بخش در یک رفت‌وبرگشت به دیتابیس"""
+        dept = ' AND department = %s' if department else ''
+        w_dept = ' AND w.department = %s' if department else ''
+        a_dept = ' AND a.department = %s' if department else ''
+        query = STATS_QUERY.format(dept=dept, w_dept=w_dept, a_dept=a_dept)
+        params = (department,) * 8 if department else ()
+        row = execute_query(query, params, fetch_one=True) or {}
+
+        completed = int(row.get('completed_assessments') or 0)
+        passed = int(row.get('passed_assessments') or 0)
+        return {
+            'total_masters': int(row.get('total_masters') or 0),
+            'total_workshops': int(row.get('total_workshops') or 0),
+            'total_assessments': int(row.get('total_assessments') or 0),
+            'upcoming_workshops': int(row.get('upcoming_workshops') or 0),
+            'completed_assessments': completed,
+            'total_students': int(row.get('total_students') or 0),
+            'avg_rating': round(float(row.get('avg_rating') or 0), 1),
+            'success_rate': round(passed / completed * 100) if completed else 0
+        }
@@ -159,4 +159,18 @@ SALES_MASTER_SYSTEM_PROMPT = """شما استاد فروش ارشد شرکت ن
 - اعداد و قیمت‌ها رو دقیق بگو (به ریال یا میلیون ریال)"""
 
 def get_sales_master_prompt():
-    return SALES_MASTER_SYSTEM_PROMPT
\ No newline at end of file
+    return SALES_MASTER_SYSTEM_PROMPT
+
+
+def build_chat_messages(history, products_text):
+    """پیام‌های درخواست چت: پرامپت ثابت استاد، تاریخچه، محصولات مرتبط و در آخر پیام جدید کاربر
+
+    پرامپت ثابت و تاریخچه قبلی در پیام‌های پیاپی یک مکالمه یکسان می‌مانند و OpenAI آن‌ها را
+    کش می‌کند (prompt caching)؛ محصولات که با هر سوال تغییر می‌کنند بعد از تاریخچه می‌آیند.
+    history: [{role، content}] به ترتیب زمان که آخرین آن پیام جدید کاربر است.
+    """
+    messages = [{"role": "system", "content": SALES_MASTER_SYSTEM_PROMPT}]
+    messages.extend(history[:-1])
+    messages.append({"role": "system", "content": products_text})
+    messages.extend(history[-1:])
+    return messages
\ No newline at end of file
@@ -2,24 +2,55 @@
 from flask import Blueprint, render_template, jsonify, request, session
 from modules.auth.decorators import login_required, manager_required, admin_required
 from datetime import datetime
-import openai
 from modules.config import Config
 import json
 import pytz
-from modules.database import execute_query, get_db_connection
+from modules.database import execute_query, get_db_connection, mark_write
+from modules.utils.cache import TTLCache
+from modules.openai_client import OpenAIClient
+from modules.llm_resilience import CircuitOpenError
+from modules.llm_usage import UsageBatch, TokenBudgetError
 from .product_search import ProductSearch
+from .models import (
+    AcademyMaster, AcademyWorkshop, AcademyAssessment, AcademyQA, AcademySchedule, AcademyStats,
+    DEPARTMENTS, WORKSHOP_TYPES, WORKSHOP_STATUSES, ASSESSMENT_STATUSES, MASTER_FIELDS, WORKSHOP_FIELDS, exists,
+    CHAT_HISTORY_QUERY, CHAT_FIRST_MESSAGE_QUERY, CHAT_ACCESS_QUERY, CHAT_MESSAGES_QUERY, CHAT_CONTEXT_QUERY
+)
 
 # ایمپورت پرامپت
-from modules.academy.prompts.sales_master_prompt import get_sales_master_prompt
-
-# تنظیم کلید OpenAI
-openai.api_key = Config.OPENAI_API_KEY
+from modules.academy.prompts.sales_master_prompt import build_chat_messages
 
 # ایجاد شیء جستجوی محصولات
 product_search = ProductSearch()
 
+# کلاینت چت استاد؛ اتصال HTTP با بقیه بخش‌ها مشترک است (modules/llm_client.py)
+chat_client = OpenAIClient()
+
+# کش لیست‌ها و آمار آموزشگاه (read-through با انقضای زمانی)؛ API های نوشتن کلیدهای مربوط را
+# invalidate می‌کنند. کش درون پروسس است: پروسس‌های دیگر و نوشتن مستقیم در دیتابیس
+# (مثل migrations/011_academy_seed.sql) فقط با انقضای ACADEMY_CACHE_TTL دیده می‌شوند.
+academy_cache = TTLCache(ttl=Config.ACADEMY_CACHE_TTL)
+
 academy_bp = Blueprint('academy', __name__, url_prefix='/academy')
 
+
+def _arg_choice(name, choices):
+    """مقدار پارامتر فیلتر در صورت معتبر بودن (all یا مقدار ناشناخته = بدون فیلتر)"""
+    value = request.args.get(name)
+    return value if value in choices else None
+
+
+def _payload(fields, required=(), choices=None):
+    """فیلدهای مجاز بدنه JSON درخواست ← (داده، پیام خطا)"""
+    data = {key: value for key, value in (request.get_json(silent=True) or {}).items() if key in fields}
+    missing = [field for field in required if not data.get(field)]
+    if missing:
+        return None, f"فیلدهای الزامی ارسال نشده: {', '.join(missing)}"
+    for field, allowed in (choices or {}).items():
+        if field in data and data[field] not in allowed:
+            return None, f"مقدار نامعتبر برای {field}"
+    return data, None
+
 # ================ صفحات اصلی ================
 
 @academy_bp.route('/')
@@ -88,99 +119,34 @@ def services_workshop():
 @login_required
 def get_masters_list():
     """دریافت لیست اساتید"""
-    department = request.args.get('department')
+    department = _arg_choice('department', DEPARTMENTS)
     
-    masters = {
-        'sales': [
-            {
-                'id': 1,
-                'full_name': 'دکتر علی محمدی',
-                'expertise': 'فروش و بازاریابی پیشرفته',
-                'department': 'sales',
-                'bio': 'دکترای مدیریت بازاریابی با ۱۵ سال سابقه تدریس در سازمان‌های بزرگ',
-                'image_url': None,
-                'courses_count': 12,
-                'students_count': 450,
-                'rating': 4.8
-            },
-            {
-                'id': 2,
-                'full_name': 'مهندس سارا احمدی',
-                'expertise': 'مذاکرات فروش حرفه‌ای',
-                'department': 'sales',
-                'bio': 'مشاور فروش شرکت‌های بزرگ با سابقه بیش از ۱۰۰۰ ساعت کارگاه آموزشی',
-                'image_url': None,
-                'courses_count': 8,
-                'students_count': 320,
-                'rating': 4.9
-            }
-        ],
-        'services': [
-            {
-                'id': 3,
-                'full_name': 'دکتر رضا حسینی',
-                'expertise': 'مدیریت ارتباط با مشتری',
-                'department': 'services',
-                'bio': 'دکترای مدیریت خدمات با سابقه اجرایی در شرکت‌های بین‌المللی',
-                'image_url': None,
-                'courses_count': 10,
-                'students_count': 380,
-                'rating': 4.7
-            },
-            {
-                'id': 4,
-                'full_name': 'مهندس مریم کریمی',
-                'expertise': 'خدمات پس از فروش',
-                'department': 'services',
-                'bio': 'کارشناس ارشد مدیریت خدمات با ۱۲ سال سابقه در صنعت خودرو',
-                'image_url': None,
-                'courses_count': 6,
-                'students_count': 210,
-                'rating': 4.6
-            }
-        ]
-    }
-    
-    if department and department in masters:
-        return jsonify({
-            'success': True,
-            'masters': masters[department]
-        })
-    else:
-        all_masters = masters['sales'] + masters['services']
+    try:
+        masters = academy_cache.get_or_load(
+            f"masters:{department}",
+            lambda: AcademyMaster.get_all(department)
+        )
         return jsonify({
             'success': True,
-            'masters': all_masters
+            'masters': masters
         })
+    except Exception as e:
+        print(f"❌ خطا در دریافت اساتید: {e}")
+        return jsonify({'success': False, 'error': 'خطا در دریافت لیست اساتید'}), 500
 
 
 @academy_bp.route('/api/master/<int:master_id>', methods=['GET'])
 @login_required
 def get_master(master_id):
     """دریافت اطلاعات یک استاد"""
-    master = {
-        'id': master_id,
-        'full_name': 'دکتر علی محمدی',
-        'expertise': 'فروش و بازاریابی پیشرفته',
-        'department': 'sales',
-        'bio': 'دکترای مدیریت بازاریابی از دانشگاه تهران با ۱۵ سال سابقه تدریس در سازمان‌های بزرگ کشور. نویسنده کتاب "فروش حرفه‌ای در عصر دیجیتال"',
-        'image_url': None,
-        'email': 'a.mohammadi@academy.ir',
-        'phone': '0912xxxxxxx',
-        'education': [
-            {'degree': 'دکترای مدیریت بازاریابی', 'university': 'دانشگاه تهران', 'year': '1390'},
-            {'degree': 'کارشناسی ارشد مدیریت اجرایی', 'university': 'دانشگاه صنعتی شریف', 'year': '1385'}
-        ],
-        'experience': [
-            {'position': 'مدیر آموزش فروش', 'company': 'شرکت بازرگانی البرز', 'years': '1395-1400'},
-            {'position': 'مشاور ارشد فروش', 'company': 'هلدینگ توسعه تجارت', 'years': '1400-اکنون'}
-        ],
-        'courses': [
-            {'id': 1, 'title': 'کارگاه فروش حرفه‌ای', 'date': '1404/02/15', 'students': 45},
-            {'id': 2, 'title': 'مذاکرات پیشرفته', 'date': '1404/03/10', 'students': 32}
-        ]
-    }
-    
+    try:
+        master = AcademyMaster.get_by_id(master_id)
+    except Exception as e:
+        print(f"❌ خطا در دریافت استاد: {e}")
+        return jsonify({'success': False, 'error': 'خطا در دریافت اطلاعات استاد'}), 500
+
+    if not master:
+        return jsonify({'success': False, 'error': 'استاد یافت نشد'}), 404
     return jsonify({
         'success': True,
         'master': master
@@ -191,11 +157,23 @@ def get_master(master_id):
 @manager_required
 def create_master():
     """ایجاد استاد جدید (فقط مدیران)"""
-    data = request.json
+    data, error = _payload(MASTER_FIELDS, required=('full_name', 'department'),
+                           choices={'department': DEPARTMENTS})
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+
+    try:
+        master_id = AcademyMaster.create(data)
+        mark_write()
+        academy_cache.invalidate()
+    except Exception as e:
+        print(f"❌ خطا در ایجاد استاد: {e}")
+        return jsonify({'success': False, 'error': 'خطا در ایجاد استاد'}), 500
+
     return jsonify({
         'success': True,
         'message': 'استاد با موفقیت ایجاد شد',
-        'master_id': 5
+        'master_id': master_id
     })
 
 
@@ -203,6 +181,22 @@ def create_master():
 @manager_required
 def update_master(master_id):
     """ویرایش اطلاعات استاد (فقط مدیران)"""
+    data, error = _payload(MASTER_FIELDS, choices={'department': DEPARTMENTS})
+    if error or not data:
+        return jsonify({'success': False, 'error': error or 'فیلدی برای ویرایش ارسال نشده'}), 400
+
+    try:
+        updated = AcademyMaster.update(master_id, data)
+        if updated:
+            mark_write()
+            # نام استاد در لیست کارگاه‌ها و سنجش‌ها هم آمده است
+            academy_cache.invalidate()
+    except Exception as e:
+        print(f"❌ خطا در ویرایش استاد: {e}")
+        return jsonify({'success': False, 'error': 'خطا در ویرایش اطلاعات استاد'}), 500
+
+    if not updated:
+        return jsonify({'success': False, 'error': 'استاد یافت نشد'}), 404
     return jsonify({
         'success': True,
         'message': 'اطلاعات استاد با موفقیت ویرایش شد'
@@ -213,6 +207,17 @@ def update_master(master_id):
 @admin_required
 def delete_master(master_id):
     """حذف استاد (فقط ادمین)"""
+    try:
+        deleted = AcademyMaster.delete(master_id)
+        if deleted:
+            mark_write()
+            academy_cache.invalidate()
+    except Exception as e:
+        print(f"❌ خطا در حذف استاد: {e}")
+        return jsonify({'success': False, 'error': 'خطا در حذف استاد'}), 500
+
+    if not deleted:
+        return jsonify({'success': False, 'error': 'استاد یافت نشد'}), 404
     return jsonify({
         'success': True,
         'message': 'استاد با موفقیت حذف شد'
@@ -225,103 +230,36 @@ def delete_master(master_id):
 @login_required
 def get_workshops_list():
     """دریافت لیست کارگاه‌ها"""
-    department = request.args.get('department')
-    workshop_type = request.args.get('type', 'all')
-    status = request.args.get('status', 'all')
-    
-    workshops = [
-        {
-            'id': 1,
-            'title': 'کارگاه فروش حرفه‌ای',
-            'department': 'sales',
-            'master_name': 'دکتر علی محمدی',
-            'master_id': 1,
-            'description': 'آموزش تکنیک‌های پیشرفته فروش و مذاکره',
-            'start_date': '2025-03-15T10:00:00',
-            'end_date': '2025-03-17T18:00:00',
-            'capacity': 30,
-            'registered_count': 15,
-            'workshop_type': 'online',
-            'status': 'upcoming',
-            'price': 'رایگان',
-            'location': 'آنلاین - اسکای روم'
-        },
-        {
-            'id': 2,
-            'title': 'مدیریت ارتباط با مشتری',
-            'department': 'services',
-            'master_name': 'دکتر رضا حسینی',
-            'master_id': 3,
-            'description': 'اصول و تکنیک‌های مدیریت ارتباط با مشتری',
-            'start_date': '2025-03-20T09:00:00',
-            'end_date': '2025-03-22T17:00:00',
-            'capacity': 25,
-            'registered_count': 22,
-            'workshop_type': 'practical',
-            'status': 'upcoming',
-            'price': '450,000 تومان',
-            'location': 'مشهد - بلوار وکیل‌آباد'
-        },
-        {
-            'id': 3,
-            'title': 'مذاکرات فروش پیشرفته',
-            'department': 'sales',
-            'master_name': 'مهندس سارا احمدی',
-            'master_id': 2,
-            'description': 'تکنیک‌های مذاکره در فروش B2B',
-            'start_date': '2025-02-10T10:00:00',
-            'end_date': '2025-02-12T18:00:00',
-            'capacity': 20,
-            'registered_count': 20,
-            'workshop_type': 'online',
-            'status': 'completed',
-            'price': 'رایگان',
-            'location': 'آنلاین - اسکای روم'
-        }
-    ]
-    
-    if department:
-        workshops = [w for w in workshops if w['department'] == department]
-    if status != 'all':
-        workshops = [w for w in workshops if w['status'] == status]
-    if workshop_type != 'all':
-        workshops = [w for w in workshops if w['workshop_type'] == workshop_type]
+    department = _arg_choice('department', DEPARTMENTS)
+    workshop_type = _arg_choice('type', WORKSHOP_TYPES)
+    status = _arg_choice('status', WORKSHOP_STATUSES)
     
-    return jsonify({
-        'success': True,
-        'workshops': workshops
-    })
+    try:
+        workshops = academy_cache.get_or_load(
+            f"workshops:{department}:{workshop_type}:{status}",
+            lambda: AcademyWorkshop.get_all(department, workshop_type, status)
+        )
+        return jsonify({
+            'success': True,
+            'workshops': workshops
+        })
+    except Exception as e:
+        print(f"❌ خطا در دریافت کارگاه‌ها: {e}")
+        return jsonify({'success': False, 'error': 'خطا در دریافت لیست کارگاه‌ها'}), 500
 
 
 @academy_bp.route('/api/workshop/<int:workshop_id>', methods=['GET'])
 @login_required
 def get_workshop(workshop_id):
     """دریافت اطلاعات یک کارگاه"""
-    workshop = {
-        'id': workshop_id,
-        'title': 'کارگاه فروش حرفه‌ای',
-        'department': 'sales',
-        'master_name': 'دکتر علی محمدی',
-        'master_id': 1,
-        'master_bio': 'دکترای مدیریت بازاریابی با ۱۵ سال سابقه',
-        'description': 'در این کارگاه با تکنیک‌های پیشرفته فروش، اصول مذاکره و روش‌های جذب مشتری آشنا خواهید شد.',
-        'start_date': '2025-03-15T10:00:00',
-        'end_date': '2025-03-17T18:00:00',
-        'capacity': 30,
-        'registered_count': 15,
-        'workshop_type': 'online',
-        'status': 'upcoming',
-        'price': 'رایگان',
-        'location': 'آنلاین - اسکای روم',
-        'syllabus': [
-            {'day': 1, 'title': 'مقدمات فروش حرفه‌ای', 'topics': ['شناخت مشتری', 'نیازسنجی', 'ارزش‌آفرینی']},
-            {'day': 2, 'title': 'تکنیک‌های مذاکره', 'topics': ['اصول مذاکره', 'مدیریت اعتراضات', 'بستن قرارداد']},
-            {'day': 3, 'title': 'فروش در عصر دیجیتال', 'topics': ['CRM', 'فروش آنلاین', 'تحلیل داده‌های فروش']}
-        ],
-        'prerequisites': ['آشنایی مقدماتی با مفاهیم فروش', 'گذراندن دوره مقدماتی'],
-        'target_audience': ['مدیران فروش', 'کارشناسان فروش', 'بازاریابان']
-    }
-    
+    try:
+        workshop = AcademyWorkshop.get_by_id(workshop_id)
+    except Exception as e:
+        print(f"❌ خطا در دریافت کارگاه: {e}")
+        return jsonify({'success': False, 'error': 'خطا در دریافت اطلاعات کارگاه'}), 500
+
+    if not workshop:
+        return jsonify({'success': False, 'error': 'کارگاه یافت نشد'}), 404
     return jsonify({
         'success': True,
         'workshop': workshop
@@ -332,6 +270,26 @@ def get_workshop(workshop_id):
 @login_required
 def register_workshop(workshop_id):
     """ثبت نام در کارگاه"""
+    try:
+        result = AcademyWorkshop.register(workshop_id, session.get('user_id'))
+    except Exception as e:
+        print(f"❌ خطا در ثبت نام کارگاه: {e}")
+        return jsonify({'success': False, 'error': 'خطا در ثبت نام'}), 500
+
+    errors = {
+        'not_found': ('کارگاه یافت نشد', 404),
+        'closed': ('ثبت نام این کارگاه بسته است', 409),
+        'exists': ('قبلاً در این کارگاه ثبت نام کرده‌اید', 409),
+        'full': ('ظرفیت کارگاه تکمیل است', 409)
+    }
+    if result in errors:
+        message, status_code = errors[result]
+        return jsonify({'success': False, 'error': message}), status_code
+
+    mark_write()
+    # تعداد ثبت‌نامی در لیست کارگاه‌ها و تعداد دانشجویان در آمار
+    academy_cache.invalidate('workshops:')
+    academy_cache.invalidate('stats:')
     return jsonify({
         'success': True,
         'message': 'ثبت نام با موفقیت انجام شد'
@@ -342,6 +300,18 @@ def register_workshop(workshop_id):
 @login_required
 def unregister_workshop(workshop_id):
     """لغو ثبت نام در کارگاه"""
+    try:
+        cancelled = AcademyWorkshop.unregister(workshop_id, session.get('user_id'))
+    except Exception as e:
+        print(f"❌ خطا در لغو ثبت نام کارگاه: {e}")
+        return jsonify({'success': False, 'error': 'خطا در لغو ثبت نام'}), 500
+
+    if not cancelled:
+        return jsonify({'success': False, 'error': 'ثبت نام فعالی در این کارگاه یافت نشد'}), 404
+
+    mark_write()
+    academy_cache.invalidate('workshops:')
+    academy_cache.invalidate('stats:')
     return jsonify({
         'success': True,
         'message': 'ثبت نام با موفقیت لغو شد'
@@ -352,29 +322,14 @@ def unregister_workshop(workshop_id):
 @login_required
 def get_workshop_sessions(workshop_id):
     """دریافت جلسات کارگاه"""
-    sessions = [
-        {
-            'id': 1,
-            'title': 'جلسه اول - مقدمات فروش',
-            'date': '2025-03-15T10:00:00',
-            'duration': 180,
-            'master_name': 'دکتر علی محمدی',
-            'material_url': None,
-            'video_url': None,
-            'status': 'upcoming'
-        },
-        {
-            'id': 2,
-            'title': 'جلسه دوم - تکنیک‌های مذاکره',
-            'date': '2025-03-16T10:00:00',
-            'duration': 180,
-            'master_name': 'دکتر علی محمدی',
-            'material_url': None,
-            'video_url': None,
-            'status': 'upcoming'
-        }
-    ]
-    
+    try:
+        if not exists('academy_workshops', workshop_id):
+            return jsonify({'success': False, 'error': 'کارگاه یافت نشد'}), 404
+        sessions = AcademyWorkshop.get_sessions(workshop_id)
+    except Exception as e:
+        print(f"❌ خطا در دریافت جلسات کارگاه: {e}")
+        return jsonify({'success': False, 'error': 'خطا در دریافت جلسات کارگاه'}), 500
+
     return jsonify({
         'success': True,
         'sessions': sessions
@@ -385,10 +340,29 @@ def get_workshop_sessions(workshop_id):
 @manager_required
 def create_workshop():
     """ایجاد کارگاه جدید (فقط مدیران)"""
+    data, error = _payload(WORKSHOP_FIELDS, required=('title', 'department'), choices={
+        'department': DEPARTMENTS,
+        'workshop_type': WORKSHOP_TYPES,
+        'status': WORKSHOP_STATUSES
+    })
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+
+    try:
+        if data.get('master_id') and not exists('academy_masters', data['master_id']):
+            return jsonify({'success': False, 'error': 'استاد یافت نشد'}), 400
+        workshop_id = AcademyWorkshop.create(data)
+        mark_write()
+        academy_cache.invalidate('workshops:')
+        academy_cache.invalidate('stats:')
+    except Exception as e:
+        print(f"❌ خطا در ایجاد کارگاه: {e}")
+        return jsonify({'success': False, 'error': 'خطا در ایجاد کارگاه'}), 500
+
     return jsonify({
         'success': True,
         'message': 'کارگاه با موفقیت ایجاد شد',
-        'workshop_id': 4
+        'workshop_id': workshop_id
     })
 
 
@@ -402,15 +376,7 @@ def get_chat_history():
     
     try:
         # دریافت آخرین 10 مکالمه کاربر
-        query = """
-            SELECT cs.*, 
-                   (SELECT content FROM chat_messages WHERE session_id = cs.id ORDER BY created_at DESC LIMIT 1) as last_message
-            FROM chat_sessions cs
-            WHERE cs.user_id = %s
-            ORDER BY cs.updated_at DESC
-            LIMIT 10
-        """
-        sessions = execute_query(query, (user_id,), fetch_all=True)
+        sessions = execute_query(CHAT_HISTORY_QUERY, (user_id,), fetch_all=True)
         
         history = []
         for session_data in sessions or []:
@@ -418,12 +384,7 @@ def get_chat_history():
             title = session_data.get('title')
             if not title:
                 # اگر عنوان نداره، از اولین پیام کاربر استفاده کن
-                first_msg_query = """
-                    SELECT content FROM chat_messages 
-                    WHERE session_id = %s AND role = 'user' 
-                    ORDER BY created_at ASC LIMIT 1
-                """
-                first_msg = execute_query(first_msg_query, (session_data['id'],), fetch_one=True)
+                first_msg = execute_query(CHAT_FIRST_MESSAGE_QUERY, (session_data['id'],), fetch_one=True)
                 if first_msg:
                     title = first_msg['content'][:30] + '...'
                 else:
@@ -468,20 +429,13 @@ def get_chat(chat_id):
     
     try:
         # بررسی دسترسی کاربر به این مکالمه
-        check_query = "SELECT id FROM chat_sessions WHERE id = %s AND user_id = %s"
-        session_data = execute_query(check_query, (chat_id, user_id), fetch_one=True)
+        session_data = execute_query(CHAT_ACCESS_QUERY, (chat_id, user_id), fetch_one=True)
         
         if not session_data:
             return jsonify({'success': False, 'error': 'مکالمه یافت نشد'}), 404
         
         # دریافت تمام پیام‌های مکالمه
-        messages_query = """
-            SELECT role, content, created_at 
-            FROM chat_messages 
-            WHERE session_id = %s 
-            ORDER BY created_at ASC
-        """
-        db_messages = execute_query(messages_query, (chat_id,), fetch_all=True)
+        db_messages = execute_query(CHAT_MESSAGES_QUERY, (chat_id,), fetch_all=True)
         
         messages = []
         for msg in db_messages or []:
@@ -517,15 +471,8 @@ def send_chat_message():
         
         # ایجاد متن محصولات (خلاصه یا مفصل)
         products_text = product_search.get_products_text(relevant_products, detailed=need_detailed)
-        
-        # دریافت پرامپت پایه
-        base_prompt = get_sales_master_prompt()
-        
-        # ترکیب پرامپت با محصولات
-        if products_text:
-            system_prompt = base_prompt + "\n\n" + products_text
-        else:
-            system_prompt = base_prompt + "\n\n❌ محصول مرتبطی با جستجوی شما یافت نشد. لطفاً با جزئیات بیشتر بپرسید."
+        if not products_text:
+            products_text = "❌ محصول مرتبطی با جستجوی شما یافت نشد. لطفاً با جزئیات بیشتر بپرسید."
         
         # اگر chat_id نداریم، یک مکالمه جدید بساز
         if not chat_id:
@@ -547,41 +494,29 @@ def send_chat_message():
             VALUES (%s, 'user', %s, NOW())
         """
         execute_query(insert_message, (chat_id, message), commit=True)
-        
-        # دریافت پاسخ از OpenAI
-        from openai import OpenAI
-        from modules.config import Config
-        
-        client = OpenAI(api_key=Config.OPENAI_API_KEY)
+        mark_write()
         
         # تنظیم temperature بر اساس نیاز کاربر
         temperature = 0.8 if need_detailed else 0.5
         max_tokens = 1000 if need_detailed else 500
         
         # دریافت آخرین پیام‌ها برای context
-        context_query = """
-            SELECT role, content FROM chat_messages 
-            WHERE session_id = %s 
-            ORDER BY created_at DESC 
-            LIMIT 10
-        """
-        recent_messages = execute_query(context_query, (chat_id,), fetch_all=True) or []
+        recent_messages = execute_query(CHAT_CONTEXT_QUERY, (chat_id,), fetch_all=True) or []
         
-        messages_for_api = [{"role": "system", "content": system_prompt}]
-        for msg in reversed(recent_messages):
-            messages_for_api.append({
-                "role": "user" if msg['role'] == 'user' else 'assistant',
-                "content": msg['content']
-            })
+        history = [{
+            "role": "user" if msg['role'] == 'user' else 'assistant',
+            "content": msg['content']
+        } for msg in reversed(recent_messages)]
         
-        response = client.chat.completions.create(
-            model=Config.OPENAI_MODEL,
-            messages=messages_for_api,
-            temperature=temperature,
-            max_tokens=max_tokens
-        )
+        # پرامپت ثابت اول و محصولات (متغیر) کنار پیام آخر تا پیشوند در کش OpenAI بماند
+        messages_for_api = build_chat_messages(history, products_text)
         
-        ai_response = response.choices[0].message.content
+        # دریافت پاسخ از OpenAI (با تلاش مجدد و circuit breaker)؛ مصرف توکن با شناسه مکالمه ثبت می‌شود
+        usage = UsageBatch('chat')
+        try:
+            ai_response = chat_client.chat_completion(messages_for_api, temperature, max_tokens, usage=usage)
+        finally:
+            usage.save(chat_id)
         
         # ذخیره پاسخ استاد
         insert_bot = """
@@ -593,6 +528,7 @@ def send_chat_message():
         # آپدیت زمان مکالمه
         update_session = "UPDATE chat_sessions SET updated_at = NOW() WHERE id = %s"
         execute_query(update_session, (chat_id,), commit=True)
+        mark_write()
         
         return jsonify({
             'success': True,
@@ -601,6 +537,18 @@ def send_chat_message():
             'products_count': len(relevant_products)
         })
         
+    except CircuitOpenError as e:
+        print(f"Error in chat: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'استاد موقتاً در دسترس نیست. لطفاً چند لحظه دیگر تلاش کنید.'
+        }), 503
+    except TokenBudgetError as e:
+        print(f"Error in chat: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'پیام بیش از حد طولانی است. لطفاً آن را کوتاه‌تر کنید.'
+        }), 400
     except Exception as e:
         print(f"Error in chat: {str(e)}")
         return jsonify({
@@ -625,6 +573,7 @@ def new_chat():
         cursor.execute(insert_session, (user_id,))
         chat_id = cursor.lastrowid
         conn.commit()
+        mark_write()
         cursor.close()
         conn.close()
         
@@ -645,91 +594,35 @@ def new_chat():
 @login_required
 def get_assessments_list():
     """دریافت لیست سنجش‌ها"""
-    department = request.args.get('department')
-    status = request.args.get('status', 'all')
-    
-    assessments = [
-        {
-            'id': 1,
-            'title': 'آزمون فروش مقدماتی',
-            'department': 'sales',
-            'master_name': 'دکتر علی محمدی',
-            'workshop_id': 1,
-            'workshop_title': 'کارگاه فروش حرفه‌ای',
-            'assessment_type': 'quiz',
-            'max_score': 100,
-            'passing_score': 70,
-            'start_date': '2025-03-20T10:00:00',
-            'end_date': '2025-03-25T18:00:00',
-            'duration': 60,
-            'questions_count': 20,
-            'status': 'active'
-        },
-        {
-            'id': 2,
-            'title': 'سنجش مهارت خدمات مشتریان',
-            'department': 'services',
-            'master_name': 'دکتر رضا حسینی',
-            'workshop_id': 2,
-            'workshop_title': 'مدیریت ارتباط با مشتری',
-            'assessment_type': 'practical',
-            'max_score': 100,
-            'passing_score': 75,
-            'start_date': '2025-03-22T09:00:00',
-            'end_date': '2025-03-27T17:00:00',
-            'duration': 120,
-            'questions_count': 15,
-            'status': 'upcoming'
-        }
-    ]
+    department = _arg_choice('department', DEPARTMENTS)
+    status = _arg_choice('status', ASSESSMENT_STATUSES)
     
-    if department:
-        assessments = [a for a in assessments if a['department'] == department]
-    if status != 'all':
-        assessments = [a for a in assessments if a['status'] == status]
-    
-    return jsonify({
-        'success': True,
-        'assessments': assessments
-    })
+    try:
+        assessments = academy_cache.get_or_load(
+            f"assessments:{department}:{status}",
+            lambda: AcademyAssessment.get_all(department, status)
+        )
+        return jsonify({
+            'success': True,
+            'assessments': assessments
+        })
+    except Exception as e:
+        print(f"❌ خطا در دریافت سنجش‌ها: {e}")
+        return jsonify({'success': False, 'error': 'خطا در دریافت لیست سنجش‌ها'}), 500
 
 
 @academy_bp.route('/api/assessment/<int:assessment_id>', methods=['GET'])
 @login_required
 def get_assessment(assessment_id):
     """دریافت اطلاعات یک سنجش"""
-    assessment = {
-        'id': assessment_id,
-        'title': 'آزمون فروش مقدماتی',
-        'department': 'sales',
-        'master_name': 'دکتر علی محمدی',
-        'workshop_id': 1,
-        'workshop_title': 'کارگاه فروش حرفه‌ای',
-        'assessment_type': 'quiz',
-        'description': 'این آزمون شامل ۲۰ سوال چهارگزینه‌ای از مباحث کارگاه فروش می‌باشد.',
-        'questions': [
-            {
-                'id': 1,
-                'text': 'کدام یک از موارد زیر جزو مراحل فروش حرفه‌ای محسوب می‌شود؟',
-                'options': ['شناسایی نیاز', 'ارائه محصول', 'مدیریت اعتراضات', 'همه موارد'],
-                'score': 5
-            },
-            {
-                'id': 2,
-                'text': 'در مذاکره فروش، BATNA به چه معناست؟',
-                'options': ['بهترین جایگزین توافق', 'قدرت چانه‌زنی', 'نقطه توقف', 'استراتژی مذاکره'],
-                'score': 5
-            }
-        ],
-        'max_score': 100,
-        'passing_score': 70,
-        'start_date': '2025-03-20T10:00:00',
-        'end_date': '2025-03-25T18:00:00',
-        'duration': 60,
-        'status': 'active',
-        'user_status': 'not_started'
-    }
-    
+    try:
+        assessment = AcademyAssessment.get_by_id(assessment_id, session.get('user_id'))
+    except Exception as e:
+        print(f"❌ خطا در دریافت سنجش: {e}")
+        return jsonify({'success': False, 'error': 'خطا در دریافت اطلاعات سنجش'}), 500
+
+    if not assessment:
+        return jsonify({'success': False, 'error': 'سنجش یافت نشد'}), 404
     return jsonify({
         'success': True,
         'assessment': assessment
@@ -740,11 +633,32 @@ def get_assessment(assessment_id):
 @login_required
 def submit_assessment(assessment_id):
     """ثبت پاسخ سنجش"""
+    answers = (request.get_json(silent=True) or {}).get('answers')
+    if not isinstance(answers, dict):
+        return jsonify({'success': False, 'error': 'پاسخ‌ها ارسال نشده است'}), 400
+
+    try:
+        outcome, result = AcademyAssessment.submit(assessment_id, session.get('user_id'), answers)
+    except Exception as e:
+        print(f"❌ خطا در ثبت پاسخ سنجش: {e}")
+        return jsonify({'success': False, 'error': 'خطا در ثبت پاسخ‌ها'}), 500
+
+    errors = {
+        'not_found': ('سنجش یافت نشد', 404),
+        'closed': ('این سنجش فعال نیست', 409),
+        'submitted': ('پاسخ این سنجش قبلاً ثبت شده است', 409)
+    }
+    if outcome in errors:
+        message, status_code = errors[outcome]
+        return jsonify({'success': False, 'error': message}), status_code
+
+    mark_write()
+    academy_cache.invalidate('stats:')
     return jsonify({
         'success': True,
         'message': 'پاسخ‌ها با موفقیت ثبت شد',
-        'score': 85,
-        'status': 'passed'
+        'score': result['score'],
+        'status': result['status']
     })
 
 
@@ -752,19 +666,14 @@ def submit_assessment(assessment_id):
 @login_required
 def get_assessment_result(assessment_id):
     """دریافت نتیجه سنجش برای کاربر جاری"""
-    result = {
-        'id': 1,
-        'assessment_id': assessment_id,
-        'user_id': session.get('user_id'),
-        'score': 85,
-        'status': 'passed',
-        'completed_at': '2025-03-21T14:30:00',
-        'answers': {
-            '1': 3,
-            '2': 1
-        }
-    }
-    
+    try:
+        result = AcademyAssessment.get_result(assessment_id, session.get('user_id'))
+    except Exception as e:
+        print(f"❌ خطا در دریافت نتیجه سنجش: {e}")
+        return jsonify({'success': False, 'error': 'خطا در دریافت نتیجه سنجش'}), 500
+
+    if not result:
+        return jsonify({'success': False, 'error': 'نتیجه‌ای برای این سنجش ثبت نشده'}), 404
     return jsonify({
         'success': True,
         'result': result
@@ -777,29 +686,14 @@ def get_assessment_result(assessment_id):
 @login_required
 def get_workshop_qa(workshop_id):
     """دریافت پرسش و پاسخ‌های کارگاه"""
-    qas = [
-        {
-            'id': 1,
-            'question': 'آیا فایل ارائه جلسات بعد از کارگاه در اختیار شرکت‌کنندگان قرار می‌گیرد؟',
-            'answer': 'بله، تمام فایل‌ها و منابع آموزشی بعد از هر جلسه در پنل کاربری قرار می‌گیرد.',
-            'is_answered': True,
-            'created_at': '2025-03-14T15:30:00',
-            'user_name': 'علی رضایی',
-            'master_name': 'دکتر علی محمدی',
-            'answered_at': '2025-03-14T16:45:00'
-        },
-        {
-            'id': 2,
-            'question': 'آیا این کارگاه پیش‌نیاز خاصی دارد؟',
-            'answer': None,
-            'is_answered': False,
-            'created_at': '2025-03-15T09:15:00',
-            'user_name': 'سارا احمدی',
-            'master_name': None,
-            'answered_at': None
-        }
-    ]
-    
+    try:
+        if not exists('academy_workshops', workshop_id):
+            return jsonify({'success': False, 'error': 'کارگاه یافت نشد'}), 404
+        qas = AcademyQA.get_for_workshop(workshop_id)
+    except Exception as e:
+        print(f"❌ خطا در دریافت پرسش و پاسخ‌ها: {e}")
+        return jsonify({'success': False, 'error': 'خطا در دریافت پرسش و پاسخ‌ها'}), 500
+
     return jsonify({
         'success': True,
         'qas': qas
@@ -810,10 +704,23 @@ def get_workshop_qa(workshop_id):
 @login_required
 def ask_question(workshop_id):
     """پرسش سوال جدید"""
+    question = ((request.get_json(silent=True) or {}).get('question') or '').strip()
+    if not question:
+        return jsonify({'success': False, 'error': 'متن سوال نمی‌تواند خالی باشد'}), 400
+
+    try:
+        if not exists('academy_workshops', workshop_id):
+            return jsonify({'success': False, 'error': 'کارگاه یافت نشد'}), 404
+        qa_id = AcademyQA.ask(workshop_id, session.get('user_id'), question)
+        mark_write()
+    except Exception as e:
+        print(f"❌ خطا در ثبت سوال: {e}")
+        return jsonify({'success': False, 'error': 'خطا در ثبت سوال'}), 500
+
     return jsonify({
         'success': True,
         'message': 'سوال شما ثبت شد',
-        'qa_id': 3
+        'qa_id': qa_id
     })
 
 
@@ -821,6 +728,24 @@ def ask_question(workshop_id):
 @manager_required
 def answer_question(qa_id):
     """پاسخ به سوال (فقط مدیران و اساتید)"""
+    data = request.get_json(silent=True) or {}
+    answer = (data.get('answer') or '').strip()
+    master_id = data.get('master_id')
+    if not answer:
+        return jsonify({'success': False, 'error': 'متن پاسخ نمی‌تواند خالی باشد'}), 400
+
+    try:
+        if master_id and not exists('academy_masters', master_id):
+            return jsonify({'success': False, 'error': 'استاد یافت نشد'}), 400
+        answered = AcademyQA.answer(qa_id, answer, master_id)
+        if answered:
+            mark_write()
+    except Exception as e:
+        print(f"❌ خطا در ثبت پاسخ: {e}")
+        return jsonify({'success': False, 'error': 'خطا در ثبت پاسخ'}), 500
+
+    if not answered:
+        return jsonify({'success': False, 'error': 'سوال یافت نشد'}), 404
     return jsonify({
         'success': True,
         'message': 'پاسخ با موفقیت ثبت شد'
@@ -833,45 +758,20 @@ def answer_question(qa_id):
 @login_required
 def get_schedule():
     """دریافت تقویم آموزشی"""
-    department = request.args.get('department')
-    
-    events = [
-        {
-            'id': 1,
-            'title': 'کارگاه فروش حرفه‌ای',
-            'description': 'کارگاه ۳ روزه فروش',
-            'event_date': '2025-03-15T10:00:00',
-            'event_type': 'workshop',
-            'department': 'sales',
-            'status': 'upcoming'
-        },
-        {
-            'id': 2,
-            'title': 'آزمون فروش مقدماتی',
-            'description': 'آزمون پایان دوره فروش',
-            'event_date': '2025-03-20T10:00:00',
-            'event_type': 'assessment',
-            'department': 'sales',
-            'status': 'upcoming'
-        },
-        {
-            'id': 3,
-            'title': 'مدیریت ارتباط با مشتری',
-            'description': 'کارگاه خدمات مشتریان',
-            'event_date': '2025-03-20T09:00:00',
-            'event_type': 'workshop',
-            'department': 'services',
-            'status': 'upcoming'
-        }
-    ]
+    department = _arg_choice('department', DEPARTMENTS)
     
-    if department:
-        events = [e for e in events if e['department'] == department]
-    
-    return jsonify({
-        'success': True,
-        'events': events
-    })
+    try:
+        events = academy_cache.get_or_load(
+            f"schedule:{department}",
+            lambda: AcademySchedule.get_all(department)
+        )
+        return jsonify({
+            'success': True,
+            'events': events
+        })
+    except Exception as e:
+        print(f"❌ خطا در دریافت تقویم: {e}")
+        return jsonify({'success': False, 'error': 'خطا در دریافت تقویم آموزشی'}), 500
 
 
 # ================ API آمار ================
@@ -880,46 +780,20 @@ def get_schedule():
 @login_required
 def get_stats():
     """دریافت آمار آموزشگاه"""
-    department = request.args.get('department')
-    
-    if department == 'sales':
-        stats = {
-            'total_masters': 5,
-            'total_workshops': 8,
-            'total_assessments': 10,
-            'upcoming_workshops': 3,
-            'completed_assessments': 28,
-            'total_students': 156,
-            'avg_rating': 4.7,
-            'success_rate': 82
-        }
-    elif department == 'services':
-        stats = {
-            'total_masters': 4,
-            'total_workshops': 6,
-            'total_assessments': 8,
-            'upcoming_workshops': 2,
-            'completed_assessments': 19,
-            'total_students': 98,
-            'avg_rating': 4.5,
-            'success_rate': 78
-        }
-    else:
-        stats = {
-            'total_masters': 9,
-            'total_workshops': 14,
-            'total_assessments': 18,
-            'upcoming_workshops': 5,
-            'completed_assessments': 47,
-            'total_students': 254,
-            'avg_rating': 4.6,
-            'success_rate': 80
-        }
+    department = _arg_choice('department', DEPARTMENTS)
     
-    return jsonify({
-        'success': True,
-        'stats': stats
-    })
+    try:
+        stats = academy_cache.get_or_load(
+            f"stats:{department}",
+            lambda: AcademyStats.get(department)
+        )
+        return jsonify({
+            'success': True,
+            'stats': stats
+        })
+    except Exception as e:
+        print(f"❌ خطا در دریافت آمار آموزشگاه: {e}")
+        return jsonify({'success': False, 'error': 'خطا در دریافت آمار'}), 500
 
 
 # ================ API پنل کاربری ================
@@ -928,29 +802,12 @@ def get_stats():
 @login_required
 def get_my_courses():
     """دریافت دوره‌های ثبت‌نامی کاربر"""
-    courses = [
-        {
-            'id': 1,
-            'title': 'کارگاه فروش حرفه‌ای',
-            'master_name': 'دکتر علی محمدی',
-            'start_date': '2025-03-15T10:00:00',
-            'end_date': '2025-03-17T18:00:00',
-            'status': 'upcoming',
-            'progress': 0,
-            'certificate_available': False
-        },
-        {
-            'id': 3,
-            'title': 'مذاکرات فروش پیشرفته',
-            'master_name': 'مهندس سارا احمدی',
-            'start_date': '2025-02-10T10:00:00',
-            'end_date': '2025-02-12T18:00:00',
-            'status': 'completed',
-            'progress': 100,
-            'certificate_available': True
-        }
-    ]
-    
+    try:
+        courses = AcademyWorkshop.get_for_user(session.get('user_id'))
+    except Exception as e:
+        print(f"❌ خطا در دریافت دوره‌های کاربر: {e}")
+        return jsonify({'success': False, 'error': 'خطا در دریافت دوره‌ها'}), 500
+
     return jsonify({
         'success': True,
         'courses': courses
@@ -961,26 +818,13 @@ def get_my_courses():
 @login_required
 def get_my_assessments():
     """دریافت سنجش‌های کاربر"""
-    assessments = [
-        {
-            'id': 1,
-            'title': 'آزمون فروش مقدماتی',
-            'workshop_title': 'کارگاه فروش حرفه‌ای',
-            'status': 'pending',
-            'score': None,
-            'deadline': '2025-03-25T18:00:00'
-        },
-        {
-            'id': 2,
-            'title': 'سنجش نهایی فروش',
-            'workshop_title': 'مذاکرات فروش پیشرفته',
-            'status': 'completed',
-            'score': 92,
-            'deadline': '2025-02-15T18:00:00'
-        }
-    ]
-    
+    try:
+        assessments = AcademyAssessment.get_for_user(session.get('user_id'))
+    except Exception as e:
+        print(f"❌ خطا در دریافت سنجش‌های کاربر: {e}")
+        return jsonify({'success': False, 'error': 'خطا در دریافت سنجش‌ها'}), 500
+
     return jsonify({
         'success': True,
         'assessments': assessments
-    })
\ No newline at end of file
+    })
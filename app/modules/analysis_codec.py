@@ -0,0 +1,67 @@
+# modules/analysis_codec.py
+"""
+رمزگذاری فشرده ستون full_analysis.
+
+بلاب فشرده در ستون full_analysis_z با یک بایت نسخه شروع می‌شود:
+    0x01 = zlib ، 0x02 = zstd
+ردیف‌های قدیمی (یا وقتی فشرده‌سازی خاموش است) همچنان JSON متنی در full_analysis دارند.
+"""
+import json
+import zlib
+from .config import Config
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+FORMAT_ZLIB = 1
+FORMAT_ZSTD = 2
+
+COMPRESSED_COLUMN_SUFFIX = '_z'
+
+
+def compress_json(data, algorithm=None):
+    """تبدیل داده به بلاب فشرده با بایت نسخه"""
+    algorithm = algorithm or Config.ANALYSIS_COMPRESSION
+    raw = json.dumps(data, ensure_ascii=False).encode('utf-8') if not isinstance(data, (str, bytes)) \
+        else (data.encode('utf-8') if isinstance(data, str) else data)
+
+    if algorithm == 'zstd':
+        if zstandard is not None:
+            return bytes([FORMAT_ZSTD]) + zstandard.ZstdCompressor(level=Config.ANALYSIS_COMPRESSION_LEVEL).compress(raw)
+        print("⚠️ پکیج zstandard نصب نیست، از zlib استفاده می‌شود")
+    return bytes([FORMAT_ZLIB]) + zlib.compress(raw, min(Config.ANALYSIS_COMPRESSION_LEVEL, 9))
+
+
+def decompress_text(blob):
+    """بازگرداندن JSON متنی از بلاب فشرده"""
+    blob = bytes(blob)
+    version, payload = blob[0], blob[1:]
+    if version == FORMAT_ZLIB:
+        return zlib.decompress(payload).decode('utf-8')
+    if version == FORMAT_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("برای خواندن این تحلیل پکیج zstandard لازم است")
+        return zstandard.ZstdDecompressor().decompress(payload).decode('utf-8')
+    raise ValueError(f"نسخه ناشناخته فشرده‌سازی: {version}")
+
+
+def encode_for_storage(data):
+    """مقادیر (full_analysis, full_analysis_z) برای INSERT بر اساس تنظیمات"""
+    if Config.ANALYSIS_COMPRESSION in ('zlib', 'zstd'):
+        return None, compress_json(data)
+    return json.dumps(data, ensure_ascii=False), None
+
+
+def unpack_row(row, column='full_analysis'):
+    """جایگزینی بلاب فشرده با JSON متنی در سطر خوانده‌شده
+
+    فقط سطرهایی که ستون را SELECT کرده‌اند هزینه باز کردن دارند؛ لیست‌ها آن را نمی‌خوانند.
+    """
+    if not row:
+        return row
+    blob = row.pop(column + COMPRESSED_COLUMN_SUFFIX, None)
+    if blob:
+        row[column] = decompress_text(blob)
+    return row
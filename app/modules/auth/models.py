@@ -5,6 +5,32 @@ import json
 from datetime import datetime, timedelta
 from modules.database import get_db_connection
 
+# کوئری‌های خواندنی؛ scripts/check_query_plans.py پلن همین‌ها را بررسی می‌کند
+USER_EXISTS_QUERY = "SELECT id FROM users WHERE username = %s OR email = %s"
+AUTHENTICATE_QUERY = """
+    SELECT * FROM users 
+    WHERE (username = %s OR email = %s) AND is_active = TRUE
+"""
+USER_BY_ID_QUERY = """
+    SELECT id, username, email, full_name, role, department,
+           position, phone, avatar_url, is_active, last_login,
+           created_at
+    FROM users WHERE id = %s
+"""
+PASSWORD_HASH_QUERY = "SELECT password_hash FROM users WHERE id = %s"
+SESSION_VALIDATE_QUERY = """
+    SELECT s.*, u.username, u.full_name, u.role
+    FROM sessions s
+    JOIN users u ON s.user_id = u.id
+    WHERE s.session_token = %s AND s.expires_at > NOW() AND u.is_active = TRUE
+"""
+USER_LOGS_QUERY = """
+    SELECT * FROM activity_logs 
+    WHERE user_id = %s 
+    ORDER BY created_at DESC 
+    LIMIT %s
+"""
+
 class User:
     """مدل کاربر"""
     
@@ -19,10 +45,7 @@ class User:
             cursor = conn.cursor(dictionary=True)
             
             # بررسی وجود کاربر
-            cursor.execute(
-                "SELECT id FROM users WHERE username = %s OR email = %s",
-                (username, email)
-            )
+            cursor.execute(USER_EXISTS_QUERY, (username, email))
             if cursor.fetchone():
                 cursor.close()
                 conn.close()
@@ -78,10 +101,7 @@ class User:
             cursor = conn.cursor(dictionary=True)
             
             # جستجوی کاربر
-            cursor.execute("""
-                SELECT * FROM users 
-                WHERE (username = %s OR email = %s) AND is_active = TRUE
-            """, (username_or_email, username_or_email))
+            cursor.execute(AUTHENTICATE_QUERY, (username_or_email, username_or_email))
             
             user = cursor.fetchone()
             
@@ -129,12 +149,7 @@ class User:
                 return None
             
             cursor = conn.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT id, username, email, full_name, role, department,
-                       position, phone, avatar_url, is_active, last_login,
-                       created_at
-                FROM users WHERE id = %s
-            """, (user_id,))
+            cursor.execute(USER_BY_ID_QUERY, (user_id,))
             
             user = cursor.fetchone()
             cursor.close()
@@ -197,10 +212,7 @@ class User:
             cursor = conn.cursor(dictionary=True)
             
             # بررسی رمز قدیم
-            cursor.execute(
-                "SELECT password_hash FROM users WHERE id = %s",
-                (user_id,)
-            )
+            cursor.execute(PASSWORD_HASH_QUERY, (user_id,))
             user = cursor.fetchone()
             
             if not user:
@@ -280,12 +292,7 @@ class Session:
             
             cursor = conn.cursor(dictionary=True)
             
-            cursor.execute("""
-                SELECT s.*, u.username, u.full_name, u.role
-                FROM sessions s
-                JOIN users u ON s.user_id = u.id
-                WHERE s.session_token = %s AND s.expires_at > NOW() AND u.is_active = TRUE
-            """, (token,))
+            cursor.execute(SESSION_VALIDATE_QUERY, (token,))
             
             session = cursor.fetchone()
             cursor.close()
@@ -379,12 +386,7 @@ class ActivityLog:
                 return []
             
             cursor = conn.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT * FROM activity_logs 
-                WHERE user_id = %s 
-                ORDER BY created_at DESC 
-                LIMIT %s
-            """, (user_id, limit))
+            cursor.execute(USER_LOGS_QUERY, (user_id, limit))
             
             logs = cursor.fetchall()
             cursor.close()
@@ -0,0 +1,562 @@
+# modules/batch_analysis.py
+"""
+تحلیل مجدد انبوه فایل‌های آپلودشده با Batch API (مثلاً بعد از تغییر پرامپت CRM).
+
+    python scripts/batch_reanalyze.py submit --type crm     # ساخت فایل‌های درخواست و ارسال
+    python scripts/batch_reanalyze.py poll --wait           # پیگیری و ذخیره نتایج
+
+مراحل:
+1. build: فایل تحلیل‌های قبلی (analyses_all یا referral_analyses_all) از دیسک خوانده می‌شود و برای هر تکه
+   یک خط JSONL با همان پرامپت و پارامترهای تحلیل مستقیم در BATCH_DIR/batch_{id}.jsonl نوشته می‌شود؛
+   مثل آپلود، اگر آمار محلی (crm_stats / referral_stats) قابل محاسبه باشد فقط بخش‌های کیفی درخواست می‌شوند.
+   هر فایل batch حداکثر BATCH_MAX_REQUESTS درخواست و BATCH_MAX_BYTES حجم دارد.
+2. submit: آپلود فایل و ساخت batch در backend.
+3. poll: batchهای تمام‌شده خط‌به‌خط خوانده می‌شوند؛ تکه‌های هر فایل ادغام (و با آمار محلی تازه ترکیب) و
+   با AnalysisModel.update (یا ReferralAnalysisModel.update) جایگزین همان تحلیل قبلی می‌شوند تا تاریخچه
+   سطر تکراری نگیرد. نتیجه کامل (نه partial) در llm_cache هم قرار می‌گیرد.
+
+backendها:
+- openai: Files و Batches API (نصف قیمت، پاسخ تا ۲۴ ساعت).
+- local: همان فایل JSONL با chat completions معمولی در همین پروسه اجرا می‌شود (تست و محیط بدون Batch API؛
+  با OPENAI_BASE_URL روی scripts/openai_stub.py کاملاً آفلاین).
+
+وضعیت در جدول‌های analysis_batches و analysis_batch_items است؛ اجرای دوباره poll بعد از قطع شدن،
+فایل‌های ذخیره‌شده را تکرار نمی‌کند. هیچ بخشی از این مسیر در پروسه وب اجرا نمی‌شود.
+"""
+import json
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from itertools import islice
+from typing import Any, Dict
+from .config import Config
+from .database import execute_query, transaction, stream_query
+from . import llm_cache, crm_stats, referral_stats
+from .chunked_analysis import merge_crm_results, merge_referral_results, merge_partials
+from .llm_resilience import call_with_resilience
+from .llm_usage import TokenBudgetError, UsageBatch
+
+ENDPOINT = '/v1/chat/completions'
+
+# پاسخ خام API به صورت dict (cast_to=dict در openai==1.12 پشتیبانی نمی‌شود)
+JSONObject = Dict[str, Any]
+
+# وضعیت‌های پایانی batch در OpenAI؛ expired و cancelled ممکن است نتیجه ناقص داشته باشند
+FINAL_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+SOURCES = {
+    'crm': "SELECT id, file_name, file_path, file_size, file_type FROM analyses_all",
+    'referral': "SELECT id, file_name, file_path, file_size FROM referral_analyses_all"
+}
+
+# آمار محلی هر نوع تحلیل (None اگر فایل جدول قابل خواندن نداشته باشد)
+LOCAL_STATS = {'crm': crm_stats.from_file, 'referral': referral_stats.from_file}
+
+# ادغام تکه‌ها بر اساس نوع تحلیل (crm_insights به آمار محلی نیاز دارد و در _ingest_item ساخته می‌شود)
+MERGERS = {
+    'crm': merge_crm_results,
+    'referral': merge_referral_results,
+    'referral_insights': lambda partials: partials[0]
+}
+
+
+def _read_jsonl(path):
+    """خط‌به‌خط بدون بارگذاری کل فایل"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class OpenAIBatchBackend:
+    """Files و Batches API در OpenAI
+
+    openai==1.12 منبع batches ندارد؛ درخواست‌ها با client.post/get مستقیم ارسال می‌شوند.
+    """
+    name = 'openai'
+
+    def __init__(self, client, directory):
+        self.client = client
+        self.directory = directory
+
+    def _call(self, call):
+        return call_with_resilience('batch', call)
+
+    def submit(self, input_path):
+        """آپلود فایل و ساخت batch؛ خروجی: شناسه batch در OpenAI"""
+        def upload(timeout):
+            # هر تلاش مجدد فایل را از ابتدا می‌خواند
+            with open(input_path, 'rb') as f:
+                return self.client.files.create(file=f, purpose='batch', timeout=timeout)
+
+        uploaded = self._call(upload)
+        batch = self._call(lambda timeout: self.client.post('/batches', cast_to=JSONObject, body={
+            'input_file_id': uploaded.id,
+            'endpoint': ENDPOINT,
+            'completion_window': '24h'
+        }, options={'timeout': timeout}))
+        return batch['id']
+
+    def retrieve(self, remote_id):
+        batch = self._call(lambda timeout: self.client.get(f'/batches/{remote_id}', cast_to=JSONObject,
+                                                           options={'timeout': timeout}))
+        errors = (batch.get('errors') or {}).get('data') or []
+        return {
+            'status': batch['status'],
+            'counts': batch.get('request_counts') or {},
+            'output_file_id': batch.get('output_file_id'),
+            'error_file_id': batch.get('error_file_id'),
+            'error': '؛ '.join(e.get('message', '') for e in errors[:5]) or None
+        }
+
+    def results(self, remote_id, info):
+        """خطوط خروجی و خطا؛ فایل‌ها ابتدا در BATCH_DIR ذخیره می‌شوند"""
+        for key in ('output_file_id', 'error_file_id'):
+            if not info.get(key):
+                continue
+            path = os.path.join(self.directory, f"{remote_id}_{key.split('_')[0]}.jsonl")
+            if not os.path.exists(path):
+                content = self._call(lambda timeout: self.client.files.content(info[key], timeout=timeout))
+                content.stream_to_file(path)
+            yield from _read_jsonl(path)
+
+    def cancel(self, remote_id):
+        self._call(lambda timeout: self.client.post(f'/batches/{remote_id}/cancel', cast_to=JSONObject,
+                                                    options={'timeout': timeout}))
+
+
+class LocalBatchBackend:
+    """اجرای محلی فایل batch با chat completions (جایگزین Batch API برای تست)
+
+    وضعیت در BATCH_DIR/{remote_id}.json است و پردازش در اولین retrieve (یعنی در poll) انجام می‌شود؛
+    خروجی همان قالب خطوط خروجی OpenAI را دارد.
+    """
+    name = 'local'
+
+    def __init__(self, client, directory, workers=None):
+        self.client = client
+        self.directory = directory
+        self.workers = max(workers or Config.LLM_CHUNK_WORKERS, 1)
+
+    def _state_path(self, remote_id):
+        return os.path.join(self.directory, f'{remote_id}.json')
+
+    def _read_state(self, remote_id):
+        with open(self._state_path(remote_id), encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_state(self, remote_id, state):
+        with open(self._state_path(remote_id), 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+
+    def submit(self, input_path):
+        remote_id = f'local_{uuid.uuid4().hex[:16]}'
+        self._write_state(remote_id, {'status': 'in_progress', 'input_path': input_path, 'counts': {}})
+        return remote_id
+
+    def retrieve(self, remote_id):
+        state = self._read_state(remote_id)
+        if state['status'] == 'in_progress':
+            state = self._run(remote_id, state)
+        return state
+
+    def _run(self, remote_id, state):
+        """اجرای همه درخواست‌ها با LLM_CHUNK_WORKERS فراخوانی همزمان (پنجره‌ای، نه کل فایل در حافظه)"""
+        output_path = os.path.join(self.directory, f'{remote_id}_output.jsonl')
+        counts = {'total': 0, 'completed': 0, 'failed': 0}
+        with open(state['input_path'], encoding='utf-8') as source, \
+                open(output_path, 'w', encoding='utf-8') as output, \
+                ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                lines = list(islice(source, self.workers * 4))
+                if not lines:
+                    break
+                requests = [json.loads(line) for line in lines if line.strip()]
+                for result in executor.map(self._execute, requests):
+                    counts['total'] += 1
+                    counts['failed' if result['error'] else 'completed'] += 1
+                    output.write(json.dumps(result, ensure_ascii=False) + '\n')
+        state.update(status='completed', counts=counts, output_path=output_path)
+        self._write_state(remote_id, state)
+        return state
+
+    def _execute(self, request):
+        result = {'id': f'batch_req_{uuid.uuid4().hex[:16]}', 'custom_id': request['custom_id'],
+                  'response': None, 'error': None}
+        try:
+            completion = call_with_resilience('batch', lambda timeout: self.client.chat.completions.create(
+                **request['body'], timeout=timeout
+            ))
+            result['response'] = {'status_code': 200, 'body': completion.model_dump()}
+        except Exception as e:
+            result['error'] = {'code': type(e).__name__, 'message': str(e)}
+        return result
+
+    def results(self, remote_id, info):
+        if info.get('output_path') and os.path.exists(info['output_path']):
+            yield from _read_jsonl(info['output_path'])
+
+    def cancel(self, remote_id):
+        state = self._read_state(remote_id)
+        if state['status'] == 'in_progress':
+            state['status'] = 'cancelled'
+            self._write_state(remote_id, state)
+
+
+def get_backend(client, name=None):
+    """backend بر اساس BATCH_BACKEND (client: شیء openai.OpenAI)"""
+    name = (name or Config.BATCH_BACKEND).lower()
+    os.makedirs(Config.BATCH_DIR, exist_ok=True)
+    if name == 'openai':
+        return OpenAIBatchBackend(client, Config.BATCH_DIR)
+    if name == 'local':
+        return LocalBatchBackend(client, Config.BATCH_DIR)
+    raise ValueError(f"backend نامعتبر برای batch: {name}")
+
+
+def _prompt_version(ai_client, job_type):
+    return ai_client.CRM_PROMPT_VERSION if job_type == 'crm' else ai_client.REFERRAL_PROMPT_VERSION
+
+
+def _is_current(key):
+    """همین محتوا با همین نسخه پرامپت قبلاً تحلیل شده یا در batch دیگری در انتظار است (بدون تغییر کش)"""
+    row = execute_query("""
+        SELECT id FROM analysis_batch_items WHERE cache_key = %s AND status IN ('pending', 'done') LIMIT 1
+    """, (key,), fetch_one=True)
+    return bool(row) or llm_cache.exists(key)
+
+
+class _BatchWriter:
+    """فایل JSONL یک batch در حال ساخت"""
+
+    def __init__(self, job_type, backend_name, model, prompt_version):
+        with transaction() as cursor:
+            cursor.execute("""
+                INSERT INTO analysis_batches (job_type, backend, status, model, prompt_version)
+                VALUES (%s, %s, 'building', %s, %s)
+            """, (job_type, backend_name, model, prompt_version))
+            self.id = cursor.lastrowid
+        self.path = os.path.join(Config.BATCH_DIR, f'batch_{self.id}.jsonl')
+        self.file = open(self.path, 'w', encoding='utf-8')
+        self.items = self.requests = self.bytes = 0
+
+    def fits(self, requests, size):
+        return self.requests + requests <= Config.BATCH_MAX_REQUESTS and self.bytes + size <= Config.BATCH_MAX_BYTES
+
+    def add(self, item_id, bodies):
+        for part, body in enumerate(bodies, 1):
+            line = json.dumps({
+                'custom_id': f'{item_id}:{part}:{len(bodies)}',
+                'method': 'POST',
+                'url': ENDPOINT,
+                'body': body
+            }, ensure_ascii=False) + '\n'
+            self.file.write(line)
+            self.bytes += len(line.encode('utf-8'))
+        self.items += 1
+        self.requests += len(bodies)
+
+    def close(self):
+        self.file.close()
+        execute_query("""
+            UPDATE analysis_batches SET status = 'built', input_path = %s, item_count = %s, request_count = %s
+            WHERE id = %s
+        """, (self.path, self.items, self.requests, self.id), commit=True)
+
+
+def build_batches(job_type, ai_client, file_handler, backend_name, since=None, limit=None, force=False):
+    """ساخت فایل‌های درخواست از آپلودهای تحلیل‌های قبلی؛ خروجی: شناسه batchهای ساخته‌شده"""
+    if job_type not in SOURCES:
+        raise ValueError(f"نوع تحلیل نامعتبر: {job_type}")
+    prompt_version = _prompt_version(ai_client, job_type)
+    query = SOURCES[job_type] + (" WHERE analyzed_at >= %s" if since else "") + " ORDER BY analyzed_at DESC"
+    # پیمایش تدریجی؛ کل تاریخچه در حافظه بارگذاری نمی‌شود
+    sources = stream_query(query, (since,) if since else None)
+
+    seen = set()
+    batch_ids = []
+    writer = None
+    built = skipped = 0
+    try:
+        for row in sources:
+            if limit and built >= limit:
+                break
+            path = row['file_path']
+            # آخرین تحلیل هر فایل کافی است؛ فایل‌های حذف‌شده از دیسک قابل تحلیل نیستند
+            if not path or path in seen or not os.path.exists(path):
+                skipped += 1
+                continue
+            seen.add(path)
+
+            try:
+                content, _ = file_handler.extract_prompt_text(path, row['file_name'])
+                if not content or len(content.strip()) < 50:
+                    skipped += 1
+                    continue
+                # همان مسیر آپلود: آمار محلی + بخش‌های کیفی، یا تحلیل کامل اگر جدول قابل خواندن نباشد
+                local = LOCAL_STATS[job_type](path, row['file_name'])
+                analysis_type, item_version, key_content, build_prompt = ai_client.batch_plan(job_type, content, local)
+                key = llm_cache.make_key(analysis_type, key_content, item_version, ai_client.model,
+                                         ai_client.TEMPERATURE)
+                if not force and _is_current(key):
+                    skipped += 1
+                    continue
+                requests = ai_client.batch_requests(analysis_type, key_content, build_prompt)
+            except TokenBudgetError as e:
+                print(f"⚠️ {row['file_name']}: {e}")
+                skipped += 1
+                continue
+            except Exception as e:
+                print(f"⚠️ خطا در خواندن {row['file_name']}: {e}")
+                skipped += 1
+                continue
+
+            bodies = [body for body, _ in requests]
+            size = sum(len(json.dumps(body, ensure_ascii=False).encode('utf-8')) + 100 for body in bodies)
+            if writer and not writer.fits(len(bodies), size):
+                writer.close()
+                writer = None
+            if writer is None:
+                writer = _BatchWriter(job_type, backend_name, ai_client.model, prompt_version)
+                batch_ids.append(writer.id)
+
+            with transaction() as cursor:
+                cursor.execute("""
+                    INSERT INTO analysis_batch_items (batch_id, source_id, file_name, file_path, file_size,
+                                                      file_type, analysis_type, prompt_version, cache_key, parts,
+                                                      estimated_tokens)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, (writer.id, row['id'], row['file_name'], path, row.get('file_size') or 0,
+                      row.get('file_type') or os.path.splitext(path)[1].lstrip('.').lower(), analysis_type,
+                      item_version, key, len(bodies), sum(estimated for _, estimated in requests)))
+                item_id = cursor.lastrowid
+            writer.add(item_id, bodies)
+            built += 1
+    finally:
+        sources.close()
+        if writer:
+            writer.close()
+
+    print(f"📦 {built} فایل در {len(batch_ids)} batch آماده شد ({skipped} فایل رد شد)")
+    return batch_ids
+
+
+def submit_batches(backend):
+    """ارسال batchهای ساخته‌شده؛ خطای ارسال، batch را برای اجرای بعدی در وضعیت built نگه می‌دارد"""
+    rows = execute_query("""
+        SELECT id, input_path, request_count FROM analysis_batches
+        WHERE status = 'built' AND backend = %s ORDER BY id
+    """, (backend.name,), fetch_all=True) or []
+    submitted = []
+    for row in rows:
+        try:
+            remote_id = backend.submit(row['input_path'])
+        except Exception as e:
+            print(f"❌ خطا در ارسال batch {row['id']}: {e}")
+            continue
+        execute_query("""
+            UPDATE analysis_batches SET status = 'submitted', remote_id = %s, submitted_at = %s WHERE id = %s
+        """, (remote_id, datetime.now(), row['id']), commit=True)
+        print(f"🚀 batch {row['id']} ارسال شد ({row['request_count']} درخواست، {remote_id})")
+        submitted.append(row['id'])
+    return submitted
+
+
+def _parse_custom_id(custom_id):
+    item_id, part, parts = (int(value) for value in custom_id.split(':'))
+    return item_id, part, parts
+
+
+def _line_error(line):
+    """پیام خطای یک خط خروجی یا None"""
+    response = line.get('response') or {}
+    if line.get('error'):
+        return line['error'].get('message') or line['error'].get('code') or 'خطای نامشخص'
+    if response.get('status_code') != 200:
+        error = (response.get('body') or {}).get('error') or {}
+        return error.get('message') or f"HTTP {response.get('status_code')}"
+    return None
+
+
+def _fail_item(item_id, error):
+    execute_query("UPDATE analysis_batch_items SET status = 'failed', error = %s WHERE id = %s",
+                  (error, item_id), commit=True)
+
+
+def _ingest_item(batch, item, lines, ai_client):
+    """ادغام تکه‌های یک فایل و جایگزینی تحلیل قبلی آن؛ خروجی: True در صورت موفقیت"""
+    from .models import AnalysisModel, ReferralAnalysisModel
+
+    job_type = batch['job_type']
+    # itemهای قبل از migrations/010 نوع تحلیل ندارند (تحلیل کامل)
+    analysis_type = item.get('analysis_type') or job_type
+    usage = UsageBatch(f'{job_type}_batch')
+    estimated = item['estimated_tokens'] // max(item['parts'], 1)
+    partials, errors = [], []
+    for line in lines:
+        error = _line_error(line)
+        if not error:
+            body = line['response']['body']
+            usage.add(batch['model'], estimated, 0, body.get('usage'))
+            try:
+                partials.append(ai_client.parse_batch_response(body, analysis_type))
+                continue
+            except (ValueError, KeyError, IndexError, RuntimeError) as e:
+                error = str(e)
+        else:
+            usage.add(batch['model'], estimated, 0, status='error')
+        errors.append(error)
+        partials.append({'error': True, 'message': error})
+
+    if len(errors) == len(partials):
+        usage.save(None)
+        _fail_item(item['id'], '؛ '.join(errors[:3]) or 'پاسخی دریافت نشد')
+        return False
+
+    local = None
+    if analysis_type.endswith('_insights'):
+        # آمار از همان فایل دوباره محاسبه می‌شود (قطعی و سریع)
+        local = LOCAL_STATS[job_type](item['file_path'], item['file_name'])
+        if local is None:
+            usage.save(None)
+            _fail_item(item['id'], 'آمار محلی فایل قابل محاسبه نیست')
+            return False
+
+    merge = partial(merge_crm_results, stats=local['stats']) if analysis_type == 'crm_insights' \
+        else MERGERS[analysis_type]
+    analysis = merge_partials(partials, merge) if item['parts'] > 1 else partials[0]
+    if not analysis.get('partial'):
+        llm_cache.put(item['cache_key'], analysis_type, item.get('prompt_version') or batch['prompt_version'],
+                      batch['model'], analysis)
+    if analysis_type == 'crm_insights':
+        analysis = crm_stats.merge_insights(local, analysis)
+    elif analysis_type == 'referral_insights':
+        analysis = referral_stats.merge_insights(local, analysis)
+
+    analysis['analyzed_at'] = datetime.now().isoformat()
+    analysis['file_name'] = item['file_name']
+    model = ReferralAnalysisModel if job_type == 'referral' else AnalysisModel
+    if not model.update(item['source_id'], analysis):
+        usage.save(None)
+        _fail_item(item['id'], 'تحلیل قبلی این فایل حذف شده است')
+        return False
+    usage.save(item['source_id'])
+    execute_query("UPDATE analysis_batch_items SET status = 'done', result_id = %s, error = NULL WHERE id = %s",
+                  (item['source_id'], item['id']), commit=True)
+    return True
+
+
+def ingest_batch(batch, backend, info, ai_client):
+    """ذخیره نتایج یک batch تمام‌شده؛ خروجی: (موفق، ناموفق)"""
+    items = {row['id']: row for row in execute_query("""
+        SELECT id, source_id, file_name, file_path, file_size, file_type, analysis_type, prompt_version, cache_key,
+               parts, estimated_tokens
+        FROM analysis_batch_items WHERE batch_id = %s AND status = 'pending'
+    """, (batch['id'],), fetch_all=True) or []}
+
+    # تکه‌های یک فایل لزوماً پشت سر هم در خروجی نیستند
+    collected = {}
+    succeeded = failed = 0
+    for line in backend.results(batch['remote_id'], info):
+        try:
+            item_id, part, parts = _parse_custom_id(line['custom_id'])
+        except (KeyError, ValueError):
+            continue
+        item = items.get(item_id)
+        if not item:
+            continue
+        parts_seen = collected.setdefault(item_id, {})
+        parts_seen[part] = line
+        if len(parts_seen) < item['parts']:
+            continue
+
+        del collected[item_id]
+        del items[item_id]
+        try:
+            ok = _ingest_item(batch, item, [parts_seen[p] for p in sorted(parts_seen)], ai_client)
+        except Exception as e:
+            print(f"❌ خطا در ذخیره نتیجه {item['file_name']}: {e}")
+            _fail_item(item_id, str(e))
+            ok = False
+        succeeded += ok
+        failed += not ok
+
+    for item_id in items:
+        _fail_item(item_id, 'پاسخی در خروجی batch نبود')
+        failed += 1
+    return succeeded, failed
+
+
+def poll_batches(backend, ai_client):
+    """بررسی batchهای در جریان و ذخیره نتایج تمام‌شده‌ها؛ خروجی: تعداد batchهای هنوز در جریان"""
+    rows = execute_query("""
+        SELECT id, job_type, remote_id, model, prompt_version, status FROM analysis_batches
+        WHERE backend = %s AND status NOT IN ('building', 'built', 'ingested', 'failed') ORDER BY id
+    """, (backend.name,), fetch_all=True) or []
+
+    active = 0
+    for batch in rows:
+        try:
+            info = backend.retrieve(batch['remote_id'])
+        except Exception as e:
+            print(f"⚠️ خطا در بررسی batch {batch['id']}: {e}")
+            active += 1
+            continue
+
+        status = info['status']
+        if status not in FINAL_STATUSES:
+            if status != batch['status']:
+                execute_query("UPDATE analysis_batches SET status = %s WHERE id = %s", (status, batch['id']),
+                              commit=True)
+            counts = info.get('counts') or {}
+            print(f"⏳ batch {batch['id']}: {status} ({counts.get('completed', 0)}/{counts.get('total', '?')})")
+            active += 1
+            continue
+
+        if status == 'failed':
+            error = info.get('error') or 'batch ناموفق بود'
+            execute_query("""
+                UPDATE analysis_batch_items SET status = 'failed', error = %s
+                WHERE batch_id = %s AND status = 'pending'
+            """, (error, batch['id']), commit=True)
+            execute_query("""
+                UPDATE analysis_batches SET status = 'failed', error = %s, finished_at = %s WHERE id = %s
+            """, (error, datetime.now(), batch['id']), commit=True)
+            print(f"❌ batch {batch['id']}: {error}")
+            continue
+
+        succeeded, failed = ingest_batch(batch, backend, info, ai_client)
+        execute_query("""
+            UPDATE analysis_batches
+            SET status = 'ingested', succeeded = succeeded + %s, failed = failed + %s, error = %s, finished_at = %s
+            WHERE id = %s
+        """, (succeeded, failed, None if status == 'completed' else f'batch {status}', datetime.now(),
+              batch['id']), commit=True)
+        print(f"✅ batch {batch['id']} ({status}): {succeeded} تحلیل ذخیره شد، {failed} ناموفق")
+    return active
+
+
+def cancel_batch(backend, batch_id):
+    """لغو batch ارسال‌شده؛ نتایج آماده در poll بعدی ذخیره می‌شوند"""
+    row = execute_query("SELECT remote_id FROM analysis_batches WHERE id = %s AND backend = %s",
+                        (batch_id, backend.name), fetch_one=True)
+    if not row or not row['remote_id']:
+        return False
+    backend.cancel(row['remote_id'])
+    return True
+
+
+def list_batches(limit=20):
+    """آخرین batchها"""
+    rows = execute_query("""
+        SELECT id, job_type, backend, status, remote_id, item_count, request_count, succeeded, failed, error,
+               created_at, submitted_at, finished_at
+        FROM analysis_batches ORDER BY id DESC LIMIT %s
+    """, (limit,), fetch_all=True) or []
+    for row in rows:
+        for key in ('created_at', 'submitted_at', 'finished_at'):
+            if row.get(key) and hasattr(row[key], 'isoformat'):
+                row[key] = row[key].isoformat()
+    return rows
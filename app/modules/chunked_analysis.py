@@ -0,0 +1,444 @@
+# modules/chunked_analysis.py
+"""
+تحلیل تکه‌ای (map-reduce) برای خروجی‌های بزرگ CRM و ارجاعیات.
+
+    split_content  ← تقسیم سطرها به تکه‌هایی با سقف توکن (سطر سرستون و تعریف کدهای @n هر تکه در همان تکه)
+    run_chunks     ← تحلیل همزمان تکه‌ها در یک ThreadPool محدود
+    retry_failed   ← تلاش دوباره برای تکه‌های ناموفق
+    merge_partials ← ادغام تکه‌های موفق و علامت partial اگر تکه‌ای ناموفق مانده باشد
+    merge_crm_results ← ادغام JSONهای جزئی در همان ساختار فیلدهای_عددی / آمار / لیست_ها
+    merge_referral_results ← ادغام تحلیل‌های جزئی ارجاعیات (status_analysis و ...)
+
+در ادغام، شمارش‌ها جمع می‌شوند و امتیازها/درصدها با وزن تعداد تماس (یا ارجاع) هر تکه
+میانگین می‌گیرند. درصدها و بیشترین/کمترین‌ها از روی شمارش‌های ادغام‌شده دوباره محاسبه می‌شوند.
+"""
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .llm_usage import CHARS_PER_TOKEN, estimate_tokens
+from .prompt_compaction import DICTIONARY_END, LEGEND, split_dictionary, with_dictionary
+
+# سقف آیتم‌های لیست‌های ادغام‌شده (هم‌اندازه با خروجی یک تحلیل تکی)
+MAX_LIST_ITEMS = 10
+MAX_RANKED_ITEMS = 10
+
+
+def _split_long(text, max_chars):
+    """شکستن یک سطر بلند (مثلاً متن RTF بدون خط جدید) روی فاصله‌ها"""
+    pieces = []
+    while len(text) > max_chars:
+        cut = text.rfind(' ', 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(text[:cut].strip())
+        text = text[cut:].strip()
+    if text:
+        pieces.append(text)
+    return pieces
+
+
+def split_content(content, max_tokens):
+    """تقسیم محتوا به تکه‌هایی با حداکثر max_tokens توکن؛ محتوای کوچک یک تکه می‌ماند"""
+    if estimate_tokens(content) <= max_tokens:
+        return [content]
+
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    compacted = split_dictionary(content)
+    if compacted:
+        # خروجی prompt_compaction: راهنما، فرهنگ و سطر عنوان جدول در هر تکه (فقط کدهای همان تکه)
+        definitions, header_lines, body = compacted
+        lines = [line for line in body if line.strip()]
+        preamble = len('\n'.join([LEGEND, *definitions.values(), DICTIONARY_END, *header_lines]))
+        max_chars = max(max_chars - preamble - 1, max_chars // 2)
+    else:
+        lines = [line for line in content.splitlines() if line.strip()]
+        header = lines[0] if len(lines) > 1 and len(lines[0]) < max_chars // 4 else ''
+        header_lines = [header] if header else []
+        if header:
+            lines = lines[1:]
+            max_chars -= len(header) + 1
+
+    chunks = []
+    current, size = [], 0
+    for line in lines:
+        for piece in _split_long(line, max_chars):
+            if current and size + len(piece) + 1 > max_chars:
+                chunks.append(current)
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece) + 1
+    if current:
+        chunks.append(current)
+
+    if compacted:
+        return [with_dictionary(definitions, header_lines, chunk) for chunk in chunks]
+    return ['\n'.join(header_lines + chunk) for chunk in chunks]
+
+
+def iter_chunks(chunks, analyze, max_workers):
+    """اجرای analyze(chunk, index, total) روی تکه‌ها به صورت همزمان؛ (index، نتیجه) به ترتیب اتمام"""
+    total = len(chunks)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, total))) as executor:
+        futures = {executor.submit(analyze, chunk, index, total): index for index, chunk in enumerate(chunks)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def run_chunks(chunks, analyze, max_workers):
+    """اجرای همزمان تکه‌ها؛ خروجی به ترتیب تکه‌ها"""
+    results = dict(iter_chunks(chunks, analyze, max_workers))
+    return [results[index] for index in range(len(chunks))]
+
+
+def retry_failed(chunks, partials, analyze, max_workers, retries):
+    """تحلیل دوباره تکه‌های ناموفق (حداکثر retries دور)؛ partials (به ترتیب تکه‌ها) در جا به‌روز می‌شود"""
+    for attempt in range(retries):
+        failed = [index for index, partial in enumerate(partials) if partial.get('error')]
+        if not failed:
+            break
+        print(f"🔁 تلاش دوباره برای {len(failed)} بخش ناموفق (دور {attempt + 1})")
+        for position, result in iter_chunks([chunks[index] for index in failed],
+                                            lambda chunk, i, _: analyze(chunk, failed[i], len(chunks)),
+                                            max_workers):
+            partials[failed[position]] = result
+    return partials
+
+
+def merge_partials(partials, merge):
+    """ادغام تکه‌های موفق با merge؛ اگر همه ناموفق باشند خطای اولین تکه برمی‌گردد
+
+    اگر بعضی تکه‌ها ناموفق مانده باشند شمارش‌ها کامل نیستند: نتیجه partial=True و failed_chunks (شماره
+    تکه‌ها از ۱) دارد و نباید در کش ذخیره شود.
+    """
+    failed = [index + 1 for index, partial in enumerate(partials) if partial.get('error')]
+    succeeded = [partial for partial in partials if not partial.get('error')]
+    if not succeeded:
+        return partials[0]
+    analysis = merge(succeeded)
+    if failed:
+        print(f"⚠️ {len(failed)} بخش از {len(partials)} تحلیل نشد؛ نتیجه ناقص است")
+        analysis['partial'] = True
+        analysis['failed_chunks'] = failed
+    return analysis
+
+
+def _number(value):
+    """عدد از مقدار خروجی مدل (ممکن است رشته یا None باشد)"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _dict(value):
+    return value if isinstance(value, dict) else {}
+
+
+def _list(value):
+    return value if isinstance(value, list) else []
+
+
+def _is_count(key):
+    """فیلدهای شمارشی جمع می‌شوند؛ بقیه (امتیاز، درصد، disc) میانگین وزنی می‌گیرند"""
+    return key.startswith('تعداد_')
+
+
+def _merge_numbers(dicts, weights):
+    """ادغام دیکشنری‌های عددی: جمع شمارش‌ها و میانگین وزنی بقیه"""
+    keys = []
+    for data in dicts:
+        keys.extend(key for key in data if key not in keys)
+
+    total_weight = sum(weights) or 1
+    merged = {}
+    for key in keys:
+        values = [_number(data.get(key)) for data in dicts]
+        if _is_count(key):
+            merged[key] = int(round(sum(values)))
+        else:
+            merged[key] = round(sum(v * w for v, w in zip(values, weights)) / total_weight, 1)
+    return merged
+
+
+def _merge_lists(lists, limit=MAX_LIST_ITEMS):
+    """اجتماع لیست‌های متنی، مرتب بر اساس تعداد تکه‌هایی که آیتم در آن‌ها آمده"""
+    counter = Counter()
+    first_seen = {}
+    for items in lists:
+        for item in dict.fromkeys(str(i).strip() for i in _list(items) if str(i).strip()):
+            counter[item] += 1
+            first_seen.setdefault(item, len(first_seen))
+    ranked = sorted(counter, key=lambda item: (-counter[item], first_seen[item]))
+    return ranked[:limit]
+
+
+def _merge_list_dicts(dicts):
+    """ادغام دیکشنری‌هایی از لیست (لیست_ها، دلایل_کاهش/کسب_امتیازها)"""
+    keys = []
+    for data in dicts:
+        keys.extend(key for key in data if key not in keys)
+    return {key: _merge_lists(data.get(key) for data in dicts) for key in keys}
+
+
+def _merge_ranked(lists, count_key='تعداد_تماس'):
+    """ادغام لیست‌های [{نام، تعداد_تماس، ...}] با جمع تعداد برای نام‌های یکسان"""
+    merged = {}
+    for items in lists:
+        for item in _list(items):
+            if not isinstance(item, dict) or not item.get('نام'):
+                continue
+            name = str(item['نام']).strip()
+            if name in merged:
+                merged[name][count_key] += int(_number(item.get(count_key)))
+            else:
+                merged[name] = dict(item, نام=name)
+                merged[name][count_key] = int(_number(item.get(count_key)))
+    ranked = sorted(merged.values(), key=lambda item: -item[count_key])
+    return ranked[:MAX_RANKED_ITEMS]
+
+
+def _merge_counts(dicts):
+    """جمع دیکشنری‌های شمارشی مثل انواع_تماس"""
+    total = Counter()
+    for data in dicts:
+        for key, value in data.items():
+            total[key] += int(_number(value))
+    return dict(total.most_common())
+
+
+def _merge_stats(stats):
+    """ادغام بخش آمار"""
+    merged = {}
+    for data in stats:
+        for key, value in data.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and key not in merged:
+                merged[key] = sum(int(_number(s.get(key))) for s in stats)
+    merged['کاربران_فعال'] = _merge_ranked(s.get('کاربران_فعال') for s in stats)
+    merged['مشتریان_پرتماس'] = _merge_ranked(s.get('مشتریان_پرتماس') for s in stats)
+    merged['انواع_تماس'] = _merge_counts(_dict(s.get('انواع_تماس')) for s in stats)
+    return merged
+
+
+def _best(ranked, partials, section, key):
+    """بهترین فروشنده/مشتری از روی لیست ادغام‌شده؛ دلیل از تکه‌ای که همان نام را انتخاب کرده"""
+    if not ranked:
+        return {}
+    name = ranked[0]['نام']
+    for partial in partials:
+        candidate = _dict(_dict(partial.get(section)).get(key))
+        if str(candidate.get('نام', '')).strip() == name and candidate.get('دلیل'):
+            return {'نام': name, 'دلیل': candidate['دلیل']}
+    return {'نام': name, 'دلیل': f"{ranked[0]['تعداد_تماس']} تماس"}
+
+
+def merge_crm_results(partials, stats=None):
+    """ادغام تحلیل‌های جزئی CRM در یک تحلیل با ساختار خروجی analyze_crm
+
+    stats: آمار دقیق کل فایل (crm_stats) به جای جمع آمار تکه‌ها.
+    """
+    if len(partials) == 1:
+        return partials[0]
+
+    exact_stats = stats
+    stats = [_dict(p.get('آمار')) for p in partials]
+    # وزن هر تکه = تعداد تماس‌های آن (حداقل ۱ تا تکه‌های بدون آمار هم اثر داشته باشند)
+    weights = [max(_number(s.get('تعداد_کل_تماس_ها')), 1) for s in stats]
+    heaviest = partials[max(range(len(partials)), key=lambda i: weights[i])]
+
+    merged_stats = exact_stats or _merge_stats(stats)
+    numbers = _merge_numbers([_dict(p.get('فیلدهای_عددی')) for p in partials], weights)
+
+    # متن‌ها از تکه‌ای با بیشترین تماس؛ نام‌ها و شواهد از همه تکه‌ها
+    text = dict(_dict(heaviest.get('فیلدهای_متنی')))
+    texts = [_dict(p.get('فیلدهای_متنی')) for p in partials]
+    for key in ('نام_فروشنده', 'نام_مشتری', 'محصول'):
+        names = _merge_lists([str(t.get(key, '')).replace('،', ',').split(',') for t in texts])
+        if names:
+            text[key] = '، '.join(names)
+    text['disc_شواهد'] = _merge_lists(t.get('disc_شواهد') for t in texts)
+    disc = {k: numbers.get(f'disc_{k.lower()}', 0) for k in 'DISC'}
+    if any(disc.values()):
+        text['disc_تیپ'] = max(disc, key=disc.get)
+    total_calls = merged_stats.get('تعداد_کل_تماس_ها', 0)
+    if total_calls:
+        text['خلاصه'] = (
+            f"گزارش شامل {total_calls} تماس: {merged_stats.get('تماس_های_موفق', 0)} موفق و "
+            f"{merged_stats.get('تماس_های_بی_پاسخ', 0)} بی‌پاسخ (تحلیل در {len(partials)} بخش). "
+            + str(text.get('خلاصه', ''))
+        ).strip()
+
+    return {
+        'فیلدهای_عددی': numbers,
+        'فیلدهای_متنی': text,
+        'دلایل_کاهش_امتیازها': _merge_list_dicts([_dict(p.get('دلایل_کاهش_امتیازها')) for p in partials]),
+        'دلایل_کسب_امتیازها': _merge_list_dicts([_dict(p.get('دلایل_کسب_امتیازها')) for p in partials]),
+        'لیست_ها': _merge_list_dicts([_dict(p.get('لیست_ها')) for p in partials]),
+        'آمار': merged_stats,
+        'بهترین_ها': {
+            'بهترین_فروشنده': _best(merged_stats['کاربران_فعال'], partials, 'بهترین_ها', 'بهترین_فروشنده'),
+            'بهترین_مشتری': _best(merged_stats['مشتریان_پرتماس'], partials, 'بهترین_ها', 'بهترین_مشتری')
+        }
+    }
+
+
+def _merge_records(lists, key_fields, sum_fields=('count',), rate_fields=(), weight_field='count', limit=MAX_RANKED_ITEMS):
+    """ادغام لیست‌های رکورد (مثل top_senders) بر اساس key_fields
+
+    sum_fields جمع می‌شوند و rate_fields با وزن weight_field هر رکورد میانگین می‌گیرند.
+    """
+    merged = {}
+    rate_totals = {}
+    for items in lists:
+        for item in _list(items):
+            if not isinstance(item, dict):
+                continue
+            key = tuple(str(item.get(field, '')).strip() for field in key_fields)
+            if not any(key):
+                continue
+            weight = max(_number(item.get(weight_field)), 1)
+            if key not in merged:
+                merged[key] = dict(item)
+                merged[key].update({field: 0 for field in sum_fields})
+                rate_totals[key] = {field: [0.0, 0.0] for field in rate_fields}
+            for field in sum_fields:
+                merged[key][field] += int(_number(item.get(field)))
+            for field in rate_fields:
+                if item.get(field) is not None:
+                    rate_totals[key][field][0] += _number(item.get(field)) * weight
+                    rate_totals[key][field][1] += weight
+
+    for key, record in merged.items():
+        for field, (total, weight) in rate_totals[key].items():
+            record[field] = round(total / weight, 1) if weight else 0
+    ranked = sorted(merged.values(), key=lambda item: -_number(item.get(sum_fields[0])))
+    return ranked[:limit]
+
+
+def _weighted(values_weights):
+    """میانگین وزنی [(مقدار، وزن)] برای مقادیر موجود"""
+    pairs = [(_number(value), weight) for value, weight in values_weights if value is not None]
+    total_weight = sum(weight for _, weight in pairs)
+    return round(sum(value * weight for value, weight in pairs) / total_weight, 1) if total_weight else 0
+
+
+def _merge_pick(items, key_field):
+    """ادغام آیتم‌های تکی {key_field، count} هر تکه و انتخاب بیشترین"""
+    ranked = _merge_records([[item] for item in items if isinstance(item, dict)], (key_field,))
+    return ranked[0] if ranked else {}
+
+
+def merge_referral_results(partials):
+    """ادغام تحلیل‌های جزئی ارجاعیات در یک تحلیل با ساختار خروجی analyze_referral"""
+    if len(partials) == 1:
+        return partials[0]
+
+    def section(name):
+        return [_dict(p.get(name)) for p in partials]
+
+    status = section('status_analysis')
+    subjects = section('subject_analysis')
+    senders = section('sender_receiver_analysis')
+    institutions = section('institution_analysis')
+    descriptions = section('description_analysis')
+    insights = section('comprehensive_insights')
+
+    # توزیع وضعیت‌ها دقیقاً جمع می‌شود؛ وزن هر تکه = تعداد ارجاعات آن
+    distributions = [_merge_counts([_dict(s.get('status_distribution'))]) for s in status]
+    distribution = _merge_counts(distributions)
+    weights = [max(sum(d.values()), 1) for d in distributions]
+    total = sum(distribution.values())
+    heaviest = partials[max(range(len(partials)), key=lambda i: weights[i])]
+
+    def percent(count):
+        return round(count / total * 100, 1) if total else 0
+
+    ordered = sorted(distribution.items(), key=lambda item: -item[1])
+    pending_counts = [d.get('بررسی نشده', 0) for d in distributions]
+    merged_status = {
+        'percent_pending': percent(distribution.get('بررسی نشده', 0)),
+        'most_frequent_status': ordered[0][0] if ordered else '',
+        'frequent_status_count': ordered[0][1] if ordered else 0,
+        'avg_days_pending': _weighted((s.get('avg_days_pending'), max(c, 1)) for s, c in zip(status, pending_counts)),
+        'worst_sender_pending': _merge_pick((s.get('worst_sender_pending') for s in status), 'unit'),
+        'percent_completed': percent(distribution.get('اتمام کار', 0)),
+        'receiver_with_most_in_progress': _merge_pick(
+            (s.get('receiver_with_most_in_progress') for s in status), 'receiver'),
+        'status_distribution': distribution,
+        'status_with_lowest_frequency': ordered[-1][0] if ordered else '',
+        'lowest_frequency_count': ordered[-1][1] if ordered else 0
+    }
+
+    unique_subjects = _merge_records((s.get('unique_subjects') for s in subjects), ('subject',), limit=None)
+    subject_counts = [
+        {str(item.get('subject', '')).strip(): _number(item.get('count')) for item in _list(s.get('unique_subjects'))
+         if isinstance(item, dict)}
+        for s in subjects
+    ]
+    response_keys = []
+    for s in subjects:
+        response_keys.extend(key for key in _dict(s.get('subject_response_time')) if key not in response_keys)
+    merged_subjects = {
+        'most_frequent_subject': unique_subjects[0]['subject'] if unique_subjects else '',
+        'subject_frequency': unique_subjects[0]['count'] if unique_subjects else 0,
+        'second_most_frequent': unique_subjects[1]['subject'] if len(unique_subjects) > 1 else '',
+        'second_frequency': unique_subjects[1]['count'] if len(unique_subjects) > 1 else 0,
+        'subject_pending': _merge_counts(_dict(s.get('subject_pending')) for s in subjects),
+        'subject_response_time': {
+            key: _weighted(
+                (_dict(s.get('subject_response_time')).get(key), max(counts.get(key, 0), 1))
+                for s, counts in zip(subjects, subject_counts)
+            )
+            for key in response_keys
+        },
+        'unique_subjects': unique_subjects
+    }
+
+    merged_senders = {
+        'top_senders': _merge_records((s.get('top_senders') for s in senders), ('sender',),
+                                      rate_fields=('completion_rate',)),
+        'top_receivers': _merge_records((s.get('top_receivers') for s in senders), ('receiver',),
+                                        sum_fields=('count', 'pending')),
+        'common_pairs': _merge_records((s.get('common_pairs') for s in senders), ('from', 'to'))
+    }
+
+    merged_institutions = {
+        'top_institutions': _merge_records((s.get('top_institutions') for s in institutions), ('name',),
+                                           rate_fields=('completion_rate',)),
+        'subscription_correlation': _weighted(
+            (s.get('subscription_correlation'), w) for s, w in zip(institutions, weights))
+    }
+
+    merged_descriptions = {
+        'percent_with_description': _weighted(
+            (s.get('percent_with_description'), w) for s, w in zip(descriptions, weights)),
+        'avg_description_length': _weighted(
+            (s.get('avg_description_length'), w) for s, w in zip(descriptions, weights)),
+        'top_keywords': _merge_records((s.get('top_keywords') for s in descriptions), ('word',),
+                                       rate_fields=('completion_rate',))
+    }
+
+    summary = _dict(heaviest.get('comprehensive_insights')).get('summary_fa', '')
+    merged_insights = {
+        'completion_factors': _merge_lists(s.get('completion_factors') for s in insights),
+        'top_bottlenecks': _merge_records((s.get('top_bottlenecks') for s in insights), ('bottleneck',),
+                                          sum_fields=('pending_count',), weight_field='pending_count', limit=5),
+        'top_strengths': _merge_lists(s.get('top_strengths') for s in insights),
+        'workflow_health_score': _weighted(
+            (s.get('workflow_health_score'), w) for s, w in zip(insights, weights)),
+        'summary_fa': (
+            f"از مجموع {total} ارجاع، {distribution.get('اتمام کار', 0)} مورد به اتمام رسیده "
+            f"({percent(distribution.get('اتمام کار', 0))}٪) و {distribution.get('بررسی نشده', 0)} مورد "
+            f"بررسی نشده است (تحلیل در {len(partials)} بخش). {summary}"
+        ).strip(),
+        'recommendations_fa': _merge_lists((s.get('recommendations_fa') for s in insights), limit=5)
+    }
+
+    merged = dict(heaviest)
+    merged.update({
+        'status_analysis': merged_status,
+        'subject_analysis': merged_subjects,
+        'sender_receiver_analysis': merged_senders,
+        'institution_analysis': merged_institutions,
+        'description_analysis': merged_descriptions,
+        'comprehensive_insights': merged_insights
+    })
+    return merged
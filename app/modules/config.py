@@ -6,6 +6,17 @@ import secrets
 # بارگذاری متغیرهای محیطی
 load_dotenv()
 
+def _parse_replicas(base_config, value):
+    """ساخت تنظیمات اتصال replicaها از رشته host[:port] جدا شده با کاما"""
+    replicas = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.partition(':')
+        replicas.append({**base_config, 'host': host, 'port': int(port or 3306)})
+    return replicas
+
 class Config:
     # تنظیمات پایه
     SECRET_KEY = os.getenv('SECRET_KEY', secrets.token_hex(32))
@@ -24,6 +35,8 @@ class Config:
     # تنظیمات OpenAI
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+    # آدرس API سازگار با OpenAI؛ مثلاً http://127.0.0.1:8089/v1 برای scripts/openai_stub.py
+    OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL') or None
     
     # تنظیمات MySQL
     DB_CONFIG = {
@@ -34,6 +47,103 @@ class Config:
         'charset': 'utf8mb4'
     }
     
+    # بک‌اند دیتابیس: mysql یا sqlite (نصب تک‌نودی و بنچمارک)
+    DB_BACKEND = os.getenv('DB_BACKEND', 'mysql').lower()
+    SQLITE_PATH = os.getenv('SQLITE_PATH', 'crm_analyzer.sqlite3')
+    
+    # تنظیمات استخر اتصال
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))  # ثانیه انتظار برای اتصال آزاد
+    DB_POOL_HEALTHCHECK_IDLE = float(os.getenv('DB_POOL_HEALTHCHECK_IDLE', '30'))  # ping بعد از این مدت بیکاری
+    
+    # replicaهای فقط خواندنی: DB_READ_REPLICAS=host1,host2:3307
+    DB_REPLICAS = _parse_replicas(DB_CONFIG, os.getenv('DB_READ_REPLICAS', ''))
+    DB_READ_YOUR_WRITES_SECONDS = float(os.getenv('DB_READ_YOUR_WRITES_SECONDS', '5'))
+    
+    # لاگ کوئری‌های کند
+    DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', '200'))
+    DB_SLOW_QUERY_EXPLAIN = os.getenv('DB_SLOW_QUERY_EXPLAIN', 'False').lower() == 'true'
+    
+    # فشرده‌سازی full_analysis: none، zlib یا zstd (نیازمند پکیج zstandard)
+    ANALYSIS_COMPRESSION = os.getenv('ANALYSIS_COMPRESSION', 'none').lower()
+    ANALYSIS_COMPRESSION_LEVEL = int(os.getenv('ANALYSIS_COMPRESSION_LEVEL', '6'))
+    
+    # پارتیشن‌های فعال: داشبوردها به طور پیش‌فرض فقط این تعداد ماه اخیر را تجمیع می‌کنند
+    DASHBOARD_HOT_MONTHS = int(os.getenv('DASHBOARD_HOT_MONTHS', '3'))
+    ARCHIVE_AFTER_MONTHS = int(os.getenv('ARCHIVE_AFTER_MONTHS', '12'))
+    
+    # کش لیست‌های آموزشگاه (ثانیه)
+    ACADEMY_CACHE_TTL = float(os.getenv('ACADEMY_CACHE_TTL', '60'))
+    
+    # کش نتایج تحلیل OpenAI بر اساس محتوای فایل (جدول llm_cache)
+    LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'True').lower() == 'true'
+    LLM_CACHE_TTL_DAYS = float(os.getenv('LLM_CACHE_TTL_DAYS', '30'))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '1000'))
+    LLM_CACHE_PRUNE_EVERY = int(os.getenv('LLM_CACHE_PRUNE_EVERY', '50'))  # پاک‌سازی کش هر چند نوشتن
+    
+    # تحلیل تکه‌ای فایل‌های بزرگ: سقف توکن هر تکه و تعداد درخواست همزمان
+    LLM_CHUNK_TOKENS = int(os.getenv('LLM_CHUNK_TOKENS', '12000'))
+    LLM_CHUNK_WORKERS = int(os.getenv('LLM_CHUNK_WORKERS', '4'))
+    LLM_CHUNK_RETRIES = int(os.getenv('LLM_CHUNK_RETRIES', '1'))  # دورهای تلاش دوباره برای تکه‌های ناموفق
+    
+    # خروجی تحلیل با JSON schema سخت‌گیرانه (modules/schemas.py)؛ برای مدل‌های بدون structured outputs خاموش کنید
+    LLM_STRUCTURED_OUTPUT = os.getenv('LLM_STRUCTURED_OUTPUT', 'True').lower() == 'true'
+    
+    # آمار ارجاعیات Excel با pandas (modules/referral_stats.py)؛ مدل فقط comprehensive_insights را می‌نویسد
+    REFERRAL_LOCAL_STATS = os.getenv('REFERRAL_LOCAL_STATS', 'True').lower() == 'true'
+    # جدول CRM (RTF/Excel) و بخش «آمار» با pandas (modules/crm_stats.py)؛ مدل فقط امتیازها و متن‌ها را می‌نویسد
+    CRM_LOCAL_STATS = os.getenv('CRM_LOCAL_STATS', 'True').lower() == 'true'
+    
+    # صف کارهای تحلیل (worker.py)
+    JOB_VISIBILITY_TIMEOUT = int(os.getenv('JOB_VISIBILITY_TIMEOUT', '600'))  # ثانیه قفل هر کار
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+    JOB_RETRY_DELAY = int(os.getenv('JOB_RETRY_DELAY', '30'))  # ثانیه؛ در هر تلاش دو برابر می‌شود
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '2'))
+    JOB_WORKER_THREADS = int(os.getenv('JOB_WORKER_THREADS', '2'))
+    
+    # تحلیل مجدد انبوه با Batch API (modules/batch_analysis.py): openai یا local (اجرای محلی همان فایل‌ها)
+    BATCH_BACKEND = os.getenv('BATCH_BACKEND', 'openai').lower()
+    BATCH_DIR = os.getenv('BATCH_DIR', 'batch_files')
+    BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', '50000'))  # سقف OpenAI برای هر فایل batch
+    BATCH_MAX_BYTES = int(os.getenv('BATCH_MAX_BYTES', str(190 * 1024 * 1024)))  # سقف OpenAI: 200MB
+    BATCH_POLL_INTERVAL = float(os.getenv('BATCH_POLL_INTERVAL', '60'))
+    BATCH_PRICE_FACTOR = float(os.getenv('BATCH_PRICE_FACTOR', '0.5'))  # تخفیف Batch API نسبت به LLM_PRICES
+    
+    # تاب‌آوری فراخوانی‌های OpenAI (modules/llm_resilience.py)
+    LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '4'))
+    LLM_BACKOFF_BASE = float(os.getenv('LLM_BACKOFF_BASE', '1'))  # ثانیه
+    LLM_BACKOFF_MAX = float(os.getenv('LLM_BACKOFF_MAX', '30'))
+    LLM_BREAKER_FAILURES = int(os.getenv('LLM_BREAKER_FAILURES', '5'))  # شکست پیاپی تا باز شدن مدار
+    LLM_BREAKER_RESET = float(os.getenv('LLM_BREAKER_RESET', '30'))  # ثانیه باز ماندن مدار
+    LLM_TIMEOUTS = {
+        'default': float(os.getenv('LLM_TIMEOUT', '60')),
+        'analysis': float(os.getenv('LLM_TIMEOUT_ANALYSIS', '180')),
+        'chat': float(os.getenv('LLM_TIMEOUT_CHAT', '30')),
+        'batch': float(os.getenv('LLM_TIMEOUT_BATCH', '600'))  # آپلود/دانلود فایل‌های batch
+    }
+    
+    # استخر اتصال HTTP مشترک OpenAI (modules/llm_client.py)؛ حداقل به اندازه درخواست‌های همزمان پروسه
+    LLM_HTTP_MAX_CONNECTIONS = int(os.getenv('LLM_HTTP_MAX_CONNECTIONS', '20'))
+    LLM_HTTP_MAX_KEEPALIVE = int(os.getenv('LLM_HTTP_MAX_KEEPALIVE', '10'))
+    LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv('LLM_HTTP_KEEPALIVE_EXPIRY', '60'))  # ثانیه
+    LLM_HTTP_CONNECT_TIMEOUT = float(os.getenv('LLM_HTTP_CONNECT_TIMEOUT', '5'))
+    LLM_HTTP_POOL_TIMEOUT = float(os.getenv('LLM_HTTP_POOL_TIMEOUT', '10'))  # انتظار برای اتصال آزاد
+    
+    # بودجه توکن prompt (قبل از هر فراخوانی تخمین زده می‌شود)
+    LLM_MAX_PROMPT_TOKENS = int(os.getenv('LLM_MAX_PROMPT_TOKENS', '100000'))
+    LLM_CHAT_MAX_PROMPT_TOKENS = int(os.getenv('LLM_CHAT_MAX_PROMPT_TOKENS', '8000'))
+    
+    # فشرده‌سازی محتوای فایل قبل از پرامپت (modules/prompt_compaction.py): TSV، حذف تکرار و فرهنگ مقادیر
+    PROMPT_COMPACTION = os.getenv('PROMPT_COMPACTION', 'True').lower() == 'true'
+    PROMPT_DICT_MIN_COUNT = int(os.getenv('PROMPT_DICT_MIN_COUNT', '3'))  # حداقل تکرار برای کد @n
+    PROMPT_DICT_MIN_LENGTH = int(os.getenv('PROMPT_DICT_MIN_LENGTH', '6'))  # حداقل طول مقدار (کاراکتر)
+    
+    # قیمت هر یک میلیون توکن (ورودی، خروجی، ورودی کش‌شده) به دلار برای گزارش هزینه
+    LLM_PRICES = {
+        'gpt-4o-mini': (0.15, 0.60, 0.075),
+        'gpt-4o': (2.50, 10.00, 1.25)
+    }
+    
     @classmethod
     def validate(cls):
         """بررسی تنظیمات ضروری"""
@@ -0,0 +1,197 @@
+# modules/crm_stats.py
+"""
+خواندن جدول گزارش CRM («گزارش سوابق ارتباط با مشترک») و آمار دقیق تماس‌ها با pandas.
+
+    table = from_file(file_info['path'], file_info['name'])    # None اگر جدول قابل خواندن نباشد
+    analysis = ai_client.analyze_crm(content, table=table)
+
+table['stats'] بخش «آمار» خروجی CRM است (تعداد کل، موفق، بی‌پاسخ، ارجاعی، کاربران فعال، مشتریان پرتماس و
+انواع تماس) که با group-by محاسبه و در نتیجه قرار می‌گیرد؛ table['calls'] سطرهای تمیز جدول (یک خط برای هر
+تماس) است که به جای متن خام فایل برای امتیازدهی کیفی به مدل می‌رود.
+
+ستون‌ها: ردیف | اشتراک | نام | نام موسسه | تلفن | کاربر | ثبت | نوع | وضعیت؛ شرح هر تماس در سطر بعدی جدول است.
+جدول RTF (خروجی FastReport) با modules/utils/rtf.py سلول به سلول خوانده می‌شود.
+نتیجه تماس از شرح آن تشخیص داده می‌شود: بی‌پاسخ (NO_ANSWER)، موفق (شرح ثبت‌شده غیر از بی‌پاسخ) و
+تماس بدون شرح که در هیچ‌کدام شمرده نمی‌شود.
+"""
+import json
+import os
+import re
+import time
+from .config import Config
+from .table_utils import clean_text, value_counts
+from .utils.rtf import table_rows
+from .prompt_compaction import compact_rows
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+# عنوان ستون ← نام ستون در DataFrame
+HEADERS = {
+    'ردیف': 'row',
+    'اشتراک': 'subscription',
+    'نام': 'contact',
+    'نام موسسه': 'institution',
+    'تلفن': 'phone',
+    'کاربر': 'user',
+    'ثبت': 'registered',
+    'نوع': 'call_type',
+    'وضعیت': 'status'
+}
+REQUIRED_COLUMNS = ('row', 'user')
+
+NO_ANSWER = re.compile(r'بی+\s*پاسخ|پاسخگو نبود|جواب ندا|خاموش|در دسترس نبود|بوق مشغول|ردی? داد')
+REFERRAL_TYPES = {'erja'}
+UNTYPED = 'بدون نوع'
+TOP_CUSTOMERS = 10
+
+
+class CrmFormatError(ValueError):
+    """فایل قالب جدولی گزارش CRM را ندارد"""
+    pass
+
+
+def _excel_rows(path):
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            for row in sheet.iter_rows(values_only=True):
+                yield [clean_text(value) for value in row]
+    finally:
+        workbook.close()
+
+
+def _header_columns(cells):
+    columns = {}
+    for index, value in enumerate(cells):
+        name = HEADERS.get(value)
+        if name and name not in columns.values():
+            columns[index] = name
+    return columns if all(name in columns.values() for name in REQUIRED_COLUMNS) else None
+
+
+def load_calls(path, filename=None):
+    """خواندن تماس‌ها از RTF یا Excel؛ خروجی: DataFrame (یک سطر برای هر تماس با ستون note)"""
+    if pd is None:
+        raise CrmFormatError("pandas نصب نیست")
+    ext = (filename or path).lower().rsplit('.', 1)[-1]
+    if ext == 'rtf':
+        with open(path, 'rb') as f:
+            rows = table_rows(f.read())
+    elif ext == 'xlsx' and openpyxl is not None:
+        rows = _excel_rows(path)
+    else:
+        raise CrmFormatError(f"قالب {ext} پشتیبانی نمی‌شود")
+
+    columns = None
+    banner = set()  # عنوان گزارش که بالای هر صفحه تکرار می‌شود
+    records = []
+    for cells in rows:
+        values = [cell for cell in cells if cell]
+        header = _header_columns(cells)
+        if columns is None:
+            if header:
+                columns = header
+                number_index = next(i for i, name in columns.items() if name == 'row')
+            else:
+                banner.update(values)
+            continue
+        if header or not values:
+            continue
+        number = cells[number_index] if number_index < len(cells) else ''
+        if number.isdigit() and len(cells) > max(columns):
+            record = {name: cells[index] for index, name in columns.items()}
+            record['note'] = ''
+            records.append(record)
+        elif len(values) == 1 and values[0] not in banner and records:
+            # شرح تماس سطر قبل (سطرهای پاصفحه بیش از یک سلول پر دارند)
+            records[-1]['note'] = clean_text(f"{records[-1]['note']} {values[0]}")
+    if not records:
+        raise CrmFormatError("سطر عنوان جدول CRM (ردیف، کاربر، ...) یافت نشد")
+    df = pd.DataFrame(records)
+    df['no_answer'] = df['note'].str.contains(NO_ANSWER)
+    df['successful'] = (df['note'] != '') & ~df['no_answer']
+    df['referral'] = df['call_type'].str.lower().isin(REFERRAL_TYPES) | df['note'].str.startswith('ارجاع')
+    df['customer'] = df['institution'].where(df['institution'] != '', df['contact'])
+    return df
+
+
+def _quality(rate):
+    """کیفیت تعامل از نرخ تماس موفق"""
+    if rate >= 80:
+        return 'عالی'
+    if rate >= 60:
+        return 'خوب'
+    if rate >= 40:
+        return 'متوسط'
+    return 'ضعیف'
+
+
+def compute_stats(df):
+    """بخش «آمار» تحلیل CRM از سطرهای جدول"""
+    users = df[df['user'] != ''].groupby('user').agg(
+        calls=('row', 'size'), successful=('successful', 'sum'), no_answer=('no_answer', 'sum'),
+        referral=('referral', 'sum'))
+    users = users.reset_index().sort_values(['calls', 'user'], ascending=[False, True])
+    customers = df[df['customer'] != ''].groupby('customer').agg(
+        calls=('row', 'size'), success_rate=('successful', 'mean'))
+    customers = customers.reset_index().sort_values(['calls', 'customer'], ascending=[False, True])
+    call_types = value_counts(df['call_type'].replace('', UNTYPED))
+    return {
+        'تعداد_کل_تماس_ها': int(len(df)),
+        'تماس_های_موفق': int(df['successful'].sum()),
+        'تماس_های_بی_پاسخ': int(df['no_answer'].sum()),
+        'تماس_های_ارجاعی': int(df['referral'].sum()),
+        'کاربران_فعال': [{
+            'نام': row.user,
+            'تعداد_تماس': int(row.calls),
+            'یادداشت_عملکرد': f"{int(row.successful)} موفق، {int(row.no_answer)} بی‌پاسخ، {int(row.referral)} ارجاع"
+        } for row in users.itertuples()],
+        'مشتریان_پرتماس': [{
+            'نام': row.customer,
+            'تعداد_تماس': int(row.calls),
+            'کیفیت_تعامل': _quality(row.success_rate * 100)
+        } for row in customers.head(TOP_CUSTOMERS).itertuples()],
+        'انواع_تماس': {name: int(count) for name, count in call_types.items()}
+    }
+
+
+def calls_text(df):
+    """سطرهای جدول به شکل TSV فشرده برای مدل (بدون شماره تلفن)"""
+    rows = [['ردیف', 'کاربر', 'ثبت', 'نوع', 'اشتراک', 'مشتری', 'شرح']]
+    for row in df.itertuples():
+        customer = ' - '.join(part for part in (row.institution, row.contact) if part)
+        rows.append([row.row, row.user, row.registered, row.call_type, row.subscription, customer, row.note])
+    return compact_rows(rows)
+
+
+def from_file(path, filename=None):
+    """جدول و آمار محلی فایل CRM: {'stats'، 'calls'، 'rows'}؛ None در صورت عدم پشتیبانی یا خطا"""
+    filename = filename or os.path.basename(path)
+    if not Config.CRM_LOCAL_STATS or pd is None or not filename.lower().endswith(('.rtf', '.xlsx')):
+        return None
+    started = time.perf_counter()
+    try:
+        df = load_calls(path, filename)
+        table = {'stats': compute_stats(df), 'calls': calls_text(df), 'rows': int(len(df))}
+    except Exception as e:
+        print(f"⚠️ خواندن جدول CRM ممکن نشد ({e})؛ تحلیل کامل با مدل")
+        return None
+    print(f"📐 آمار محلی CRM: {table['rows']} تماس در {(time.perf_counter() - started) * 1000:.0f} میلی‌ثانیه")
+    return table
+
+
+def stats_text(stats):
+    return json.dumps(stats, ensure_ascii=False, separators=(',', ':'))
+
+
+def merge_insights(table, insights):
+    """امتیازها و متن‌های مدل + آمار محلی"""
+    return {**insights, 'آمار': table['stats'], 'local_stats': {'rows': table['rows']}}
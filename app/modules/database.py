@@ -1,16 +1,401 @@
-import mysql.connector
-from mysql.connector import Error
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from queue import LifoQueue, Empty
+from sqlite3 import Error as SQLiteError
+from flask import has_request_context, session
 from .config import Config
+from .query_stats import TimedCursor
+from . import sqlite_backend
 
-def get_db_connection():
-    """اتصال به دیتابیس"""
-    try:
-        conn = mysql.connector.connect(**Config.DB_CONFIG)
+try:
+    import mysql.connector
+    from mysql.connector import Error
+except ImportError:  # نصب تک‌نودی با DB_BACKEND=sqlite نیازی به mysql.connector ندارد
+    mysql = None
+    Error = SQLiteError
+
+DB_ERRORS = (Error, SQLiteError)
+
+
+class PoolTimeoutError(Exception):
+    """خطای اتمام زمان انتظار برای اتصال آزاد"""
+
+
+class PooledConnection:
+    """اتصال امانی از استخر - close() اتصال را به استخر برمی‌گرداند"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        """کرسر زمان‌سنجی‌شده برای آمار کوئری‌ها"""
+        return TimedCursor(self._conn.cursor(*args, **kwargs), self._conn)
+
+    def commit(self):
+        """commit اتصال؛ read-your-writes فقط با mark_write در نوشتن‌های کاربر ثبت می‌شود"""
+        self._conn.commit()
+
+    def close(self):
+        """برگرداندن اتصال به استخر به جای بستن واقعی"""
+        if self._conn is not None:
+            self._pool.release(self._conn)
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """استخر اتصال با بررسی سلامت هنگام تحویل و شمارنده‌های وضعیت
+
+    connect تابع ساخت اتصال است (پیش‌فرض mysql.connector.connect) و با
+    db_config صدا زده می‌شود.
+    """
+
+    def __init__(self, db_config, size=10, timeout=5, healthcheck_idle=30, name='primary', connect=None):
+        self.db_config = dict(db_config)
+        self.connect = connect or mysql.connector.connect
+        self.size = size
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        self.name = name
+
+        self._idle = LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._in_use = 0
+        self._counters = {
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'created': 0,
+            'discarded': 0,
+            'health_check_failures': 0
+        }
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._counters[key] += amount
+
+    def _connect(self):
+        """ساخت اتصال جدید"""
+        conn = self.connect(**self.db_config)
+        self._count('created')
         return conn
-    except Error as e:
+
+    def _discard(self, conn):
+        """بستن واقعی اتصال و آزاد کردن ظرفیت آن"""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._opened -= 1
+            self._counters['discarded'] += 1
+
+    def _is_healthy(self, conn, idle_since):
+        """بررسی سلامت اتصالی که مدتی بیکار بوده"""
+        if time.monotonic() - idle_since < self.healthcheck_idle:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            self._count('health_check_failures')
+            return False
+
+    def acquire(self):
+        """دریافت یک اتصال سالم از استخر"""
+        deadline = time.monotonic() + self.timeout
+        waited = False
+
+        while True:
+            try:
+                conn, idle_since = self._idle.get_nowait()
+            except Empty:
+                conn = None
+
+            if conn is None:
+                with self._lock:
+                    can_open = self._opened < self.size
+                    if can_open:
+                        self._opened += 1
+                if can_open:
+                    try:
+                        conn = self._connect()
+                    except Exception:
+                        with self._lock:
+                            self._opened -= 1
+                        raise
+                    idle_since = time.monotonic()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if not waited:
+                        waited = True
+                        self._count('waits')
+                    if remaining <= 0:
+                        self._count('timeouts')
+                        raise PoolTimeoutError(
+                            f"اتصال آزادی در استخر {self.name} طی {self.timeout} ثانیه پیدا نشد"
+                        )
+                    try:
+                        conn, idle_since = self._idle.get(timeout=remaining)
+                    except Empty:
+                        continue
+
+            if not self._is_healthy(conn, idle_since):
+                self._discard(conn)
+                continue
+
+            with self._lock:
+                self._in_use += 1
+                self._counters['checkouts'] += 1
+            return PooledConnection(self, conn)
+
+    def release(self, conn):
+        """برگرداندن اتصال به استخر (تراکنش باز rollback می‌شود)"""
+        with self._lock:
+            self._in_use -= 1
+        try:
+            if conn.unread_result:
+                conn.consume_results()
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+        self._idle.put((conn, time.monotonic()))
+
+    def stats(self):
+        """شمارنده‌های استخر"""
+        with self._lock:
+            data = dict(self._counters)
+            data.update({
+                'name': self.name,
+                'size': self.size,
+                'opened': self._opened,
+                'in_use': self._in_use,
+                'idle': self._idle.qsize()
+            })
+        return data
+
+
+_pools = {}
+_pools_pid = None
+_pools_lock = threading.Lock()
+_replica_counter = itertools.count()
+
+READ_ONLY_PREFIXES = ('SELECT', 'SHOW', 'EXPLAIN', 'DESCRIBE', 'WITH')
+
+
+def _build_sqlite_pools():
+    """استخر SQLite (فایل محلی در حالت WAL، بدون replica)"""
+    path = Config.SQLITE_PATH
+    if not os.path.exists(path):
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        schema_paths = [os.path.join(base_dir, 'database_schema.sql')]
+        migrations_dir = os.path.join(base_dir, 'migrations')
+        schema_paths += [
+            os.path.join(migrations_dir, name)
+            for name in sorted(os.listdir(migrations_dir)) if name.endswith('.sql')
+        ]
+        sqlite_backend.init_schema(path, schema_paths)
+        print(f"✅ دیتابیس SQLite ساخته شد: {path}")
+    return {
+        'primary': ConnectionPool(
+            {'path': path},
+            size=Config.DB_POOL_SIZE,
+            timeout=Config.DB_POOL_TIMEOUT,
+            healthcheck_idle=Config.DB_POOL_HEALTHCHECK_IDLE,
+            connect=sqlite_backend.connect
+        )
+    }
+
+
+def _build_pools():
+    """ساخت استخر اصلی و استخر هر replica"""
+    if Config.DB_BACKEND == 'sqlite':
+        return _build_sqlite_pools()
+    pools = {
+        'primary': ConnectionPool(
+            Config.DB_CONFIG,
+            size=Config.DB_POOL_SIZE,
+            timeout=Config.DB_POOL_TIMEOUT,
+            healthcheck_idle=Config.DB_POOL_HEALTHCHECK_IDLE
+        )
+    }
+    for index, replica_config in enumerate(Config.DB_REPLICAS):
+        name = f'replica-{index}'
+        pools[name] = ConnectionPool(
+            replica_config,
+            size=Config.DB_POOL_SIZE,
+            timeout=Config.DB_POOL_TIMEOUT,
+            healthcheck_idle=Config.DB_POOL_HEALTHCHECK_IDLE,
+            name=name
+        )
+    return pools
+
+
+def _get_pools():
+    """استخرهای پروسس جاری (بعد از fork از نو ساخته می‌شوند)"""
+    global _pools, _pools_pid
+    pid = os.getpid()
+    if _pools_pid != pid:
+        with _pools_lock:
+            if _pools_pid != pid:
+                _pools = _build_pools()
+                _pools_pid = pid
+    return _pools
+
+
+def get_pool(name='primary'):
+    """استخر اتصال با نام مشخص"""
+    return _get_pools()[name]
+
+
+def pool_stats():
+    """آمار همه استخرهای اتصال"""
+    return {name: pool.stats() for name, pool in _get_pools().items()}
+
+
+def is_read_query(query):
+    """آیا کوئری فقط خواندنی است؟"""
+    return query.lstrip().lstrip('(').upper().startswith(READ_ONLY_PREFIXES)
+
+
+def mark_write(ahead=0):
+    """ثبت زمان آخرین نوشتن کاربر برای read-your-writes
+
+    فقط بعد از نوشتن‌هایی که کاربر جاری انجام داده صدا زده شود (ذخیره/حذف تحلیل، پیام چت، ثبت کار)؛
+    نوشتن‌های جانبی مثل به‌روزرسانی کش یا آمار نباید خواندن‌های کاربر را به primary بفرستند.
+    بیرون از درخواست (worker و اسکریپت‌ها) کاری انجام نمی‌دهد.
+
+    نوشتنی که بعد از ارسال هدرها انجام می‌شود (ذخیره در انتهای پاسخ SSE) دیگر به کوکی session
+    نمی‌رسد؛ route باید پیش از شروع جریان با ahead برابر حداکثر مدت جریان صدا بزند تا پنجره
+    read-your-writes تا پایان آن باز بماند.
+    """
+    if has_request_context():
+        session['_db_last_write'] = time.time() + ahead
+
+
+def _recent_write():
+    """آیا کاربر جاری اخیراً نوشته است؟ (خواندن باید از primary باشد)"""
+    if not has_request_context():
+        return False
+    last_write = session.get('_db_last_write')
+    return bool(last_write) and time.time() - last_write < Config.DB_READ_YOUR_WRITES_SECONDS
+
+
+def _pick_replica_pool():
+    """انتخاب replica به صورت چرخشی"""
+    pools = _get_pools()
+    replicas = [name for name in pools if name != 'primary']
+    if not replicas:
+        return None
+    return pools[replicas[next(_replica_counter) % len(replicas)]]
+
+
+def get_db_connection(read_only=False):
+    """اتصال به دیتابیس (از استخر)
+    
+    با read_only=True در صورت وجود replica اتصال از replica گرفته می‌شود؛
+    مگر کاربر جاری به تازگی نوشته باشد. خطای replica به primary برمی‌گردد.
+    """
+    if read_only and not _recent_write():
+        replica_pool = _pick_replica_pool()
+        if replica_pool:
+            try:
+                return replica_pool.acquire()
+            except (*DB_ERRORS, PoolTimeoutError) as e:
+                print(f"⚠️ خطا در اتصال به {replica_pool.name}، استفاده از primary: {e}")
+    try:
+        return get_pool().acquire()
+    except (*DB_ERRORS, PoolTimeoutError) as e:
         print(f"❌ خطا در اتصال به دیتابیس: {e}")
         return None
 
+
+@contextmanager
+def db_connection(read_only=False):
+    """اتصال امانی از استخر به صورت context manager"""
+    conn = get_db_connection(read_only=read_only)
+    if not conn:
+        raise Exception("اتصال به دیتابیس برقرار نشد")
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+@contextmanager
+def db_cursor(dictionary=True, commit=False, read_only=False):
+    """کرسر آماده روی اتصال امانی؛ در صورت commit=True در پایان commit می‌شود"""
+    with db_connection(read_only=read_only and not commit) as conn:
+        cursor = conn.cursor(dictionary=dictionary)
+        try:
+            yield cursor
+            if commit:
+                conn.commit()
+        except Exception:
+            if commit:
+                conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+@contextmanager
+def transaction():
+    """تراکنش روی یک اتصال؛ در صورت خطا کل تراکنش rollback می‌شود"""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            conn.start_transaction()
+            yield cursor
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+def stream_query(query, params=None, batch_size=500, read_only=True):
+    """اجرای کوئری با کرسر unbuffered و برگرداندن سطرها به صورت generator
+    
+    سطرها دسته‌ای با fetchmany از سرور خوانده می‌شوند تا کل نتیجه در حافظه نماند.
+    اتصال تا پایان پیمایش (یا بسته شدن generator) در اختیار می‌ماند.
+    """
+    with db_connection(read_only=read_only) as conn:
+        cursor = conn.cursor(dictionary=True, buffered=False)
+        try:
+            cursor.execute(query, params or ())
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+        finally:
+            # اگر پیمایش نیمه‌کاره رها شد، باقی نتیجه باید خوانده شود
+            try:
+                if conn.unread_result:
+                    conn.consume_results()
+                cursor.close()
+            except Exception as e:
+                print(f"⚠️ خطا در بستن کرسر: {e}")
+
+
 def test_connection():
     """تست اتصال به دیتابیس"""
     conn = get_db_connection()
@@ -24,24 +409,25 @@ def execute_query(query, params=None, fetch_one=False, fetch_all=False, commit=F
     conn = None
     cursor = None
     try:
-        conn = get_db_connection()
+        # کوئری‌های فقط خواندنی به replica می‌روند
+        conn = get_db_connection(read_only=not commit and is_read_query(query))
         if not conn:
             raise Exception("اتصال به دیتابیس برقرار نشد")
-        
+
         cursor = conn.cursor(dictionary=True)
         cursor.execute(query, params or ())
-        
+
         result = None
         if fetch_one:
             result = cursor.fetchone()
         elif fetch_all:
             result = cursor.fetchall()
-        
+
         if commit:
             conn.commit()
-            
+
         return result
-        
+
     except Exception as e:
         print(f"❌ خطا در اجرای کوئری: {e}")
         if conn and commit:
@@ -51,4 +437,4 @@ def execute_query(query, params=None, fetch_one=False, fetch_all=False, commit=F
         if cursor:
             cursor.close()
         if conn:
-            conn.close()
\ No newline at end of file
+            conn.close()
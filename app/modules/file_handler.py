@@ -5,6 +5,9 @@ from werkzeug.utils import secure_filename
 import pdfplumber
 from docx import Document
 import openpyxl
+from .config import Config
+from .utils.rtf import table_rows
+from . import prompt_compaction
 
 class FileHandler:
     """مدیریت آپلود و استخراج متن از فایل‌ها"""
@@ -62,6 +65,40 @@ class FileHandler:
         except Exception as e:
             raise Exception(f"خطا در استخراج متن از فایل: {str(e)}")
     
+    def extract_rows(self, file_path, original_filename=None):
+        """سطرهای جدول فایل‌های Excel و RTF (لیست مقادیر سلول)؛ None برای فایل‌های غیرجدولی"""
+        filename = original_filename or os.path.basename(file_path)
+        ext = filename.lower().split('.')[-1] if '.' in filename else ''
+        try:
+            if ext == 'xlsx':
+                wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+                try:
+                    return [list(row) for sheet in wb.worksheets for row in sheet.iter_rows(values_only=True)]
+                finally:
+                    wb.close()
+            if ext == 'rtf':
+                with open(file_path, 'rb') as f:
+                    rows = list(table_rows(f.read()))
+                return rows or None
+        except Exception as e:
+            print(f"⚠️ خواندن جدول {filename} ممکن نشد: {e}")
+        return None
+    
+    def extract_prompt_text(self, file_path, original_filename=None, model=None):
+        """متن فایل برای پرامپت تحلیل؛ خروجی: (متن، گزارش توکن قبل و بعد از فشرده‌سازی یا None)
+        
+        فایل‌های جدولی به TSV فشرده تبدیل می‌شوند (modules/prompt_compaction.py).
+        """
+        content = self.extract_text(file_path, original_filename)
+        if not Config.PROMPT_COMPACTION or not content:
+            return content, None
+        rows = self.extract_rows(file_path, original_filename)
+        compacted, report = prompt_compaction.compact(content, rows, model or Config.OPENAI_MODEL)
+        if len(compacted.strip()) < 50:
+            # جدول خالی یا ناقص خوانده شده است
+            return content, None
+        return compacted, report
+    
     def _extract_from_rtf(self, content):
         """استخراج از RTF"""
         try:
@@ -0,0 +1,252 @@
+# modules/job_queue.py
+"""
+صف پایدار کارهای تحلیل روی جدول analysis_jobs.
+
+وب فقط فایل را ذخیره و کار را ثبت می‌کند (enqueue) و شناسه کار را برمی‌گرداند؛
+کارگرها (python worker.py) روی هر تعداد نود با SELECT ... FOR UPDATE SKIP LOCKED کار برمی‌دارند.
+
+    queued ← running ← done
+                 ↓
+              queued (تلاش مجدد با تاخیر نمایی) یا failed (بعد از max_attempts)
+
+هر کار برداشته‌شده تا locked_until قفل است و کارگر در حین پردازش آن را تمدید می‌کند؛
+اگر کارگر از کار بیفتد، بعد از گذشت مهلت، کار دوباره توسط کارگر دیگری برداشته می‌شود.
+پوشه آپلود باید بین وب و کارگرها مشترک باشد؛ فایل کاری که نهایتاً failed شود حذف می‌شود.
+"""
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+from .config import Config
+from .database import db_cursor, transaction
+from .llm_usage import UsageBatch
+from . import referral_stats, crm_stats
+
+JOB_TYPES = ('crm', 'referral')
+
+# کار queued که زمانش رسیده، یا کار running که قفلش منقضی شده (کارگر از کار افتاده)
+CLAIM_QUERIES = (
+    """
+    SELECT id, job_type, file_name, file_path, file_size, file_type, use_cache, attempts, max_attempts
+    FROM analysis_jobs
+    WHERE status = 'queued' AND run_after <= %s
+    ORDER BY run_after, id LIMIT 1
+    FOR UPDATE SKIP LOCKED
+    """,
+    """
+    SELECT id, job_type, file_name, file_path, file_size, file_type, use_cache, attempts, max_attempts
+    FROM analysis_jobs
+    WHERE status = 'running' AND locked_until < %s
+    ORDER BY locked_until LIMIT 1
+    FOR UPDATE SKIP LOCKED
+    """
+)
+
+GET_QUERY = """
+    SELECT id, job_type, status, file_name, attempts, max_attempts, result_id, error,
+           created_at, started_at, finished_at
+    FROM analysis_jobs WHERE id = %s AND user_id = %s
+"""
+
+
+class PermanentJobError(Exception):
+    """خطایی که تلاش مجدد آن را حل نمی‌کند (مثلاً فایل خالی)"""
+    pass
+
+
+def _discard_upload(path):
+    """حذف فایل آپلودشده کاری که دیگر تلاش نمی‌شود"""
+    try:
+        if path and os.path.exists(path):
+            os.remove(path)
+    except OSError as e:
+        print(f"⚠️ خطا در حذف فایل کار: {e}")
+
+
+def worker_name(suffix=''):
+    """شناسه یکتای کارگر: host:pid[:thread]"""
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    return f"{name}:{suffix}" if suffix else name
+
+
+class JobQueue:
+    """عملیات صف کارها"""
+
+    @staticmethod
+    def enqueue(job_type, file_info, user_id=None, use_cache=True):
+        """ثبت کار جدید؛ خروجی: شناسه کار"""
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"نوع کار نامعتبر: {job_type}")
+        with transaction() as cursor:
+            cursor.execute("""
+                INSERT INTO analysis_jobs (job_type, status, user_id, file_name, file_path, file_size,
+                                           file_type, use_cache, max_attempts, run_after)
+                VALUES (%s, 'queued', %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (job_type, user_id, file_info.get('name', ''), file_info.get('path', ''),
+                  file_info.get('size', 0), file_info.get('type', ''), bool(use_cache),
+                  Config.JOB_MAX_ATTEMPTS, datetime.now()))
+            return cursor.lastrowid
+
+    @staticmethod
+    def get(job_id, user_id):
+        """وضعیت یک کار کاربر؛ None اگر کار نباشد یا متعلق به کاربر دیگری باشد
+
+        از primary خوانده می‌شود تا وضعیتی که کارگر همین الان ثبت کرده با تاخیر replica دیده نشود.
+        """
+        with db_cursor() as cursor:
+            cursor.execute(GET_QUERY, (job_id, user_id))
+            row = cursor.fetchone()
+        if row:
+            for key in ('created_at', 'started_at', 'finished_at'):
+                if row.get(key):
+                    row[key] = row[key].isoformat()
+        return row
+
+    @staticmethod
+    def claim(worker):
+        """برداشتن یک کار آماده و قفل آن برای این کارگر؛ None اگر کاری نباشد"""
+        now = datetime.now()
+        for query in CLAIM_QUERIES:
+            with transaction() as cursor:
+                cursor.execute(query, (now,))
+                row = cursor.fetchone()
+                if not row:
+                    continue
+                job = dict(zip([column[0] for column in cursor.description], row))
+
+                expired = job['attempts'] >= job['max_attempts']
+                if expired:
+                    # کارگر قبلی در آخرین تلاش از کار افتاده است
+                    cursor.execute("""
+                        UPDATE analysis_jobs SET status = 'failed', locked_by = NULL, finished_at = %s,
+                               error = %s
+                        WHERE id = %s
+                    """, (now, 'مهلت پردازش به پایان رسید', job['id']))
+                else:
+                    cursor.execute("""
+                        UPDATE analysis_jobs
+                        SET status = 'running', attempts = attempts + 1, locked_by = %s, locked_until = %s,
+                            started_at = %s
+                        WHERE id = %s
+                    """, (worker, now + timedelta(seconds=Config.JOB_VISIBILITY_TIMEOUT), now, job['id']))
+                    job['attempts'] += 1
+            if expired:
+                _discard_upload(job['file_path'])
+                continue
+            return job
+        return None
+
+    @staticmethod
+    def extend(job_id, worker):
+        """تمدید قفل کار در حال پردازش؛ False اگر قفل به کارگر دیگری رسیده باشد"""
+        with transaction() as cursor:
+            cursor.execute("""
+                UPDATE analysis_jobs SET locked_until = %s
+                WHERE id = %s AND locked_by = %s AND status = 'running'
+            """, (datetime.now() + timedelta(seconds=Config.JOB_VISIBILITY_TIMEOUT), job_id, worker))
+            return cursor.rowcount > 0
+
+    @staticmethod
+    def complete(job_id, worker, result_id):
+        """پایان موفق کار"""
+        with transaction() as cursor:
+            cursor.execute("""
+                UPDATE analysis_jobs
+                SET status = 'done', result_id = %s, error = NULL, locked_by = NULL, locked_until = NULL,
+                    finished_at = %s
+                WHERE id = %s AND locked_by = %s
+            """, (result_id, datetime.now(), job_id, worker))
+            return cursor.rowcount > 0
+
+    @staticmethod
+    def fail(job, worker, error, permanent=False):
+        """ثبت خطا؛ تا max_attempts با تاخیر نمایی دوباره در صف قرار می‌گیرد و بعد از آن فایل حذف می‌شود"""
+        now = datetime.now()
+        retry = not permanent and job['attempts'] < job['max_attempts']
+        with transaction() as cursor:
+            if retry:
+                delay = Config.JOB_RETRY_DELAY * 2 ** (job['attempts'] - 1)
+                cursor.execute("""
+                    UPDATE analysis_jobs
+                    SET status = 'queued', error = %s, locked_by = NULL, locked_until = NULL, run_after = %s
+                    WHERE id = %s AND locked_by = %s
+                """, (error, now + timedelta(seconds=delay), job['id'], worker))
+            else:
+                cursor.execute("""
+                    UPDATE analysis_jobs
+                    SET status = 'failed', error = %s, locked_by = NULL, locked_until = NULL, finished_at = %s
+                    WHERE id = %s AND locked_by = %s
+                """, (error, now, job['id'], worker))
+                failed = cursor.rowcount > 0
+        if not retry and failed:
+            _discard_upload(job['file_path'])
+        return retry
+
+
+class LeaseKeeper:
+    """تمدید دوره‌ای قفل کار در یک thread جداگانه در طول پردازش"""
+
+    def __init__(self, job_id, worker):
+        self.job_id = job_id
+        self.worker = worker
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        interval = max(Config.JOB_VISIBILITY_TIMEOUT / 3, 1)
+        while not self._stop.wait(interval):
+            try:
+                if not JobQueue.extend(self.job_id, self.worker):
+                    print(f"⚠️ قفل کار {self.job_id} از دست رفت")
+                    return
+            except Exception as e:
+                print(f"⚠️ خطا در تمدید قفل کار {self.job_id}: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def process_job(job, ai_client, file_handler):
+    """اجرای یک کار: استخراج متن، تحلیل و ذخیره؛ خروجی: شناسه تحلیل ذخیره‌شده"""
+    from .models import AnalysisModel, ReferralAnalysisModel
+
+    file_info = {
+        'name': job['file_name'],
+        'path': job['file_path'],
+        'size': job['file_size'],
+        'type': job['file_type']
+    }
+    if not os.path.exists(file_info['path']):
+        raise PermanentJobError("فایل آپلود شده یافت نشد")
+
+    content, compaction = file_handler.extract_prompt_text(file_info['path'], file_info['name'])
+    if not content or len(content.strip()) < 50:
+        file_handler.delete_file(file_info['path'])
+        raise PermanentJobError("محتوای فایل خالی یا ناقص است")
+
+    usage = UsageBatch(job['job_type'])
+    if job['job_type'] == 'referral':
+        stats = referral_stats.from_file(file_info['path'], file_info['name'])
+        analysis = ai_client.analyze_referral(content, use_cache=bool(job['use_cache']), usage=usage, stats=stats)
+        model = ReferralAnalysisModel
+    else:
+        table = crm_stats.from_file(file_info['path'], file_info['name'])
+        analysis = ai_client.analyze_crm(content, use_cache=bool(job['use_cache']), usage=usage, table=table)
+        model = AnalysisModel
+
+    if analysis.get('error'):
+        usage.save(None)
+        raise RuntimeError(analysis.get('message') or 'خطا در تحلیل')
+
+    analysis['analyzed_at'] = datetime.now().isoformat()
+    analysis['file_name'] = file_info['name']
+    analysis['prompt_compaction'] = compaction
+    analysis_id = model.save(file_info, analysis)
+    usage.save(analysis_id)
+    return analysis_id
@@ -0,0 +1,115 @@
+# modules/llm_cache.py
+"""
+کش پایدار نتایج تحلیل OpenAI بر اساس محتوا (جدول llm_cache).
+
+کلید = sha256(نوع تحلیل، نسخه پرامپت، مدل، temperature، متن استخراج‌شده)؛
+پس آپلود دوباره همان فایل (حتی با نام دیگر) بدون فراخوانی API پاسخ می‌گیرد.
+تغییر پرامپت باید با بالا بردن نسخه آن در OpenAIClient همراه باشد تا کش قدیمی استفاده نشود.
+
+ورودی‌ها بعد از LLM_CACHE_TTL_DAYS منقضی می‌شوند و وقتی تعداد از LLM_CACHE_MAX_ENTRIES
+بیشتر شود، کم‌استفاده‌ترین‌ها (قدیمی‌ترین last_used_at) حذف می‌شوند؛ این پاک‌سازی هر
+LLM_CACHE_PRUNE_EVERY نوشتن (در هر پروسه) یک بار اجرا می‌شود، نه در هر put.
+خطای دیتابیس در کش هیچ‌وقت تحلیل را متوقف نمی‌کند.
+"""
+import hashlib
+import itertools
+import json
+from datetime import datetime, timedelta
+from .config import Config
+from .database import execute_query
+from .analysis_codec import compress_json, decompress_text
+
+_COLUMNS = "cache_key, analysis_type, model, prompt_version, result, hits, created_at, last_used_at, expires_at"
+
+# درج یا جایگزینی در یک دستور؛ دو miss همزمان برای یک کلید خطای کلید تکراری نمی‌دهند
+_UPSERT = {
+    'mysql': f"""
+        INSERT INTO llm_cache ({_COLUMNS}) VALUES (%s, %s, %s, %s, %s, 0, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE analysis_type = VALUES(analysis_type), model = VALUES(model),
+            prompt_version = VALUES(prompt_version), result = VALUES(result), hits = 0,
+            created_at = VALUES(created_at), last_used_at = VALUES(last_used_at), expires_at = VALUES(expires_at)
+    """,
+    'sqlite': f"INSERT OR REPLACE INTO llm_cache ({_COLUMNS}) VALUES (%s, %s, %s, %s, %s, 0, %s, %s, %s)"
+}
+
+# کوئری‌های خواندن و هرس؛ scripts/check_query_plans.py پلن همین‌ها را بررسی می‌کند
+GET_QUERY = "SELECT result FROM llm_cache WHERE cache_key = %s AND expires_at > %s"
+EXISTS_QUERY = "SELECT 1 AS found FROM llm_cache WHERE cache_key = %s AND expires_at > %s"
+COUNT_QUERY = "SELECT COUNT(*) as total FROM llm_cache"
+PRUNE_EXPIRED_QUERY = "DELETE FROM llm_cache WHERE expires_at <= %s"
+# جدول مشتق لازم است چون MySQL در زیرکوئری IN از LIMIT پشتیبانی نمی‌کند
+PRUNE_OLDEST_QUERY = """
+    DELETE FROM llm_cache WHERE cache_key IN (
+        SELECT cache_key FROM (
+            SELECT cache_key FROM llm_cache ORDER BY last_used_at LIMIT %s
+        ) oldest
+    )
+"""
+
+_writes = itertools.count(1)
+
+
+def make_key(analysis_type, content, prompt_version, model, temperature):
+    """کلید محتوامحور کش"""
+    header = json.dumps([analysis_type, prompt_version, model, temperature], ensure_ascii=False)
+    digest = hashlib.sha256(header.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(content.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def get(key):
+    """نتیجه کش‌شده یا None؛ هر برخورد، ورودی را تازه (LRU) می‌کند"""
+    if not Config.LLM_CACHE_ENABLED:
+        return None
+    now = datetime.now()
+    try:
+        row = execute_query(GET_QUERY, (key, now), fetch_one=True)
+        if not row:
+            return None
+        execute_query(
+            "UPDATE llm_cache SET hits = hits + 1, last_used_at = %s WHERE cache_key = %s",
+            (now, key), commit=True
+        )
+        return json.loads(decompress_text(row['result']))
+    except Exception as e:
+        print(f"⚠️ خطا در خواندن کش تحلیل: {e}")
+        return None
+
+
+def exists(key):
+    """آیا نتیجه معتبری برای کلید در کش هست (فقط خواندنی؛ شمارنده برخورد و last_used_at تغییر نمی‌کنند)"""
+    if not Config.LLM_CACHE_ENABLED:
+        return False
+    try:
+        row = execute_query(EXISTS_QUERY, (key, datetime.now()), fetch_one=True)
+        return bool(row)
+    except Exception as e:
+        print(f"⚠️ خطا در خواندن کش تحلیل: {e}")
+        return False
+
+
+def put(key, analysis_type, prompt_version, model, result):
+    """ذخیره نتیجه موفق در کش؛ هر LLM_CACHE_PRUNE_EVERY نوشتن ورودی‌های منقضی/اضافی هم حذف می‌شوند"""
+    if not Config.LLM_CACHE_ENABLED:
+        return
+    now = datetime.now()
+    expires_at = now + timedelta(days=Config.LLM_CACHE_TTL_DAYS)
+    try:
+        execute_query(_UPSERT.get(Config.DB_BACKEND, _UPSERT['mysql']),
+                      (key, analysis_type, model, prompt_version, compress_json(result), now, now, expires_at),
+                      commit=True)
+        if next(_writes) % max(Config.LLM_CACHE_PRUNE_EVERY, 1) == 0:
+            prune()
+    except Exception as e:
+        print(f"⚠️ خطا در ذخیره کش تحلیل: {e}")
+
+
+def prune():
+    """حذف ورودی‌های منقضی و کم‌استفاده‌ترین‌ها تا سقف LLM_CACHE_MAX_ENTRIES"""
+    execute_query(PRUNE_EXPIRED_QUERY, (datetime.now(),), commit=True)
+    row = execute_query(COUNT_QUERY, fetch_one=True)
+    excess = int(row['total']) - Config.LLM_CACHE_MAX_ENTRIES if row else 0
+    if excess > 0:
+        execute_query(PRUNE_OLDEST_QUERY, (excess,), commit=True)
+        print(f"🧹 {excess} ورودی قدیمی از کش تحلیل حذف شد")
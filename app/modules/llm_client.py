@@ -0,0 +1,170 @@
+# modules/llm_client.py
+"""
+کلاینت مشترک OpenAI در سطح پروسه با استخر اتصال HTTP (keep-alive).
+
+    client = get_client()          # openai.OpenAI مشترک برای (کلید، OPENAI_BASE_URL)
+
+همه OpenAIClientها (تحلیل، ارجاعیات، چت آموزشگاه، کارگرها و اسکریپت‌ها) روی یک httpx.Client کار می‌کنند؛
+اتصال‌های TLS بین درخواست‌ها باز می‌مانند و تعداد اتصال همزمان با LLM_HTTP_MAX_CONNECTIONS محدود است.
+درخواستی که اتصال آزاد پیدا نکند تا LLM_HTTP_POOL_TIMEOUT ثانیه منتظر می‌ماند.
+
+مثل استخر دیتابیس، بعد از fork کلاینت‌ها از نو ساخته می‌شوند. آمار استخر (pool_stats) در
+/api/admin/llm-stats است: اگر peak_in_flight به max_connections رسیده یا pool_timeouts بالا می‌رود،
+استخر برای تعداد کارگرها کوچک است؛ نسبت connects به requests پایین یعنی keep-alive کار می‌کند.
+"""
+import os
+import threading
+import time
+from urllib.parse import urlparse
+import httpx
+from openai import OpenAI
+from .config import Config
+
+_lock = threading.Lock()
+_clients = {}
+_clients_pid = None
+
+
+def http_timeout(seconds):
+    """timeout درخواست: read/write از endpoint و connect/pool از تنظیمات استخر"""
+    return httpx.Timeout(seconds, connect=Config.LLM_HTTP_CONNECT_TIMEOUT, pool=Config.LLM_HTTP_POOL_TIMEOUT)
+
+
+class _ClosingStream(httpx.SyncByteStream):
+    """بدنه پاسخ؛ درخواست تا بسته شدن بدنه (پایان stream) در جریان حساب می‌شود"""
+
+    def __init__(self, stream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            on_close, self._on_close = self._on_close, None
+            if on_close:
+                on_close()
+
+
+class PoolTransport(httpx.HTTPTransport):
+    """HTTPTransport با شمارنده‌های استخر اتصال"""
+
+    def __init__(self, limits):
+        super().__init__(limits=limits, retries=0)
+        self.limits = limits
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.pool_timeouts = 0
+        self.connects = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.wait_ms = 0.0
+
+    def _trace(self, event, info):
+        # اتصال جدید (بدون keep-alive هر درخواست یکی می‌سازد)
+        if event == 'connection.connect_tcp.complete':
+            with self._stats_lock:
+                self.connects += 1
+
+    def _finish(self):
+        with self._stats_lock:
+            self.in_flight -= 1
+
+    def handle_request(self, request):
+        request.extensions.setdefault('trace', self._trace)
+        with self._stats_lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        started = time.perf_counter()
+        try:
+            response = super().handle_request(request)
+        except Exception as e:
+            with self._stats_lock:
+                self.in_flight -= 1
+                self.errors += 1
+                if isinstance(e, httpx.PoolTimeout):
+                    self.pool_timeouts += 1
+            raise
+        with self._stats_lock:
+            # زمان تا دریافت هدرها (شامل انتظار برای اتصال آزاد)
+            self.wait_ms += (time.perf_counter() - started) * 1000
+        response.stream = _ClosingStream(response.stream, self._finish)
+        return response
+
+    def _pool_connections(self):
+        """(اتصال‌های باز، اتصال‌های بیکار) از استخر httpcore؛ (None, None) اگر API داخلی تغییر کرده باشد
+
+        _pool.connections بخشی از API عمومی httpx نیست؛ شمارنده‌های خود این کلاس به آن وابسته نیستند.
+        """
+        try:
+            connections = list(self._pool.connections)
+            return len(connections), sum(1 for c in connections if c.is_idle())
+        except Exception:
+            return None, None
+
+    def stats(self):
+        connections, idle = self._pool_connections()
+        with self._stats_lock:
+            return {
+                'max_connections': self.limits.max_connections,
+                'max_keepalive': self.limits.max_keepalive_connections,
+                'keepalive_expiry': self.limits.keepalive_expiry,
+                'connections': connections,
+                'idle_connections': idle,
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight,
+                'requests': self.requests,
+                'connects': self.connects,
+                'errors': self.errors,
+                'pool_timeouts': self.pool_timeouts,
+                'avg_headers_ms': round(self.wait_ms / (self.requests - self.errors), 1)
+                if self.requests > self.errors else 0
+            }
+
+
+def _build(api_key, base_url):
+    """openai.OpenAI با httpx.Client و استخر اختصاصی"""
+    transport = PoolTransport(httpx.Limits(
+        max_connections=Config.LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=Config.LLM_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=Config.LLM_HTTP_KEEPALIVE_EXPIRY
+    ))
+    http_client = httpx.Client(transport=transport, timeout=http_timeout(Config.LLM_TIMEOUTS['default']))
+    # تلاش مجدد در llm_resilience انجام می‌شود، نه در خود SDK
+    client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0, http_client=http_client)
+    return client, transport
+
+
+def get_client(api_key=None, base_url=None):
+    """openai.OpenAI مشترک پروسه برای (کلید، base_url)"""
+    global _clients_pid
+    api_key = api_key or Config.OPENAI_API_KEY
+    base_url = base_url or Config.OPENAI_BASE_URL
+    pid = os.getpid()
+    with _lock:
+        if _clients_pid != pid:
+            # اتصال‌های پروسه والد در فرزند قابل استفاده نیستند
+            _clients.clear()
+            _clients_pid = pid
+        key = (api_key, base_url)
+        if key not in _clients:
+            _clients[key] = _build(api_key, base_url)
+        return _clients[key][0]
+
+
+def pool_stats():
+    """آمار استخر HTTP هر کلاینت (به تفکیک host)"""
+    with _lock:
+        entries = list(_clients.items()) if _clients_pid == os.getpid() else []
+    stats = {}
+    for (_, base_url), (_, transport) in entries:
+        name = urlparse(base_url).netloc if base_url else 'api.openai.com'
+        while name in stats:
+            name += '*'
+        stats[name] = transport.stats()
+    return stats
@@ -0,0 +1,260 @@
+# modules/llm_resilience.py
+"""
+لایه تاب‌آوری فراخوانی‌های OpenAI: تلاش مجدد، backoff و circuit breaker.
+
+    call_with_resilience('analysis', lambda timeout: client.chat.completions.create(..., timeout=timeout))
+
+- خطاهای گذرا (429، 5xx، timeout، قطع اتصال) با backoff نمایی jitterدار دوباره تلاش می‌شوند؛
+  اگر پاسخ هدر retry-after یا x-ratelimit-reset-* داشته باشد، همان مدت صبر می‌شود.
+- هر endpoint (analysis، chat، ...) timeout و circuit breaker جدا دارد؛ بعد از LLM_BREAKER_FAILURES
+  شکست پیاپی مدار باز می‌شود و تا LLM_BREAKER_RESET ثانیه درخواست‌ها فوراً رد می‌شوند،
+  سپس یک درخواست آزمایشی (half-open) وضعیت upstream را می‌سنجد.
+- آمار هر endpoint با snapshot() در /api/admin/llm-stats در دسترس است.
+- timeout هر endpoint برای خواندن پاسخ است؛ اتصال و انتظار استخر از تنظیمات llm_client می‌آیند.
+"""
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import openai
+from .config import Config
+from .llm_client import http_timeout
+
+# خطاهای 4xx دیگر (درخواست نامعتبر، کلید اشتباه) با تکرار درست نمی‌شوند
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError
+)
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+_DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+class CircuitOpenError(Exception):
+    """مدار باز است؛ upstream فعلاً در دسترس فرض نمی‌شود"""
+
+    def __init__(self, endpoint, retry_in):
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+        super().__init__(f"سرویس هوش مصنوعی موقتاً در دسترس نیست؛ {int(retry_in) + 1} ثانیه دیگر تلاش کنید")
+
+
+class CircuitBreaker:
+    """circuit breaker ساده سه‌حالته (closed / open / half_open)"""
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """آیا درخواست اجازه عبور دارد؛ در half_open فقط یک درخواست آزمایشی"""
+        with self._lock:
+            if self.state == 'open':
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = 'half_open'
+                self.trial_running = False
+            if self.state == 'half_open':
+                if self.trial_running:
+                    return False
+                self.trial_running = True
+            return True
+
+    def retry_in(self):
+        return max(self.reset_timeout - (time.monotonic() - self.opened_at), 0)
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    print(f"🔴 مدار OpenAI باز شد ({self.failures} شکست پیاپی)")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+
+class _EndpointStats:
+    """شمارنده‌های یک endpoint (از چند thread به‌روز می‌شوند؛ فقط از طریق add)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.short_circuited = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, elapsed_ms=None, **counts):
+        """افزایش شمارنده‌ها (calls=1، failures=1، ...) و ثبت زمان درخواست موفق"""
+        with self._lock:
+            for name, amount in counts.items():
+                setattr(self, name, getattr(self, name) + amount)
+            if elapsed_ms is not None:
+                self.successes += 1
+                self.total_ms += elapsed_ms
+                self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'successes': self.successes,
+                'failures': self.failures,
+                'retries': self.retries,
+                'rate_limited': self.rate_limited,
+                'short_circuited': self.short_circuited,
+                'avg_ms': round(self.total_ms / self.successes, 1) if self.successes else 0,
+                'max_ms': round(self.max_ms, 1)
+            }
+
+
+_lock = threading.Lock()
+_breakers = {}
+_stats = {}
+
+
+def _endpoint(name):
+    """breaker و آمار endpoint (ساخت در اولین استفاده)"""
+    with _lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(Config.LLM_BREAKER_FAILURES, Config.LLM_BREAKER_RESET)
+            _stats[name] = _EndpointStats()
+        return _breakers[name], _stats[name]
+
+
+def endpoint_timeout(name):
+    """timeout هر endpoint (ثانیه)"""
+    return Config.LLM_TIMEOUTS.get(name, Config.LLM_TIMEOUTS['default'])
+
+
+def _parse_duration(value):
+    """'1s'، '6m0s'، '250ms' یا عدد ثانیه"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    parts = _DURATION_PART.findall(value or '')
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts) if parts else None
+
+
+def retry_after(error):
+    """مدت انتظار پیشنهادی سرور از هدرهای پاسخ خطا؛ None اگر هدری نباشد"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+
+    if headers.get('retry-after-ms'):
+        try:
+            return float(headers['retry-after-ms']) / 1000
+        except ValueError:
+            pass
+    if headers.get('retry-after'):
+        seconds = _parse_duration(headers['retry-after'])
+        if seconds is None:
+            try:
+                seconds = parsedate_to_datetime(headers['retry-after']).timestamp() - time.time()
+            except (TypeError, ValueError):
+                seconds = None
+        if seconds is not None:
+            return max(seconds, 0)
+
+    resets = [_parse_duration(headers.get(name)) for name in
+              ('x-ratelimit-reset-requests', 'x-ratelimit-reset-tokens') if headers.get(name)]
+    resets = [seconds for seconds in resets if seconds is not None]
+    return max(resets) if resets else None
+
+
+def backoff_delay(attempt, error=None):
+    """تاخیر قبل از تلاش بعدی: هدر سرور یا full jitter نمایی"""
+    suggested = retry_after(error) if error is not None else None
+    if suggested is not None:
+        return min(suggested + random.uniform(0, 0.25), Config.LLM_BACKOFF_MAX)
+    return random.uniform(0, min(Config.LLM_BACKOFF_MAX, Config.LLM_BACKOFF_BASE * 2 ** attempt))
+
+
+def call_with_resilience(endpoint, call, max_retries=None):
+    """اجرای call(timeout) با تلاش مجدد و circuit breaker endpoint
+
+    هر استثنای دیگری (غیر از خطاهای گذرا و 4xx) هم شکست ثبت می‌شود تا درخواست آزمایشی half_open
+    آزاد شود و مدار برای همیشه بسته نماند.
+    """
+    breaker, stats = _endpoint(endpoint)
+    timeout = endpoint_timeout(endpoint)
+    max_retries = Config.LLM_MAX_RETRIES if max_retries is None else max_retries
+
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            stats.add(short_circuited=1)
+            raise CircuitOpenError(endpoint, breaker.retry_in())
+
+        stats.add(calls=1)
+        started = time.perf_counter()
+        try:
+            result = call(http_timeout(timeout))
+        except RETRYABLE_ERRORS as e:
+            stats.add(failures=1, rate_limited=int(isinstance(e, openai.RateLimitError)))
+            breaker.record_failure()
+            if attempt >= max_retries or breaker.state == 'open':
+                raise
+            delay = backoff_delay(attempt, e)
+            attempt += 1
+            stats.add(retries=1)
+            print(f"🔁 خطای گذرای OpenAI ({endpoint}): {type(e).__name__}؛ تلاش {attempt}/{max_retries} "
+                  f"بعد از {delay:.1f} ثانیه")
+            time.sleep(delay)
+            continue
+        except openai.APIStatusError:
+            # 4xx: upstream سالم است، درخواست ایراد دارد
+            stats.add(failures=1)
+            breaker.record_success()
+            raise
+        except BaseException:
+            stats.add(failures=1)
+            breaker.record_failure()
+            raise
+
+        stats.add(elapsed_ms=(time.perf_counter() - started) * 1000)
+        breaker.record_success()
+        return result
+
+
+def snapshot():
+    """وضعیت مدارها و آمار endpointها"""
+    with _lock:
+        return {
+            name: {
+                'state': _breakers[name].state,
+                'consecutive_failures': _breakers[name].failures,
+                'retry_in': round(_breakers[name].retry_in(), 1) if _breakers[name].state == 'open' else 0,
+                'timeout': endpoint_timeout(name),
+                **_stats[name].to_dict()
+            }
+            for name in _breakers
+        }
+
+
+def reset():
+    """پاک کردن آمار و بستن همه مدارها"""
+    with _lock:
+        _breakers.clear()
+        _stats.clear()
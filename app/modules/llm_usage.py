@@ -0,0 +1,252 @@
+# modules/llm_usage.py
+"""
+بودجه توکن و ثبت مصرف فراخوانی‌های OpenAI (جدول llm_usage).
+
+    usage = UsageBatch('crm')
+    analysis = ai_client.analyze_crm(content, usage=usage)
+    analysis_id = AnalysisModel.save(file_info, analysis)
+    usage.save(analysis_id)
+
+هر فراخوانی (هر تکه در تحلیل تکه‌ای) یک سطر با توکن‌های prompt/completion، تاخیر و مدل دارد؛
+ref_id شناسه تحلیل (crm/referral) یا مکالمه (chat) است. سطرها بعد از ذخیره تحلیل نوشته می‌شوند
+چون شناسه تحلیل قبل از آن معلوم نیست.
+
+تخمین توکن با tiktoken (در requirements.txt) انجام می‌شود؛ اگر نصب نباشد نسبت محافظه‌کارانه کاراکتر به توکن
+به کار می‌رود که برای متن فارسی تعداد را بیشتر از واقع تخمین می‌زند.
+"""
+import threading
+from datetime import datetime, timedelta
+from .config import Config
+from .database import execute_query, transaction
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# تخمین محافظه‌کارانه بدون tiktoken: متن فارسی حدوداً ۳ کاراکتر در هر توکن
+CHARS_PER_TOKEN = 3
+
+# سربار قالب هر پیام chat (نقش و جداکننده‌ها)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_encodings = {}
+
+
+class TokenBudgetError(Exception):
+    """درخواست از سقف توکن مجاز بزرگ‌تر است"""
+    pass
+
+
+def _encoding(model):
+    """encoding مدل در tiktoken (کش‌شده)"""
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding('o200k_base')
+    return _encodings[model]
+
+
+def estimate_tokens(text, model=None):
+    """تخمین تعداد توکن متن"""
+    if tiktoken is not None and model:
+        return len(_encoding(model).encode(text))
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def estimate_messages(messages, model=None):
+    """تخمین توکن‌های prompt یک درخواست chat"""
+    return sum(estimate_tokens(m.get('content') or '', model) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def check_budget(messages, model, max_tokens=None):
+    """تخمین توکن prompt و رد درخواست‌های بزرگ‌تر از سقف؛ خروجی: تخمین"""
+    limit = max_tokens or Config.LLM_MAX_PROMPT_TOKENS
+    estimated = estimate_messages(messages, model)
+    if estimated > limit:
+        raise TokenBudgetError(f"حجم درخواست ({estimated:,} توکن) از سقف مجاز ({limit:,} توکن) بیشتر است")
+    return estimated
+
+
+def fit_to_budget(messages, model, max_tokens):
+    """حذف قدیمی‌ترین پیام‌های تاریخچه (بین system و پیام آخر) تا prompt در بودجه جا شود"""
+    messages = list(messages)
+    while len(messages) > 2 and estimate_messages(messages, model) > max_tokens:
+        messages.pop(1)
+    return messages
+
+
+def _usage_value(usage, name):
+    """مقدار توکن از usage پاسخ (شیء SDK یا dict در پاسخ‌های stream)"""
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        return usage.get(name)
+    return getattr(usage, name, None)
+
+
+def cached_tokens(usage):
+    """توکن‌های prompt خوانده‌شده از کش پیشوند OpenAI
+
+    prompt_tokens_details در openai==1.12 تعریف نشده و به صورت dict در پاسخ می‌ماند.
+    """
+    return _usage_value(_usage_value(usage, 'prompt_tokens_details'), 'cached_tokens') or 0
+
+
+class UsageBatch:
+    """جمع‌آوری مصرف فراخوانی‌های یک تحلیل/پیام (thread-safe برای تکه‌های همزمان)"""
+
+    def __init__(self, feature):
+        self.feature = feature
+        self.records = []
+        self._lock = threading.Lock()
+
+    def add(self, model, estimated_prompt, latency_ms, usage=None, completion_text='', status='ok'):
+        """ثبت یک فراخوانی؛ اگر usage نباشد (مثلاً خطا یا stream)، توکن‌ها تخمینی ثبت می‌شوند"""
+        prompt_tokens = _usage_value(usage, 'prompt_tokens')
+        completion_tokens = _usage_value(usage, 'completion_tokens')
+        record = {
+            'model': model,
+            'prompt_tokens': prompt_tokens if prompt_tokens is not None else (estimated_prompt if status == 'ok' else 0),
+            'completion_tokens': completion_tokens if completion_tokens is not None
+            else estimate_tokens(completion_text, model) if completion_text else 0,
+            'cached_tokens': cached_tokens(usage),
+            'estimated_prompt_tokens': estimated_prompt,
+            'is_estimated': usage is None,
+            'latency_ms': int(latency_ms),
+            'status': status
+        }
+        with self._lock:
+            self.records.append(record)
+
+    @property
+    def total_tokens(self):
+        return sum(r['prompt_tokens'] + r['completion_tokens'] for r in self.records)
+
+    def save(self, ref_id=None):
+        """نوشتن سطرها در llm_usage؛ خطای ثبت مصرف، کار اصلی را متوقف نمی‌کند"""
+        with self._lock:
+            records, self.records = self.records, []
+        if not records:
+            return
+        now = datetime.now()
+        try:
+            with transaction() as cursor:
+                cursor.executemany("""
+                    INSERT INTO llm_usage (feature, ref_id, model, prompt_tokens, completion_tokens, cached_tokens,
+                                           estimated_prompt_tokens, is_estimated, latency_ms, status, created_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, [(
+                    self.feature, ref_id, r['model'], r['prompt_tokens'], r['completion_tokens'], r['cached_tokens'],
+                    r['estimated_prompt_tokens'], r['is_estimated'], r['latency_ms'], r['status'], now
+                ) for r in records])
+        except Exception as e:
+            print(f"⚠️ خطا در ثبت مصرف توکن: {e}")
+
+
+def _cost(model, prompt_tokens, completion_tokens, cached=0, batch=False):
+    """هزینه تقریبی (دلار) بر اساس LLM_PRICES (قیمت هر یک میلیون توکن: ورودی، خروجی، ورودی کش‌شده)
+
+    فراخوانی‌های Batch API (featureهای *_batch) با BATCH_PRICE_FACTOR حساب می‌شوند.
+    """
+    prices = Config.LLM_PRICES.get(model)
+    if not prices:
+        return None
+    input_price, output_price, cached_price = prices
+    factor = Config.BATCH_PRICE_FACTOR if batch else 1
+    return round(((prompt_tokens - cached) * input_price + cached * cached_price
+                  + completion_tokens * output_price) * factor / 1_000_000, 4)
+
+
+# گزارش‌ها؛ scripts/check_query_plans.py پلن همین‌ها را بررسی می‌کند
+# {feature_sql}: فیلتر اختیاری ' AND feature = %s'
+AGGREGATE_QUERY = """
+    SELECT feature, model, COUNT(*) as calls,
+           SUM(CASE WHEN status = 'ok' THEN 0 ELSE 1 END) as errors,
+           COALESCE(SUM(prompt_tokens), 0) as prompt_tokens,
+           COALESCE(SUM(completion_tokens), 0) as completion_tokens,
+           COALESCE(SUM(cached_tokens), 0) as cached_tokens,
+           COALESCE(SUM(estimated_prompt_tokens), 0) as estimated_prompt_tokens,
+           COALESCE(AVG(latency_ms), 0) as avg_latency_ms,
+           COALESCE(MAX(latency_ms), 0) as max_latency_ms,
+           COUNT(DISTINCT ref_id) as items
+    FROM llm_usage
+    WHERE created_at >= %s{feature_sql}
+    GROUP BY feature, model
+    ORDER BY feature, model
+"""
+DAILY_QUERY = """
+    SELECT DATE(created_at) as day, feature,
+           COALESCE(SUM(prompt_tokens), 0) as prompt_tokens,
+           COALESCE(SUM(completion_tokens), 0) as completion_tokens,
+           COALESCE(SUM(cached_tokens), 0) as cached_tokens,
+           COUNT(*) as calls
+    FROM llm_usage
+    WHERE created_at >= %s{feature_sql}
+    GROUP BY DATE(created_at), feature
+    ORDER BY day
+"""
+GET_FOR_QUERY = """
+    SELECT model, prompt_tokens, completion_tokens, cached_tokens, latency_ms, status, created_at
+    FROM llm_usage WHERE feature = %s AND ref_id = %s
+    ORDER BY id
+"""
+
+
+class LLMUsageModel:
+    """گزارش‌های مصرف"""
+
+    @staticmethod
+    def aggregate(days=30, feature=None):
+        """تجمیع مصرف به تفکیک feature و مدل، و روزانه"""
+        since = datetime.now() - timedelta(days=days)
+        feature_sql = ' AND feature = %s' if feature else ''
+        params = (since, feature) if feature else (since,)
+
+        rows = execute_query(AGGREGATE_QUERY.format(feature_sql=feature_sql), params, fetch_all=True) or []
+        daily = execute_query(DAILY_QUERY.format(feature_sql=feature_sql), params, fetch_all=True) or []
+
+        features = []
+        for row in rows:
+            prompt, completion = int(row['prompt_tokens']), int(row['completion_tokens'])
+            cached = int(row['cached_tokens'])
+            features.append({
+                'feature': row['feature'],
+                'model': row['model'],
+                'calls': int(row['calls']),
+                'errors': int(row['errors'] or 0),
+                'items': int(row['items']),
+                'prompt_tokens': prompt,
+                'completion_tokens': completion,
+                'cached_tokens': cached,
+                # سهم prompt که از کش پیشوند upstream خوانده شده است
+                'cache_ratio': round(cached / prompt, 2) if prompt else None,
+                # نسبت توکن واقعی به تخمین برای تنظیم CHARS_PER_TOKEN
+                'estimate_ratio': round(prompt / int(row['estimated_prompt_tokens']), 2)
+                if row['estimated_prompt_tokens'] else None,
+                'avg_latency_ms': round(float(row['avg_latency_ms']), 1),
+                'max_latency_ms': int(row['max_latency_ms']),
+                'cost_usd': _cost(row['model'], prompt, completion, cached, row['feature'].endswith('_batch'))
+            })
+
+        return {
+            'since': since.isoformat(),
+            'features': features,
+            'daily': [{
+                'day': str(row['day']),
+                'feature': row['feature'],
+                'calls': int(row['calls']),
+                'prompt_tokens': int(row['prompt_tokens']),
+                'completion_tokens': int(row['completion_tokens']),
+                'cached_tokens': int(row['cached_tokens'])
+            } for row in daily]
+        }
+
+    @staticmethod
+    def get_for(feature, ref_id):
+        """مصرف ثبت‌شده برای یک تحلیل یا مکالمه"""
+        rows = execute_query(GET_FOR_QUERY, (feature, ref_id), fetch_all=True) or []
+        for row in rows:
+            row['created_at'] = row['created_at'].isoformat() if row.get('created_at') else None
+        return rows
@@ -1,117 +1,101 @@
 import json
 from datetime import datetime
-from .database import execute_query
+from .database import execute_query, transaction, stream_query, mark_write
+from .analysis_codec import encode_for_storage, unpack_row
+from .schemas import normalize
+
+# کوئری‌های خواندنی؛ scripts/check_query_plans.py پلن همین‌ها را بررسی می‌کند
+ANALYSIS_LIST_QUERY = """
+    SELECT
+        id, file_name, analyzed_at,
+        score_total, seller_name, customer_name, product,
+        total_calls, successful_calls
+    FROM analyses
+    ORDER BY analyzed_at DESC
+"""
+REFERRAL_LIST_QUERY = """
+    SELECT
+        id, file_name, analyzed_at,
+        total_referrals, completed_count, pending_count,
+        completion_rate
+    FROM referral_analyses
+    ORDER BY analyzed_at DESC
+"""
+# {table}: جدول اصلی یا آرشیو (analyses، analyses_archive، referral_analyses، ...)
+BY_ID_QUERY = "SELECT * FROM {table} WHERE id = %s"
+FILE_PATH_QUERY = "SELECT file_path FROM {table} WHERE id = %s"
+LATEST_QUERY = """
+    SELECT id, file_name, analyzed_at, full_analysis, full_analysis_z
+    FROM {table}
+    ORDER BY analyzed_at DESC
+    LIMIT 1
+"""
+
+
+def _delete_analysis(table, child_tables, analysis_id):
+    """حذف تحلیل (از جدول اصلی یا آرشیو) و سطرهای جداول جزئیات آن در یک تراکنش
+
+    جداول جزئیات کلید خارجی و ON DELETE CASCADE ندارند (migrations/004)؛ همه مسیرهای حذف باید از
+    این تابع استفاده کنند. خروجی: مسیر فایل تحلیل ('' اگر ثبت نشده) یا None اگر تحلیل یافت نشد.
+    """
+    for source, suffix in ((table, ''), (f'{table}_archive', '_archive')):
+        with transaction() as cursor:
+            cursor.execute(FILE_PATH_QUERY.format(table=source), (analysis_id,))
+            row = cursor.fetchone()
+            if not row:
+                continue
+            for child in child_tables:
+                cursor.execute(f"DELETE FROM {child}{suffix} WHERE analysis_id = %s", (analysis_id,))
+            cursor.execute(f"DELETE FROM {source} WHERE id = %s", (analysis_id,))
+        mark_write()
+        return row[0] or ''
+    return None
+
 
 class AnalysisModel:
     """مدل تحلیل‌های عمومی CRM"""
     
+    # ستون‌هایی که از نتیجه تحلیل پر می‌شوند (به ترتیب _analysis_values)
+    ANALYSIS_COLUMNS = (
+        'score_total', 'score_rapport', 'score_needs', 'score_value', 'score_objection',
+        'score_price', 'score_closing', 'score_followup', 'score_empathy', 'score_listening',
+        'lead_quality_percent', 'open_questions_count', 'objections_count',
+        'objection_success_percent', 'closing_attempts_count', 'customer_feeling_score',
+        'closing_readiness_percent', 'seller_technical_density_percent',
+        'customer_technical_density_percent', 'customer_price_sensitivity_percent',
+        'customer_risk_sensitivity_percent', 'customer_time_sensitivity_percent',
+        'yes_ladder_count', 'disc_d', 'disc_i', 'disc_s', 'disc_c', 'seller_name', 'seller_code',
+        'customer_name', 'call_duration', 'call_direction', 'call_stage', 'call_warmth',
+        'call_nature', 'product', 'seller_level', 'disc_type', 'disc_evidence',
+        'disc_interaction_guide', 'preferred_channel', 'customer_awareness_level',
+        'customer_talk_ratio', 'seller_talk_ratio', 'summary', 'customer_personality_analysis',
+        'seller_individual_performance', 'call_type_readiness', 'next_action',
+        'rapport_decrease_reasons', 'needs_decrease_reasons', 'value_decrease_reasons',
+        'objection_decrease_reasons', 'price_decrease_reasons', 'closing_decrease_reasons',
+        'followup_decrease_reasons', 'empathy_decrease_reasons', 'listening_decrease_reasons',
+        'rapport_increase_reasons', 'needs_increase_reasons', 'value_increase_reasons',
+        'objection_increase_reasons', 'price_increase_reasons', 'closing_increase_reasons',
+        'followup_increase_reasons', 'empathy_increase_reasons', 'listening_increase_reasons',
+        'total_calls', 'successful_calls', 'no_answer_calls', 'referred_calls', 'best_seller',
+        'best_seller_reason', 'best_customer', 'best_customer_reason', 'full_analysis',
+        'full_analysis_z'
+    )
+    
     @staticmethod
-    def save(file_info, analysis_data):
-        """ذخیره تحلیل جدید با مدیریت خطا"""
-        
-        # اطمینان از دیکشنری بودن analysis_data
-        if not isinstance(analysis_data, dict):
-            analysis_data = {}
-        
-        # استخراج داده‌ها با مدیریت خطا
-        nums = analysis_data.get('فیلدهای_عددی', {})
-        if not isinstance(nums, dict):
-            nums = {}
-            
-        text = analysis_data.get('فیلدهای_متنی', {})
-        if not isinstance(text, dict):
-            text = {}
-            
-        lists = analysis_data.get('لیست_ها', {})
-        if not isinstance(lists, dict):
-            lists = {}
-            
-        stats = analysis_data.get('آمار', {})
-        if not isinstance(stats, dict):
-            stats = {}
-            
-        best = analysis_data.get('بهترین_ها', {})
-        if not isinstance(best, dict):
-            best = {}
-        
-        # مهم: بررسی و تبدیل دلایل کاهش امتیازها
-        reasons_dec = analysis_data.get('دلایل_کاهش_امتیازها', {})
-        if not isinstance(reasons_dec, dict):
-            # اگه لیست بود، تبدیل به دیکشنری کن
-            if isinstance(reasons_dec, list):
-                new_dict = {}
-                for item in reasons_dec:
-                    if isinstance(item, dict):
-                        new_dict.update(item)
-                reasons_dec = new_dict
-            else:
-                reasons_dec = {}
-        
-        # بررسی و تبدیل دلایل کسب امتیازها
-        reasons_inc = analysis_data.get('دلایل_کسب_امتیازها', {})
-        if not isinstance(reasons_inc, dict):
-            if isinstance(reasons_inc, list):
-                new_dict = {}
-                for item in reasons_inc:
-                    if isinstance(item, dict):
-                        new_dict.update(item)
-                reasons_inc = new_dict
-            else:
-                reasons_inc = {}
-        
-        # حالا با خیال راحت از get استفاده کن
-        query = """
-        INSERT INTO analyses (
-            file_name, file_path, file_size, file_type, analyzed_at,
-            score_total, score_rapport, score_needs, score_value, 
-            score_objection, score_price, score_closing, score_followup,
-            score_empathy, score_listening,
-            lead_quality_percent, open_questions_count, objections_count,
-            objection_success_percent, closing_attempts_count, customer_feeling_score,
-            closing_readiness_percent, seller_technical_density_percent,
-            customer_technical_density_percent, customer_price_sensitivity_percent,
-            customer_risk_sensitivity_percent, customer_time_sensitivity_percent,
-            yes_ladder_count,
-            disc_d, disc_i, disc_s, disc_c,
-            seller_name, seller_code, customer_name, call_duration,
-            call_direction, call_stage, call_warmth, call_nature,
-            product, seller_level, disc_type, disc_evidence, disc_interaction_guide,
-            preferred_channel, customer_awareness_level,
-            customer_talk_ratio, seller_talk_ratio,
-            summary, customer_personality_analysis, seller_individual_performance,
-            call_type_readiness, next_action,
-            rapport_decrease_reasons, needs_decrease_reasons, value_decrease_reasons,
-            objection_decrease_reasons, price_decrease_reasons, closing_decrease_reasons,
-            followup_decrease_reasons, empathy_decrease_reasons, listening_decrease_reasons,
-            rapport_increase_reasons, needs_increase_reasons, value_increase_reasons,
-            objection_increase_reasons, price_increase_reasons, closing_increase_reasons,
-            followup_increase_reasons, empathy_increase_reasons, listening_increase_reasons,
-            total_calls, successful_calls, no_answer_calls, referred_calls,
-            best_seller, best_seller_reason, best_customer, best_customer_reason,
-            full_analysis
-        ) VALUES (
-            %s, %s, %s, %s, %s,
-            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-            %s, %s, %s, %s,
-            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-            %s, %s,
-            %s, %s, %s, %s, %s,
-            %s, %s, %s, %s, %s, %s, %s, %s, %s,
-            %s, %s, %s, %s, %s, %s, %s, %s, %s,
-            %s, %s, %s, %s,
-            %s, %s, %s, %s,
-            %s
-        )
-        """
+    def _analysis_values(analysis_data):
+        """مقادیر ANALYSIS_COLUMNS و بخش‌های آمار و لیست‌ها از نتیجه تحلیل"""
+        # تطبیق با ساختار CRM: همه بخش‌ها و فیلدها با نوع درست وجود دارند
+        analysis_data = normalize('crm', analysis_data)
+        nums = analysis_data['فیلدهای_عددی']
+        text = analysis_data['فیلدهای_متنی']
+        lists = analysis_data['لیست_ها']
+        stats = analysis_data['آمار']
+        best = analysis_data['بهترین_ها']
+        reasons_dec = analysis_data['دلایل_کاهش_امتیازها']
+        reasons_inc = analysis_data['دلایل_کسب_امتیازها']
         
         # استخراج مقادیر با مدیریت خطا
         values = (
-            file_info.get('name', ''), 
-            file_info.get('path', ''), 
-            file_info.get('size', 0), 
-            file_info.get('type', ''),
-            datetime.now(),
             nums.get('امتیاز_کل', 0),
             nums.get('امتیاز_برقراری_ارتباط', 0),
             nums.get('امتیاز_نیازسنجی', 0),
@@ -183,129 +167,165 @@ class AnalysisModel:
             stats.get('تماس_های_موفق', 0),
             stats.get('تماس_های_بی_پاسخ', 0),
             stats.get('تماس_های_ارجاعی', 0),
-            best.get('بهترین_فروشنده', {}).get('نام') if isinstance(best.get('بهترین_فروشنده'), dict) else best.get('بهترین_فروشنده'),
-            best.get('بهترین_فروشنده', {}).get('دلیل') if isinstance(best.get('بهترین_فروشنده'), dict) else '',
-            best.get('بهترین_مشتری', {}).get('نام') if isinstance(best.get('بهترین_مشتری'), dict) else best.get('بهترین_مشتری'),
-            best.get('بهترین_مشتری', {}).get('دلیل') if isinstance(best.get('بهترین_مشتری'), dict) else '',
-            json.dumps(analysis_data, ensure_ascii=False)
+            best['بهترین_فروشنده']['نام'],
+            best['بهترین_فروشنده']['دلیل'],
+            best['بهترین_مشتری']['نام'],
+            best['بهترین_مشتری']['دلیل'],
+
+            *encode_for_storage(analysis_data)
+        )
+        return values, stats, lists
+    
+    @staticmethod
+    def save(file_info, analysis_data):
+        """ذخیره تحلیل جدید با مدیریت خطا"""
+        values, stats, lists = AnalysisModel._analysis_values(analysis_data)
+        columns = ('file_name', 'file_path', 'file_size', 'file_type', 'analyzed_at') + AnalysisModel.ANALYSIS_COLUMNS
+        query = f"INSERT INTO analyses ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+        values = (
+            file_info.get('name', ''), 
+            file_info.get('path', ''), 
+            file_info.get('size', 0), 
+            file_info.get('type', ''),
+            datetime.now(),
+            *values
         )
         
-        analysis_id = execute_query(query, values, commit=True)
-        
-        # ذخیره جزئیات اضافی
-        if analysis_id:
-            AnalysisModel._save_details(analysis_id, stats, lists)
+        # درج تحلیل و همه جزئیات در یک تراکنش؛ خطا در هر بخش کل تحلیل را برمی‌گرداند
+        with transaction() as cursor:
+            cursor.execute(query, values)
+            analysis_id = cursor.lastrowid
+            AnalysisModel._save_details(cursor, analysis_id, stats, lists)
         
+        mark_write()
         return analysis_id
     
     @staticmethod
-    def _save_details(analysis_id, stats, lists):
-        """ذخیره جزئیات در جداول مرتبط"""
-        # اطمینان از دیکشنری بودن
-        if not isinstance(stats, dict):
-            stats = {}
-        if not isinstance(lists, dict):
-            lists = {}
+    def update(analysis_id, analysis_data):
+        """جایگزینی نتیجه یک تحلیل موجود (تحلیل مجدد)؛ مشخصات فایل و analyzed_at تغییر نمی‌کنند
+        
+        خروجی: True اگر تحلیل (در جدول اصلی یا آرشیو) یافت و به‌روز شد.
+        """
+        values, stats, lists = AnalysisModel._analysis_values(analysis_data)
+        assignments = ', '.join(f"{column} = %s" for column in AnalysisModel.ANALYSIS_COLUMNS)
+        for table, suffix in (('analyses', ''), ('analyses_archive', '_archive')):
+            with transaction() as cursor:
+                cursor.execute(f"SELECT id FROM {table} WHERE id = %s", (analysis_id,))
+                if not cursor.fetchone():
+                    continue
+                cursor.execute(f"UPDATE {table} SET {assignments} WHERE id = %s", (*values, analysis_id))
+                for child in AnalysisModel.CHILD_TABLES:
+                    cursor.execute(f"DELETE FROM {child}{suffix} WHERE analysis_id = %s", (analysis_id,))
+                AnalysisModel._save_details(cursor, analysis_id, stats, lists, suffix)
+            mark_write()
+            return True
+        return False
+    
+    # جداول لیستی: (کلید در لیست_ها، جدول، ستون)
+    LIST_TABLES = [
+        ('نقاط_قوت', 'strengths', 'strength'),
+        ('نقاط_ضعف', 'weaknesses', 'weakness'),
+        ('اعتراضات', 'objections', 'objection'),
+        ('تکنیکها', 'techniques', 'technique'),
+        ('کلمات_مثبت', 'positive_keywords', 'keyword'),
+        ('کلمات_منفی', 'negative_keywords', 'keyword'),
+        ('ریسک_ها', 'risks', 'risk'),
+        ('پارامترهای_رعایت_نشده', 'missed_parameters', 'parameter'),
+        ('اشتباهات_رایج', 'common_mistakes', 'mistake')
+    ]
+    
+    # همه جداول جزئیات (بدون کلید خارجی؛ analyses پارتیشن‌بندی شده است)
+    CHILD_TABLES = ['active_users', 'top_customers'] + [table for _, table, _ in LIST_TABLES]
+    
+    @staticmethod
+    def _save_details(cursor, analysis_id, stats, lists, suffix=''):
+        """ذخیره جزئیات در جداول مرتبط - هر جدول با یک executemany (stats و lists از normalize)
         
+        suffix='_archive' برای تحلیل‌هایی که به آرشیو منتقل شده‌اند.
+        """
         # ذخیره کاربران فعال
-        users = stats.get('کاربران_فعال', [])
-        if isinstance(users, list):
-            for user in users:
-                if isinstance(user, dict):
-                    execute_query(
-                        "INSERT INTO active_users (analysis_id, user_name, call_count, performance_note) VALUES (%s, %s, %s, %s)",
-                        (analysis_id, user.get('نام'), user.get('تعداد_تماس', 1), user.get('یادداشت_عملکرد')),
-                        commit=True
-                    )
+        rows = [
+            (analysis_id, user['نام'], user['تعداد_تماس'] or 1, user['یادداشت_عملکرد'])
+            for user in stats['کاربران_فعال'] if user['نام']
+        ]
+        if rows:
+            cursor.executemany(
+                f"INSERT INTO active_users{suffix} (analysis_id, user_name, call_count, performance_note) VALUES (%s, %s, %s, %s)",
+                rows
+            )
         
         # ذخیره مشتریان پرتماس
-        customers = stats.get('مشتریان_پرتماس', [])
-        if isinstance(customers, list):
-            for customer in customers:
-                if isinstance(customer, dict):
-                    execute_query(
-                        "INSERT INTO top_customers (analysis_id, customer_name, contact_count, interaction_quality) VALUES (%s, %s, %s, %s)",
-                        (analysis_id, customer.get('نام'), customer.get('تعداد_تماس', 1), customer.get('کیفیت_تعامل')),
-                        commit=True
-                    )
-        
-        # ذخیره لیست‌ها
-        list_mappings = [
-            ('نقاط_قوت', 'strengths', 'strength'),
-            ('نقاط_ضعف', 'weaknesses', 'weakness'),
-            ('اعتراضات', 'objections', 'objection'),
-            ('تکنیکها', 'techniques', 'technique'),
-            ('کلمات_مثبت', 'positive_keywords', 'keyword'),
-            ('کلمات_منفی', 'negative_keywords', 'keyword'),
-            ('ریسک_ها', 'risks', 'risk'),
-            ('پارامترهای_رعایت_نشده', 'missed_parameters', 'parameter'),
-            ('اشتباهات_رایج', 'common_mistakes', 'mistake')
+        rows = [
+            (analysis_id, customer['نام'], customer['تعداد_تماس'] or 1, customer['کیفیت_تعامل'])
+            for customer in stats['مشتریان_پرتماس'] if customer['نام']
         ]
+        if rows:
+            cursor.executemany(
+                f"INSERT INTO top_customers{suffix} (analysis_id, customer_name, contact_count, interaction_quality) VALUES (%s, %s, %s, %s)",
+                rows
+            )
         
-        for list_key, table, field in list_mappings:
-            items = lists.get(list_key, [])
-            if isinstance(items, list):
-                for item in items:
-                    if item:  # فقط اگه خالی نباشه
-                        execute_query(
-                            f"INSERT INTO {table} (analysis_id, {field}) VALUES (%s, %s)",
-                            (analysis_id, item),
-                            commit=True
-                        )
+        # ذخیره لیست‌ها
+        for list_key, table, field in AnalysisModel.LIST_TABLES:
+            rows = [(analysis_id, item) for item in lists[list_key] if item]  # فقط موارد غیرخالی
+            if rows:
+                cursor.executemany(
+                    f"INSERT INTO {table}{suffix} (analysis_id, {field}) VALUES (%s, %s)",
+                    rows
+                )
     
     @staticmethod
     def get_all():
         """دریافت لیست تمام تحلیل‌ها"""
-        query = """
-        SELECT 
-            id, file_name, analyzed_at,
-            score_total, seller_name, customer_name, product,
-            total_calls, successful_calls
-        FROM analyses
-        ORDER BY analyzed_at DESC
-        """
-        return execute_query(query, fetch_all=True)
+        return execute_query(ANALYSIS_LIST_QUERY, fetch_all=True)
+    
+    @staticmethod
+    def iter_all():
+        """پیمایش تدریجی لیست تحلیل‌ها بدون بارگذاری کامل در حافظه"""
+        return stream_query(ANALYSIS_LIST_QUERY)
     
     @staticmethod
     def get_by_id(analysis_id):
         """دریافت یک تحلیل با ID"""
-        query = "SELECT * FROM analyses WHERE id = %s"
-        return execute_query(query, (analysis_id,), fetch_one=True)
+        row = execute_query(BY_ID_QUERY.format(table='analyses'), (analysis_id,), fetch_one=True)
+        if not row:
+            # تحلیل‌های قدیمی به آرشیو منتقل شده‌اند
+            row = execute_query(BY_ID_QUERY.format(table='analyses_archive'), (analysis_id,), fetch_one=True)
+        return unpack_row(row)
     
     @staticmethod
     def get_latest():
         """دریافت آخرین تحلیل"""
-        query = """
-        SELECT 
-            id, file_name, analyzed_at, full_analysis
-        FROM analyses 
-        ORDER BY analyzed_at DESC 
-        LIMIT 1
-        """
-        return execute_query(query, fetch_one=True)
+        return unpack_row(execute_query(LATEST_QUERY.format(table='analyses'), fetch_one=True))
+    
+    @staticmethod
+    def delete(analysis_id):
+        """حذف تحلیل CRM و جزئیات آن؛ خروجی: مسیر فایل یا None اگر یافت نشد"""
+        return _delete_analysis('analyses', AnalysisModel.CHILD_TABLES, analysis_id)
 
 
 class ReferralAnalysisModel:
     """مدل تحلیل‌های ارجاعیات"""
     
+    CHILD_TABLES = [
+        'referral_status_details', 'referral_subjects', 'referral_units',
+        'referral_customers', 'referral_insights'
+    ]
+    
+    # ستون‌هایی که از نتیجه تحلیل پر می‌شوند (به ترتیب _analysis_values)
+    ANALYSIS_COLUMNS = (
+        'total_referrals', 'completed_count', 'pending_count', 'in_progress_count', 'seen_count',
+        'accepted_count', 'completion_rate', 'pending_rate', 'full_analysis', 'full_analysis_z'
+    )
+    
     @staticmethod
-    def save(file_info, analysis_data):
-        """ذخیره تحلیل ارجاعیات"""
+    def _analysis_values(analysis_data):
+        """مقادیر ANALYSIS_COLUMNS از نتیجه تحلیل"""
+        # تطبیق با ساختار ارجاعیات: status_distribution همیشه دیکشنری {وضعیت: تعداد} است
+        analysis_data = normalize('referral', analysis_data)
+        dist = analysis_data['status_analysis']['status_distribution']
         
-        # اطمینان از دیکشنری بودن
-        if not isinstance(analysis_data, dict):
-            analysis_data = {}
-        
-        # استخراج داده‌ها
-        status = analysis_data.get('status_analysis', {})
-        if not isinstance(status, dict):
-            status = {}
-            
-        dist = status.get('status_distribution', {})
-        if not isinstance(dist, dict):
-            dist = {}
-        
-        total = sum(dist.values()) if isinstance(dist, dict) else 0
+        total = sum(dist.values())
         completed = dist.get('اتمام کار', 0)
         pending = dist.get('بررسی نشده', 0)
         in_progress = dist.get('درحال پیگیری', 0)
@@ -315,53 +335,72 @@ class ReferralAnalysisModel:
         completion_rate = (completed / total * 100) if total > 0 else 0
         pending_rate = (pending / total * 100) if total > 0 else 0
         
-        query = """
-        INSERT INTO referral_analyses (
-            file_name, file_path, file_size, analyzed_at,
-            total_referrals, completed_count, pending_count,
-            in_progress_count, seen_count, accepted_count,
-            completion_rate, pending_rate, full_analysis
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        
+        return (
+            total, completed, pending, in_progress, seen, accepted,
+            completion_rate, pending_rate,
+            *encode_for_storage(analysis_data)
+        )
+    
+    @staticmethod
+    def save(file_info, analysis_data):
+        """ذخیره تحلیل ارجاعیات"""
+        columns = ('file_name', 'file_path', 'file_size', 'analyzed_at') + ReferralAnalysisModel.ANALYSIS_COLUMNS
+        query = f"INSERT INTO referral_analyses ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
         values = (
             file_info.get('name', ''), 
             file_info.get('path', ''), 
             file_info.get('size', 0), 
             datetime.now(),
-            total, completed, pending, in_progress, seen, accepted,
-            completion_rate, pending_rate,
-            json.dumps(analysis_data, ensure_ascii=False)
+            *ReferralAnalysisModel._analysis_values(analysis_data)
         )
         
-        return execute_query(query, values, commit=True)
+        with transaction() as cursor:
+            cursor.execute(query, values)
+            analysis_id = cursor.lastrowid
+        
+        mark_write()
+        return analysis_id
+    
+    @staticmethod
+    def update(analysis_id, analysis_data):
+        """جایگزینی نتیجه یک تحلیل ارجاعیات موجود (تحلیل مجدد)؛ خروجی: True اگر یافت و به‌روز شد"""
+        values = ReferralAnalysisModel._analysis_values(analysis_data)
+        assignments = ', '.join(f"{column} = %s" for column in ReferralAnalysisModel.ANALYSIS_COLUMNS)
+        for table in ('referral_analyses', 'referral_analyses_archive'):
+            with transaction() as cursor:
+                cursor.execute(f"UPDATE {table} SET {assignments} WHERE id = %s", (*values, analysis_id))
+                updated = cursor.rowcount
+            if updated:
+                mark_write()
+                return True
+        return False
     
     @staticmethod
     def get_all():
         """دریافت لیست تحلیل‌های ارجاعیات"""
-        query = """
-        SELECT 
-            id, file_name, analyzed_at,
-            total_referrals, completed_count, pending_count,
-            completion_rate
-        FROM referral_analyses
-        ORDER BY analyzed_at DESC
-        """
-        return execute_query(query, fetch_all=True)
+        return execute_query(REFERRAL_LIST_QUERY, fetch_all=True)
+    
+    @staticmethod
+    def iter_all():
+        """پیمایش تدریجی لیست تحلیل‌های ارجاعیات"""
+        return stream_query(REFERRAL_LIST_QUERY)
     
     @staticmethod
     def get_by_id(analysis_id):
         """دریافت یک تحلیل ارجاعیات با ID"""
-        query = "SELECT * FROM referral_analyses WHERE id = %s"
-        return execute_query(query, (analysis_id,), fetch_one=True)
+        row = execute_query(BY_ID_QUERY.format(table='referral_analyses'), (analysis_id,), fetch_one=True)
+        if not row:
+            row = execute_query(
+                BY_ID_QUERY.format(table='referral_analyses_archive'), (analysis_id,), fetch_one=True
+            )
+        return unpack_row(row)
     
     @staticmethod
     def get_latest():
         """دریافت آخرین تحلیل ارجاعیات"""
-        query = """
-        SELECT id, file_name, analyzed_at, full_analysis
-        FROM referral_analyses 
-        ORDER BY analyzed_at DESC 
-        LIMIT 1
-        """
-        return execute_query(query, fetch_one=True)
\ No newline at end of file
+        return unpack_row(execute_query(LATEST_QUERY.format(table='referral_analyses'), fetch_one=True))
+    
+    @staticmethod
+    def delete(analysis_id):
+        """حذف تحلیل ارجاعیات و جزئیات آن؛ خروجی: مسیر فایل یا None اگر یافت نشد"""
+        return _delete_analysis('referral_analyses', ReferralAnalysisModel.CHILD_TABLES, analysis_id)
@@ -1,64 +1,338 @@
-from openai import OpenAI
 import json
+import time
+from functools import partial
 from .config import Config
+from .llm_client import get_client
+from . import llm_cache, schemas, referral_stats, crm_stats
+from .chunked_analysis import (split_content, run_chunks, iter_chunks, retry_failed, merge_partials, merge_crm_results,
+                               merge_referral_results)
+from .utils.streaming import JsonSectionParser
+from .llm_resilience import call_with_resilience
+from .llm_usage import check_budget, fit_to_budget, estimate_tokens, cached_tokens
+from .analysis_prompts import (CRM_INSTRUCTIONS, REFERRAL_INSTRUCTIONS, REFERRAL_INSIGHTS_INSTRUCTIONS,
+                               CRM_INSIGHTS_INSTRUCTIONS)
 
 class OpenAIClient:
     """کلاینت OpenAI برای تحلیل‌های مختلف"""
     
+    # با هر تغییر در پرامپت‌ها نسخه را بالا ببرید تا نتایج کش‌شده قدیمی استفاده نشوند
+    CRM_PROMPT_VERSION = '4'
+    CRM_INSIGHTS_PROMPT_VERSION = '1'
+    REFERRAL_PROMPT_VERSION = '4'
+    REFERRAL_INSIGHTS_PROMPT_VERSION = '1'
+    TEMPERATURE = 0.2
+    
+    SYSTEM_MESSAGES = {
+        'crm': "CRM analyst",
+        'referral': "workflow analyst specializing in Persian CRM data"
+    }
+    
     def __init__(self):
-        self.client = OpenAI(api_key=Config.OPENAI_API_KEY)
+        # کلاینت و استخر اتصال HTTP در کل پروسه مشترک است (modules/llm_client.py)
+        self.client = get_client()
         self.model = Config.OPENAI_MODEL
     
-    def analyze_crm(self, content):
-        """تحلیل فایل CRM عمومی با پرامپت کامل"""
-        prompt = self._build_crm_prompt(content)
-        return self._call_api(prompt, "CRM analyst")
+    def chat_completion(self, messages, temperature=0.5, max_tokens=500, endpoint='chat', usage=None):
+        """فراخوانی ساده chat با تلاش مجدد و circuit breaker؛ خروجی: متن پاسخ
+        
+        تاریخچه طولانی از قدیمی‌ترین پیام کوتاه می‌شود تا در LLM_CHAT_MAX_PROMPT_TOKENS جا شود.
+        """
+        messages = fit_to_budget(messages, self.model, Config.LLM_CHAT_MAX_PROMPT_TOKENS)
+        estimated = check_budget(messages, self.model, Config.LLM_CHAT_MAX_PROMPT_TOKENS)
+        started = time.perf_counter()
+        try:
+            response = call_with_resilience(endpoint, lambda timeout: self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=timeout
+            ))
+        except Exception:
+            self._record(usage, estimated, started, status='error')
+            raise
+        self._record(usage, estimated, started, response.usage)
+        return response.choices[0].message.content
+    
+    def analyze_crm(self, content, use_cache=True, usage=None, table=None):
+        """تحلیل فایل CRM عمومی با پرامپت کامل؛ مصرف هر فراخوانی در usage (UsageBatch) ثبت می‌شود
+        
+        با table (crm_stats.from_file) آمار از جدول محاسبه و فقط بخش‌های کیفی از مدل گرفته می‌شود.
+        """
+        if table is not None:
+            return self._crm_insights(table, use_cache, usage)
+        return self._cached('crm', self.CRM_PROMPT_VERSION, content, use_cache,
+                            lambda: self._analyze_chunked(content, self._build_crm_prompt,
+                                                          self.SYSTEM_MESSAGES['crm'], merge_crm_results, usage,
+                                                          'crm'))
+    
+    def analyze_referral(self, content, use_cache=True, usage=None, stats=None):
+        """تحلیل فایل ارجاعیات (کل فایل، در صورت نیاز به صورت تکه‌ای)
+        
+        با stats (آمار محلی referral_stats.from_file) فقط comprehensive_insights از مدل گرفته می‌شود.
+        """
+        if stats is not None:
+            return self._referral_insights(stats, use_cache, usage)
+        return self._cached('referral', self.REFERRAL_PROMPT_VERSION, content, use_cache,
+                            lambda: self._analyze_chunked(content, self._build_referral_prompt,
+                                                          self.SYSTEM_MESSAGES['referral'],
+                                                          merge_referral_results, usage, 'referral'))
+    
+    def analyze_crm_stream(self, content, use_cache=True, usage=None, table=None):
+        """نسخه جریانی analyze_crm: رویدادهای (نام، داده) تا رویداد نهایی result"""
+        if table is not None:
+            return self._stream_crm_insights(table, use_cache, usage)
+        return self._stream_analysis('crm', self.CRM_PROMPT_VERSION, content, use_cache,
+                                     self._build_crm_prompt, self.SYSTEM_MESSAGES['crm'], merge_crm_results, usage)
+    
+    def analyze_referral_stream(self, content, use_cache=True, usage=None, stats=None):
+        """نسخه جریانی analyze_referral"""
+        if stats is not None:
+            return self._stream_referral_insights(stats, use_cache, usage)
+        return self._stream_analysis('referral', self.REFERRAL_PROMPT_VERSION, content, use_cache,
+                                     self._build_referral_prompt, self.SYSTEM_MESSAGES['referral'],
+                                     merge_referral_results, usage)
+    
+    def _crm_insights(self, table, use_cache, usage):
+        """بخش‌های کیفی از مدل روی سطرهای جدول (کش روی همان سطرها) + آمار محلی"""
+        build_prompt = partial(self._build_crm_insights_prompt, crm_stats.stats_text(table['stats']))
+        insights = self._cached('crm_insights', self.CRM_INSIGHTS_PROMPT_VERSION, table['calls'], use_cache,
+                                lambda: self._analyze_chunked(table['calls'], build_prompt, self.SYSTEM_MESSAGES['crm'],
+                                                              partial(merge_crm_results, stats=table['stats']),
+                                                              usage, 'crm_insights'))
+        return insights if insights.get('error') else crm_stats.merge_insights(table, insights)
+    
+    def _stream_crm_insights(self, table, use_cache, usage):
+        """بخش آمار بلافاصله و سپس رویدادهای stream بخش‌های کیفی"""
+        yield 'section', {'name': 'آمار', 'data': table['stats']}
+        build_prompt = partial(self._build_crm_insights_prompt, crm_stats.stats_text(table['stats']))
+        for event, data in self._stream_analysis('crm_insights', self.CRM_INSIGHTS_PROMPT_VERSION, table['calls'],
+                                                 use_cache, build_prompt, self.SYSTEM_MESSAGES['crm'],
+                                                 partial(merge_crm_results, stats=table['stats']), usage):
+            if event == 'result' and not data.get('error'):
+                data = crm_stats.merge_insights(table, data)
+            yield event, data
+    
+    def _referral_insights(self, stats, use_cache, usage):
+        """آمار محلی + comprehensive_insights مدل از روی خلاصه آمار (کش روی همان خلاصه)"""
+        summary = referral_stats.summary_text(stats)
+        insights = self._cached('referral_insights', self.REFERRAL_INSIGHTS_PROMPT_VERSION, summary, use_cache,
+                                lambda: self._call_api(self._build_referral_insights_prompt(summary),
+                                                       self.SYSTEM_MESSAGES['referral'], usage, 'referral_insights'))
+        return insights if insights.get('error') else referral_stats.merge_insights(stats, insights)
+    
+    def _stream_referral_insights(self, stats, use_cache, usage):
+        """بخش‌های آماری بلافاصله و سپس رویدادهای stream تحلیل comprehensive_insights"""
+        for name, value in stats.items():
+            yield 'section', {'name': name, 'data': value}
+        summary = referral_stats.summary_text(stats)
+        for event, data in self._stream_analysis('referral_insights', self.REFERRAL_INSIGHTS_PROMPT_VERSION, summary,
+                                                 use_cache, self._build_referral_insights_prompt,
+                                                 self.SYSTEM_MESSAGES['referral'], lambda partials: partials[0],
+                                                 usage):
+            if event == 'result' and not data.get('error'):
+                data = referral_stats.merge_insights(stats, data)
+            yield event, data
+    
+    def batch_plan(self, job_type, content, local=None):
+        """مسیر تحلیل یک فایل برای Batch API، همان تحلیل مستقیم؛ خروجی: (نوع تحلیل، نسخه پرامپت، متن، build_prompt)
+        
+        با آمار محلی (crm_stats.from_file یا referral_stats.from_file) فقط بخش‌های کیفی درخواست می‌شوند؛
+        نوع تحلیل و متن همان کلید کش تحلیل مستقیم را می‌سازند.
+        """
+        if job_type == 'crm':
+            if local is not None:
+                return ('crm_insights', self.CRM_INSIGHTS_PROMPT_VERSION, local['calls'],
+                        partial(self._build_crm_insights_prompt, crm_stats.stats_text(local['stats'])))
+            return 'crm', self.CRM_PROMPT_VERSION, content, self._build_crm_prompt
+        if local is not None:
+            return ('referral_insights', self.REFERRAL_INSIGHTS_PROMPT_VERSION, referral_stats.summary_text(local),
+                    self._build_referral_insights_prompt)
+        return 'referral', self.REFERRAL_PROMPT_VERSION, content, self._build_referral_prompt
+    
+    def batch_requests(self, analysis_type, content, build_prompt):
+        """درخواست‌های تحلیل یک فایل برای Batch API (یکی برای هر تکه)؛ خروجی: [(پارامترها، تخمین توکن)]
+        
+        پرامپت و پارامترها همان تحلیل مستقیم است (batch_plan)؛ TokenBudgetError برای تکه‌های بزرگ‌تر از سقف.
+        """
+        system_message = self.SYSTEM_MESSAGES[analysis_type.split('_')[0]]
+        chunks = split_content(content, Config.LLM_CHUNK_TOKENS)
+        requests = []
+        for index, chunk in enumerate(chunks):
+            prompt = build_prompt(chunk, index + 1, len(chunks)) if len(chunks) > 1 else build_prompt(chunk)
+            messages = self._messages(prompt, system_message)
+            requests.append((self._request_params(messages, analysis_type), check_budget(messages, self.model)))
+        return requests
+    
+    def parse_batch_response(self, body, schema):
+        """تحلیل از بدنه پاسخ chat completion (dict) در خروجی Batch API"""
+        choice = body['choices'][0]
+        message = choice.get('message') or {}
+        if message.get('refusal'):
+            raise RuntimeError(f"مدل از پاسخ خودداری کرد: {message['refusal']}")
+        return self._parse_response(message.get('content') or '', schema, choice.get('finish_reason'))
     
-    def analyze_referral(self, content):
-        """تحلیل فایل ارجاعیات"""
-        prompt = self._build_referral_prompt(content)
-        return self._call_api(prompt, "workflow analyst specializing in Persian CRM data")
+    def _stream_analysis(self, analysis_type, prompt_version, content, use_cache, build_prompt, system_message, merge,
+                         usage=None):
+        """رویدادهای پیشرفت: cached، chunk، llm (تعداد توکن)، section (بخش کامل JSON) و result"""
+        key = llm_cache.make_key(analysis_type, content, prompt_version, self.model, self.TEMPERATURE)
+        cached = llm_cache.get(key) if use_cache else None
+        if cached is not None:
+            print(f"⚡ نتیجه از کش ({analysis_type}، {key[:12]})")
+            yield 'cached', {'key': key[:12]}
+            for name, value in cached.items():
+                yield 'section', {'name': name, 'data': value}
+            yield 'result', cached
+            return
+        
+        chunks = split_content(content, Config.LLM_CHUNK_TOKENS)
+        if len(chunks) == 1:
+            analysis = yield from self._stream_api(build_prompt(content), system_message, usage, analysis_type)
+        else:
+            # تکه‌ها همزمان و بدون stream تحلیل می‌شوند؛ پیشرفت با اتمام هر تکه گزارش می‌شود
+            print(f"🧩 تقسیم فایل به {len(chunks)} بخش ({Config.LLM_CHUNK_WORKERS} همزمان)")
+            analyze = lambda chunk, index, total: self._call_api(build_prompt(chunk, index + 1, total),
+                                                                 system_message, usage, analysis_type)
+            partials = [None] * len(chunks)
+            for done, (index, partial) in enumerate(iter_chunks(chunks, analyze, Config.LLM_CHUNK_WORKERS), 1):
+                partials[index] = partial
+                yield 'chunk', {'done': done, 'total': len(chunks), 'error': bool(partial.get('error'))}
+            retry_failed(chunks, partials, analyze, Config.LLM_CHUNK_WORKERS, Config.LLM_CHUNK_RETRIES)
+            analysis = merge_partials(partials, merge)
+            if not analysis.get('error'):
+                for name, value in analysis.items():
+                    yield 'section', {'name': name, 'data': value}
+        
+        # نتیجه ناقص (تکه ناموفق) کش نمی‌شود تا تحلیل بعدی دوباره کامل انجام شود
+        if not analysis.get('error') and not analysis.get('partial'):
+            llm_cache.put(key, analysis_type, prompt_version, self.model, analysis)
+        yield 'result', analysis
+    
+    def _analyze_chunked(self, content, build_prompt, system_message, merge, usage=None, schema=None):
+        """تحلیل map-reduce: هر تکه جداگانه تحلیل و نتایج جزئی ادغام می‌شوند
+
+        تکه‌های ناموفق LLM_CHUNK_RETRIES بار دیگر تحلیل می‌شوند؛ اگر باز هم ناموفق بمانند نتیجه
+        partial و failed_chunks دارد (merge_partials).
+        """
+        chunks = split_content(content, Config.LLM_CHUNK_TOKENS)
+        if len(chunks) == 1:
+            return self._call_api(build_prompt(content), system_message, usage, schema)
+        
+        print(f"🧩 تقسیم فایل به {len(chunks)} بخش ({Config.LLM_CHUNK_WORKERS} همزمان)")
+        analyze = lambda chunk, index, total: self._call_api(build_prompt(chunk, index + 1, total), system_message,
+                                                             usage, schema)
+        partials = run_chunks(chunks, analyze, Config.LLM_CHUNK_WORKERS)
+        retry_failed(chunks, partials, analyze, Config.LLM_CHUNK_WORKERS, Config.LLM_CHUNK_RETRIES)
+        return merge_partials(partials, merge)
+    
+    def _cached(self, analysis_type, prompt_version, content, use_cache, call):
+        """خواندن از کش محتوامحور یا فراخوانی API و ذخیره نتیجه موفق و کامل (نه partial)"""
+        key = llm_cache.make_key(analysis_type, content, prompt_version, self.model, self.TEMPERATURE)
+        if use_cache:
+            cached = llm_cache.get(key)
+            if cached is not None:
+                print(f"⚡ نتیجه از کش ({analysis_type}، {key[:12]})")
+                return cached
+        
+        analysis = call()
+        if not analysis.get('error') and not analysis.get('partial'):
+            llm_cache.put(key, analysis_type, prompt_version, self.model, analysis)
+        return analysis
+    
+    def _messages(self, prompt, system_message):
+        return [
+            {
+                "role": "system", 
+                "content": f"You are a {system_message}. Return ONLY valid JSON with no markdown or explanation."
+            },
+            {
+                "role": "user", 
+                "content": prompt
+            }
+        ]
+    
+    def _request_params(self, messages, schema=None):
+        """پارامترهای درخواست تحلیل (مشترک بین فراخوانی مستقیم، stream و Batch API)"""
+        return {
+            'model': self.model,
+            'messages': messages,
+            'temperature': self.TEMPERATURE,
+            'max_tokens': 8000,
+            'response_format': self._response_format(schema)
+        }
     
-    def _call_api(self, prompt, system_message):
-        """فراخوانی API با مدیریت خطا"""
+    def _record(self, usage, estimated, started, response_usage=None, completion_text='', status='ok'):
+        """ثبت مصرف یک فراخوانی در UsageBatch (در صورت وجود)"""
+        if usage is not None:
+            usage.add(self.model, estimated, (time.perf_counter() - started) * 1000,
+                      response_usage, completion_text, status)
+    
+    def _response_format(self, schema):
+        """JSON schema سخت‌گیرانه (structured outputs) یا در صورت غیرفعال بودن، حالت JSON ساده"""
+        if schema and Config.LLM_STRUCTURED_OUTPUT:
+            return schemas.response_format(schema)
+        return {'type': 'json_object'}
+    
+    def _parse_response(self, response_text, schema=None, finish_reason=None):
+        """پارس JSON پاسخ و تطبیق با schema؛ markdown احتمالی (حالت بدون schema) حذف می‌شود"""
+        if finish_reason == 'length':
+            # JSON نیمه‌کاره؛ پارس آن فقط خطای مبهم می‌دهد
+            raise json.JSONDecodeError('پاسخ به سقف max_tokens رسید و ناقص است', response_text, len(response_text))
+        
+        response_text = response_text.strip()
+        
+        # حذف markdown اگر وجود داشت
+        if response_text.startswith('```'):
+            lines = response_text.split('\n')
+            json_lines = []
+            in_json = False
+            for line in lines:
+                if line.strip() == '```json' or line.strip() == '```':
+                    in_json = not in_json
+                    continue
+                if in_json or (line.strip().startswith('{') or json_lines):
+                    json_lines.append(line)
+            response_text = '\n'.join(json_lines).strip()
+        
+        # Parse JSON
+        analysis = json.loads(response_text)
+        if not isinstance(analysis, dict):
+            raise json.JSONDecodeError('پاسخ یک شیء JSON نیست', response_text, 0)
+        if schema:
+            analysis, problems = schemas.validate(schema, analysis)
+            if problems:
+                print(f"⚠️ {len(problems)} مورد ناسازگار با ساختار {schema} اصلاح شد: {'، '.join(problems[:5])}")
+        return analysis
+    
+    def _call_api(self, prompt, system_message, usage=None, schema=None):
+        """فراخوانی API با مدیریت خطا؛ درخواست‌های بزرگ‌تر از LLM_MAX_PROMPT_TOKENS ارسال نمی‌شوند"""
+        response_text = ''
         try:
-            print(f"📤 ارسال به OpenAI...")
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": f"You are a {system_message}. Return ONLY valid JSON with no markdown or explanation."
-                    },
-                    {
-                        "role": "user", 
-                        "content": prompt
-                    }
-                ],
-                temperature=0.2,
-                max_tokens=8000
-            )
+            messages = self._messages(prompt, system_message)
+            estimated = check_budget(messages, self.model)
+            print(f"📤 ارسال به OpenAI... (~{estimated:,} توکن)")
             
-            response_text = response.choices[0].message.content.strip()
+            started = time.perf_counter()
+            try:
+                response = call_with_resilience('analysis', lambda timeout: self.client.chat.completions.create(
+                    **self._request_params(messages, schema),
+                    timeout=timeout
+                ))
+            except Exception:
+                self._record(usage, estimated, started, status='error')
+                raise
+            self._record(usage, estimated, started, response.usage)
             
-            print(f"✅ دریافت پاسخ - طول: {len(response_text)} کاراکتر")
+            message = response.choices[0].message
+            if getattr(message, 'refusal', None):
+                raise RuntimeError(f"مدل از پاسخ خودداری کرد: {message.refusal}")
+            response_text = (message.content or '').strip()
             
-            # حذف markdown اگر وجود داشت
-            if response_text.startswith('```'):
-                lines = response_text.split('\n')
-                json_lines = []
-                in_json = False
-                for line in lines:
-                    if line.strip() == '```json' or line.strip() == '```':
-                        in_json = not in_json
-                        continue
-                    if in_json or (line.strip().startswith('{') or json_lines):
-                        json_lines.append(line)
-                response_text = '\n'.join(json_lines).strip()
+            print(f"✅ دریافت پاسخ - طول: {len(response_text)} کاراکتر"
+                  + (f"، توکن: {response.usage.prompt_tokens:,} + {response.usage.completion_tokens:,}"
+                     f" (کش: {cached_tokens(response.usage):,})" if response.usage else ""))
             
-            # Parse JSON
-            analysis = json.loads(response_text)
+            analysis = self._parse_response(response_text, schema, response.choices[0].finish_reason)
             
             print(f"✅ JSON پارس شد")
             return analysis
@@ -79,355 +353,112 @@ class OpenAIClient:
                 "message": str(e)
             }
     
-    def _build_crm_prompt(self, content):
-        """ساخت پرامپت کامل برای تحلیل CRM - نسخه اصلی"""
+    def _stream_api(self, prompt, system_message, usage=None, schema=None):
+        """فراخوانی جریانی API؛ رویدادهای llm و section را yield و تحلیل نهایی را return می‌کند"""
+        response_text = ''
+        parts = []
+        estimated = None
+        try:
+            messages = self._messages(prompt, system_message)
+            estimated = check_budget(messages, self.model)
+            print(f"📤 ارسال جریانی به OpenAI... (~{estimated:,} توکن)")
+            started = time.perf_counter()
+            # فقط باز کردن stream تکرار می‌شود؛ قطع شدن در میانه پاسخ خطا برمی‌گرداند
+            stream = call_with_resilience('analysis', lambda timeout: self.client.chat.completions.create(
+                **self._request_params(messages, schema),
+                stream=True,
+                # آخرین chunk شامل usage واقعی است (extra_body چون openai==1.12 پارامتر stream_options ندارد)
+                extra_body={'stream_options': {'include_usage': True}},
+                timeout=timeout
+            ))
+            
+            parser = JsonSectionParser()
+            tokens = 0
+            last_report = 0
+            stream_usage = None
+            finish_reason = None
+            for chunk in stream:
+                if getattr(chunk, 'usage', None):
+                    stream_usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+                delta = chunk.choices[0].delta.content or ''
+                if not delta:
+                    continue
+                parts.append(delta)
+                tokens += 1
+                # گزارش پیشرفت حداکثر چهار بار در ثانیه
+                if time.monotonic() - last_report > 0.25:
+                    last_report = time.monotonic()
+                    yield 'llm', {'tokens': tokens}
+                for name, value in parser.feed(delta):
+                    if schema:
+                        value = schemas.validate_section(schema, name, value)
+                    yield 'section', {'name': name, 'data': value}
+            
+            response_text = ''.join(parts)
+            self._record(usage, estimated, started, stream_usage, response_text)
+            estimated = None
+            print(f"✅ دریافت پاسخ جریانی - طول: {len(response_text)} کاراکتر")
+            return self._parse_response(response_text, schema, finish_reason)
+        
+        except json.JSONDecodeError as e:
+            print(f"❌ خطا در JSON: {str(e)}")
+            print(f"📄 متن مشکل‌دار (500 کاراکتر اول): {response_text[:500]}")
+            return {
+                "error": True,
+                "message": "خطا در پردازش پاسخ هوش مصنوعی"
+            }
+        except Exception as e:
+            if estimated is not None:
+                # خطا در باز کردن یا میانه stream
+                self._record(usage, estimated, started, completion_text=''.join(parts), status='error')
+            print(f"❌ خطا در فراخوانی API: {str(e)}")
+            return {
+                "error": True,
+                "message": str(e)
+            }
+    
+    def _build_crm_prompt(self, content, part=None, total_parts=None):
+        """ساخت پرامپت کامل برای تحلیل CRM - نسخه اصلی
+        
+        در تحلیل تکه‌ای، part/total_parts به مدل می‌گوید آمار را فقط برای همین بخش بشمارد.
+        """
         
         print(f"\n{'='*50}")
-        print(f"📊 طول محتوا: {len(content)} کاراکتر")
+        print(f"📊 طول محتوا: {len(content)} کاراکتر، ~{estimate_tokens(content, self.model):,} توکن"
+              + (f" (بخش {part} از {total_parts})" if part else ""))
         print(f"{'='*50}\n")
         
-        prompt = f"""این گزارش CRM است. تحلیل کن و **فقط JSON برگردون** (بدون توضیح).
-
-**ستون‌ها:**
-ردیف | اشتراک | نام | نام موسسه | تلفن | کاربر | ثبت | نوع | وضعیت
-
-**متن:**
-{content}
-
-**برای خلاصه:**
-- بگو چند تماس انجام شده (موفق، بی‌پاسخ)
-- چه کارشناسانی فعال بودن
-- برترین مشتریان کدومن
-- محصولات اصلی چی بودن
-- نقاط قوت و ضعف
-
-**مثال خلاصه:**
-"گزارش شامل 150 تماس: 90 موفق (60%) و 30 بی‌پاسخ. کارشناس 'پایان' با 40 تماس برترین بود. مشتریان کلیدی: اداره کل دادگستری و تابلوفرمان پار. محصولات: APC، UPS، دوربین. نقاط قوت: پیگیری منظم و خدمات تعمیراتی. نقاط ضعف: تماس‌های بی‌پاسخ."
-
-{{
-  "فیلدهای_عددی": {{
-    "امتیاز_کل": 7,
-    "امتیاز_برقراری_ارتباط": 7,
-    "امتیاز_نیازسنجی": 6,
-    "امتیاز_ارزش_فروشی": 5,
-    "امتیاز_مدیریت_اعتراض": 5,
-    "امتیاز_شفافیت_قیمت": 6,
-    "امتیاز_بستن_فروش": 5,
-    "امتیاز_پیگیری": 8,
-    "امتیاز_همسویی_احساسی": 6,
-    "امتیاز_شنوندگی": 7,
-    "کیفیت_لید_درصد": 70,
-    "تعداد_سوالات_باز": 0,
-    "تعداد_اعتراض": 5,
-    "درصد_پاسخ_موفق_به_اعتراض": 60,
-    "تعداد_تلاش_برای_بستن": 10,
-    "امتیاز_احساس_مشتری": 6,
-    "آمادگی_بستن_درصد": 50,
-    "چگالی_اطلاعات_فنی_فروشنده_درصد": 75,
-    "چگالی_اطلاعات_فنی_مشتری_درصد": 60,
-    "disc_d": 6,
-    "disc_i": 7,
-    "disc_s": 6,
-    "disc_c": 5,
-    "حساسیت_قیمت_مشتری_درصد": 65,
-    "حساسیت_ریسک_مشتری_درصد": 55,
-    "حساسیت_زمان_مشتری_درصد": 60,
-    "تعداد_بله_پله_ای": 3
-  }},
-  "فیلدهای_متنی": {{
-    "نام_فروشنده": "پایان، کارگر، حسینی",
-    "کد_فروشنده": "",
-    "نام_مشتری": "اداره کل دادگستری مشهد، تابلوفرمان پار",
-    "مدت_تماس": "",
-    "نوع_تماس_جهت": "خروجی",
-    "نوع_تماس_مرحله": "پشتیبانی و فروش",
-    "نوع_تماس_گرمی": "متوسط",
-    "نوع_تماس_ماهیت": "پشتیبانی و فروش",
-    "محصول": "APC، UPS، دوربین، سانترال",
-    "سطح_فروشنده": "متوسط",
-    "disc_تیپ": "I",
-    "disc_شواهد": ["تعامل زیاد", "پیگیری مستمر"],
-    "disc_راهنما": "تعامل مستمر و پیگیری",
-    "ترجیح_کانال": "تلفن",
-    "سطح_آگاهی_مشتری": "متوسط",
-    "نسبت_زمان_صحبت_مشتری_به_فروشنده": "40:60",
-    "نسبت_زمان_صحبت_فروشنده_به_مشتری": "60:40",
-    "خلاصه": "خلاصه کامل مطابق مثال - با اعداد و جزئیات",
-    "تحلیل_شخصیت_مشتری": "مشتریان سازمانی و دولتی با نیاز به پشتیبانی مستمر",
-    "ارزیابی_عملکرد_فردی_فروشنده": "تیم فعال با پیگیری منظم",
-    "تشخیص_آمادگی": "آمادگی متوسط برای خرید",
-    "اقدام_بعدی": "پیگیری تماس‌های بی‌پاسخ و بستن فروش‌ها"
-  }},
-  "دلایل_کاهش_امتیازها": {{
-    "برقراری_ارتباط": ["تماس‌های بی‌پاسخ"],
-    "نیازسنجی": ["عدم شناسایی کامل نیاز"],
-    "ارزش_فروشی": ["عدم توضیح کامل ارزش"],
-    "مدیریت_اعتراض": ["برخی اعتراضات بدون پاسخ"],
-    "شفافیت_قیمت": ["تاخیر در ارسال قیمت"],
-    "بستن_فروش": ["عدم بستن فروش‌های آماده"],
-    "پیگیری": ["ختم زودهنگام"],
-    "همسویی_احساسی": [],
-    "شنوندگی": []
-  }},
-  "دلایل_کسب_امتیازها": {{
-    "برقراری_ارتباط": ["تماس‌های منظم"],
-    "نیازسنجی": ["شناسایی نیازهای فنی"],
-    "ارزش_فروشی": ["ارائه محصولات متنوع"],
-    "مدیریت_اعتراض": ["رسیدگی به مشکلات"],
-    "شفافیت_قیمت": ["ارائه قیمت"],
-    "بستن_فروش": ["فاکتورهای موفق"],
-    "پیگیری": ["Reminder منظم"],
-    "همسویی_احساسی": ["رفتار محترمانه"],
-    "شنوندگی": ["توجه به نیازها"]
-  }},
-  "لیست_ها": {{
-    "کلمات_مثبت": ["تایید", "موفق", "انجام شد", "قبول"],
-    "کلمات_منفی": ["بی‌پاسخ", "خاتمه", "مشکل", "تاخیر"],
-    "ریسک_ها": ["از دست دادن مشتری", "تاخیر در پاسخ"],
-    "نقاط_قوت": ["پیگیری منظم", "تنوع خدمات", "تعمیرات فعال"],
-    "نقاط_ضعف": ["تماس‌های بی‌پاسخ", "ختم زودهنگام"],
-    "اعتراضات": ["تاخیر در پاسخ", "مشکل در تحویل"],
-    "تکنیکها": ["Reminder", "ارجاع به حسابداری", "پیگیری تلفنی"],
-    "پارامترهای_رعایت_نشده": ["زمان پاسخ"],
-    "اشتباهات_رایج": ["عدم پاسخ به موقع"]
-  }},
-  "آمار": {{
-    "تعداد_کل_تماس_ها": 150,
-    "تماس_های_موفق": 90,
-    "تماس_های_بی_پاسخ": 30,
-    "تماس_های_ارجاعی": 20,
-    "کاربران_فعال": [
-      {{"نام": "پایان", "تعداد_تماس": 40, "یادداشت_عملکرد": "برترین کارشناس"}},
-      {{"نام": "فنی-اداری1", "تعداد_تماس": 25, "یادداشت_عملکرد": "خوب"}},
-      {{"نام": "حسینی", "تعداد_تماس": 20, "یادداشت_عملکرد": "فعال"}},
-      {{"نام": "کارگر", "تعداد_تماس": 15, "یادداشت_عملکرد": "خوب"}},
-      {{"نام": "رسولی", "تعداد_تماس": 10, "یادداشت_عملکرد": "متوسط"}}
-    ],
-    "مشتریان_پرتماس": [
-      {{"نام": "اداره کل دادگستری مشهد", "تعداد_تماس": 12, "کیفیت_تعامل": "عالی"}},
-      {{"نام": "تابلوفرمان پار", "تعداد_تماس": 8, "کیفیت_تعامل": "خوب"}},
-      {{"نام": "شرکت گاز", "تعداد_تماس": 6, "کیفیت_تعامل": "متوسط"}}
-    ],
-    "انواع_تماس": {{
-      "پایان": 50,
-      "Reminder": 40,
-      "Erja": 20,
-      "تعمیرات": 30,
-      "Repair": 10
-    }}
-  }},
-  "بهترین_ها": {{
-    "بهترین_فروشنده": {{
-      "نام": "پایان",
-      "دلیل": "40 تماس با نرخ موفقیت بالا"
-    }},
-    "بهترین_مشتری": {{
-      "نام": "اداره کل دادگستری مشهد",
-      "دلیل": "12 تماس با کیفیت عالی"
-    }}
-  }}
-}}"""
-
-        return prompt
+        part_note = (
+            f"\n**این بخش {part} از {total_parts} گزارش است؛ همه شمارش‌ها و آمار را فقط برای سطرهای همین بخش حساب کن.**\n"
+            if part else ""
+        )
+        
+        # بخش ثابت اول و محتوای متغیر آخر (prompt caching)
+        return f"{CRM_INSTRUCTIONS}\n{part_note}\n**متن گزارش:**\n{content}"
     
-    def _build_referral_prompt(self, content):
-        """ساخت پرامپت برای تحلیل ارجاعیات"""
-        return f"""You are a workflow analyst. Analyze this referral/excel data and return ONLY JSON with the analysis.
-
-**Input Data:**
-{content[:15000]}
-
-**COMPLETE ANALYSIS QUESTIONS:**
-
-1. STATUS ANALYSIS (وضعیت ارجاعیات):
-   - What percentage of referrals are in "بررسی نشده" status?
-   - Which status has the highest frequency?
-   - Average time in "بررسی نشده" status?
-   - Which sender unit has most "بررسی نشده" referrals?
-   - Percentage of "اتمام کار" referrals vs total?
-   - Which receiver has most "درحال پیگیری" referrals?
-   - What is the distribution of all statuses?
-   - Which status has the lowest frequency?
-   - How many referrals are in "قبول ارجاع" status?
-
-2. TEMPORAL ANALYSIS (تحلیل زمانی):
-   - Which date had most referrals?
-   - Average days between registration and due date?
-   - Which day was busiest?
-   - Percentage of overdue referrals still pending?
-   - What is the hourly distribution of referrals?
-   - What is the trend between dates?
-   - Which time of day has most referrals?
-
-3. SUBJECT ANALYSIS (تحلیل موضوعی):
-   - Most frequent subject/topic?
-   - Which subject has most "بررسی نشده"?
-   - Average response time per subject?
-   - Which subjects go to "تعمیرات" most?
-   - Subjects with no descriptions?
-   - Second most frequent subject?
-   - Which subject has highest completion rate?
-   - Which subject has lowest completion rate?
-   - List all unique subjects with counts
-
-4. SENDER/RECEIVER ANALYSIS:
-   - Top sender by volume?
-   - Top receiver by volume?
-   - Most common sender-receiver pair?
-   - Which receiver has most pending?
-   - Which sender has least descriptions?
-   - Second top sender?
-   - Second top receiver?
-   - Which unit collaborates with most others?
-   - Sender with highest completion rate?
-   - Receiver with highest completion rate?
-
-5. INSTITUTION ANALYSIS:
-   - Top institutions by referral count?
-   - Most common subject for top institutions?
-   - Do higher subscription numbers mean more referrals?
-   - Institutions with no descriptions?
-   - Which institution has most pending?
-   - Which institution has highest completion rate?
-   - List all institutions with their subscription codes
-   - Correlation between subscription and completion?
-
-6. DESCRIPTION ANALYSIS:
-   - Percentage with descriptions?
-   - Average description length?
-   - Which units write most descriptions?
-   - Status of referrals without descriptions?
-   - Top keywords in descriptions (like باتری, فاکتور, etc.)?
-   - List all unique keywords with frequencies
-   - Which keywords correlate with completion?
-   - Longest description length?
-
-7. TRACKING ANALYSIS:
-   - Which tracking numbers had multiple referrals?
-   - Average follow-ups per tracking?
-   - Maximum follow-ups for a single tracking?
-   - Tracking numbers with most status changes?
-
-8. SUBSCRIPTION ANALYSIS:
-   - Highest subscription number?
-   - Correlation between subscription and referral count?
-   - Average subscription for completed referrals?
-   - Average subscription for pending referrals?
-
-9. COMPREHENSIVE INSIGHTS:
-   - What factors lead to "اتمام کار"?
-   - Which units collaborate most?
-   - Do longer descriptions lead to faster completion?
-   - Recurring patterns in referrals?
-   - What are the top 3 bottlenecks?
-   - What are the top 3 strengths?
-   - What are the top 3 risks?
-   - Overall health score of the workflow (0-100)?
-   - Summary in Persian (minimum 3 sentences)
-   - Top 5 recommendations in Persian (as an array)
-
-Return JSON with this exact structure:
-{{
-  "status_analysis": {{
-    "percent_pending": 25.5,
-    "most_frequent_status": "بررسی نشده",
-    "frequent_status_count": 7,
-    "avg_days_pending": 2.3,
-    "worst_sender_pending": {{"unit": "تعمیرات", "count": 3}},
-    "percent_completed": 45.8,
-    "receiver_with_most_in_progress": {{"receiver": "امور خدمات", "count": 2}},
-    "status_distribution": {{
-      "بررسی نشده": 7,
-      "رویت شده": 3,
-      "درحال پیگیری": 2,
-      "اتمام کار": 12,
-      "قبول ارجاع": 1
-    }},
-    "status_with_lowest_frequency": "قبول ارجاع",
-    "lowest_frequency_count": 1
-  }},
-  
-  "subject_analysis": {{
-    "most_frequent_subject": "فاکتور شود و تحویل",
-    "subject_frequency": 6,
-    "second_most_frequent": "خرید باتری",
-    "second_frequency": 3,
-    "subject_pending": {{
-      "فاکتور شود و تحویل": 2,
-      "خرید باتری": 1,
-      "اعزام کارشناس": 1
-    }},
-    "subject_response_time": {{
-      "فاکتور شود و تحویل": 1.2,
-      "خرید باتری": 2.1,
-      "اعزام کارشناس": 3.5
-    }},
-    "unique_subjects": [
-      {{"subject": "فاکتور شود و تحویل", "count": 6}},
-      {{"subject": "خرید باتری", "count": 3}},
-      {{"subject": "اعزام کارشناس", "count": 2}}
-    ]
-  }},
-  
-  "sender_receiver_analysis": {{
-    "top_senders": [
-      {{"sender": "تعمیرات", "count": 7, "completion_rate": 57.1}},
-      {{"sender": "پورحسین", "count": 5, "completion_rate": 80.0}},
-      {{"sender": "رسولی", "count": 3, "completion_rate": 66.7}}
-    ],
-    "top_receivers": [
-      {{"receiver": "امور خدمات", "count": 8, "pending": 5}},
-      {{"receiver": "کمک-حسابدار1", "count": 6, "pending": 1}},
-      {{"receiver": "پورحسین", "count": 5, "pending": 1}}
-    ],
-    "common_pairs": [
-      {{"from": "تعمیرات", "to": "امور خدمات", "count": 3}},
-      {{"from": "پورحسین", "to": "کمک-حسابدار1", "count": 2}},
-      {{"from": "رسولی", "to": "امور خدمات", "count": 2}}
-    ]
-  }},
-  
-  "institution_analysis": {{
-    "top_institutions": [
-      {{"name": "سیمان بجنورد", "count": 3, "subs": 28, "completion_rate": 100}},
-      {{"name": "بیمارستان نهم دی تربت حیدریه", "count": 3, "subs": 92, "completion_rate": 100}},
-      {{"name": "موقوفات ملک", "count": 3, "subs": 184, "completion_rate": 0}}
-    ],
-    "subscription_correlation": 0.3
-  }},
-  
-  "description_analysis": {{
-    "percent_with_description": 65.4,
-    "avg_description_length": 45.2,
-    "top_keywords": [
-      {{"word": "باتری", "count": 6, "completion_rate": 50.0}},
-      {{"word": "فاکتور", "count": 5, "completion_rate": 80.0}},
-      {{"word": "تحویل", "count": 4, "completion_rate": 75.0}}
-    ]
-  }},
-  
-  "comprehensive_insights": {{
-    "completion_factors": [
-      "توضیحات کامل",
-      "ارجاع مستقیم به واحد مناسب",
-      "پیگیری منظم"
-    ],
-    "top_bottlenecks": [
-      {{"bottleneck": "واحد امور خدمات", "pending_count": 5, "impact": "بالا"}},
-      {{"bottleneck": "واحد تعمیرات", "pending_count": 3, "impact": "متوسط"}}
-    ],
-    "top_strengths": [
-      "پیگیری منظم توسط پورحسین",
-      "سرعت عمل در فاکتور"
-    ],
-    "workflow_health_score": 68.5,
-    "summary_fa": "از مجموع ۲۷ ارجاع، ۱۲ مورد به اتمام رسیده (۴۴٪) و ۷ مورد بررسی نشده (۲۶٪). گلوگاه اصلی در واحد امور خدمات با ۸ ارجاع دریافتی و ۵ مورد مانده است.",
-    "recommendations_fa": [
-      "پیگیری فوری ارجاعات معطل‌مانده در امور خدمات (۵ مورد)",
-      "تماس با جایگاه سوخت کوه سفید و عذرخواهی + اعزام کارشناس",
-      "ثبت توضیحات کامل‌تر برای ارجاعات (۳۵٪ بدون توضیح هستند)",
-      "بهبود هماهنگی بین تعمیرات و امور خدمات",
-      "برگزاری جلسه هماهنگی برای رسیدگی به درخواست‌های تکراری"
-    ]
-  }}
-}}"""
\ No newline at end of file
+    def _build_crm_insights_prompt(self, stats, content, part=None, total_parts=None):
+        """پرامپت بخش‌های کیفی CRM: آمار محاسبه‌شده و سطرهای جدول تماس‌ها"""
+        part_note = (
+            f"\n**این بخش {part} از {total_parts} تماس‌هاست؛ امتیازها و لیست‌ها را برای تماس‌های همین بخش بده.**\n"
+            if part else ""
+        )
+        return f"{CRM_INSIGHTS_INSTRUCTIONS}\n{part_note}\n**آمار محاسبه‌شده:**\n{stats}\n\n**تماس‌ها:**\n{content}"
+    
+    def _build_referral_prompt(self, content, part=None, total_parts=None):
+        """ساخت پرامپت برای تحلیل ارجاعیات
+        
+        محتوا کوتاه نمی‌شود؛ فایل‌های بزرگ در _analyze_chunked تکه‌تکه می‌شوند.
+        """
+        part_note = (
+            f"\n**This is part {part} of {total_parts} of the file. Count and compute every statistic "
+            f"(status_distribution, counts, rates) for the rows of THIS part only.**\n"
+            if part else ""
+        )
+        return f"{REFERRAL_INSTRUCTIONS}\n{part_note}\n**Input Data:**\n{content}"
+    
+    def _build_referral_insights_prompt(self, summary, part=None, total_parts=None):
+        """پرامپت comprehensive_insights از روی خلاصه آمار محلی ارجاعیات"""
+        return f"{REFERRAL_INSIGHTS_INSTRUCTIONS}\n\n**Statistics:**\n{summary}"
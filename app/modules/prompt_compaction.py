@@ -0,0 +1,168 @@
+# modules/prompt_compaction.py
+"""
+فشرده‌سازی محتوای فایل قبل از ساخت پرامپت (بین FileHandler.extract_text و build_prompt).
+
+    content, report = file_handler.extract_prompt_text(path, name)
+    # report: {'tokens_before': 15230, 'tokens_after': 6120, 'saved_percent': 59.8, ...}
+
+فایل‌های جدولی (Excel و جدول RTF) سطر به سطر خوانده و به TSV تبدیل می‌شوند:
+- عنوان گزارش و سطر عنوان جدول که در هر صفحه تکرار می‌شوند یک بار می‌آیند و سطرهای یکسان پشت سر هم
+  یکی و با ×n علامت می‌خورند؛
+- ستون‌هایی که زیر سطر عنوان همیشه خالی‌اند حذف می‌شوند؛
+- مقادیر پرتکرار (نام موسسه، کاربر، وضعیت) در فرهنگ ابتدای متن کد @n می‌گیرند.
+سطرهای تک‌سلولی (توضیحات، عنوان گزارش) به صورت متن ساده می‌آیند. برای فایل‌های غیرجدولی فقط
+فاصله‌ها فشرده و خطوط تکراری پشت سر هم یکی می‌شوند.
+
+فرهنگ و سطر عنوان فقط ابتدای متن می‌آیند؛ تحلیل تکه‌ای (chunked_analysis.split_content) با
+split_dictionary و with_dictionary به هر تکه سطر عنوان و تعریف کدهایی را که همان تکه به کار برده می‌دهد.
+"""
+import re
+from collections import Counter
+from datetime import date, datetime
+from .config import Config
+from .llm_usage import estimate_tokens
+
+DICTIONARY_PREFIX = '@'
+DICTIONARY_END = '---'
+LEGEND = ("# جدول TSV (ستون‌ها با tab). کدهای @n مقادیر تکراری‌اند و معنی آن‌ها در فرهنگ زیر آمده؛ "
+          "×n یعنی همان سطر n بار تکرار شده است.")
+
+
+def _cell(value):
+    """مقدار یک سلول به متن تک‌خطی"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M') if value.time() != datetime.min.time() else value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return re.sub(r'\s+', ' ', str(value)).strip()
+
+
+def _dedupe(lines, layout=()):
+    """حذف تکرار؛ خروجی: [(سطر، تعداد)]
+
+    سطرهای layout (عنوان گزارش و سطر عنوان جدول که در هر صفحه تکرار می‌شوند) فقط بار اول می‌آیند؛
+    بقیه سطرها فقط وقتی پشت سر هم تکرار شوند یکی می‌شوند تا ترتیب و ارتباط سطرها (مثل توضیحات
+    زیر هر تماس) حفظ شود.
+    """
+    result = []
+    seen_layout = set()
+    for line in lines:
+        if line in layout:
+            if line not in seen_layout:
+                seen_layout.add(line)
+                result.append([line, 1])
+        elif result and result[-1][0] == line:
+            result[-1][1] += 1
+        else:
+            result.append([line, 1])
+    return [tuple(item) for item in result]
+
+
+def _with_count(fields, count):
+    return fields + [f'×{count}'] if count > 1 else fields
+
+
+def _dictionary(rows):
+    """کد @n برای مقادیری که جایگزینی‌شان (با هزینه سطر فرهنگ) کاراکتر کمتری دارد"""
+    counts = Counter(cell for row in rows for cell in row if len(cell) >= Config.PROMPT_DICT_MIN_LENGTH)
+    candidates = [cell for cell, count in counts.most_common() if count >= Config.PROMPT_DICT_MIN_COUNT]
+    codes = {}
+    for cell in candidates:
+        code = f'{DICTIONARY_PREFIX}{len(codes) + 1}'
+        if counts[cell] * (len(cell) - len(code)) > len(cell) + len(code) + 2:
+            codes[cell] = code
+    return codes
+
+
+def compact_rows(rows):
+    """سطرهای جدول (لیست مقادیر سلول) ← TSV فشرده با فرهنگ مقادیر تکراری"""
+    rows = [[_cell(value).replace('\t', ' ') for value in row] for row in rows]
+    rows = [row for row in rows if any(row)]
+    table = [row for row in rows if sum(1 for cell in row if cell) > 1]
+    if not table:
+        return compact_text('\n'.join(cell for row in rows for cell in row if cell))
+
+    # عنوان گزارش (سطرهای قبل از جدول) و سطر عنوان جدول (اولین سطر چندسلولی)
+    header = table[0]
+    preamble = rows[:rows.index(header)]
+    layout = {tuple(row) for row in preamble} | {tuple(header)}
+
+    # ستون‌هایی که زیر سطر عنوان همیشه خالی‌اند
+    body = [row for row in table if row != header]
+    width = max(len(row) for row in table)
+    used = [i for i in range(width) if any(i < len(row) and row[i] for row in body)] if body else \
+        list(range(len(header)))
+
+    lines = []
+    for row in rows:
+        values = [cell for cell in row if cell]
+        if len(values) == 1:
+            lines.append((values[0],))
+        else:
+            lines.append(tuple(row[i] if i < len(row) else '' for i in used))
+    layout_lines = {line for row, line in zip(rows, lines) if tuple(row) in layout}
+    unique = _dedupe(lines, layout_lines)
+
+    codes = _dictionary([list(line) for line, _ in unique if len(line) > 1])
+    output = []
+    if codes:
+        output.append(LEGEND)
+        output.extend(f'{code}\t{value}' for value, code in codes.items())
+        output.append(DICTIONARY_END)
+    for line, count in unique:
+        fields = [codes.get(cell, cell) for cell in line] if len(line) > 1 else list(line)
+        output.append('\t'.join(_with_count(fields, count)).rstrip('\t'))
+    return '\n'.join(output)
+
+
+def split_dictionary(text):
+    """خروجی compact_rows ← (فرهنگ {کد: سطر تعریف}، سطرهای تا سطر عنوان جدول، بقیه سطرها)
+
+    None اگر متن فرهنگ کدها را ندارد.
+    """
+    lines = text.split('\n')
+    if lines[0] != LEGEND or DICTIONARY_END not in lines:
+        return None
+    end = lines.index(DICTIONARY_END)
+    definitions = {line.split('\t', 1)[0]: line for line in lines[1:end]}
+    rest = lines[end + 1:]
+    header_end = next((index + 1 for index, line in enumerate(rest) if '\t' in line), 0)
+    return definitions, rest[:header_end], rest[header_end:]
+
+
+def with_dictionary(definitions, header, body):
+    """متن یک تکه: راهنما و تعریف کدهایی که در header و body آمده‌اند، سپس سطرها"""
+    used = {field for line in header + body for field in line.split('\t') if field in definitions}
+    lines = []
+    if used:
+        lines = [LEGEND] + [line for code, line in definitions.items() if code in used] + [DICTIONARY_END]
+    return '\n'.join(lines + header + body)
+
+
+def compact_text(text):
+    """متن غیرجدولی: فشرده‌سازی فاصله‌ها و یکی کردن خطوط تکراری پشت سر هم"""
+    lines = [re.sub(r'[ \t]+', ' ', line).strip() for line in text.splitlines()]
+    unique = _dedupe([line for line in lines if line])
+    return '\n'.join(' '.join(_with_count([line], count)) for line, count in unique)
+
+
+def compact(text, rows=None, model=None):
+    """متن فشرده برای پرامپت و گزارش تعداد توکن قبل و بعد"""
+    compacted = compact_rows(rows) if rows else compact_text(text or '')
+    before = estimate_tokens(text or '', model)
+    after = estimate_tokens(compacted, model)
+    report = {
+        'mode': 'table' if rows else 'text',
+        'chars_before': len(text or ''),
+        'chars_after': len(compacted),
+        'tokens_before': before,
+        'tokens_after': after,
+        'saved_percent': round((1 - after / before) * 100, 1) if before else 0
+    }
+    print(f"🗜️ فشرده‌سازی پرامپت ({report['mode']}): {before:,} ← {after:,} توکن "
+          f"({report['saved_percent']}% کمتر)")
+    return compacted, report
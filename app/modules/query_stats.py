@@ -0,0 +1,187 @@
+# modules/query_stats.py
+import re
+import threading
+import time
+from .config import Config
+
+# مرزهای سطل‌های هیستوگرام تاخیر (میلی‌ثانیه)
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(query):
+    """نسخه نرمال‌شده کوئری (بدون مقادیر ثابت) برای گروه‌بندی آمار"""
+    text = _STRING_LITERAL.sub('?', query)
+    text = _NUMBER_LITERAL.sub('?', text)
+    text = text.replace('%s', '?')
+    text = _PLACEHOLDER_LIST.sub('(?+)', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def param_shape(params):
+    """شکل پارامترها (نوع و طول) بدون افشای مقدار آنها"""
+    if params is None:
+        return []
+    if isinstance(params, dict):
+        return {key: param_shape([value])[0] for key, value in params.items()}
+    shape = []
+    for value in params:
+        if isinstance(value, (str, bytes)):
+            shape.append(f"{type(value).__name__}({len(value)})")
+        elif value is None:
+            shape.append('null')
+        else:
+            shape.append(type(value).__name__)
+    return shape
+
+
+class _Histogram:
+    """هیستوگرام تاخیر یک fingerprint"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.slow = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def add(self, elapsed_ms, failed, slow):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        if failed:
+            self.errors += 1
+        if slow:
+            self.slow += 1
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[index] += 1
+                return
+        self.buckets[-1] += 1
+
+    def percentile(self, fraction):
+        """تخمین صدک از روی سطل‌ها (کران بالای سطل)"""
+        target = self.count * fraction
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= target and bucket_count:
+                return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else round(self.max_ms, 2)
+        return 0
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'slow': self.slow,
+            'total_ms': round(self.total_ms, 2),
+            'avg_ms': round(self.total_ms / self.count, 2) if self.count else 0,
+            'max_ms': round(self.max_ms, 2),
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'buckets': {
+                **{f"le_{bound}": self.buckets[i] for i, bound in enumerate(LATENCY_BUCKETS_MS)},
+                'inf': self.buckets[-1]
+            }
+        }
+
+
+_histograms = {}
+_lock = threading.Lock()
+_started_at = time.time()
+
+
+def _explain(conn, query, params):
+    """اجرای EXPLAIN روی همان اتصال (فقط برای SELECT)"""
+    if not query.lstrip().upper().startswith('SELECT') or conn.unread_result:
+        return None
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute('EXPLAIN ' + query, params or ())
+        return cursor.fetchall()
+    except Exception as e:
+        return f"EXPLAIN ناموفق: {e}"
+    finally:
+        cursor.close()
+
+
+def record(query, params, elapsed_ms, failed=False, conn=None):
+    """ثبت زمان اجرای یک دستور و لاگ کوئری‌های کند"""
+    key = fingerprint(query)
+    slow = elapsed_ms >= Config.DB_SLOW_QUERY_MS
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = _Histogram()
+        histogram.add(elapsed_ms, failed, slow)
+
+    if slow:
+        print(f"🐢 کوئری کند ({elapsed_ms:.1f}ms): {key[:300]} | پارامترها: {param_shape(params)}")
+        if Config.DB_SLOW_QUERY_EXPLAIN and conn is not None and not failed:
+            plan = _explain(conn, query, params)
+            if plan:
+                print(f"   📋 EXPLAIN: {plan}")
+
+
+def snapshot(limit=None):
+    """آمار همه fingerprintها، مرتب‌شده بر اساس مجموع زمان"""
+    with _lock:
+        items = [
+            {'query': key, **histogram.to_dict()}
+            for key, histogram in _histograms.items()
+        ]
+    items.sort(key=lambda item: item['total_ms'], reverse=True)
+    return {
+        'since': _started_at,
+        'slow_threshold_ms': Config.DB_SLOW_QUERY_MS,
+        'queries': items[:limit] if limit else items
+    }
+
+
+def reset():
+    """پاک کردن آمار جمع‌آوری‌شده"""
+    global _started_at
+    with _lock:
+        _histograms.clear()
+        _started_at = time.time()
+
+
+class TimedCursor:
+    """کرسری که زمان هر execute/executemany را ثبت می‌کند"""
+
+    def __init__(self, cursor, conn):
+        self._cursor = cursor
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def _timed(self, method, query, params, logged_params):
+        started = time.perf_counter()
+        failed = False
+        try:
+            return method(query, params)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            record(query, logged_params, elapsed_ms, failed=failed, conn=self._conn)
+
+    def execute(self, query, params=None):
+        params = params or ()
+        return self._timed(self._cursor.execute, query, params, params)
+
+    def executemany(self, query, seq_params):
+        # برای executemany فقط شکل اولین سطر لاگ می‌شود
+        first = seq_params[0] if seq_params else None
+        return self._timed(self._cursor.executemany, query, seq_params, first)
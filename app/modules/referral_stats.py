@@ -0,0 +1,357 @@
+# modules/referral_stats.py
+"""
+آمار دقیق گزارش ارجاعیات (Excel) با pandas به جای شمارش توسط مدل.
+
+    stats = from_file(file_info['path'], file_info['name'])     # None اگر فایل جدولی قابل خواندن نباشد
+    analysis = ai_client.analyze_referral(content, stats=stats)
+
+همه بخش‌های شمارشی (توزیع وضعیت‌ها، فرستنده/گیرنده، موضوع، موسسه، توضیحات، پیگیری، اشتراک و زمان)
+اینجا محاسبه می‌شوند و فقط خلاصه فشرده (summary_text) برای نوشتن comprehensive_insights به مدل می‌رود.
+
+قالب فایل: سطر عنوان با ستون‌های وضعیت، فرستنده، گیرنده و ...؛ هر ارجاع یک سطر و در صورت وجود،
+سطر بعدی «شرح وظیفه :» توضیحات آن است. تاریخ‌ها شمسی (1404/11/28) هستند.
+"""
+import json
+import os
+import re
+import time
+from .config import Config
+from .table_utils import clean_text, value_counts
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:
+    np = pd = None
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+# عنوان ستون ← نام ستون در DataFrame
+HEADERS = {
+    'وضعیت': 'status',
+    'سررسید': 'due',
+    'ثبت': 'registered',
+    'نام موسسه': 'institution',
+    'مشترک': 'subscriber',
+    'اشتراک': 'subscription',
+    'موضوع': 'subject',
+    'گیرنده': 'receiver',
+    'فرستنده': 'sender',
+    'پیگیری': 'tracking',
+    'ردیف': 'row'
+}
+REQUIRED_COLUMNS = ('status', 'sender', 'receiver')
+DESCRIPTION_MARKER = 'شرح وظیفه'
+
+PENDING = 'بررسی نشده'
+IN_PROGRESS = 'درحال پیگیری'
+COMPLETED = 'اتمام کار'
+STATUS_ALIASES = {
+    'در حال پیگیری': IN_PROGRESS,
+    'رؤیت شده': 'رویت شده',
+    'اتمام': COMPLETED
+}
+
+# کلمات پرتکرار بی‌معنا در توضیحات
+STOPWORDS = {
+    'برای', 'این', 'است', 'شود', 'بشه', 'شده', 'انجام', 'لطفا', 'لطفاً', 'نمایید', 'فرمایید', 'گردید', 'عدد',
+    'های', 'درخصوص', 'خصوص', 'اقدام', 'باشد', 'دارد', 'کنید', 'کند', 'شد', 'هست', 'میشه', 'بود', 'آقای',
+    'خانم', 'مهندس', 'تماس', 'پیوست', 'گردد', 'بدین', 'ترتیب', 'میباشد'
+}
+TOP_N = 10
+OPEN_ITEMS = 20
+
+_WORD = re.compile(r'[؀-ۿ]{3,}')
+
+
+class ReferralFormatError(ValueError):
+    """فایل قالب جدولی گزارش ارجاعیات را ندارد"""
+    pass
+
+
+def _number(value):
+    try:
+        return float(str(value).replace(',', '')) if value not in (None, '') else None
+    except ValueError:
+        return None
+
+
+def _day_number(value):
+    """شماره روز پیوسته برای اختلاف تاریخ‌ها (شمسی yyyy/mm/dd یا datetime)"""
+    if value is None or value == '':
+        return None
+    if hasattr(value, 'toordinal'):
+        return value.toordinal()
+    match = re.match(r'(\d{4})[/-](\d{1,2})[/-](\d{1,2})', clean_text(value))
+    if not match:
+        return None
+    year, month, day = (int(part) for part in match.groups())
+    if year > 1700:
+        # سال میلادی
+        from datetime import date
+        return date(year, month, day).toordinal()
+    year += 1595
+    return (-355668 + 365 * year + (year // 33) * 8 + ((year % 33) + 3) // 4 + day
+            + ((month - 1) * 31 if month < 7 else (month - 7) * 30 + 186))
+
+
+def _header_columns(row):
+    """نگاشت ایندکس ستون ← نام ستون اگر این سطر، سطر عنوان باشد"""
+    columns = {}
+    for index, value in enumerate(row):
+        name = HEADERS.get(clean_text(value))
+        if name and name not in columns.values():
+            columns[index] = name
+    return columns if all(name in columns.values() for name in REQUIRED_COLUMNS) else None
+
+
+def load_referrals(path):
+    """خواندن ارجاعات از Excel؛ خروجی: DataFrame (یک سطر برای هر ارجاع)"""
+    if pd is None or openpyxl is None:
+        raise ReferralFormatError("pandas/openpyxl نصب نیست")
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            columns = None
+            records = []
+            for row in sheet.iter_rows(values_only=True):
+                if columns is None:
+                    columns = _header_columns(row)
+                    continue
+                if _header_columns(row):
+                    # تکرار سطر عنوان در ابتدای هر صفحه گزارش
+                    continue
+                cells = [clean_text(value) for value in row]
+                marker = next((i for i, cell in enumerate(cells) if cell.startswith(DESCRIPTION_MARKER)), None)
+                if marker is not None:
+                    # توضیحات ارجاع سطر قبل
+                    if records:
+                        records[-1]['description'] = ' '.join(
+                            cell for i, cell in enumerate(cells) if cell and i != marker
+                        )
+                    continue
+                record = {name: row[index] if index < len(row) else None for index, name in columns.items()}
+                if not clean_text(record.get('status')):
+                    continue
+                if not (clean_text(record.get('sender')) or clean_text(record.get('receiver'))):
+                    continue
+                record['description'] = ''
+                records.append(record)
+            if records:
+                return _frame(records)
+    finally:
+        workbook.close()
+    raise ReferralFormatError("سطر عنوان ارجاعیات (وضعیت، فرستنده، گیرنده) یافت نشد")
+
+
+def _frame(records):
+    df = pd.DataFrame(records)
+    for name in HEADERS.values():
+        if name not in df:
+            df[name] = None
+    for name in ('status', 'institution', 'subscriber', 'subject', 'receiver', 'sender', 'tracking', 'description'):
+        df[name] = df[name].map(clean_text)
+    df['status'] = df['status'].replace(STATUS_ALIASES)
+    df['tracking'] = df['tracking'].str.replace(r'\.0$', '', regex=True)
+    # اشتراک 0 یعنی مشترک ثبت نشده است
+    df['subscription'] = pd.to_numeric(df['subscription'].map(_number), errors='coerce').replace(0, np.nan)
+    df['registered_day'] = pd.to_numeric(df['registered'].map(_day_number), errors='coerce')
+    df['due_day'] = pd.to_numeric(df['due'].map(_day_number), errors='coerce')
+    return df
+
+
+def _top(counts, key):
+    return {key: counts.index[0], 'count': int(counts.iloc[0])} if len(counts) else {key: '', 'count': 0}
+
+
+def _rate(mask):
+    return round(float(mask.mean()) * 100, 1) if len(mask) else 0
+
+
+def _mean(series, digits=1):
+    series = series.dropna()
+    return round(float(series.mean()), digits) if len(series) else 0
+
+
+def _corr(x, y):
+    """ضریب همبستگی پیرسون؛ 0 اگر داده کافی نباشد"""
+    if len(x) < 3 or np.std(x) == 0 or np.std(y) == 0:
+        return 0
+    return round(float(np.corrcoef(x, y)[0, 1]), 2)
+
+
+def _keywords(df, completed):
+    """پرتکرارترین کلمات توضیحات (تعداد ارجاع شامل کلمه) و نرخ اتمام آن‌ها"""
+    words = df['description'].map(lambda text: sorted({w for w in _WORD.findall(text) if w not in STOPWORDS}))
+    exploded = pd.DataFrame({'word': words, 'completed': completed}).explode('word').dropna(subset=['word'])
+    if exploded.empty:
+        return []
+    grouped = exploded.groupby('word')['completed'].agg(['size', 'mean']).reset_index()
+    grouped = grouped.sort_values(['size', 'word'], ascending=[False, True]).head(TOP_N)
+    return [{'word': row.word, 'count': int(row.size), 'completion_rate': round(float(row.mean) * 100, 1)}
+            for row in grouped.itertuples()]
+
+
+def compute_stats(df):
+    """همه شاخص‌های قابل شمارش به شکل بخش‌های REFERRAL_SCHEMA (به جز comprehensive_insights) و بخش‌های اضافه"""
+    started = time.perf_counter()
+    status = df['status']
+    pending = status.eq(PENDING)
+    in_progress = status.eq(IN_PROGRESS)
+    completed = status.eq(COMPLETED)
+    # مبنای «امروز» آخرین تاریخ ثبت در خود گزارش است تا نتیجه به زمان اجرا وابسته نباشد
+    reference_day = df['registered_day'].max()
+
+    status_counts = value_counts(status)
+    subject_counts = value_counts(df['subject'])
+    lead_days = df['due_day'] - df['registered_day']
+
+    senders = df[df['sender'] != ''].groupby('sender').agg(
+        count=('status', 'size'), completion_rate=('status', lambda s: _rate(s.eq(COMPLETED))))
+    receivers = df[df['receiver'] != ''].groupby('receiver').agg(
+        count=('status', 'size'), pending=('status', lambda s: int(s.eq(PENDING).sum())))
+    pairs = df[(df['sender'] != '') & (df['receiver'] != '')].groupby(['sender', 'receiver']).size()
+    institutions = df[df['institution'] != ''].groupby('institution').agg(
+        count=('status', 'size'), subs=('subscription', 'max'),
+        completion_rate=('status', lambda s: _rate(s.eq(COMPLETED))))
+
+    def ordered(frame, by='count'):
+        return frame.reset_index().sort_values([by, frame.index.name or 'index'], ascending=[False, True],
+                                                kind='stable')
+
+    with_subs = institutions.dropna(subset=['subs'])
+    has_description = df['description'] != ''
+    description_lengths = df.loc[has_description, 'description'].str.len()
+
+    tracking = df[df['tracking'] != ''].groupby('tracking').agg(
+        count=('status', 'size'), statuses=('status', 'nunique'))
+    partners = pd.concat([
+        pairs.reset_index()[['sender', 'receiver']].rename(columns={'sender': 'unit', 'receiver': 'partner'}),
+        pairs.reset_index()[['receiver', 'sender']].rename(columns={'receiver': 'unit', 'sender': 'partner'})
+    ]).groupby('unit')['partner'].nunique() if len(pairs) else pd.Series(dtype=int)
+    partners = partners.sort_index(kind='stable').sort_values(ascending=False, kind='stable')
+    daily = value_counts(df['registered'].map(clean_text))
+
+    open_rows = df[pending | in_progress]
+    stats = {
+        'status_analysis': {
+            'percent_pending': _rate(pending),
+            'most_frequent_status': status_counts.index[0] if len(status_counts) else '',
+            'frequent_status_count': int(status_counts.iloc[0]) if len(status_counts) else 0,
+            'avg_days_pending': _mean(reference_day - df.loc[pending, 'registered_day']),
+            'worst_sender_pending': _top(value_counts(df.loc[pending, 'sender']), 'unit'),
+            'percent_completed': _rate(completed),
+            'receiver_with_most_in_progress': _top(value_counts(df.loc[in_progress, 'receiver']), 'receiver'),
+            'status_distribution': {name: int(count) for name, count in status_counts.items()},
+            'status_with_lowest_frequency': status_counts.index[-1] if len(status_counts) else '',
+            'lowest_frequency_count': int(status_counts.iloc[-1]) if len(status_counts) else 0
+        },
+        'subject_analysis': {
+            'most_frequent_subject': subject_counts.index[0] if len(subject_counts) else '',
+            'subject_frequency': int(subject_counts.iloc[0]) if len(subject_counts) else 0,
+            'second_most_frequent': subject_counts.index[1] if len(subject_counts) > 1 else '',
+            'second_frequency': int(subject_counts.iloc[1]) if len(subject_counts) > 1 else 0,
+            'subject_pending': {name: int(count) for name, count in value_counts(df.loc[pending, 'subject']).items()},
+            # روزهای بین ثبت و سررسید
+            'subject_response_time': {
+                name: round(float(days), 1)
+                for name, days in lead_days.groupby(df['subject']).mean().dropna().items() if name
+            },
+            'unique_subjects': [{'subject': name, 'count': int(count)} for name, count in subject_counts.items()]
+        },
+        'sender_receiver_analysis': {
+            'top_senders': [{'sender': row.sender, 'count': int(row.count), 'completion_rate': row.completion_rate}
+                            for row in ordered(senders).head(TOP_N).itertuples()],
+            'top_receivers': [{'receiver': row.receiver, 'count': int(row.count), 'pending': int(row.pending)}
+                              for row in ordered(receivers).head(TOP_N).itertuples()],
+            'common_pairs': [{'from': sender, 'to': receiver, 'count': int(count)}
+                             for (sender, receiver), count in pairs.sort_index(kind='stable').sort_values(
+                                 ascending=False, kind='stable').head(TOP_N).items()]
+        },
+        'institution_analysis': {
+            'top_institutions': [{'name': row.institution, 'count': int(row.count),
+                                  'subs': int(row.subs) if row.subs == row.subs else 0,
+                                  'completion_rate': row.completion_rate}
+                                 for row in ordered(institutions).head(TOP_N).itertuples()],
+            # آیا اشتراک بزرگ‌تر یعنی ارجاع بیشتر؟
+            'subscription_correlation': _corr(with_subs['subs'].to_numpy(), with_subs['count'].to_numpy())
+        },
+        'description_analysis': {
+            'percent_with_description': _rate(has_description),
+            'avg_description_length': _mean(description_lengths),
+            'top_keywords': _keywords(df, completed)
+        },
+        'temporal_analysis': {
+            'busiest_date': daily.index[0] if len(daily) else '',
+            'busiest_date_count': int(daily.iloc[0]) if len(daily) else 0,
+            'daily_counts': {name: int(count) for name, count in daily.sort_index().items()},
+            'avg_days_to_due': _mean(lead_days),
+            'percent_overdue_pending': _rate(df.loc[pending, 'due_day'] < reference_day)
+        },
+        'tracking_analysis': {
+            'multi_referral_tracking': [
+                {'tracking': name, 'count': int(row['count']), 'status_changes': int(row['statuses']) - 1}
+                for name, row in tracking[tracking['count'] > 1].sort_values(
+                    'count', ascending=False, kind='stable').head(TOP_N).iterrows()
+            ],
+            'avg_referrals_per_tracking': _mean(tracking['count'], 2),
+            'max_referrals_per_tracking': int(tracking['count'].max()) if len(tracking) else 0,
+            'max_status_changes': int(tracking['statuses'].max()) - 1 if len(tracking) else 0
+        },
+        'subscription_analysis': {
+            'highest_subscription': int(df['subscription'].max()) if df['subscription'].notna().any() else 0,
+            'avg_subscription_completed': _mean(df.loc[completed, 'subscription']),
+            'avg_subscription_pending': _mean(df.loc[pending, 'subscription'])
+        },
+        'unit_analysis': {
+            'sender_counts': {name: int(count) for name, count in value_counts(df['sender']).items()},
+            'receiver_counts': {name: int(count) for name, count in value_counts(df['receiver']).items()},
+            'most_connected_unit': {'unit': partners.index[0], 'partners': int(partners.iloc[0])}
+            if len(partners) else {'unit': '', 'partners': 0}
+        },
+        'open_items': [{
+            'status': row.status, 'subject': row.subject, 'institution': row.institution,
+            'from': row.sender, 'to': row.receiver, 'registered': clean_text(row.registered),
+            'description': row.description[:150]
+        } for row in open_rows.head(OPEN_ITEMS).itertuples()]
+    }
+    stats['local_stats'] = {'rows': int(len(df)), 'compute_ms': round((time.perf_counter() - started) * 1000, 1)}
+    return stats
+
+
+def from_file(path, filename=None):
+    """آمار محلی فایل Excel ارجاعیات؛ None برای فایل‌های غیرجدولی یا در صورت خطا (تحلیل کامل با مدل)"""
+    filename = filename or os.path.basename(path)
+    if not Config.REFERRAL_LOCAL_STATS or pd is None or not filename.lower().endswith('.xlsx'):
+        return None
+    started = time.perf_counter()
+    try:
+        stats = compute_stats(load_referrals(path))
+    except Exception as e:
+        print(f"⚠️ آمار محلی ارجاعیات ممکن نشد ({e})؛ تحلیل کامل با مدل")
+        return None
+    print(f"📐 آمار محلی ارجاعیات: {stats['local_stats']['rows']} ارجاع در "
+          f"{(time.perf_counter() - started) * 1000:.0f} میلی‌ثانیه")
+    return stats
+
+
+def summary_text(stats):
+    """خلاصه فشرده آمار برای پرامپت insights (نقشه‌های بزرگ کوتاه می‌شوند)"""
+    def shorten(value):
+        if isinstance(value, dict):
+            items = list(value.items())
+            return {key: shorten(item) for key, item in items[:TOP_N]}
+        if isinstance(value, list):
+            return [shorten(item) for item in value[:OPEN_ITEMS]]
+        return value
+
+    compact = {name: shorten(section) for name, section in stats.items() if name != 'local_stats'}
+    return json.dumps(compact, ensure_ascii=False, separators=(',', ':'))
+
+
+def merge_insights(stats, insights):
+    """آمار محلی + comprehensive_insights مدل"""
+    return {**stats, 'comprehensive_insights': insights.get('comprehensive_insights', {})}
@@ -7,7 +7,11 @@ from modules.file_handler import FileHandler
 from modules.openai_client import OpenAIClient
 from modules.models import AnalysisModel
 from modules.config import Config
-from modules.database import get_db_connection
+from modules.database import mark_write
+from modules.utils.streaming import stream_json_array, sse_response, analysis_event_stream
+from modules.routes.jobs import enqueue_upload
+from modules.llm_usage import UsageBatch
+from modules import crm_stats
 
 analysis_bp = Blueprint('analysis', __name__)
 file_handler = FileHandler(Config.UPLOAD_FOLDER)
@@ -18,6 +22,11 @@ ai_client = OpenAIClient()
 def analyze():
     """API برای تحلیل فایل CRM عمومی"""
     file_info = None
+    usage = UsageBatch('crm')
+    
+    # async=1: فقط ثبت در صف و برگرداندن شناسه کار (پردازش توسط worker.py)
+    if request.values.get('async', '').lower() in ('1', 'true', 'yes'):
+        return enqueue_upload('crm')
     
     try:
         # بررسی وجود فایل
@@ -35,25 +44,31 @@ def analyze():
         # ذخیره فایل
         file_info = file_handler.save_file(file)
         
-        # استخراج متن
-        content = file_handler.extract_text(file_info['path'], file_info['name'])
+        # استخراج متن (جدول‌ها به TSV فشرده)
+        content, compaction = file_handler.extract_prompt_text(file_info['path'], file_info['name'])
         
         if not content or len(content.strip()) < 50:
             file_handler.delete_file(file_info['path'])
             return jsonify({"error": "محتوای فایل خالی یا ناقص است"}), 400
         
-        # تحلیل با AI
-        analysis = ai_client.analyze_crm(content)
+        # تحلیل با AI (no_cache=1 کش نتایج را نادیده می‌گیرد)
+        use_cache = request.values.get('no_cache', '').lower() not in ('1', 'true', 'yes')
+        # آمار تماس‌ها از جدول فایل (آمار محلی) و فقط امتیازدهی کیفی با مدل
+        table = crm_stats.from_file(file_info['path'], file_info['name'])
+        analysis = ai_client.analyze_crm(content, use_cache=use_cache, usage=usage, table=table)
         
         if analysis.get('error'):
             file_handler.delete_file(file_info['path'])
+            usage.save(None)
             return jsonify(analysis), 400
         
         analysis['analyzed_at'] = datetime.now().isoformat()
         analysis['file_name'] = file_info['name']
+        analysis['prompt_compaction'] = compaction
         
         # ذخیره در دیتابیس
         analysis_id = AnalysisModel.save(file_info, analysis)
+        usage.save(analysis_id)
         
         if analysis_id:
             analysis['id'] = analysis_id
@@ -67,12 +82,44 @@ def analyze():
         
         if file_info and os.path.exists(file_info['path']):
             file_handler.delete_file(file_info['path'])
+        usage.save(None)
         
         return jsonify({
             "error": True,
             "message": str(e)
         }), 500
 
+@analysis_bp.route('/api/analyze/stream', methods=['POST'])
+@login_required
+def analyze_stream():
+    """نسخه Server-Sent Events تحلیل فایل CRM عمومی: مراحل پیشرفت و بخش‌های JSON به محض آماده شدن"""
+    if 'file' not in request.files:
+        return jsonify({"error": "فایلی آپلود نشده است"}), 400
+    
+    file = request.files['file']
+    
+    if file.filename == '':
+        return jsonify({"error": "فایل انتخاب نشده است"}), 400
+    
+    if not file_handler.allowed_file(file.filename):
+        return jsonify({"error": "نوع فایل مجاز نیست"}), 400
+    
+    file_info = file_handler.save_file(file)
+    use_cache = request.values.get('no_cache', '').lower() not in ('1', 'true', 'yes')
+    usage = UsageBatch('crm')
+    
+    # ذخیره در انتهای جریان و بعد از ارسال کوکی session انجام می‌شود؛ read-your-writes از همین حالا
+    mark_write(ahead=Config.LLM_TIMEOUTS['analysis'])
+    return sse_response(analysis_event_stream(
+        file_info, file_handler,
+        lambda content: ai_client.analyze_crm_stream(
+            content, use_cache=use_cache, usage=usage,
+            table=crm_stats.from_file(file_info['path'], file_info['name'])
+        ),
+        AnalysisModel.save,
+        usage
+    ))
+
 @analysis_bp.route('/api/analysis/latest')
 @login_required
 def get_latest_analysis():
@@ -107,10 +154,10 @@ def get_latest_analysis():
         return jsonify({'error': True, 'message': str(e)}), 500
 
 @analysis_bp.route('/api/history')
+@login_required
 def api_history():
-    """API دریافت لیست تحلیل‌ها"""
-    analyses = AnalysisModel.get_all()
-    return jsonify(analyses)
+    """API دریافت لیست تحلیل‌ها (ارسال تدریجی)"""
+    return stream_json_array(AnalysisModel.iter_all())
 
 @analysis_bp.route('/api/analysis/<int:analysis_id>')
 @login_required
@@ -125,36 +172,12 @@ def api_analysis_detail(analysis_id):
 @login_required
 def delete_analysis(analysis_id):
     """حذف یک تحلیل CRM به همراه فایل مرتبط"""
-    conn = None
-    cursor = None
-    file_path = None
-    
     try:
-        # اتصال به دیتابیس
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({"error": "خطا در اتصال به دیتابیس"}), 500
-        
-        cursor = conn.cursor(dictionary=True)
-        
-        # دریافت اطلاعات فایل قبل از حذف
-        cursor.execute("SELECT file_path FROM analyses WHERE id = %s", (analysis_id,))
-        result = cursor.fetchone()
-        
-        if not result:
-            cursor.close()
-            conn.close()
+        # حذف تحلیل و جزئیات آن در یک تراکنش
+        file_path = AnalysisModel.delete(analysis_id)
+        if file_path is None:
             return jsonify({"error": "تحلیل یافت نشد"}), 404
         
-        file_path = result['file_path']
-        
-        # حذف از دیتابیس
-        cursor.execute("DELETE FROM analyses WHERE id = %s", (analysis_id,))
-        conn.commit()
-        
-        cursor.close()
-        conn.close()
-        
         # حذف فایل از روی دیسک
         if file_path and os.path.exists(file_path):
             os.remove(file_path)
@@ -170,14 +193,6 @@ def delete_analysis(analysis_id):
         print(f"❌ خطا در حذف تحلیل: {str(e)}")
         import traceback
         traceback.print_exc()
-        
-        if conn:
-            conn.rollback()
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-            
         return jsonify({
             "error": True,
             "message": str(e)
@@ -0,0 +1,79 @@
+from flask import Blueprint, request, jsonify, session
+from modules.auth.decorators import login_required
+from modules.file_handler import FileHandler
+from modules.job_queue import JobQueue, JOB_TYPES
+from modules.models import AnalysisModel, ReferralAnalysisModel
+from modules.config import Config
+
+jobs_bp = Blueprint('jobs', __name__)
+file_handler = FileHandler(Config.UPLOAD_FOLDER)
+
+
+def enqueue_upload(job_type):
+    """ذخیره فایل آپلودشده و ثبت کار تحلیل آن؛ پاسخ 202 با شناسه کار"""
+    if 'file' not in request.files:
+        return jsonify({"error": "فایلی آپلود نشده است"}), 400
+    
+    file = request.files['file']
+    
+    if file.filename == '':
+        return jsonify({"error": "فایل انتخاب نشده است"}), 400
+    
+    if not file_handler.allowed_file(file.filename):
+        return jsonify({"error": "نوع فایل مجاز نیست"}), 400
+    
+    file_info = file_handler.save_file(file)
+    use_cache = request.values.get('no_cache', '').lower() not in ('1', 'true', 'yes')
+    
+    try:
+        job_id = JobQueue.enqueue(job_type, file_info, session.get('user_id'), use_cache)
+    except Exception as e:
+        print(f"❌ خطا در ثبت کار: {str(e)}")
+        file_handler.delete_file(file_info['path'])
+        return jsonify({"error": True, "message": str(e)}), 500
+    
+    print(f"📥 کار {job_id} ({job_type}) در صف قرار گرفت: {file_info['name']}")
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/api/jobs/{job_id}'
+    }), 202
+
+
+@jobs_bp.route('/api/jobs', methods=['POST'])
+@login_required
+def create_job():
+    """ثبت تحلیل پس‌زمینه (type=crm یا referral)"""
+    job_type = request.values.get('type', 'crm')
+    if job_type not in JOB_TYPES:
+        return jsonify({"error": "نوع تحلیل نامعتبر است"}), 400
+    return enqueue_upload(job_type)
+
+
+@jobs_bp.route('/api/jobs/<int:job_id>')
+@login_required
+def get_job(job_id):
+    """وضعیت کار"""
+    job = JobQueue.get(job_id, session.get('user_id'))
+    if not job:
+        return jsonify({"error": "کار یافت نشد"}), 404
+    if job['status'] == 'done':
+        job['result_url'] = f'/api/jobs/{job_id}/result'
+    return jsonify(job)
+
+
+@jobs_bp.route('/api/jobs/<int:job_id>/result')
+@login_required
+def get_job_result(job_id):
+    """نتیجه کار انجام‌شده (همان خروجی جزئیات تحلیل)"""
+    job = JobQueue.get(job_id, session.get('user_id'))
+    if not job:
+        return jsonify({"error": "کار یافت نشد"}), 404
+    if job['status'] != 'done':
+        return jsonify({'status': job['status'], 'error': job.get('error')}), 409
+    
+    model = ReferralAnalysisModel if job['job_type'] == 'referral' else AnalysisModel
+    analysis = model.get_by_id(job['result_id'])
+    if not analysis:
+        return jsonify({"error": "تحلیل یافت نشد"}), 404
+    return jsonify(analysis)
@@ -1,13 +1,126 @@
 # modules/routes/main.py
 from flask import Blueprint, render_template, request, jsonify, current_app, session
 from modules.config import Config
-from modules.database import test_connection, get_db_connection
-from modules.auth.decorators import login_required, role_required
+from modules.database import test_connection, get_db_connection, pool_stats, stream_query
+from modules.utils.streaming import stream_json_array
+from modules.analysis_codec import unpack_row
+from modules.auth.decorators import login_required, role_required, admin_required
+from modules import query_stats, llm_resilience, llm_client
+from modules.llm_usage import LLMUsageModel
 import json
 from datetime import datetime, timedelta
 
 main_bp = Blueprint('main', __name__)
 
+# کوئری‌های داشبورد؛ scripts/check_query_plans.py پلن همین‌ها را بررسی می‌کند
+# {table} و {scope} از _dashboard_scope می‌آیند
+HISTORY_QUERY = """
+    SELECT 
+        id, 
+        file_name, 
+        analyzed_at,
+        seller_name,
+        customer_name,
+        score_total,
+        total_calls,
+        successful_calls
+    FROM analyses 
+    ORDER BY analyzed_at DESC 
+    LIMIT 50
+"""
+STATS_TOTALS_QUERY = """
+    SELECT 
+        COUNT(*) as total_analyses,
+        COALESCE(SUM(total_calls), 0) as total_calls,
+        COALESCE(SUM(successful_calls), 0) as successful_calls,
+        COALESCE(AVG(score_total), 0) as avg_score
+    FROM {table}
+    WHERE {scope}
+"""
+TOP_SELLERS_QUERY = """
+    SELECT 
+        seller_name,
+        COUNT(*) as analysis_count,
+        AVG(score_total) as avg_score
+    FROM {table}
+    WHERE {scope} AND seller_name IS NOT NULL AND seller_name != '—' AND seller_name != ''
+    GROUP BY seller_name
+    ORDER BY analysis_count DESC
+    LIMIT 5
+"""
+TOP_CUSTOMERS_QUERY = """
+    SELECT 
+        customer_name,
+        COUNT(*) as analysis_count,
+        AVG(score_total) as avg_score
+    FROM {table}
+    WHERE {scope} AND customer_name IS NOT NULL AND customer_name != '—' AND customer_name != ''
+    GROUP BY customer_name
+    ORDER BY analysis_count DESC
+    LIMIT 5
+"""
+WEEKLY_TREND_QUERY = """
+    SELECT 
+        DATE_FORMAT(analyzed_at, '%Y-%%u') as week,
+        COUNT(*) as count
+    FROM analyses
+    WHERE analyzed_at >= DATE_SUB(NOW(), INTERVAL 8 WEEK)
+    GROUP BY week
+    ORDER BY week DESC
+"""
+SCORE_DISTRIBUTION_QUERY = """
+    SELECT 
+        SUM(CASE WHEN score_total >= 8 THEN 1 ELSE 0 END) as excellent,
+        SUM(CASE WHEN score_total >= 6 AND score_total < 8 THEN 1 ELSE 0 END) as good,
+        SUM(CASE WHEN score_total >= 4 AND score_total < 6 THEN 1 ELSE 0 END) as average,
+        SUM(CASE WHEN score_total < 4 AND score_total > 0 THEN 1 ELSE 0 END) as poor,
+        SUM(CASE WHEN score_total = 0 OR score_total IS NULL THEN 1 ELSE 0 END) as unknown
+    FROM {table}
+    WHERE {scope}
+"""
+LATEST_QUERY = """
+    SELECT 
+        id, 
+        file_name, 
+        analyzed_at,
+        seller_name,
+        customer_name,
+        score_total,
+        total_calls,
+        successful_calls,
+        full_analysis,
+        full_analysis_z
+    FROM analyses 
+    ORDER BY analyzed_at DESC 
+    LIMIT 1
+"""
+RECENT_ANALYSES_QUERY = """
+    SELECT 
+        'تحلیل فروش' as type,
+        file_name,
+        analyzed_at as date,
+        seller_name as user,
+        score_total as score,
+        'success' as status
+    FROM analyses 
+    WHERE analyzed_at IS NOT NULL
+    ORDER BY analyzed_at DESC 
+    LIMIT 10
+"""
+RECENT_REFERRALS_QUERY = """
+    SELECT 
+        'تحلیل ارجاع' as type,
+        file_name,
+        analyzed_at as date,
+        'سیستم' as user,
+        completion_rate as score,
+        'info' as status
+    FROM referral_analyses 
+    WHERE analyzed_at IS NOT NULL
+    ORDER BY analyzed_at DESC 
+    LIMIT 10
+"""
+
 @main_bp.route('/')
 @login_required
 def index():
@@ -42,9 +155,52 @@ def health():
         "status": "ok" if not errors and db_status else "warning",
         "api_configured": bool(Config.OPENAI_API_KEY),
         "db_connected": db_status,
+        "db_pool": pool_stats(),
         "warnings": errors
     })
 
+@main_bp.route('/api/admin/db-stats')
+@admin_required
+def db_stats():
+    """آمار تاخیر کوئری‌ها و استخرهای اتصال (فقط ادمین)"""
+    limit = request.args.get('limit', type=int)
+    return jsonify({
+        **query_stats.snapshot(limit=limit),
+        'pools': pool_stats()
+    })
+
+@main_bp.route('/api/admin/db-stats', methods=['DELETE'])
+@admin_required
+def reset_db_stats():
+    """پاک کردن آمار کوئری‌ها (فقط ادمین)"""
+    query_stats.reset()
+    return jsonify({'success': True})
+
+@main_bp.route('/api/admin/llm-stats')
+@admin_required
+def llm_stats():
+    """وضعیت circuit breaker، آمار فراخوانی‌های OpenAI و استخر اتصال HTTP (فقط ادمین)"""
+    return jsonify({'endpoints': llm_resilience.snapshot(), 'http_pool': llm_client.pool_stats()})
+
+@main_bp.route('/api/admin/llm-stats', methods=['DELETE'])
+@admin_required
+def reset_llm_stats():
+    """پاک کردن آمار و بستن مدارهای OpenAI (فقط ادمین)"""
+    llm_resilience.reset()
+    return jsonify({'success': True})
+
+@main_bp.route('/api/admin/llm-usage')
+@admin_required
+def llm_usage():
+    """مصرف توکن، هزینه تقریبی و تاخیر OpenAI به تفکیک بخش (?days=30&feature=crm|referral|chat)"""
+    days = min(max(request.args.get('days', 30, type=int), 1), 365)
+    feature = request.args.get('feature') or None
+    try:
+        return jsonify(LLMUsageModel.aggregate(days, feature))
+    except Exception as e:
+        print(f"❌ خطا در گزارش مصرف: {str(e)}")
+        return jsonify({'error': True, 'message': str(e)}), 500
+
 # ========================================
 # API های مورد نیاز داشبورد (نیاز به لاگین)
 # ========================================
@@ -52,43 +208,23 @@ def health():
 @main_bp.route('/api/analysis/history')
 @login_required
 def get_analysis_history():
-    """دریافت تاریخچه تحلیل‌های فروش"""
+    """دریافت تاریخچه تحلیل‌های فروش (ارسال تدریجی)
+
+    لیست فقط ستون‌های خلاصه را می‌خواند؛ full_analysis (و باز کردن بلاب فشرده) فقط در جزئیات.
+    """
     try:
-        conn = get_db_connection()
-        if not conn:
-            print("❌ اتصال به دیتابیس برقرار نشد")
-            return jsonify([])
-        
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT 
-                id, 
-                file_name, 
-                analyzed_at,
-                seller_name,
-                customer_name,
-                score_total,
-                total_calls,
-                successful_calls,
-                full_analysis
-            FROM analyses 
-            ORDER BY analyzed_at DESC 
-            LIMIT 50
-        """)
-        
-        analyses = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        rows = stream_query(HISTORY_QUERY, batch_size=10)
         
-        # تبدیل تاریخ به رشته
-        for analysis in analyses:
+        def format_row(analysis):
+            # تبدیل تاریخ به رشته
             if analysis['analyzed_at']:
                 if hasattr(analysis['analyzed_at'], 'isoformat'):
                     analysis['analyzed_at'] = analysis['analyzed_at'].isoformat()
                 else:
                     analysis['analyzed_at'] = str(analysis['analyzed_at'])
+            return analysis
         
-        return jsonify(analyses)
+        return stream_json_array(rows, transform=format_row)
         
     except Exception as e:
         print(f"❌ خطا در دریافت تاریخچه تحلیل‌ها: {str(e)}")
@@ -96,12 +232,21 @@ def get_analysis_history():
         traceback.print_exc()
         return jsonify([])
 
+def _dashboard_scope():
+    """منبع تجمیع داشبورد: ماه‌های اخیر (پارتیشن‌های فعال) یا ?range=all برای کل تاریخچه و آرشیو"""
+    if request.args.get('range') == 'all':
+        return 'analyses_all', '1 = 1', (), None
+    today = datetime.now()
+    month_index = today.year * 12 + today.month - Config.DASHBOARD_HOT_MONTHS
+    since = datetime(month_index // 12, month_index % 12 + 1, 1)
+    return 'analyses', 'analyzed_at >= %s', (since,), since
+
 @main_bp.route('/api/analysis/stats')
 @login_required
 def get_analysis_stats():
     """دریافت آمار کلی تحلیل‌ها"""
     try:
-        conn = get_db_connection()
+        conn = get_db_connection(read_only=True)
         if not conn:
             return jsonify({
                 'total_analyses': 0,
@@ -113,44 +258,18 @@ def get_analysis_stats():
             })
         
         cursor = conn.cursor(dictionary=True)
+        table, scope, params, since = _dashboard_scope()
         
         # آمار کلی
-        cursor.execute("""
-            SELECT 
-                COUNT(*) as total_analyses,
-                COALESCE(SUM(total_calls), 0) as total_calls,
-                COALESCE(SUM(successful_calls), 0) as successful_calls,
-                COALESCE(AVG(score_total), 0) as avg_score
-            FROM analyses
-        """)
+        cursor.execute(STATS_TOTALS_QUERY.format(table=table, scope=scope), params)
         stats = cursor.fetchone()
         
         # فروشندگان برتر
-        cursor.execute("""
-            SELECT 
-                seller_name,
-                COUNT(*) as analysis_count,
-                AVG(score_total) as avg_score
-            FROM analyses
-            WHERE seller_name IS NOT NULL AND seller_name != '—' AND seller_name != ''
-            GROUP BY seller_name
-            ORDER BY analysis_count DESC
-            LIMIT 5
-        """)
+        cursor.execute(TOP_SELLERS_QUERY.format(table=table, scope=scope), params)
         top_sellers = cursor.fetchall()
         
         # مشتریان برتر
-        cursor.execute("""
-            SELECT 
-                customer_name,
-                COUNT(*) as analysis_count,
-                AVG(score_total) as avg_score
-            FROM analyses
-            WHERE customer_name IS NOT NULL AND customer_name != '—' AND customer_name != ''
-            GROUP BY customer_name
-            ORDER BY analysis_count DESC
-            LIMIT 5
-        """)
+        cursor.execute(TOP_CUSTOMERS_QUERY.format(table=table, scope=scope), params)
         top_customers = cursor.fetchall()
         
         cursor.close()
@@ -162,7 +281,8 @@ def get_analysis_stats():
             'successful_calls': stats['successful_calls'] if stats else 0,
             'avg_score': round(stats['avg_score'], 1) if stats and stats['avg_score'] else 0,
             'top_sellers': top_sellers or [],
-            'top_customers': top_customers or []
+            'top_customers': top_customers or [],
+            'since': since.isoformat() if since else None
         })
         
     except Exception as e:
@@ -183,22 +303,14 @@ def get_analysis_stats():
 def get_weekly_trend():
     """دریافت روند هفتگی تحلیل‌ها"""
     try:
-        conn = get_db_connection()
+        conn = get_db_connection(read_only=True)
         if not conn:
             return jsonify({})
         
         cursor = conn.cursor(dictionary=True)
         
         # 8 هفته اخیر
-        cursor.execute("""
-            SELECT 
-                DATE_FORMAT(analyzed_at, '%Y-%%u') as week,
-                COUNT(*) as count
-            FROM analyses
-            WHERE analyzed_at >= DATE_SUB(NOW(), INTERVAL 8 WEEK)
-            GROUP BY week
-            ORDER BY week DESC
-        """)
+        cursor.execute(WEEKLY_TREND_QUERY)
         
         trends = cursor.fetchall()
         cursor.close()
@@ -230,21 +342,14 @@ def get_weekly_trend():
 def get_score_distribution():
     """دریافت توزیع امتیازها"""
     try:
-        conn = get_db_connection()
+        conn = get_db_connection(read_only=True)
         if not conn:
             return jsonify({})
         
         cursor = conn.cursor(dictionary=True)
+        table, scope, params, _ = _dashboard_scope()
         
-        cursor.execute("""
-            SELECT 
-                SUM(CASE WHEN score_total >= 8 THEN 1 ELSE 0 END) as excellent,
-                SUM(CASE WHEN score_total >= 6 AND score_total < 8 THEN 1 ELSE 0 END) as good,
-                SUM(CASE WHEN score_total >= 4 AND score_total < 6 THEN 1 ELSE 0 END) as average,
-                SUM(CASE WHEN score_total < 4 AND score_total > 0 THEN 1 ELSE 0 END) as poor,
-                SUM(CASE WHEN score_total = 0 OR score_total IS NULL THEN 1 ELSE 0 END) as unknown
-            FROM analyses
-        """)
+        cursor.execute(SCORE_DISTRIBUTION_QUERY.format(table=table, scope=scope), params)
         
         dist = cursor.fetchone()
         cursor.close()
@@ -274,28 +379,14 @@ def get_score_distribution():
 def get_latest_analysis():
     """دریافت آخرین تحلیل"""
     try:
-        conn = get_db_connection()
+        conn = get_db_connection(read_only=True)
         if not conn:
             return jsonify(None)
         
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT 
-                id, 
-                file_name, 
-                analyzed_at,
-                seller_name,
-                customer_name,
-                score_total,
-                total_calls,
-                successful_calls,
-                full_analysis
-            FROM analyses 
-            ORDER BY analyzed_at DESC 
-            LIMIT 1
-        """)
-        
-        analysis = cursor.fetchone()
+        cursor.execute(LATEST_QUERY)
+        
+        analysis = unpack_row(cursor.fetchone())
         cursor.close()
         conn.close()
         
@@ -337,44 +428,20 @@ def price_list():
 def get_recent_activities():
     """دریافت فعالیت‌های اخیر (ترکیبی از تحلیل‌ها و ارجاعات)"""
     try:
-        conn = get_db_connection()
+        conn = get_db_connection(read_only=True)
         if not conn:
             return jsonify([])
         
         cursor = conn.cursor(dictionary=True)
         
         # دریافت آخرین تحلیل‌های فروش
-        cursor.execute("""
-            SELECT 
-                'تحلیل فروش' as type,
-                file_name,
-                analyzed_at as date,
-                seller_name as user,
-                score_total as score,
-                'success' as status
-            FROM analyses 
-            WHERE analyzed_at IS NOT NULL
-            ORDER BY analyzed_at DESC 
-            LIMIT 10
-        """)
+        cursor.execute(RECENT_ANALYSES_QUERY)
         
         analyses = cursor.fetchall()
         
         # دریافت آخرین تحلیل‌های ارجاع (اگر جدول referral_analyses وجود دارد)
         try:
-            cursor.execute("""
-                SELECT 
-                    'تحلیل ارجاع' as type,
-                    file_name,
-                    analyzed_at as date,
-                    'سیستم' as user,
-                    completion_rate as score,
-                    'info' as status
-                FROM referral_analyses 
-                WHERE analyzed_at IS NOT NULL
-                ORDER BY analyzed_at DESC 
-                LIMIT 10
-            """)
+            cursor.execute(RECENT_REFERRALS_QUERY)
             referrals = cursor.fetchall()
         except:
             referrals = []
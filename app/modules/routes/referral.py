@@ -7,7 +7,11 @@ from modules.file_handler import FileHandler
 from modules.openai_client import OpenAIClient
 from modules.models import ReferralAnalysisModel
 from modules.config import Config
-from modules.database import get_db_connection  # اضافه کردن این خط
+from modules.database import mark_write
+from modules.utils.streaming import stream_json_array, sse_response, analysis_event_stream
+from modules.routes.jobs import enqueue_upload
+from modules.llm_usage import UsageBatch
+from modules import referral_stats
 
 referral_bp = Blueprint('referral', __name__)
 file_handler = FileHandler(Config.UPLOAD_FOLDER)
@@ -30,6 +34,11 @@ def referral_history_page():
 def analyze_referral():
     """API برای تحلیل فایل ارجاعیات"""
     file_info = None
+    usage = UsageBatch('referral')
+    
+    # async=1: فقط ثبت در صف و برگرداندن شناسه کار (پردازش توسط worker.py)
+    if request.values.get('async', '').lower() in ('1', 'true', 'yes'):
+        return enqueue_upload('referral')
     
     try:
         # بررسی وجود فایل
@@ -47,25 +56,31 @@ def analyze_referral():
         # ذخیره فایل
         file_info = file_handler.save_file(file)
         
-        # استخراج متن
-        content = file_handler.extract_text(file_info['path'], file_info['name'])
+        # استخراج متن (جدول‌ها به TSV فشرده)
+        content, compaction = file_handler.extract_prompt_text(file_info['path'], file_info['name'])
         
         if not content or len(content.strip()) < 50:
             file_handler.delete_file(file_info['path'])
             return jsonify({"error": "محتوای فایل خالی یا ناقص است"}), 400
         
-        # تحلیل با AI
-        analysis = ai_client.analyze_referral(content)
+        # تحلیل با AI (no_cache=1 کش نتایج را نادیده می‌گیرد)
+        use_cache = request.values.get('no_cache', '').lower() not in ('1', 'true', 'yes')
+        # شمارش‌ها از خود فایل Excel (آمار محلی) و فقط تحلیل روایی از مدل
+        stats = referral_stats.from_file(file_info['path'], file_info['name'])
+        analysis = ai_client.analyze_referral(content, use_cache=use_cache, usage=usage, stats=stats)
         
         if analysis.get('error'):
             file_handler.delete_file(file_info['path'])
+            usage.save(None)
             return jsonify(analysis), 400
         
         analysis['analyzed_at'] = datetime.now().isoformat()
         analysis['file_name'] = file_info['name']
+        analysis['prompt_compaction'] = compaction
         
         # ذخیره در دیتابیس
         analysis_id = ReferralAnalysisModel.save(file_info, analysis)
+        usage.save(analysis_id)
         
         if analysis_id:
             analysis['id'] = analysis_id
@@ -80,19 +95,50 @@ def analyze_referral():
         
         if file_info and os.path.exists(file_info['path']):
             file_handler.delete_file(file_info['path'])
+        usage.save(None)
         
         return jsonify({
             "error": True,
             "message": str(e)
         }), 500
 
+@referral_bp.route('/api/analyze-referral/stream', methods=['POST'])
+@login_required
+def analyze_referral_stream():
+    """نسخه Server-Sent Events تحلیل فایل ارجاعیات: مراحل پیشرفت و بخش‌های JSON به محض آماده شدن"""
+    if 'file' not in request.files:
+        return jsonify({"error": "فایلی آپلود نشده است"}), 400
+    
+    file = request.files['file']
+    
+    if file.filename == '':
+        return jsonify({"error": "فایل انتخاب نشده است"}), 400
+    
+    if not file_handler.allowed_file(file.filename):
+        return jsonify({"error": "نوع فایل مجاز نیست"}), 400
+    
+    file_info = file_handler.save_file(file)
+    use_cache = request.values.get('no_cache', '').lower() not in ('1', 'true', 'yes')
+    usage = UsageBatch('referral')
+    
+    # ذخیره در انتهای جریان و بعد از ارسال کوکی session انجام می‌شود؛ read-your-writes از همین حالا
+    mark_write(ahead=Config.LLM_TIMEOUTS['analysis'])
+    return sse_response(analysis_event_stream(
+        file_info, file_handler,
+        lambda content: ai_client.analyze_referral_stream(
+            content, use_cache=use_cache, usage=usage,
+            stats=referral_stats.from_file(file_info['path'], file_info['name'])
+        ),
+        ReferralAnalysisModel.save,
+        usage
+    ))
+
 @referral_bp.route('/api/referral-history')
 @login_required
 def get_referral_history():
     """دریافت تاریخچه تحلیل‌های ارجاعیات"""
     try:
-        analyses = ReferralAnalysisModel.get_all()
-        return jsonify(analyses)
+        return stream_json_array(ReferralAnalysisModel.iter_all())
     except Exception as e:
         print(f"❌ خطا: {str(e)}")
         return jsonify([])
@@ -121,36 +167,12 @@ def get_referral_analysis(analysis_id):
 @login_required
 def delete_referral_analysis(analysis_id):
     """حذف یک تحلیل ارجاعیات به همراه فایل مرتبط"""
-    conn = None
-    cursor = None
-    file_path = None
-    
     try:
-        # اتصال به دیتابیس
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({"error": "خطا در اتصال به دیتابیس"}), 500
-        
-        cursor = conn.cursor(dictionary=True)
-        
-        # دریافت اطلاعات فایل قبل از حذف
-        cursor.execute("SELECT file_path FROM referral_analyses WHERE id = %s", (analysis_id,))
-        result = cursor.fetchone()
-        
-        if not result:
-            cursor.close()
-            conn.close()
+        # حذف تحلیل و جزئیات آن در یک تراکنش
+        file_path = ReferralAnalysisModel.delete(analysis_id)
+        if file_path is None:
             return jsonify({"error": "تحلیل یافت نشد"}), 404
         
-        file_path = result['file_path']
-        
-        # حذف از دیتابیس
-        cursor.execute("DELETE FROM referral_analyses WHERE id = %s", (analysis_id,))
-        conn.commit()
-        
-        cursor.close()
-        conn.close()
-        
         # حذف فایل از روی دیسک
         if file_path and os.path.exists(file_path):
             os.remove(file_path)
@@ -166,14 +188,6 @@ def delete_referral_analysis(analysis_id):
         print(f"❌ خطا در حذف تحلیل: {str(e)}")
         import traceback
         traceback.print_exc()
-        
-        if conn:
-            conn.rollback()
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-            
         return jsonify({
             "error": True,
             "message": str(e)
@@ -199,55 +213,66 @@ def get_latest_referral_analysis():
 @login_required
 def download_referral_report(analysis_id):
     """دانلود گزارش Excel از تحلیل ارجاعیات"""
+    output = None
     try:
         analysis = ReferralAnalysisModel.get_by_id(analysis_id)
         
         if not analysis:
             return jsonify({"error": "یافت نشد"}), 404
         
-        # ایجاد گزارش Excel
-        import pandas as pd
-        from io import BytesIO
-        
-        output = BytesIO()
-        
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            # برگه خلاصه
-            summary_df = pd.DataFrame([{
-                'نام فایل': analysis['file_name'],
-                'تاریخ تحلیل': analysis['analyzed_at'],
-                'کل ارجاعات': analysis['total_referrals'],
-                'اتمام یافته': analysis['completed_count'],
-                'بررسی نشده': analysis['pending_count'],
-                'درصد موفقیت': f"{analysis['completion_rate']:.1f}%"
-            }])
-            summary_df.to_excel(writer, sheet_name='خلاصه', index=False)
+        # ایجاد گزارش Excel در حالت write-only در فایل موقت روی دیسک؛ send_file آن را تکه‌تکه
+        # می‌فرستد و بعد از ارسال می‌بندد (فایل موقت حذف می‌شود)، پس کل گزارش در حافظه نمی‌ماند
+        from openpyxl import Workbook
+        from tempfile import TemporaryFile
+        
+        output = TemporaryFile()
+        wb = Workbook(write_only=True)
+        
+        # برگه خلاصه
+        ws = wb.create_sheet('خلاصه')
+        ws.append(['نام فایل', 'تاریخ تحلیل', 'کل ارجاعات', 'اتمام یافته', 'بررسی نشده', 'درصد موفقیت'])
+        ws.append([
+            analysis['file_name'],
+            analysis['analyzed_at'],
+            analysis['total_referrals'],
+            analysis['completed_count'],
+            analysis['pending_count'],
+            f"{analysis['completion_rate'] or 0:.1f}%"
+        ])
+        
+        # برگه جزئیات (از full_analysis)
+        if analysis.get('full_analysis'):
+            full = json.loads(analysis['full_analysis']) if isinstance(analysis['full_analysis'], str) else analysis['full_analysis']
             
-            # برگه جزئیات (از full_analysis)
-            if analysis.get('full_analysis'):
-                full = json.loads(analysis['full_analysis']) if isinstance(analysis['full_analysis'], str) else analysis['full_analysis']
-                
-                # وضعیت‌ها
-                status_dist = full.get('status_analysis', {}).get('status_distribution', {})
-                if status_dist:
-                    status_df = pd.DataFrame([
-                        {'وضعیت': k, 'تعداد': v} 
-                        for k, v in status_dist.items()
-                    ])
-                    status_df.to_excel(writer, sheet_name='وضعیت‌ها', index=False)
-                
-                # موضوعات
-                subjects = full.get('subject_analysis', {}).get('unique_subjects', [])
-                if subjects:
-                    subject_df = pd.DataFrame(subjects)
-                    subject_df.to_excel(writer, sheet_name='موضوعات', index=False)
-                
-                # توصیه‌ها
-                recs = full.get('comprehensive_insights', {}).get('recommendations_fa', [])
-                if recs:
-                    rec_df = pd.DataFrame({'توصیه‌ها': recs})
-                    rec_df.to_excel(writer, sheet_name='توصیه‌ها', index=False)
-        
+            # وضعیت‌ها
+            status_dist = full.get('status_analysis', {}).get('status_distribution', {})
+            if status_dist:
+                ws = wb.create_sheet('وضعیت‌ها')
+                ws.append(['وضعیت', 'تعداد'])
+                for k, v in status_dist.items():
+                    ws.append([k, v])
+            
+            # موضوعات
+            subjects = [
+                item for item in full.get('subject_analysis', {}).get('unique_subjects', [])
+                if isinstance(item, dict)
+            ]
+            if subjects:
+                ws = wb.create_sheet('موضوعات')
+                columns = list(dict.fromkeys(key for item in subjects for key in item))
+                ws.append(columns)
+                for item in subjects:
+                    ws.append([item.get(col) for col in columns])
+            
+            # توصیه‌ها
+            recs = full.get('comprehensive_insights', {}).get('recommendations_fa', [])
+            if recs:
+                ws = wb.create_sheet('توصیه‌ها')
+                ws.append(['توصیه‌ها'])
+                for rec in recs:
+                    ws.append([rec])
+        
+        wb.save(output)
         output.seek(0)
         
         return send_file(
@@ -259,4 +284,6 @@ def download_referral_report(analysis_id):
         
     except Exception as e:
         print(f"❌ خطا: {str(e)}")
+        if output is not None:
+            output.close()
         return jsonify({"error": str(e)}), 500
\ No newline at end of file
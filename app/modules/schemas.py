@@ -0,0 +1,283 @@
+# modules/schemas.py
+"""
+ساختار خروجی تحلیل‌های CRM و ارجاعیات؛ یک تعریف برای همه کاربردها:
+
+    response_format('crm')  ← JSON schema سخت‌گیرانه (structured outputs) برای درخواست OpenAI
+    validate('crm', data)   ← تطبیق پاسخ با ساختار: فیلدهای ناموجود مقدار پیش‌فرض می‌گیرند،
+                              رشته‌های عددی ("60%"، "۱۲") عدد می‌شوند؛ خروجی: (داده، لیست ایرادها)
+    normalize('crm', data)  ← همان validate بدون ایرادها (برای مدل‌ها قبل از ذخیره)
+    encode('crm', data)     ← پاسخ به شکل structured outputs (سرور آزمایشی scripts/openai_stub.py)
+
+خروجی validate همیشه همان شکل تعریف‌شده را دارد، پس کد مصرف‌کننده به بررسی نوع نیاز ندارد.
+کلیدهای اضافه (analyzed_at، file_name، id) حفظ می‌شوند.
+
+دیکشنری‌های با کلید آزاد (انواع_تماس، status_distribution) در structured outputs مجاز نیستند؛
+Map در schema به شکل لیست [{key، value}] ارسال و در validate دوباره دیکشنری می‌شود.
+"""
+import re
+
+STRING = 'string'
+NUMBER = 'number'
+INTEGER = 'integer'
+
+_NUMBER_PATTERN = re.compile(r'-?\d+(?:\.\d+)?')
+_PERSIAN_DIGITS = str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩٫', '01234567890123456789.')
+
+
+class Map:
+    """دیکشنری با کلیدهای متنی آزاد و مقادیر از نوع value"""
+
+    def __init__(self, value):
+        self.value = value
+
+
+def _names(spec, names):
+    """{نام: spec} برای کلیدهای هم‌نوع"""
+    return {name: spec for name in names}
+
+
+_SCORE_REASONS = _names([STRING], (
+    'برقراری_ارتباط', 'نیازسنجی', 'ارزش_فروشی', 'مدیریت_اعتراض', 'شفافیت_قیمت',
+    'بستن_فروش', 'پیگیری', 'همسویی_احساسی', 'شنوندگی'
+))
+
+CRM_SCHEMA = {
+    'فیلدهای_عددی': _names(NUMBER, (
+        'امتیاز_کل', 'امتیاز_برقراری_ارتباط', 'امتیاز_نیازسنجی', 'امتیاز_ارزش_فروشی',
+        'امتیاز_مدیریت_اعتراض', 'امتیاز_شفافیت_قیمت', 'امتیاز_بستن_فروش', 'امتیاز_پیگیری',
+        'امتیاز_همسویی_احساسی', 'امتیاز_شنوندگی', 'کیفیت_لید_درصد', 'تعداد_سوالات_باز',
+        'تعداد_اعتراض', 'درصد_پاسخ_موفق_به_اعتراض', 'تعداد_تلاش_برای_بستن', 'امتیاز_احساس_مشتری',
+        'آمادگی_بستن_درصد', 'چگالی_اطلاعات_فنی_فروشنده_درصد', 'چگالی_اطلاعات_فنی_مشتری_درصد',
+        'disc_d', 'disc_i', 'disc_s', 'disc_c', 'حساسیت_قیمت_مشتری_درصد', 'حساسیت_ریسک_مشتری_درصد',
+        'حساسیت_زمان_مشتری_درصد', 'تعداد_بله_پله_ای'
+    )),
+    'فیلدهای_متنی': {
+        **_names(STRING, (
+            'نام_فروشنده', 'کد_فروشنده', 'نام_مشتری', 'مدت_تماس', 'نوع_تماس_جهت', 'نوع_تماس_مرحله',
+            'نوع_تماس_گرمی', 'نوع_تماس_ماهیت', 'محصول', 'سطح_فروشنده', 'disc_تیپ'
+        )),
+        'disc_شواهد': [STRING],
+        **_names(STRING, (
+            'disc_راهنما', 'ترجیح_کانال', 'سطح_آگاهی_مشتری', 'نسبت_زمان_صحبت_مشتری_به_فروشنده',
+            'نسبت_زمان_صحبت_فروشنده_به_مشتری', 'خلاصه', 'تحلیل_شخصیت_مشتری',
+            'ارزیابی_عملکرد_فردی_فروشنده', 'تشخیص_آمادگی', 'اقدام_بعدی'
+        ))
+    },
+    'دلایل_کاهش_امتیازها': _SCORE_REASONS,
+    'دلایل_کسب_امتیازها': _SCORE_REASONS,
+    'لیست_ها': _names([STRING], (
+        'کلمات_مثبت', 'کلمات_منفی', 'ریسک_ها', 'نقاط_قوت', 'نقاط_ضعف', 'اعتراضات', 'تکنیکها',
+        'پارامترهای_رعایت_نشده', 'اشتباهات_رایج'
+    )),
+    'آمار': {
+        'تعداد_کل_تماس_ها': INTEGER,
+        'تماس_های_موفق': INTEGER,
+        'تماس_های_بی_پاسخ': INTEGER,
+        'تماس_های_ارجاعی': INTEGER,
+        'کاربران_فعال': [{'نام': STRING, 'تعداد_تماس': INTEGER, 'یادداشت_عملکرد': STRING}],
+        'مشتریان_پرتماس': [{'نام': STRING, 'تعداد_تماس': INTEGER, 'کیفیت_تعامل': STRING}],
+        'انواع_تماس': Map(INTEGER)
+    },
+    'بهترین_ها': {
+        'بهترین_فروشنده': {'نام': STRING, 'دلیل': STRING},
+        'بهترین_مشتری': {'نام': STRING, 'دلیل': STRING}
+    }
+}
+
+REFERRAL_SCHEMA = {
+    'status_analysis': {
+        'percent_pending': NUMBER,
+        'most_frequent_status': STRING,
+        'frequent_status_count': INTEGER,
+        'avg_days_pending': NUMBER,
+        'worst_sender_pending': {'unit': STRING, 'count': INTEGER},
+        'percent_completed': NUMBER,
+        'receiver_with_most_in_progress': {'receiver': STRING, 'count': INTEGER},
+        'status_distribution': Map(INTEGER),
+        'status_with_lowest_frequency': STRING,
+        'lowest_frequency_count': INTEGER
+    },
+    'subject_analysis': {
+        'most_frequent_subject': STRING,
+        'subject_frequency': INTEGER,
+        'second_most_frequent': STRING,
+        'second_frequency': INTEGER,
+        'subject_pending': Map(INTEGER),
+        'subject_response_time': Map(NUMBER),
+        'unique_subjects': [{'subject': STRING, 'count': INTEGER}]
+    },
+    'sender_receiver_analysis': {
+        'top_senders': [{'sender': STRING, 'count': INTEGER, 'completion_rate': NUMBER}],
+        'top_receivers': [{'receiver': STRING, 'count': INTEGER, 'pending': INTEGER}],
+        'common_pairs': [{'from': STRING, 'to': STRING, 'count': INTEGER}]
+    },
+    'institution_analysis': {
+        'top_institutions': [{'name': STRING, 'count': INTEGER, 'subs': INTEGER, 'completion_rate': NUMBER}],
+        'subscription_correlation': NUMBER
+    },
+    'description_analysis': {
+        'percent_with_description': NUMBER,
+        'avg_description_length': NUMBER,
+        'top_keywords': [{'word': STRING, 'count': INTEGER, 'completion_rate': NUMBER}]
+    },
+    'comprehensive_insights': {
+        'completion_factors': [STRING],
+        'top_bottlenecks': [{'bottleneck': STRING, 'pending_count': INTEGER, 'impact': STRING}],
+        'top_strengths': [STRING],
+        'workflow_health_score': NUMBER,
+        'summary_fa': STRING,
+        'recommendations_fa': [STRING]
+    }
+}
+
+SCHEMAS = {
+    'crm': CRM_SCHEMA,
+    'referral': REFERRAL_SCHEMA,
+    # آمار با جدول تماس‌ها (modules/crm_stats.py) محاسبه می‌شود
+    'crm_insights': {name: spec for name, spec in CRM_SCHEMA.items() if name != 'آمار'},
+    # بقیه بخش‌ها با آمار محلی (modules/referral_stats.py) محاسبه می‌شوند
+    'referral_insights': {'comprehensive_insights': REFERRAL_SCHEMA['comprehensive_insights']}
+}
+
+
+def _spec(schema):
+    return SCHEMAS[schema] if isinstance(schema, str) else schema
+
+
+def json_schema(spec):
+    """تبدیل تعریف به JSON schema سخت‌گیرانه (همه کلیدها required، بدون کلید اضافه)"""
+    if isinstance(spec, Map):
+        return {'type': 'array', 'items': json_schema({'key': STRING, 'value': spec.value})}
+    if isinstance(spec, dict):
+        return {
+            'type': 'object',
+            'properties': {name: json_schema(value) for name, value in spec.items()},
+            'required': list(spec),
+            'additionalProperties': False
+        }
+    if isinstance(spec, list):
+        return {'type': 'array', 'items': json_schema(spec[0])}
+    return {'type': spec}
+
+
+def response_format(schema):
+    """پارامتر response_format درخواست chat برای تحلیل crm یا referral"""
+    return {
+        'type': 'json_schema',
+        'json_schema': {
+            'name': f'{schema}_analysis',
+            'strict': True,
+            'schema': json_schema(SCHEMAS[schema])
+        }
+    }
+
+
+def default(spec):
+    """مقدار خالی هر نوع"""
+    if isinstance(spec, Map):
+        return {}
+    if isinstance(spec, dict):
+        return {name: default(value) for name, value in spec.items()}
+    if isinstance(spec, list):
+        return []
+    return '' if spec == STRING else 0
+
+
+def _to_number(value, spec):
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, (int, float)):
+        return int(round(value)) if spec == INTEGER else value
+    if isinstance(value, str):
+        match = _NUMBER_PATTERN.search(value.translate(_PERSIAN_DIGITS).replace(',', ''))
+        if match:
+            return _to_number(float(match.group()), spec)
+    return None
+
+
+def _validate(spec, value, path, problems):
+    if isinstance(spec, Map):
+        if isinstance(value, list):
+            # شکل structured outputs: [{key، value}]
+            pairs = [(item.get('key'), item.get('value')) for item in value if isinstance(item, dict)]
+        elif isinstance(value, dict):
+            pairs = list(value.items())
+        else:
+            problems.append(f"{path}: دیکشنری نیست")
+            return {}
+        return {str(key): _validate(spec.value, item, f"{path}.{key}", problems)
+                for key, item in pairs if key not in (None, '')}
+
+    if isinstance(spec, dict):
+        if isinstance(value, list) and all(isinstance(item, dict) for item in value):
+            # بعضی پاسخ‌ها به جای دیکشنری، لیستی از دیکشنری‌های تک‌کلیدی برمی‌گردانند
+            merged = {}
+            for item in value:
+                merged.update(item)
+            value = merged
+        elif isinstance(value, str) and next(iter(spec.values())) == STRING:
+            # مثلاً "بهترین_فروشنده": "پایان" به جای {"نام": "پایان", ...}
+            value = {next(iter(spec)): value}
+        if not isinstance(value, dict):
+            problems.append(f"{path}: دیکشنری نیست")
+            return default(spec)
+        result = dict(value)
+        for name, item_spec in spec.items():
+            if name not in value or value[name] is None:
+                problems.append(f"{path}.{name}: وجود ندارد")
+                result[name] = default(item_spec)
+            else:
+                result[name] = _validate(item_spec, value[name], f"{path}.{name}", problems)
+        return result
+
+    if isinstance(spec, list):
+        if isinstance(value, str) and spec[0] == STRING:
+            return [part.strip() for part in value.replace('،', ',').split(',') if part.strip()]
+        if not isinstance(value, list):
+            problems.append(f"{path}: لیست نیست")
+            return []
+        return [_validate(spec[0], item, f"{path}[{index}]", problems) for index, item in enumerate(value)]
+
+    if spec == STRING:
+        if isinstance(value, list):
+            return '، '.join(str(item) for item in value)
+        return value if isinstance(value, str) else str(value)
+
+    number = _to_number(value, spec)
+    if number is None:
+        problems.append(f"{path}: عدد نیست ({str(value)[:30]})")
+        return 0
+    return number
+
+
+def validate(schema, data):
+    """تطبیق data با ساختار schema ('crm'، 'referral' یا تعریف)؛ خروجی: (داده همیشه هم‌شکل، ایرادها)"""
+    problems = []
+    return _validate(_spec(schema), data, schema if isinstance(schema, str) else '', problems), problems
+
+
+def normalize(schema, data):
+    """داده هم‌شکل با schema (ایرادها نادیده گرفته می‌شوند)"""
+    return validate(schema, data)[0]
+
+
+def validate_section(schema, name, value):
+    """تطبیق یک بخش سطح اول (رویداد section در stream)"""
+    spec = SCHEMAS[schema].get(name)
+    return value if spec is None else _validate(spec, value, name, [])
+
+
+def _encode(spec, value):
+    if isinstance(spec, Map):
+        return [{'key': key, 'value': _encode(spec.value, item)} for key, item in value.items()]
+    if isinstance(spec, dict):
+        return {name: _encode(item_spec, value[name]) for name, item_spec in spec.items()}
+    if isinstance(spec, list):
+        return [_encode(spec[0], item) for item in value]
+    return value
+
+
+def encode(schema, data):
+    """عکس validate: داده هم‌شکل به شکل structured outputs (Mapها به صورت [{key، value}])"""
+    spec = _spec(schema)
+    return _encode(spec, _validate(spec, data, '', []))
@@ -0,0 +1,361 @@
+# modules/sqlite_backend.py
+"""
+بک‌اند SQLite برای نصب‌های تک‌نودی و بنچمارک‌ها.
+
+اتصال و کرسر همان رابطی را دارند که کد برنامه از mysql.connector استفاده می‌کند
+(cursor(dictionary=True)، placeholder های %s، lastrowid، fetchmany و ...) تا
+execute_query و get_db_connection بدون تغییر روی هر دو بک‌اند کار کنند.
+"""
+import json
+import re
+import sqlite3
+from datetime import datetime, date
+
+# ---------------- تبدیل نوع‌ها ----------------
+
+def _adapt_datetime(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _convert_datetime(raw):
+    text = raw.decode()
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return text
+
+
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+for _type_name in ('DATETIME', 'TIMESTAMP'):
+    sqlite3.register_converter(_type_name, _convert_datetime)
+
+
+# ---------------- توابع MySQL ----------------
+
+_DATE_FORMAT_MAP = {
+    '%Y': '%Y', '%y': '%y', '%m': '%m', '%c': '%m', '%d': '%d', '%e': '%d',
+    '%H': '%H', '%k': '%H', '%i': '%M', '%s': '%S', '%S': '%S',
+    '%u': '%W', '%U': '%U', '%j': '%j', '%W': '%A', '%M': '%B', '%%': '%%'
+}
+
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _date_format(value, mysql_format):
+    """معادل DATE_FORMAT در MySQL"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = _convert_datetime(value.encode())
+        if isinstance(value, str):
+            return None
+    python_format = re.sub(r'%.', lambda m: _DATE_FORMAT_MAP.get(m.group(0), m.group(0)), mysql_format)
+    return value.strftime(python_format)
+
+
+def _json_length(value):
+    """معادل JSON_LENGTH در MySQL"""
+    if value is None:
+        return None
+    try:
+        return len(json.loads(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _register_functions(conn):
+    """توابع MySQL مورد استفاده در کوئری‌ها و migrationها"""
+    conn.create_function('NOW', 0, _now)
+    conn.create_function('DATE_FORMAT', 2, _date_format)
+    conn.create_function('JSON_LENGTH', 1, _json_length)
+
+
+# ---------------- ترجمه SQL ----------------
+
+_INTERVAL_UNITS = {
+    'SECOND': ('seconds', 1), 'MINUTE': ('minutes', 1), 'HOUR': ('hours', 1),
+    'DAY': ('days', 1), 'WEEK': ('days', 7), 'MONTH': ('months', 1), 'YEAR': ('years', 1)
+}
+_DATE_ARITH = re.compile(
+    r"DATE_(SUB|ADD)\(\s*NOW\(\)\s*,\s*INTERVAL\s+(\d+|%s)\s+(SECOND|MINUTE|HOUR|DAY|WEEK|MONTH|YEAR)\s*\)",
+    re.IGNORECASE
+)
+
+
+def _date_arith(match):
+    sign = '-' if match.group(1).upper() == 'SUB' else '+'
+    amount = match.group(2)
+    unit, factor = _INTERVAL_UNITS[match.group(3).upper()]
+    if amount == '%s':
+        amount_sql = f"('{sign}' || (%s * {factor}) || ' {unit}')"
+    else:
+        amount_sql = f"'{sign}{int(amount) * factor} {unit}'"
+    return f"datetime('now', 'localtime', {amount_sql})"
+
+
+def translate_query(query, has_params):
+    """تبدیل دیالکت MySQL کوئری‌های برنامه به SQLite"""
+    query = _DATE_ARITH.sub(_date_arith, query)
+    query = re.sub(r'\bFOR UPDATE( SKIP LOCKED)?', '', query, flags=re.IGNORECASE)
+    if re.match(r'\s*EXPLAIN\s', query, re.IGNORECASE) and 'QUERY PLAN' not in query.upper():
+        query = re.sub(r'^\s*EXPLAIN\s', 'EXPLAIN QUERY PLAN ', query, count=1, flags=re.IGNORECASE)
+    if has_params:
+        # مثل mysql.connector: فقط وقتی پارامتر داریم %% و %s تفسیر می‌شوند
+        query = re.sub(r'%%|%s', lambda m: '%' if m.group(0) == '%%' else '?', query)
+    return query
+
+
+def _split_statements(sql_text):
+    lines = [line for line in sql_text.splitlines() if not line.strip().startswith('--')]
+    statements = [stmt.strip() for stmt in '\n'.join(lines).split(';')]
+    return [stmt for stmt in statements if stmt]
+
+
+_INLINE_INDEX = re.compile(r'^(?:INDEX|KEY)\s+`?(\w+)`?\s*\((.+)\)$', re.IGNORECASE)
+_UNIQUE_KEY = re.compile(r'^UNIQUE\s+KEY\s+`?\w+`?\s*(\(.+\))$', re.IGNORECASE)
+_CREATE_TABLE = re.compile(r'CREATE TABLE (IF NOT EXISTS )?`?(\w+)`?', re.IGNORECASE)
+_ALTER_ADD_INDEX = re.compile(
+    r'^ALTER TABLE\s+`?(\w+)`?\s+ADD\s+(UNIQUE\s+)?(?:INDEX|KEY)\s+`?(\w+)`?\s*\((.+)\)$',
+    re.IGNORECASE | re.DOTALL
+)
+
+_CREATE_TABLE_LIKE = re.compile(r'^CREATE TABLE (?:IF NOT EXISTS )?`?(\w+)`?\s+LIKE\s+`?(\w+)`?$', re.IGNORECASE)
+_CREATE_OR_REPLACE_VIEW = re.compile(r'^CREATE OR REPLACE VIEW\s+`?(\w+)`?\s+AS\s+(.+)$', re.IGNORECASE | re.DOTALL)
+_ALTER_ADD_COLUMN = re.compile(r'^ALTER TABLE\s+`?(\w+)`?\s+ADD\s+COLUMN\s+(.+)$', re.IGNORECASE | re.DOTALL)
+
+
+def _translate_column(line):
+    """ترجمه تعریف ستون MySQL به SQLite"""
+    line = re.sub(r'\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b', 'INTEGER PRIMARY KEY AUTOINCREMENT', line, flags=re.I)
+    line = re.sub(r'\bINT\s+PRIMARY\s+KEY\s+AUTO_INCREMENT\b', 'INTEGER PRIMARY KEY AUTOINCREMENT', line, flags=re.I)
+    line = re.sub(r'\bINT\s+AUTO_INCREMENT\b', 'INTEGER PRIMARY KEY AUTOINCREMENT', line, flags=re.I)
+    line = re.sub(r'\bENUM\s*\([^)]*\)', 'TEXT', line, flags=re.I)
+    line = re.sub(r'\bJSON\b', 'TEXT', line)
+    line = re.sub(r'\b(?:LONG|MEDIUM)BLOB\b', 'BLOB', line, flags=re.I)
+    line = re.sub(r'\bON UPDATE CURRENT_TIMESTAMP\b', '', line, flags=re.I)
+    line = re.sub(r'\bDEFAULT\s+(?:CURRENT_TIMESTAMP|NOW\(\))', "DEFAULT (datetime('now', 'localtime'))", line, flags=re.I)
+    line = re.sub(r'\bCHARACTER SET \w+|\bCOLLATE \w+', '', line, flags=re.I)
+    line = re.sub(r'\s+AFTER\s+`?\w+`?\s*$', '', line, flags=re.I)
+    return line
+
+
+def _table_body(stmt):
+    """متن بین پرانتز اصلی CREATE TABLE (ENGINE و PARTITION بعد از آن حذف می‌شوند)"""
+    start = stmt.index('(')
+    depth = 0
+    for position in range(start, len(stmt)):
+        if stmt[position] == '(':
+            depth += 1
+        elif stmt[position] == ')':
+            depth -= 1
+            if depth == 0:
+                return stmt[:start], stmt[start + 1:position]
+    raise ValueError("پرانتز CREATE TABLE بسته نشده است")
+
+
+def _translate_create_table(stmt):
+    """(نام جدول، head، ستون‌ها، ایندکس‌ها) برای یک CREATE TABLE"""
+    table = _CREATE_TABLE.search(stmt).group(2)
+    head, body = _table_body(stmt)
+    columns, indexes, primary_key = [], [], None
+    for raw in re.split(r',\s*\n', body):
+        line = raw.strip().rstrip(',')
+        if not line:
+            continue
+        index_match = _INLINE_INDEX.match(line)
+        unique_match = _UNIQUE_KEY.match(line)
+        if index_match:
+            indexes.append(index_match.groups())
+        elif unique_match:
+            columns.append(f"UNIQUE {unique_match.group(1)}")
+        elif re.match(r'^PRIMARY KEY\s*\(', line, re.I):
+            primary_key = line
+        else:
+            columns.append(_translate_column(line))
+    # کلید ترکیبی (id, analyzed_at) جداول پارتیشن‌شده: در SQLite فقط id کلید است
+    if primary_key and not any('PRIMARY KEY' in column for column in columns):
+        columns.append(primary_key)
+    return table, head.strip(), columns, indexes
+
+
+def _create_statements(head, table, columns, indexes):
+    create = f"{head} (\n    " + ',\n    '.join(columns) + "\n)"
+    return [create] + [
+        f"CREATE INDEX IF NOT EXISTS {table}_{name} ON {table} ({cols})" for name, cols in indexes
+    ]
+
+
+def translate_schema(sql_text):
+    """ترجمه database_schema.sql (و migrationها) به دستورات SQLite"""
+    statements = []
+    tables = {}
+    for stmt in _split_statements(sql_text):
+        upper = stmt.upper()
+        if upper.startswith(('CREATE DATABASE', 'USE ', 'SET ', 'PREPARE ', 'EXECUTE ', 'DEALLOCATE ')):
+            continue
+        like = _CREATE_TABLE_LIKE.match(stmt)
+        if like:
+            new_table, source = like.groups()
+            if source in tables:
+                _, columns, indexes = tables[source]
+                statements.extend(_create_statements(f"CREATE TABLE IF NOT EXISTS {new_table}", new_table, columns, indexes))
+            continue
+        if upper.startswith('CREATE TABLE'):
+            table, head, columns, indexes = _translate_create_table(stmt)
+            tables[table] = (head, columns, indexes)
+            statements.extend(_create_statements(head, table, columns, indexes))
+            continue
+        view = _CREATE_OR_REPLACE_VIEW.match(stmt)
+        if view:
+            name, body = view.groups()
+            statements.append(f"DROP VIEW IF EXISTS {name}")
+            statements.append(f"CREATE VIEW {name} AS {body}")
+            continue
+        alter_index = _ALTER_ADD_INDEX.match(stmt)
+        if alter_index:
+            table, unique, name, cols = alter_index.groups()
+            statements.append(
+                f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {table}_{name} ON {table} ({cols})"
+            )
+            continue
+        add_column = _ALTER_ADD_COLUMN.match(stmt)
+        if add_column:
+            table, column = add_column.groups()
+            statements.append(f"ALTER TABLE {table} ADD COLUMN {_translate_column(column)}")
+            continue
+        if upper.startswith(('ALTER TABLE', 'CREATE PROCEDURE', 'CREATE EVENT')):
+            # ساختارهای مختص MySQL (پارتیشن، تغییر ستون و ...) در SQLite لازم نیستند
+            continue
+        statements.append(stmt)
+    return statements
+
+
+# ---------------- اتصال و کرسر ----------------
+
+class SQLiteCursor:
+    """کرسر با رابط mysql.connector روی sqlite3"""
+
+    def __init__(self, conn, dictionary=False):
+        self._cursor = conn.cursor()
+        self._dictionary = dictionary
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def execute(self, query, params=None):
+        self._cursor.execute(translate_query(query, bool(params)), tuple(params or ()))
+        return None
+
+    def executemany(self, query, seq_params):
+        self._cursor.executemany(translate_query(query, True), [tuple(p) for p in seq_params])
+        return None
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        for row in self._cursor:
+            yield self._row(row)
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """اتصال SQLite با رابط مورد استفاده برنامه از mysql.connector"""
+
+    unread_result = False
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(
+            path,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,  # اتصال بین تردها از طریق استخر جابه‌جا می‌شود
+            timeout=30
+        )
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA foreign_keys=ON')
+        _register_functions(self._conn)
+
+    def cursor(self, dictionary=False, buffered=None):
+        return SQLiteCursor(self._conn, dictionary=dictionary)
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def start_transaction(self):
+        self._conn.execute('BEGIN IMMEDIATE')
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def consume_results(self):
+        pass
+
+    def ping(self, reconnect=False):
+        self._conn.execute('SELECT 1').fetchone()
+
+    def is_connected(self):
+        try:
+            self.ping()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def close(self):
+        self._conn.close()
+
+
+def connect(path):
+    """اتصال جدید به فایل SQLite در حالت WAL"""
+    return SQLiteConnection(path)
+
+
+def init_schema(path, schema_paths):
+    """ساخت جداول از روی فایل‌های schema در MySQL"""
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute('PRAGMA journal_mode=WAL')
+        _register_functions(conn)
+        for schema_path in schema_paths:
+            with open(schema_path, encoding='utf-8') as f:
+                for stmt in translate_schema(f.read()):
+                    try:
+                        conn.execute(stmt)
+                    except sqlite3.OperationalError as e:
+                        # اجرای دوباره روی دیتابیس موجود
+                        if 'already exists' not in str(e) and 'duplicate column' not in str(e):
+                            raise
+        conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,24 @@
+# modules/table_utils.py
+"""
+توابع مشترک خواندن جدول‌های گزارش (referral_stats و crm_stats).
+
+    cells = [clean_text(value) for value in row]      # یکسان‌سازی ی/ک و فاصله‌ها
+    counts = value_counts(df['status'])               # Series مرتب و تکرارپذیر
+"""
+import re
+
+_ARABIC_LETTERS = str.maketrans({'ي': 'ی', 'ك': 'ک', '‌': ' '})
+
+
+def clean_text(value):
+    """متن تمیز سلول: None به ''، حروف عربی به فارسی و فاصله‌های پشت سر هم به یک فاصله"""
+    if value is None:
+        return ''
+    text = str(value).translate(_ARABIC_LETTERS)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def value_counts(series):
+    """تعداد هر مقدار غیرخالی؛ نزولی و در تساوی به ترتیب الفبا (خروجی تکرارپذیر)"""
+    counts = series[series != ''].value_counts()
+    return counts.sort_index(kind='stable').sort_values(ascending=False, kind='stable')
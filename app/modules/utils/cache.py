@@ -0,0 +1,51 @@
+import threading
+import time
+
+
+class TTLCache:
+    """کش read-through درون پروسس با زمان انقضا
+
+    هر کلید تا ttl ثانیه معتبر است؛ بعد از آن loader دوباره صدا زده می‌شود.
+    برای جلوگیری از رشد بی‌حد، با رسیدن به max_entries قدیمی‌ترین کلیدها حذف می‌شوند.
+    """
+
+    def __init__(self, ttl=60, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key, loader, ttl=None):
+        """مقدار کش‌شده یا اجرای loader و ذخیره نتیجه"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = loader()
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if len(self._data) >= self.max_entries and key not in self._data:
+                oldest = min(self._data, key=lambda k: self._data[k][0])
+                del self._data[oldest]
+            self._data[key] = (expires_at, value)
+        return value
+
+    def invalidate(self, prefix=None):
+        """حذف کلیدهایی که با prefix شروع می‌شوند (یا همه کلیدها)"""
+        with self._lock:
+            if prefix is None:
+                self._data.clear()
+                return
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    def stats(self):
+        """تعداد hit/miss و کلیدهای فعلی"""
+        with self._lock:
+            return {'entries': len(self._data), 'hits': self.hits, 'misses': self.misses, 'ttl': self.ttl}
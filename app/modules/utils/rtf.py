@@ -0,0 +1,77 @@
+# modules/utils/rtf.py
+"""
+خواندن جدول‌های RTF (خروجی گزارش‌های FastReport) بدون تبدیل کل سند به متن.
+
+    for cells in table_rows(open(path, 'rb').read()):
+        ...                          # ['وضعیت', 'نوع', 'ثبت', ...]
+
+متن فارسی با \\uN (و کاراکتر جایگزین \\'3f) یا در فایل‌های دوباره ذخیره‌شده با \\'hh و فونت
+fcharset178 نوشته می‌شود؛ هر دو به یونیکد برگردانده می‌شوند. هر \\cell یک سلول و هر \\row پایان سطر است.
+"""
+import re
+
+_TOKEN = re.compile(
+    r"\\u(-?\d+) ?|\\'([0-9a-fA-F]{2})|\\([a-zA-Z]+)(-?\d+)? ?|\\([^a-zA-Z])|([{}])|([^\\{}\r\n]+)|[\r\n]+"
+)
+# گروه‌هایی که متن جدول نیستند
+_SKIP = {'fonttbl', 'colortbl', 'stylesheet', 'info', 'pict', 'header', 'footer', 'listtable'}
+
+
+def table_rows(data):
+    """سطرهای جدول RTF (bytes یا str) به صورت لیست متن سلول‌ها"""
+    raw = data.decode('latin-1') if isinstance(data, bytes) else data
+    # فایل‌هایی که دوباره ذخیره شده‌اند (مثلاً TextEdit) فارسی را با \'hh و فونت fcharset178 می‌نویسند
+    codepage = re.search(r'\\ansicpg(\d+)', raw[:2000])
+    if codepage and '\\fcharset178' not in raw[:5000]:
+        codepage = f"cp{codepage.group(1)}"
+    else:
+        codepage = 'cp1256'
+    stack = []
+    skip = False
+    uc = 1
+    fallback = 0  # تعداد کاراکتر جایگزین بعد از \uN که باید نادیده گرفته شود
+    cell = []
+    cells = []
+    for match in _TOKEN.finditer(raw):
+        code, hex_char, word, number, symbol, brace, text = match.groups()
+        if brace:
+            if brace == '{':
+                stack.append((skip, uc))
+            elif stack:
+                skip, uc = stack.pop()
+            continue
+        if word in _SKIP or symbol == '*':
+            skip = True
+            continue
+        if skip:
+            continue
+        if code is not None:
+            code = int(code)
+            cell.append(chr(code + 65536 if code < 0 else code))
+            fallback = uc
+        elif hex_char:
+            if fallback:
+                fallback -= 1
+            else:
+                cell.append(bytes([int(hex_char, 16)]).decode(codepage, 'replace'))
+        elif text:
+            if fallback:
+                text, fallback = text[fallback:], max(fallback - len(text), 0)
+            cell.append(text)
+        elif word or symbol:
+            fallback = 0
+            if word == 'uc':
+                uc = int(number or 1)
+            elif word in ('par', 'line', 'tab'):
+                cell.append(' ')
+            elif word == 'cell':
+                cells.append(re.sub(r'\s+', ' ', ''.join(cell)).strip())
+                cell = []
+            elif word == 'row':
+                if cells:
+                    yield cells
+                cells, cell = [], []
+            elif symbol in ('\\', '{', '}'):
+                cell.append(symbol)
+    if cells:
+        yield cells
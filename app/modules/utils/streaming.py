@@ -0,0 +1,157 @@
+import json
+import os
+from datetime import datetime
+from itertools import chain
+from flask import Response, current_app, stream_with_context
+
+
+def stream_json_array(rows, transform=None):
+    """ارسال تدریجی یک iterable از سطرها به صورت آرایه JSON
+
+    اولین سطر همین‌جا خوانده می‌شود تا خطای اتصال یا کوئری قبل از شروع پاسخ
+    به فراخواننده برسد و بتواند پاسخ جایگزین بدهد.
+    """
+    rows = iter(rows)
+    first_row = next(rows, None)
+    if first_row is not None:
+        rows = chain([first_row], rows)
+    json_provider = current_app.json
+
+    def generate():
+        yield '['
+        first = True
+        for row in rows:
+            if transform:
+                row = transform(row)
+            yield ('' if first else ',') + json_provider.dumps(row)
+            first = False
+        yield ']'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+def sse_event(event, data):
+    """قالب یک رویداد Server-Sent Events"""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def sse_response(events):
+    """پاسخ text/event-stream از یک iterable از (نام رویداد، داده)"""
+    def generate():
+        # کامنت اولیه تا پراکسی‌ها و مرورگر بلافاصله اتصال را باز ببینند
+        yield ': stream\n\n'
+        for event, data in events:
+            yield sse_event(event, data)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+class JsonSectionParser:
+    """استخراج بخش‌های سطح اول یک شیء JSON در حال دریافت
+
+    هر بار feed با متن جدید صدا زده می‌شود و بخش‌هایی که کامل شده‌اند
+    به صورت [(کلید، مقدار)] برمی‌گردند؛ متن قبل از اولین '{' (مثل ```json) نادیده گرفته می‌شود.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.position = 0
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.member_start = None
+
+    def feed(self, text):
+        self.buffer += text
+        sections = []
+        while self.position < len(self.buffer):
+            char = self.buffer[self.position]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = self.depth > 0
+            elif char in '{[':
+                self.depth += 1
+                if self.depth == 1:
+                    self.member_start = self.position + 1
+            elif char in '}]':
+                self.depth -= 1
+                if self.depth == 0:
+                    sections.extend(self._member(self.position))
+            elif char == ',' and self.depth == 1:
+                sections.extend(self._member(self.position))
+                self.member_start = self.position + 1
+            self.position += 1
+        return sections
+
+    def _member(self, end):
+        """پارس یک عضو "کلید": مقدار بین member_start و end"""
+        member = self.buffer[self.member_start:end].strip() if self.member_start is not None else ''
+        if not member:
+            return []
+        try:
+            return list(json.loads('{' + member + '}').items())
+        except ValueError:
+            return []
+
+
+def analysis_event_stream(file_info, file_handler, analyze_stream, save, usage=None):
+    """مراحل تحلیل یک فایل آپلودشده به صورت رویداد SSE
+
+    stage(saved) ← stage(extracted) ← رویدادهای analyze_stream (llm، chunk، section، ...)
+    ← stage(parsed) ← stage(stored) ← result؛ هر خطا یک رویداد error می‌فرستد و فایل را حذف می‌کند.
+    مصرف توکن (usage) بعد از ذخیره با شناسه تحلیل و در صورت خطا بدون شناسه ثبت می‌شود.
+    mark_write داخل save اینجا به کوکی session نمی‌رسد؛ route قبل از sse_response صدا می‌زند.
+    """
+    analysis_id = None
+    yield 'stage', {'stage': 'saved', 'file_name': file_info['name'], 'size': file_info['size']}
+    try:
+        content, compaction = file_handler.extract_prompt_text(file_info['path'], file_info['name'])
+        if not content or len(content.strip()) < 50:
+            file_handler.delete_file(file_info['path'])
+            yield 'error', {'error': True, 'message': 'محتوای فایل خالی یا ناقص است'}
+            return
+        yield 'stage', {'stage': 'extracted', 'chars': len(content), 'compaction': compaction}
+
+        analysis = None
+        for event, data in analyze_stream(content):
+            if event == 'result':
+                analysis = data
+            else:
+                yield event, data
+
+        if not analysis or analysis.get('error'):
+            file_handler.delete_file(file_info['path'])
+            if usage is not None:
+                usage.save(None)
+            yield 'error', analysis or {'error': True, 'message': 'پاسخی از هوش مصنوعی دریافت نشد'}
+            return
+        yield 'stage', {'stage': 'parsed'}
+
+        analysis['analyzed_at'] = datetime.now().isoformat()
+        analysis['file_name'] = file_info['name']
+        analysis['prompt_compaction'] = compaction
+        analysis_id = save(file_info, analysis)
+        if analysis_id:
+            analysis['id'] = analysis_id
+        if usage is not None:
+            usage.save(analysis_id)
+        yield 'stage', {'stage': 'stored', 'id': analysis_id}
+        yield 'result', analysis
+
+    except Exception as e:
+        print(f"❌ خطا در تحلیل جریانی: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        if os.path.exists(file_info['path']):
+            file_handler.delete_file(file_info['path'])
+        yield 'error', {'error': True, 'message': str(e)}
@@ -0,0 +1,81 @@
+# scripts/batch_reanalyze.py
+"""
+تحلیل مجدد انبوه آپلودهای قبلی با Batch API (modules/batch_analysis.py).
+
+    python scripts/batch_reanalyze.py submit --type crm [--since 2025-01-01] [--limit 500] [--force]
+    python scripts/batch_reanalyze.py poll [--wait]
+    python scripts/batch_reanalyze.py status
+    python scripts/batch_reanalyze.py cancel 12
+
+submit: ساخت فایل‌های JSONL از آپلودهایی که با نسخه فعلی پرامپت تحلیل نشده‌اند (--force: همه) و ارسال آن‌ها.
+poll: بررسی وضعیت و ذخیره نتایج batchهای تمام‌شده؛ با --wait تا پایان همه هر BATCH_POLL_INTERVAL ثانیه تکرار می‌شود
+      (مناسب cron شبانه بدون --wait).
+--backend local درخواست‌ها را در همین پروسه با chat completions اجرا می‌کند (تست؛ همراه OPENAI_BASE_URL
+روی scripts/openai_stub.py بدون هزینه).
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from modules.config import Config
+from modules.file_handler import FileHandler
+from modules.openai_client import OpenAIClient
+from modules.batch_analysis import (build_batches, submit_batches, poll_batches, cancel_batch, list_batches,
+                                    get_backend)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='تحلیل مجدد انبوه با Batch API')
+    parser.add_argument('--backend', choices=('openai', 'local'), default=Config.BATCH_BACKEND)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    submit = subparsers.add_parser('submit', help='ساخت و ارسال batchها')
+    submit.add_argument('--type', choices=('crm', 'referral'), default='crm')
+    submit.add_argument('--since', help='فقط تحلیل‌های بعد از این تاریخ (YYYY-MM-DD)')
+    submit.add_argument('--limit', type=int, help='حداکثر تعداد فایل')
+    submit.add_argument('--force', action='store_true', help='تحلیل دوباره حتی با نتیجه به‌روز در کش')
+    poll = subparsers.add_parser('poll', help='بررسی وضعیت و ذخیره نتایج')
+    poll.add_argument('--wait', action='store_true', help='تکرار تا پایان همه batchها')
+    subparsers.add_parser('status', help='نمایش آخرین batchها')
+    cancel = subparsers.add_parser('cancel', help='لغو batch')
+    cancel.add_argument('batch_id', type=int)
+    args = parser.parse_args()
+
+    if args.command == 'status':
+        for row in list_batches():
+            print(f"{row['id']:>5} {row['job_type']:<9} {row['backend']:<7} {row['status']:<12} "
+                  f"{row['item_count'] or 0:>6} فایل  {row['request_count'] or 0:>6} درخواست  "
+                  f"✅ {row['succeeded'] or 0}  ❌ {row['failed'] or 0}  {row['error'] or ''}")
+        return 0
+
+    ai_client = OpenAIClient()
+    backend = get_backend(ai_client.client, args.backend)
+
+    if args.command == 'cancel':
+        if not cancel_batch(backend, args.batch_id):
+            print(f"❌ batch {args.batch_id} یافت نشد یا ارسال نشده است")
+            return 1
+        print(f"⏹️ درخواست لغو batch {args.batch_id} ارسال شد")
+        return 0
+
+    if args.command == 'submit':
+        since = datetime.strptime(args.since, '%Y-%m-%d') if args.since else None
+        build_batches(args.type, ai_client, FileHandler(Config.UPLOAD_FOLDER), backend.name,
+                      since=since, limit=args.limit, force=args.force)
+        submit_batches(backend)
+        return 0
+
+    while True:
+        active = poll_batches(backend, ai_client)
+        if not args.wait or not active:
+            break
+        time.sleep(Config.BATCH_POLL_INTERVAL)
+    print(f"📊 {active} batch هنوز در جریان است" if active else "✅ batch در جریانی نمانده است")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
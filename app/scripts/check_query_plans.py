@@ -0,0 +1,340 @@
+# scripts/check_query_plans.py
+"""
+بررسی پلن اجرای (EXPLAIN) همه کوئری‌هایی که Blueprintها اجرا می‌کنند.
+
+یک دیتابیس موقت از روی database_schema.sql و migrations/ ساخته می‌شود، با داده
+نمونه پر می‌شود و برای هر کوئری EXPLAIN گرفته می‌شود. اگر کوئری‌ای full table scan
+یا filesort روی بیش از --max-rows سطر داشته باشد، اسکریپت با کد 1 خارج می‌شود.
+
+    python scripts/check_query_plans.py --rows 5000 --max-rows 500
+"""
+import argparse
+import glob
+import os
+import random
+import re
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import mysql.connector
+from modules.config import Config
+from modules import models, llm_cache, job_queue, llm_usage
+from modules.routes import main as main_routes
+from modules.auth import models as auth_models
+from modules.academy import models as academy_models
+
+APP_DIR = os.path.join(os.path.dirname(__file__), '..')
+SCHEMA_PATH = os.path.join(APP_DIR, 'database_schema.sql')
+MIGRATIONS_DIR = os.path.join(APP_DIR, 'migrations')
+
+NOW = datetime.now()
+
+HOT_SCOPE = {'table': 'analyses', 'scope': 'analyzed_at >= %s'}
+ALL_SCOPE = {'table': 'analyses_all', 'scope': '1 = 1'}
+SINCE = (NOW - timedelta(days=90),)
+
+
+def academy_where(*columns):
+    """همان WHERE که academy.models._where برای فیلترهای داده‌شده می‌سازد"""
+    return {'where': ' WHERE ' + ' AND '.join(f"{column} = %s" for column in columns)}
+
+
+# کوئری‌های برنامه با پارامتر نمونه؛ متن SQL از ثابت‌های خود ماژول‌ها می‌آید تا با کد یکی بماند
+# (tests/test_query_plans.py ثبت نشدن ثابت جدید را می‌گیرد)
+# format: مقادیر {table}/{scope}/{where}/... برای کوئری‌های قالب‌دار
+# allow_scan: کوئری‌هایی که ذاتاً کل جدول را تجمیع می‌کنند (با دلیل)
+QUERIES = [
+    # modules/models.py
+    {'name': 'analysis.get_all', 'sql': models.ANALYSIS_LIST_QUERY,
+     'allow_scan': 'لیست کامل تحلیل‌ها (ارسال تدریجی)'},
+    {'name': 'analysis.get_by_id', 'sql': models.BY_ID_QUERY, 'format': {'table': 'analyses'}, 'params': (1,)},
+    {'name': 'analysis.get_by_id_archive', 'sql': models.BY_ID_QUERY, 'format': {'table': 'analyses_archive'},
+     'params': (1,)},
+    {'name': 'analysis.get_latest', 'sql': models.LATEST_QUERY, 'format': {'table': 'analyses'}},
+    {'name': 'analysis.delete_lookup', 'sql': models.FILE_PATH_QUERY, 'format': {'table': 'analyses'},
+     'params': (1,)},
+    {'name': 'referral.get_all', 'sql': models.REFERRAL_LIST_QUERY,
+     'allow_scan': 'لیست کامل ارجاعیات (ارسال تدریجی)'},
+    {'name': 'referral.get_by_id', 'sql': models.BY_ID_QUERY, 'format': {'table': 'referral_analyses'},
+     'params': (1,)},
+    {'name': 'referral.get_by_id_archive', 'sql': models.BY_ID_QUERY,
+     'format': {'table': 'referral_analyses_archive'}, 'params': (1,)},
+    {'name': 'referral.get_latest', 'sql': models.LATEST_QUERY, 'format': {'table': 'referral_analyses'}},
+
+    # modules/routes/main.py
+    {'name': 'main.analysis_history', 'sql': main_routes.HISTORY_QUERY},
+    {'name': 'main.stats_totals', 'sql': main_routes.STATS_TOTALS_QUERY, 'format': HOT_SCOPE, 'params': SINCE,
+     'allow_scan': 'تجمیع ماه‌های فعال (هرس پارتیشن)'},
+    {'name': 'main.stats_totals_all', 'sql': main_routes.STATS_TOTALS_QUERY, 'format': ALL_SCOPE,
+     'allow_scan': 'range=all: کل تاریخچه و آرشیو'},
+    {'name': 'main.stats_top_sellers', 'sql': main_routes.TOP_SELLERS_QUERY, 'format': HOT_SCOPE, 'params': SINCE,
+     'allow_scan': 'تجمیع ماه‌های فعال به تفکیک فروشنده'},
+    {'name': 'main.stats_top_customers', 'sql': main_routes.TOP_CUSTOMERS_QUERY, 'format': HOT_SCOPE,
+     'params': SINCE, 'allow_scan': 'تجمیع ماه‌های فعال به تفکیک مشتری'},
+    {'name': 'main.weekly_trend', 'sql': main_routes.WEEKLY_TREND_QUERY},
+    {'name': 'main.score_distribution', 'sql': main_routes.SCORE_DISTRIBUTION_QUERY, 'format': HOT_SCOPE,
+     'params': SINCE, 'allow_scan': 'تجمیع ماه‌های فعال (هرس پارتیشن)'},
+    {'name': 'main.latest', 'sql': main_routes.LATEST_QUERY},
+    {'name': 'main.recent_analyses', 'sql': main_routes.RECENT_ANALYSES_QUERY},
+    {'name': 'main.recent_referrals', 'sql': main_routes.RECENT_REFERRALS_QUERY},
+
+    # modules/auth/models.py
+    {'name': 'auth.user_exists', 'sql': auth_models.USER_EXISTS_QUERY, 'params': ('user10', 'user10@example.com')},
+    {'name': 'auth.authenticate', 'sql': auth_models.AUTHENTICATE_QUERY, 'params': ('user10', 'user10')},
+    {'name': 'auth.get_by_id', 'sql': auth_models.USER_BY_ID_QUERY, 'params': (1,)},
+    {'name': 'auth.password_hash', 'sql': auth_models.PASSWORD_HASH_QUERY, 'params': (1,)},
+    {'name': 'auth.session_validate', 'sql': auth_models.SESSION_VALIDATE_QUERY, 'params': ('token-10',)},
+    {'name': 'auth.user_logs', 'sql': auth_models.USER_LOGS_QUERY, 'params': (1, 50)},
+
+    # modules/academy/models.py (مکالمه‌ها در routes اجرا می‌شوند)
+    {'name': 'academy.chat_history', 'sql': academy_models.CHAT_HISTORY_QUERY, 'params': (1,)},
+    {'name': 'academy.chat_first_message', 'sql': academy_models.CHAT_FIRST_MESSAGE_QUERY, 'params': (1,)},
+    {'name': 'academy.chat_access', 'sql': academy_models.CHAT_ACCESS_QUERY, 'params': (1, 1)},
+    {'name': 'academy.chat_messages', 'sql': academy_models.CHAT_MESSAGES_QUERY, 'params': (1,)},
+    {'name': 'academy.chat_context', 'sql': academy_models.CHAT_CONTEXT_QUERY, 'params': (1,)},
+    {'name': 'academy.masters', 'sql': academy_models.MASTERS_QUERY,
+     'format': {'where': ' WHERE department = %s AND is_active = TRUE'}, 'params': ('sales',)},
+    {'name': 'academy.master', 'sql': academy_models.MASTER_QUERY, 'params': (1,)},
+    {'name': 'academy.master_courses', 'sql': academy_models.MASTER_COURSES_QUERY, 'params': (1,)},
+    {'name': 'academy.workshops', 'sql': academy_models.WORKSHOPS_QUERY,
+     'format': academy_where('w.department', 'w.status'), 'params': ('sales', 'upcoming')},
+    {'name': 'academy.workshops_by_type', 'sql': academy_models.WORKSHOPS_QUERY,
+     'format': academy_where('w.workshop_type'), 'params': ('practical',)},
+    {'name': 'academy.workshop', 'sql': academy_models.WORKSHOP_QUERY, 'params': (1,)},
+    {'name': 'academy.workshop_sessions', 'sql': academy_models.WORKSHOP_SESSIONS_QUERY, 'params': (1,)},
+    {'name': 'academy.workshop_qa', 'sql': academy_models.WORKSHOP_QA_QUERY, 'params': (1,)},
+    {'name': 'academy.user_workshops', 'sql': academy_models.USER_WORKSHOPS_QUERY, 'params': (1,)},
+    {'name': 'academy.assessments', 'sql': academy_models.ASSESSMENTS_QUERY,
+     'format': academy_where('a.department', 'a.status'), 'params': ('services', 'active')},
+    {'name': 'academy.assessment', 'sql': academy_models.ASSESSMENT_QUERY, 'params': (1, 1)},
+    {'name': 'academy.assessment_result', 'sql': academy_models.ASSESSMENT_RESULT_QUERY, 'params': (1, 1)},
+    {'name': 'academy.user_assessments', 'sql': academy_models.USER_ASSESSMENTS_QUERY, 'params': (1,)},
+    {'name': 'academy.schedule', 'sql': academy_models.SCHEDULE_QUERY,
+     'format': academy_where('department'), 'params': ('sales',)},
+    {'name': 'academy.stats', 'sql': academy_models.STATS_QUERY,
+     'format': {'dept': ' AND department = %s', 'w_dept': ' AND w.department = %s',
+                'a_dept': ' AND a.department = %s'},
+     'params': ('sales',) * 8, 'allow_scan': 'شمارش‌های تجمیعی داشبورد آموزشگاه (کش‌شده)'},
+
+    # modules/llm_cache.py
+    {'name': 'llm_cache.get', 'sql': llm_cache.GET_QUERY, 'params': ('0' * 64, NOW)},
+    {'name': 'llm_cache.exists', 'sql': llm_cache.EXISTS_QUERY, 'params': ('0' * 64, NOW)},
+    {'name': 'llm_cache.count', 'sql': llm_cache.COUNT_QUERY, 'allow_scan': 'شمارش کل ورودی‌ها هنگام هرس'},
+    {'name': 'llm_cache.prune_expired', 'sql': llm_cache.PRUNE_EXPIRED_QUERY,
+     'params': (NOW - timedelta(days=365),)},
+    {'name': 'llm_cache.prune_oldest', 'sql': llm_cache.PRUNE_OLDEST_QUERY, 'params': (10,)},
+
+    # modules/job_queue.py
+    {'name': 'jobs.claim_queued', 'sql': job_queue.CLAIM_QUERIES[0], 'params': (NOW,)},
+    {'name': 'jobs.claim_expired', 'sql': job_queue.CLAIM_QUERIES[1], 'params': (NOW,)},
+    {'name': 'jobs.get', 'sql': job_queue.GET_QUERY, 'params': (1, 1)},
+
+    # modules/llm_usage.py
+    {'name': 'llm_usage.aggregate', 'sql': llm_usage.AGGREGATE_QUERY,
+     'format': {'feature_sql': ' AND feature = %s'}, 'params': (NOW - timedelta(days=30), 'crm')},
+    {'name': 'llm_usage.daily', 'sql': llm_usage.DAILY_QUERY,
+     'format': {'feature_sql': ' AND feature = %s'}, 'params': (NOW - timedelta(days=30), 'crm')},
+    {'name': 'llm_usage.get_for', 'sql': llm_usage.GET_FOR_QUERY, 'params': ('crm', 1)},
+]
+
+
+def query_sql(query):
+    """متن نهایی کوئری (قالب‌ها با مقادیر format پر می‌شوند)"""
+    if 'format' in query:
+        return query['sql'].format(**query['format'])
+    return query['sql']
+
+
+def split_statements(sql_text):
+    """تقسیم فایل SQL به دستورات جداگانه (بدون کامنت‌ها)"""
+    lines = [line for line in sql_text.splitlines() if not line.strip().startswith('--')]
+    statements = [stmt.strip() for stmt in '\n'.join(lines).split(';')]
+    return [stmt for stmt in statements if stmt]
+
+
+def load_schema(cursor, database):
+    """ساخت دیتابیس موقت از schema و migrationها"""
+    cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+    cursor.execute(f"CREATE DATABASE `{database}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+    cursor.execute(f"USE `{database}`")
+
+    with open(SCHEMA_PATH, encoding='utf-8') as f:
+        statements = split_statements(f.read())
+
+    for stmt in statements:
+        if re.match(r'(CREATE DATABASE|USE)\b', stmt, re.IGNORECASE):
+            continue
+        cursor.execute(stmt)
+
+    # migrationها روی schema جدید فقط برای اطمینان از سازگاری اجرا می‌شوند
+    for path in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, '*.sql'))):
+        with open(path, encoding='utf-8') as f:
+            for stmt in split_statements(f.read()):
+                if re.match(r'(CREATE DATABASE|USE)\b', stmt, re.IGNORECASE):
+                    continue
+                try:
+                    cursor.execute(stmt)
+                except mysql.connector.Error as e:
+                    # ایندکس/ستون تکراری، کلید خارجی حذف‌شده یا جدول بدون پارتیشن
+                    # یعنی schema از قبل به‌روز است
+                    if e.errno not in (1060, 1061, 1091, 1505, 1826):
+                        raise
+
+
+def seed(cursor, rows):
+    """پر کردن جداول با داده نمونه"""
+    sellers = [f"فروشنده {i}" for i in range(25)]
+    customers = [f"مشتری {i}" for i in range(200)]
+
+    cursor.executemany(
+        "INSERT INTO users (username, email, password_hash, full_name) VALUES (%s, %s, %s, %s)",
+        [(f"user{i}", f"user{i}@example.com", 'x', f"کاربر {i}") for i in range(max(rows // 10, 20))]
+    )
+    user_count = max(rows // 10, 20)
+
+    cursor.executemany(
+        "INSERT INTO sessions (user_id, session_token, expires_at) VALUES (%s, %s, %s)",
+        [(random.randint(1, user_count), f"token-{i}", NOW + timedelta(days=7)) for i in range(rows)]
+    )
+    cursor.executemany(
+        "INSERT INTO activity_logs (user_id, action, created_at) VALUES (%s, %s, %s)",
+        [(random.randint(1, user_count), 'login', NOW - timedelta(minutes=i)) for i in range(rows)]
+    )
+
+    cursor.executemany(
+        """INSERT INTO analyses (file_name, file_path, file_size, file_type, analyzed_at,
+               score_total, seller_name, customer_name, total_calls, successful_calls, full_analysis)
+           VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+        [(
+            f"file_{i}.rtf", f"uploaded_files/file_{i}.rtf", 1000, 'rtf',
+            NOW - timedelta(hours=random.randint(0, 24 * 365)),
+            round(random.uniform(0, 10), 1), random.choice(sellers), random.choice(customers),
+            random.randint(1, 200), random.randint(0, 100), '{}'
+        ) for i in range(rows)]
+    )
+    cursor.executemany(
+        """INSERT INTO referral_analyses (file_name, file_path, file_size, analyzed_at,
+               total_referrals, completed_count, pending_count, completion_rate, full_analysis)
+           VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+        [(
+            f"referral_{i}.xlsx", f"uploaded_files/referral_{i}.xlsx", 1000,
+            NOW - timedelta(hours=random.randint(0, 24 * 365)), 30, 10, 5, 33.3, '{}'
+        ) for i in range(rows)]
+    )
+
+    cursor.executemany(
+        "INSERT INTO chat_sessions (user_id, title, updated_at) VALUES (%s, %s, %s)",
+        [(random.randint(1, user_count), f"گفتگو {i}", NOW - timedelta(minutes=i)) for i in range(rows // 5)]
+    )
+    session_count = rows // 5
+    cursor.executemany(
+        "INSERT INTO chat_messages (session_id, role, content, created_at) VALUES (%s, %s, %s, %s)",
+        [(
+            random.randint(1, session_count), random.choice(['user', 'assistant']), 'پیام نمونه',
+            NOW - timedelta(seconds=i)
+        ) for i in range(rows * 2)]
+    )
+
+    departments = ['sales', 'services']
+    cursor.executemany(
+        "INSERT INTO academy_masters (full_name, department, rating, is_active) VALUES (%s, %s, %s, %s)",
+        [(f"استاد {i}", random.choice(departments), round(random.uniform(3, 5), 1), i % 10 != 0)
+         for i in range(rows // 10)]
+    )
+    master_count = rows // 10
+    cursor.executemany(
+        """INSERT INTO academy_workshops (title, department, master_id, start_date, end_date,
+               workshop_type, status)
+           VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+        [(
+            f"کارگاه {i}", random.choice(departments), random.randint(1, master_count),
+            NOW + timedelta(days=random.randint(-365, 90)), NOW + timedelta(days=random.randint(91, 120)),
+            random.choice(['online', 'practical', 'theoretical']),
+            random.choice(['upcoming', 'ongoing', 'completed', 'cancelled'])
+        ) for i in range(rows)]
+    )
+    cursor.executemany(
+        """INSERT INTO academy_assessments (title, department, master_id, workshop_id, questions,
+               start_date, status)
+           VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+        [(
+            f"سنجش {i}", random.choice(departments), random.randint(1, master_count),
+            random.randint(1, rows), '[]', NOW + timedelta(days=random.randint(-365, 90)),
+            random.choice(['draft', 'active', 'completed', 'archived'])
+        ) for i in range(rows)]
+    )
+    cursor.executemany(
+        "INSERT INTO academy_schedule (department, title, event_date) VALUES (%s, %s, %s)",
+        [(random.choice(departments), f"رویداد {i}", NOW + timedelta(hours=random.randint(-5000, 5000)))
+         for i in range(rows)]
+    )
+
+    for table in ('users', 'sessions', 'activity_logs', 'analyses', 'referral_analyses',
+                  'chat_sessions', 'chat_messages', 'academy_masters', 'academy_workshops',
+                  'academy_assessments', 'academy_schedule'):
+        cursor.execute(f"ANALYZE TABLE {table}")
+        cursor.fetchall()
+
+
+def check_plan(cursor, query, max_rows):
+    """EXPLAIN یک کوئری و بازگرداندن لیست مشکلات"""
+    cursor.execute('EXPLAIN ' + query_sql(query), query.get('params', ()))
+    plan = cursor.fetchall()
+    problems = []
+    for step in plan:
+        rows = step.get('rows') or 0
+        extra = step.get('Extra') or ''
+        table = step.get('table')
+        if step.get('type') == 'ALL' and rows > max_rows:
+            problems.append(f"full table scan روی {table} ({rows} سطر)")
+        if 'Using filesort' in extra and rows > max_rows:
+            problems.append(f"filesort روی {table} ({rows} سطر)")
+    return plan, problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='بررسی پلن اجرای کوئری‌های API')
+    parser.add_argument('--database', default='crm_analyzer_plancheck', help='نام دیتابیس موقت')
+    parser.add_argument('--rows', type=int, default=5000, help='تعداد سطرهای نمونه در هر جدول اصلی')
+    parser.add_argument('--max-rows', type=int, default=500, help='حداکثر سطر مجاز برای scan/filesort')
+    parser.add_argument('--keep', action='store_true', help='دیتابیس موقت حذف نشود')
+    args = parser.parse_args()
+
+    db_config = {k: v for k, v in Config.DB_CONFIG.items() if k != 'database'}
+    conn = mysql.connector.connect(**db_config)
+    cursor = conn.cursor(dictionary=True)
+
+    print(f"🛠️ ساخت دیتابیس {args.database} و درج {args.rows} سطر نمونه...")
+    load_schema(cursor, args.database)
+    random.seed(42)
+    seed(cursor, args.rows)
+    conn.commit()
+
+    failures = 0
+    for query in QUERIES:
+        plan, problems = check_plan(cursor, query, args.max_rows)
+        if problems and query.get('allow_scan'):
+            print(f"➖ {query['name']}: مجاز ({query['allow_scan']})")
+        elif problems:
+            failures += 1
+            print(f"❌ {query['name']}: {'، '.join(problems)}")
+            for step in plan:
+                print(f"     {step.get('table')}: type={step.get('type')} key={step.get('key')} "
+                      f"rows={step.get('rows')} extra={step.get('Extra')}")
+        else:
+            keys = ', '.join(str(step.get('key')) for step in plan)
+            print(f"✅ {query['name']}: {keys}")
+
+    if not args.keep:
+        cursor.execute(f"DROP DATABASE `{args.database}`")
+    cursor.close()
+    conn.close()
+
+    print(f"\n{len(QUERIES) - failures}/{len(QUERIES)} کوئری بدون مشکل")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+# scripts/compress_full_analysis.py
+"""
+تبدیل full_analysis ردیف‌های موجود به نسخه فشرده (full_analysis_z) یا برعکس.
+
+قبل از اجرا migrations/003_compressed_full_analysis.sql باید اعمال شده باشد؛ جداول آرشیو
+(migrations/004_partition_analyses.sql) هم تبدیل می‌شوند و اگر هنوز ساخته نشده‌اند رد می‌شوند.
+ردیف‌ها دسته‌ای بر اساس id پیمایش می‌شوند و هر دسته در یک تراکنش commit می‌شود،
+پس اجرای دوباره بعد از قطع شدن از همان‌جا ادامه می‌دهد.
+
+    python scripts/compress_full_analysis.py --algorithm zstd --batch 200
+    python scripts/compress_full_analysis.py --decompress
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from modules.analysis_codec import compress_json, decompress_text
+from modules.database import db_connection
+
+TABLES = ('analyses', 'referral_analyses', 'analyses_archive', 'referral_analyses_archive')
+
+
+def _text(value):
+    """JSON ستون full_analysis به صورت رشته (درایور ممکن است bytes برگرداند)"""
+    return value.decode('utf-8') if isinstance(value, (bytes, bytearray)) else value
+
+
+def table_exists(conn, table):
+    """آیا جدول وجود دارد؟ (جداول آرشیو فقط بعد از migration 004 ساخته می‌شوند)"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT 1 FROM {table} LIMIT 1")
+        cursor.fetchall()
+        return True
+    except Exception:
+        return False
+    finally:
+        cursor.close()
+
+
+def convert_table(conn, table, algorithm, batch_size, decompress=False):
+    """تبدیل یک جدول؛ خروجی: (تعداد ردیف، حجم قبل، حجم بعد)"""
+    if decompress:
+        select = f"""
+            SELECT id, full_analysis_z FROM {table}
+            WHERE full_analysis_z IS NOT NULL AND id > %s ORDER BY id LIMIT %s
+        """
+        update = f"UPDATE {table} SET full_analysis = %s, full_analysis_z = NULL WHERE id = %s"
+    else:
+        select = f"""
+            SELECT id, full_analysis FROM {table}
+            WHERE full_analysis_z IS NULL AND full_analysis IS NOT NULL AND id > %s ORDER BY id LIMIT %s
+        """
+        update = f"UPDATE {table} SET full_analysis_z = %s, full_analysis = NULL WHERE id = %s"
+
+    last_id = 0
+    converted = before = after = 0
+    cursor = conn.cursor()
+    try:
+        while True:
+            cursor.execute(select, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            updates = []
+            for row_id, value in rows:
+                if decompress:
+                    new_value = decompress_text(value)
+                    before += len(value)
+                    after += len(new_value.encode('utf-8'))
+                else:
+                    text = _text(value)
+                    new_value = compress_json(text, algorithm)
+                    before += len(text.encode('utf-8'))
+                    after += len(new_value)
+                updates.append((new_value, row_id))
+
+            cursor.executemany(update, updates)
+            conn.commit()
+            converted += len(updates)
+            last_id = rows[-1][0]
+            print(f"   {table}: {converted} ردیف تبدیل شد (تا id={last_id})")
+    finally:
+        cursor.close()
+    return converted, before, after
+
+
+def main():
+    parser = argparse.ArgumentParser(description='فشرده‌سازی full_analysis ردیف‌های موجود')
+    parser.add_argument('--algorithm', choices=['zlib', 'zstd'], default='zlib', help='الگوریتم فشرده‌سازی')
+    parser.add_argument('--batch', type=int, default=200, help='تعداد ردیف در هر تراکنش')
+    parser.add_argument('--decompress', action='store_true', help='بازگرداندن به JSON متنی')
+    parser.add_argument('--table', choices=TABLES, help='فقط یک جدول')
+    args = parser.parse_args()
+
+    with db_connection() as conn:
+        for table in ([args.table] if args.table else TABLES):
+            if not args.table and not table_exists(conn, table):
+                print(f"⚠️ جدول {table} وجود ندارد، رد شد")
+                continue
+            print(f"🗜️ تبدیل {table}...")
+            converted, before, after = convert_table(conn, table, args.algorithm, args.batch, args.decompress)
+            ratio = (after / before * 100) if before else 0
+            print(f"✅ {table}: {converted} ردیف، {before:,} بایت ← {after:,} بایت ({ratio:.1f}%)")
+
+    if not args.decompress:
+        print(f"ℹ️ برای آزاد شدن فضای دیسک در MySQL: OPTIMIZE TABLE {', '.join(TABLES)};")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
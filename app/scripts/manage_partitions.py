@@ -0,0 +1,220 @@
+# scripts/manage_partitions.py
+"""
+مدیریت پارتیشن‌های ماهانه analyses و referral_analyses (MySQL).
+
+    python scripts/manage_partitions.py list
+    python scripts/manage_partitions.py ensure --ahead 3
+    python scripts/manage_partitions.py archive --older-than 12 [--dry-run]
+
+ensure: پارتیشن p_future را تا --ahead ماه بعد به پارتیشن‌های ماهانه (pYYYYMM) می‌شکند.
+        بهتر است ماهانه با cron اجرا شود تا داده جدید همیشه در پارتیشن ماه خودش بنشیند.
+archive: پارتیشن‌هایی که کاملاً قدیمی‌تر از --older-than ماه هستند را به جداول *_archive
+         منتقل می‌کند (همراه سطرهای جداول جزئیات) و پارتیشن را DROP می‌کند. اگر اجرا نیمه‌کاره
+         قطع شود، اجرای دوباره همان پارتیشن‌ها را بدون سطر تکراری تکمیل می‌کند.
+         داده آرشیو از طریق viewهای analyses_all و referral_analyses_all قابل پرس‌وجو است.
+"""
+import argparse
+import os
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from modules.config import Config
+from modules.database import db_connection
+from modules.models import AnalysisModel, ReferralAnalysisModel
+
+# جدول پارتیشن‌شده -> (جدول آرشیو، جداول جزئیات)
+PARTITIONED_TABLES = {
+    'analyses': ('analyses_archive', AnalysisModel.CHILD_TABLES),
+    'referral_analyses': ('referral_analyses_archive', ReferralAnalysisModel.CHILD_TABLES)
+}
+
+
+def month_start(day, offset=0):
+    """اولین روز ماه، offset ماه جلوتر/عقب‌تر"""
+    month_index = day.year * 12 + day.month - 1 + offset
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(bound):
+    """نام پارتیشنی که مرز بالای آن bound است (داده‌های ماه قبل از bound)"""
+    previous = month_start(bound, -1)
+    return f"p{previous.year}{previous.month:02d}"
+
+
+def get_partitions(cursor, table):
+    """پارتیشن‌های جدول به ترتیب: [(نام، مرز بالا یا None، تعداد تقریبی سطر)]"""
+    cursor.execute("""
+        SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """, (table,))
+    partitions = []
+    for name, description, rows in cursor.fetchall():
+        bound = None
+        if description and description != 'MAXVALUE':
+            bound = date.fromisoformat(description.strip("'")[:10])
+        partitions.append((name, bound, rows))
+    return partitions
+
+
+def list_partitions(cursor):
+    for table in PARTITIONED_TABLES:
+        print(f"📦 {table}")
+        for name, bound, rows in get_partitions(cursor, table):
+            print(f"   {name:<12} < {bound or 'MAXVALUE'}  (~{rows} سطر)")
+
+
+def ensure_partitions(cursor, ahead):
+    """شکستن p_future به پارتیشن‌های ماهانه تا ahead ماه بعد"""
+    target = month_start(date.today(), ahead + 1)
+    for table in PARTITIONED_TABLES:
+        partitions = get_partitions(cursor, table)
+        if not partitions or partitions[-1][1] is not None:
+            print(f"⚠️ {table} پارتیشن p_future ندارد؛ ابتدا migrations/004 را اجرا کنید")
+            continue
+
+        last_bound = max((bound for _, bound, _ in partitions if bound), default=None)
+
+        definitions = []
+        bound = month_start(last_bound or date.today(), 1)
+        while bound <= target:
+            definitions.append(f"PARTITION {partition_name(bound)} VALUES LESS THAN ('{bound.isoformat()}')")
+            bound = month_start(bound, 1)
+
+        if not definitions:
+            print(f"✅ {table}: پارتیشن‌ها تا {target} وجود دارند")
+            continue
+
+        definitions.append("PARTITION p_future VALUES LESS THAN (MAXVALUE)")
+        cursor.execute(
+            f"ALTER TABLE {table} REORGANIZE PARTITION p_future INTO ({', '.join(definitions)})"
+        )
+        print(f"✅ {table}: {len(definitions) - 1} پارتیشن ماهانه اضافه شد (تا {target})")
+
+
+def ensure_archive_tables(cursor):
+    """ساخت جداول *_archive جزئیات (DDL در MySQL commit ضمنی دارد و نباید داخل تراکنش انتقال اجرا شود)"""
+    for _, child_tables in PARTITIONED_TABLES.values():
+        for child in child_tables:
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {child}_archive LIKE {child}")
+
+
+def purge_archived_children(conn, cursor, table, archive_table, child_tables):
+    """حذف جزئیات تحلیل‌هایی که به آرشیو رفته‌اند و پارتیشن آن‌ها DROP شده است
+
+    بعد از DROP PARTITION (و در اجرای بعدی اگر اجرای قبل بعد از DROP قطع شده باشد) اجرا می‌شود.
+    """
+    removed = 0
+    for child in child_tables:
+        cursor.execute(f"""
+            DELETE c FROM {child} c
+            JOIN {archive_table} a ON a.id = c.analysis_id
+            LEFT JOIN {table} p ON p.id = c.analysis_id
+            WHERE p.id IS NULL
+        """)
+        removed += cursor.rowcount
+    conn.commit()
+    return removed
+
+
+def archive_partitions(conn, older_than, dry_run=False):
+    """انتقال پارتیشن‌های قدیمی‌تر از older_than ماه به جداول آرشیو
+
+    قابل اجرای دوباره است: کپی هر پارتیشن در یک تراکنش و بعد از حذف نسخه‌های قبلی همان سطرها در آرشیو
+    انجام می‌شود؛ اگر DROP PARTITION انجام نشده باشد اجرای بعدی همان پارتیشن را از نو کپی می‌کند و
+    جزئیات فقط بعد از DROP از جداول اصلی حذف می‌شوند.
+    """
+    cutoff = month_start(date.today(), -older_than)
+    cursor = conn.cursor()
+    try:
+        if not dry_run:
+            ensure_archive_tables(cursor)
+
+        for table, (archive_table, child_tables) in PARTITIONED_TABLES.items():
+            if not dry_run:
+                leftover = purge_archived_children(conn, cursor, table, archive_table, child_tables)
+                if leftover:
+                    print(f"🧹 {table}: {leftover} سطر جزئیات از اجرای ناتمام قبلی حذف شد")
+
+            old_partitions = [
+                (name, bound) for name, bound, _ in get_partitions(cursor, table)
+                if bound is not None and bound <= cutoff
+            ]
+            if not old_partitions:
+                print(f"✅ {table}: پارتیشنی قدیمی‌تر از {cutoff} نیست")
+                continue
+
+            for name, bound in old_partitions:
+                if dry_run:
+                    print(f"🔎 {table}.{name} (< {bound}) منتقل خواهد شد")
+                    continue
+
+                # کپی سطرها در یک تراکنش (بدون DDL)؛ سطرهایی که از اجرای ناتمام قبلی در آرشیو مانده‌اند
+                # اول حذف می‌شوند تا تکراری نشوند
+                conn.start_transaction()
+                try:
+                    cursor.execute(f"""
+                        DELETE a FROM {archive_table} a JOIN {table} PARTITION ({name}) p ON p.id = a.id
+                    """)
+                    cursor.execute(f"INSERT INTO {archive_table} SELECT * FROM {table} PARTITION ({name})")
+                    moved = cursor.rowcount
+                    for child in child_tables:
+                        cursor.execute(f"""
+                            DELETE a FROM {child}_archive a JOIN {table} PARTITION ({name}) p ON p.id = a.analysis_id
+                        """)
+                        cursor.execute(f"""
+                            INSERT INTO {child}_archive
+                            SELECT c.* FROM {child} c JOIN {table} PARTITION ({name}) p ON p.id = c.analysis_id
+                        """)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+
+                # DDL خودش commit می‌کند؛ تا DROP موفق نشود سطرها در هر دو جدول هستند (اجرای دوباره رفع می‌کند)
+                try:
+                    cursor.execute(f"ALTER TABLE {table} DROP PARTITION {name}")
+                except Exception:
+                    print(f"❌ {table}.{name} کپی شد ولی DROP نشد؛ تا اجرای دوباره در {table}_all تکراری است")
+                    raise
+                purge_archived_children(conn, cursor, table, archive_table, child_tables)
+                print(f"🗄️ {table}.{name}: {moved} سطر به {archive_table} منتقل شد")
+    finally:
+        cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='مدیریت پارتیشن‌های ماهانه تحلیل‌ها')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help='نمایش پارتیشن‌ها')
+    ensure = subparsers.add_parser('ensure', help='ساخت پارتیشن‌های ماه‌های آینده')
+    ensure.add_argument('--ahead', type=int, default=3, help='تعداد ماه‌های آینده')
+    archive = subparsers.add_parser('archive', help='انتقال پارتیشن‌های قدیمی به آرشیو')
+    archive.add_argument('--older-than', type=int, default=Config.ARCHIVE_AFTER_MONTHS, help='سن به ماه')
+    archive.add_argument('--dry-run', action='store_true', help='فقط نمایش، بدون تغییر')
+    args = parser.parse_args()
+
+    if Config.DB_BACKEND != 'mysql':
+        print("❌ پارتیشن‌بندی فقط در MySQL پشتیبانی می‌شود")
+        return 1
+
+    with db_connection() as conn:
+        if args.command == 'archive':
+            archive_partitions(conn, args.older_than, args.dry_run)
+            return 0
+        cursor = conn.cursor()
+        try:
+            if args.command == 'list':
+                list_partitions(cursor)
+            else:
+                ensure_partitions(cursor, args.ahead)
+        finally:
+            cursor.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
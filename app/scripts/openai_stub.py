@@ -0,0 +1,256 @@
+# scripts/openai_stub.py
+"""
+سرور آزمایشی سازگار با OpenAI برای تست بار و تاخیر بدون هزینه و بدون اینترنت.
+
+    python scripts/openai_stub.py --port 8089 --latency lognormal:0.7,0.4 --error-rate 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 python app.py
+
+POST /v1/chat/completions را پیاده می‌کند:
+- تحلیل CRM و ارجاعیات (کامل یا فقط بخش‌های کیفی کنار آمار محلی): نمونه JSON داخل پرامپت‌ها (modules/analysis_prompts.py) که با schemas
+  هم‌شکل شده است؛ اگر response_format از نوع json_schema باشد، Mapها به شکل [{key، value}] ارسال می‌شوند.
+- چت آموزشگاه: پاسخ متنی کوتاه فارسی.
+- stream=True: ارسال تدریجی به صورت SSE با --token-delay بین chunkها و usage در آخرین chunk
+  (در صورت stream_options.include_usage).
+- تاخیر: fixed:S، uniform:MIN,MAX، normal:MEAN,SD یا lognormal:MU,SIGMA (ثانیه؛ lognormal روی لگاریتم).
+- خطا: با احتمال --error-rate یکی از --error-status (429 همراه retry-after) و با احتمال --hang-rate
+  بدون پاسخ ماندن تا --hang-seconds (برای تست timeout و circuit breaker).
+- کش پیشوند: cached_tokens مثل OpenAI از روی پیشوندهای تکراری (از ۱۰۲۴ توکن، گام ۱۲۸) گزارش می‌شود.
+
+GET /stats شمارنده‌های سرور را برمی‌گرداند.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import Flask, Response, jsonify, request
+from modules import schemas
+from modules.analysis_prompts import (CRM_INSTRUCTIONS, REFERRAL_INSTRUCTIONS, REFERRAL_INSIGHTS_INSTRUCTIONS,
+                                     CRM_INSIGHTS_INSTRUCTIONS)
+from modules.llm_usage import CHARS_PER_TOKEN, estimate_tokens
+
+CHAT_REPLY = ("سلام! استاد فروش نور توس هستم. برای این نیاز، یوپی‌اس لاین اینتراکتیو ۱۰۰۰VA پیشنهاد می‌دم؛ "
+              "باتری داخلی داره و ۱۸ ماه گارانتی. چند دستگاه و برای چه باری لازم دارید؟")
+
+# کش پیشوند: حداقل ۱۰۲۴ توکن و سپس گام‌های ۱۲۸ توکنی
+CACHE_MIN_TOKENS = 1024
+CACHE_STEP_TOKENS = 128
+
+app = Flask(__name__)
+settings = argparse.Namespace()
+_lock = threading.Lock()
+_prefixes = set()
+_stats = {'requests': 0, 'streams': 0, 'errors': 0, 'hangs': 0, 'crm': 0, 'referral': 0, 'referral_insights': 0, 'crm_insights': 0, 'chat': 0}
+
+
+def _example(instructions):
+    """نمونه JSON انتهای پرامپت ثابت"""
+    return json.loads(instructions[instructions.rindex('\n{\n') + 1:])
+
+
+EXAMPLES = {
+    'crm': schemas.normalize('crm', _example(CRM_INSTRUCTIONS)),
+    'referral': schemas.normalize('referral', _example(REFERRAL_INSTRUCTIONS)),
+    'referral_insights': schemas.normalize('referral_insights', _example(REFERRAL_INSIGHTS_INSTRUCTIONS)),
+    'crm_insights': schemas.normalize('crm_insights', _example(CRM_INSIGHTS_INSTRUCTIONS))
+}
+
+
+def parse_latency(spec):
+    """'fixed:0.5' و ... ← تابع نمونه‌برداری تاخیر (ثانیه)"""
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(',') if v]
+    if kind == 'fixed':
+        return lambda: values[0]
+    if kind == 'uniform':
+        return lambda: random.uniform(values[0], values[1])
+    if kind == 'normal':
+        return lambda: max(random.gauss(values[0], values[1]), 0)
+    if kind == 'lognormal':
+        return lambda: random.lognormvariate(values[0], values[1])
+    raise argparse.ArgumentTypeError(f"توزیع تاخیر نامعتبر: {spec}")
+
+
+def _kind(body):
+    """crm، referral، نسخه‌های _insights آن‌ها یا chat از روی response_format یا متن پرامپت"""
+    response_format = body.get('response_format') or {}
+    name = (response_format.get('json_schema') or {}).get('name', '')
+    for kind in ('crm', 'referral', 'referral_insights', 'crm_insights'):
+        if name == f'{kind}_analysis':
+            return kind
+    text = '\n'.join(str(m.get('content') or '') for m in body.get('messages', []))
+    if 'آمار محاسبه‌شده' in text:
+        return 'crm_insights'
+    if 'open_items' in text:
+        return 'referral_insights'
+    if 'status_analysis' in text:
+        return 'referral'
+    if 'فیلدهای_عددی' in text:
+        return 'crm'
+    return 'chat'
+
+
+def _content(kind, body):
+    if kind == 'chat':
+        return CHAT_REPLY
+    response_format = body.get('response_format') or {}
+    data = EXAMPLES[kind]
+    if response_format.get('type') == 'json_schema':
+        data = schemas.encode(kind, data)
+    return json.dumps(data, ensure_ascii=False)
+
+
+def _cached_tokens(prompt):
+    """طول بلندترین پیشوند تکراری (توکن) و ثبت پیشوندهای این درخواست"""
+    cached = 0
+    step = CACHE_STEP_TOKENS * CHARS_PER_TOKEN
+    start = CACHE_MIN_TOKENS * CHARS_PER_TOKEN
+    running = hashlib.sha1(prompt[:start].encode('utf-8'))
+    with _lock:
+        for end in range(start, len(prompt) + 1, step):
+            if end > start:
+                running.update(prompt[end - step:end].encode('utf-8'))
+            digest = running.digest()
+            if digest in _prefixes:
+                cached = end // CHARS_PER_TOKEN
+            else:
+                _prefixes.add(digest)
+    return cached
+
+
+def _usage(body, content):
+    prompt = ''.join(f"{m.get('role')}:{m.get('content') or ''}\n" for m in body.get('messages', []))
+    prompt_tokens = estimate_tokens(prompt)
+    completion_tokens = estimate_tokens(content)
+    return {
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'total_tokens': prompt_tokens + completion_tokens,
+        'prompt_tokens_details': {'cached_tokens': min(_cached_tokens(prompt), prompt_tokens)}
+    }
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def _error(status):
+    _count('errors')
+    headers = {'retry-after': str(settings.retry_after)} if status == 429 else {}
+    error_type = 'rate_limit_exceeded' if status == 429 else 'server_error'
+    return jsonify({'error': {'message': f'stub error {status}', 'type': error_type, 'code': error_type}}), \
+        status, headers
+
+
+def _stream(completion_id, model, content, usage, include_usage):
+    """chunkهای chat.completion.chunk به صورت SSE"""
+    def chunk(delta, finish_reason=None, usage_data=None):
+        data = {
+            'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+            'choices': [] if usage_data else [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]
+        }
+        if usage_data:
+            data['usage'] = usage_data
+        return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    def generate():
+        yield chunk({'role': 'assistant', 'content': ''})
+        for start in range(0, len(content), settings.chunk_chars):
+            if settings.token_delay:
+                time.sleep(settings.token_delay)
+            yield chunk({'content': content[start:start + settings.chunk_chars]})
+        yield chunk({}, 'stop')
+        if include_usage:
+            yield chunk(None, usage_data=usage)
+        yield "data: [DONE]\n\n"
+
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+
+@app.route('/v1/chat/completions', methods=['POST'])
+def chat_completions():
+    body = request.get_json(force=True)
+    _count('requests')
+
+    roll = random.random()
+    if roll < settings.error_rate:
+        return _error(random.choice(settings.error_status))
+    if roll < settings.error_rate + settings.hang_rate:
+        _count('hangs')
+        time.sleep(settings.hang_seconds)
+        return _error(504)
+
+    time.sleep(settings.sample_latency())
+
+    kind = _kind(body)
+    _count(kind)
+    model = body.get('model', 'gpt-4o-mini')
+    content = _content(kind, body)
+    usage = _usage(body, content)
+    completion_id = f"chatcmpl-stub-{uuid.uuid4().hex[:12]}"
+
+    if body.get('stream'):
+        _count('streams')
+        include_usage = bool((body.get('stream_options') or {}).get('include_usage'))
+        return _stream(completion_id, model, content, usage, include_usage)
+
+    return jsonify({
+        'id': completion_id,
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': model,
+        'choices': [{
+            'index': 0,
+            'message': {'role': 'assistant', 'content': content, 'refusal': None},
+            'finish_reason': 'stop'
+        }],
+        'usage': usage
+    })
+
+
+@app.route('/v1/models')
+def models():
+    return jsonify({'object': 'list', 'data': [{'id': 'gpt-4o-mini', 'object': 'model', 'owned_by': 'stub'}]})
+
+
+@app.route('/stats')
+def stats():
+    return jsonify(_stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='سرور آزمایشی سازگار با OpenAI (chat completions)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', default='fixed:0.5', help='توزیع تاخیر پاسخ (ثانیه)')
+    parser.add_argument('--token-delay', type=float, default=0.01, help='تاخیر بین chunkهای stream (ثانیه)')
+    parser.add_argument('--chunk-chars', type=int, default=40, help='تعداد کاراکتر هر chunk در stream')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='احتمال پاسخ خطا')
+    parser.add_argument('--error-status', default='429,500,503', help='کدهای خطای تزریقی')
+    parser.add_argument('--retry-after', type=float, default=1, help='هدر retry-after پاسخ‌های 429 (ثانیه)')
+    parser.add_argument('--hang-rate', type=float, default=0.0, help='احتمال بی‌پاسخ ماندن درخواست')
+    parser.add_argument('--hang-seconds', type=float, default=300, help='مدت بی‌پاسخ ماندن')
+    parser.add_argument('--seed', type=int, help='seed برای تکرارپذیری')
+    args = parser.parse_args()
+
+    args.sample_latency = parse_latency(args.latency)
+    args.error_status = [int(code) for code in args.error_status.split(',') if code]
+    if args.seed is not None:
+        random.seed(args.seed)
+    vars(settings).update(vars(args))
+
+    print(f"🧪 سرور آزمایشی OpenAI روی http://{args.host}:{args.port}/v1 (تاخیر {args.latency})")
+    app.run(host=args.host, port=args.port, threaded=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -101,8 +101,18 @@
         let customers = new Map();
 
         analyses.forEach(analysis => {
-            // سعی کن full_analysis رو پارس کن
-            let fullAnalysis = analysis;
+            // لیست تاریخچه فقط ستون‌های خلاصه را دارد (full_analysis فقط در جزئیات)
+            let fullAnalysis = {
+                آمار: {
+                    تعداد_کل_تماس_ها: analysis.total_calls,
+                    تماس_های_موفق: analysis.successful_calls
+                },
+                فیلدهای_متنی: {
+                    نام_فروشنده: analysis.seller_name,
+                    نام_مشتری: analysis.customer_name
+                },
+                امتیازها: { امتیاز_کل: analysis.score_total }
+            };
             if (analysis.full_analysis && typeof analysis.full_analysis === 'string') {
                 try {
                     fullAnalysis = JSON.parse(analysis.full_analysis);
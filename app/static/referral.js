@@ -92,6 +92,83 @@
         return (bytes / (1024 * 1024)).toFixed(2) + ' MB';
     }
 
+    // ========================================
+    // SSE - دریافت مراحل تحلیل به صورت جریانی
+    // ========================================
+    const STAGE_MESSAGES = {
+        saved: ['فایل دریافت شد، در حال استخراج متن...', 10],
+        extracted: ['متن استخراج شد، در حال ارسال به هوش مصنوعی...', 25],
+        parsed: ['پاسخ هوش مصنوعی پردازش شد، در حال ذخیره...', 90],
+        stored: ['گزارش ذخیره شد', 100]
+    };
+
+    function updateProgress(message, percent) {
+        const text = document.querySelector('#loading p');
+        if (text && message) text.textContent = message;
+        const fill = document.querySelector('#loading .progress-fill');
+        if (fill && percent !== undefined) fill.style.width = percent + '%';
+    }
+
+    async function readEventStream(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                let event = 'message';
+                const dataLines = [];
+                block.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) event = line.slice(6).trim();
+                    else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+                });
+                if (dataLines.length) onEvent(event, JSON.parse(dataLines.join('\n')));
+            }
+        }
+    }
+
+    function handleProgressEvent(event, data) {
+        if (event === 'stage' && STAGE_MESSAGES[data.stage]) {
+            updateProgress(...STAGE_MESSAGES[data.stage]);
+        } else if (event === 'cached') {
+            updateProgress('نتیجه از تحلیل قبلی همین فایل بازیابی شد', 85);
+        } else if (event === 'llm') {
+            updateProgress(`هوش مصنوعی در حال نوشتن گزارش... (${data.tokens} توکن)`, Math.min(25 + data.tokens / 40, 85));
+        } else if (event === 'chunk') {
+            updateProgress(`تحلیل بخش ${data.done} از ${data.total}`, 25 + Math.round(60 * data.done / data.total));
+        } else if (event === 'section') {
+            console.log('🧩 بخش آماده:', data.name);
+        }
+    }
+
+    async function fetchAnalysisStream(url, formData) {
+        const response = await fetch(url, { method: 'POST', body: formData });
+        const contentType = response.headers.get('Content-Type') || '';
+        if (!contentType.includes('text/event-stream')) {
+            const data = await response.json().catch(() => null);
+            if (data && (data.error || data.message)) {
+                return { error: true, message: data.message || data.error };
+            }
+            throw new Error('خطا در تحلیل فایل');
+        }
+
+        let result = null;
+        await readEventStream(response, (event, data) => {
+            if (event === 'result' || event === 'error') {
+                result = data;
+            } else {
+                handleProgressEvent(event, data);
+            }
+        });
+        if (!result) throw new Error('اتصال قبل از پایان تحلیل قطع شد');
+        return result;
+    }
+
     async function analyzeFile() {
         if (!selectedFile) return;
 
@@ -103,16 +180,8 @@
         document.getElementById('results').classList.add('hidden');
 
         try {
-            const response = await fetch('/api/analyze-referral', {
-                method: 'POST',
-                body: formData
-            });
-
-            if (!response.ok) {
-                throw new Error('خطا در تحلیل فایل');
-            }
-
-            analysisData = await response.json();
+            updateProgress('در حال آپلود فایل...', 5);
+            analysisData = await fetchAnalysisStream('/api/analyze-referral/stream', formData);
 
             if (analysisData.error) {
                 alert(analysisData.message);
@@ -0,0 +1,37 @@
+# tests/conftest.py
+"""
+تنظیمات مشترک تست‌ها (اجرا از پوشه app: python -m pytest -q).
+
+متغیرهای محیطی قبل از import شدن modules.config تنظیم می‌شوند: دیتابیس SQLite موقت
+(modules/sqlite_backend.py) به جای MySQL و کلید ساختگی OpenAI؛ هیچ تستی به شبکه نیاز ندارد.
+"""
+import os
+import sys
+import tempfile
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+os.environ['DB_BACKEND'] = 'sqlite'
+os.environ['SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='crm-tests-'), 'tests.sqlite3')
+os.environ['OPENAI_API_KEY'] = 'sk-test'
+
+import pytest
+
+# فایل‌های نمونه موجود در uploaded_files
+CRM_SAMPLE = os.path.join(APP_DIR, 'uploaded_files', '20251228_100431_edariMenu.rtf')
+REFERRAL_SAMPLE = os.path.join(APP_DIR, 'uploaded_files', '20260220_214527_28_29.xlsx')
+
+
+@pytest.fixture
+def crm_sample():
+    if not os.path.exists(CRM_SAMPLE):
+        pytest.skip('فایل نمونه CRM موجود نیست')
+    return CRM_SAMPLE
+
+
+@pytest.fixture
+def referral_sample():
+    if not os.path.exists(REFERRAL_SAMPLE):
+        pytest.skip('فایل نمونه ارجاعیات موجود نیست')
+    return REFERRAL_SAMPLE
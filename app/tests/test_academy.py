@@ -0,0 +1,105 @@
+# tests/test_academy.py
+"""API جزئیات آموزشگاه روی داده‌های نمونه migrations/011_academy_seed.sql و invalidate شدن کش بعد از نوشتن"""
+import uuid
+import pytest
+from app import app
+from modules.database import execute_query
+
+
+def _seeded(table, column, value):
+    row = execute_query(f"SELECT MIN(id) as id FROM {table} WHERE {column} = %s", (value,), fetch_one=True)
+    return row['id']
+
+
+@pytest.fixture
+def client():
+    """کلاینت لاگین‌شده با یک کاربر تازه (ادمین)"""
+    name = uuid.uuid4().hex[:12]
+    execute_query(
+        "INSERT INTO users (username, email, password_hash, full_name, role) VALUES (%s, %s, 'x', %s, 'admin')",
+        (name, f'{name}@test', f'کاربر {name}'), commit=True
+    )
+    user = execute_query("SELECT id FROM users WHERE username = %s", (name,), fetch_one=True)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user['id']
+        session['user_role'] = 'admin'
+    return client
+
+
+def test_seeded_details(client):
+    master_id = _seeded('academy_masters', 'full_name', 'دکتر علی محمدی')
+    master = client.get(f'/academy/api/master/{master_id}').get_json()['master']
+    assert master['education'][0]['university'] == 'دانشگاه تهران'
+    assert any(course['title'] == 'کارگاه فروش حرفه‌ای' for course in master['courses'])
+
+    workshop_id = _seeded('academy_workshops', 'title', 'کارگاه فروش حرفه‌ای')
+    workshop = client.get(f'/academy/api/workshop/{workshop_id}').get_json()['workshop']
+    assert workshop['master_name'] == 'دکتر علی محمدی'
+    assert len(workshop['syllabus']) == 3
+    sessions = client.get(f'/academy/api/workshop/{workshop_id}/sessions').get_json()['sessions']
+    assert [s['title'] for s in sessions][0] == 'جلسه اول - مقدمات فروش'
+
+    assessment_id = _seeded('academy_assessments', 'title', 'آزمون فروش مقدماتی')
+    assessment = client.get(f'/academy/api/assessment/{assessment_id}').get_json()['assessment']
+    assert assessment['user_status'] == 'not_started'
+    assert assessment['questions'] and all('answer' not in q for q in assessment['questions'])
+
+
+@pytest.mark.parametrize('url', [
+    '/academy/api/master/987654',
+    '/academy/api/workshop/987654',
+    '/academy/api/workshop/987654/sessions',
+    '/academy/api/workshop/987654/qa',
+    '/academy/api/assessment/987654',
+    '/academy/api/assessment/987654/result'
+])
+def test_missing_ids_return_404(client, url):
+    response = client.get(url)
+    assert response.status_code == 404
+    assert response.get_json()['success'] is False
+
+
+def test_register_invalidates_cached_list(client):
+    workshop_id = client.post('/academy/api/workshop', json={
+        'title': f'کارگاه آزمایشی {uuid.uuid4().hex[:6]}', 'department': 'services', 'capacity': 1
+    }).get_json()['workshop_id']
+
+    def registered():
+        workshops = client.get('/academy/api/workshop/list?department=services').get_json()['workshops']
+        return next(w['registered_count'] for w in workshops if w['id'] == workshop_id)
+
+    assert registered() == 0
+    assert client.post(f'/academy/api/workshop/{workshop_id}/register').status_code == 200
+    assert registered() == 1
+    assert client.post(f'/academy/api/workshop/{workshop_id}/register').status_code == 409
+    assert client.post(f'/academy/api/workshop/{workshop_id}/unregister').status_code == 200
+    assert registered() == 0
+
+
+def test_submit_scores_against_correct_answers(client):
+    assessment_id = _seeded('academy_assessments', 'title', 'آزمون فروش مقدماتی')
+    response = client.post(f'/academy/api/assessment/{assessment_id}/submit',
+                           json={'answers': {'1': 3, '2': 0, '3': 1}})
+    assert response.get_json()['score'] == 100
+    assert response.get_json()['status'] == 'passed'
+
+    result = client.get(f'/academy/api/assessment/{assessment_id}/result').get_json()['result']
+    assert result['answers'] == {'1': 3, '2': 0, '3': 1}
+    again = client.post(f'/academy/api/assessment/{assessment_id}/submit', json={'answers': {}})
+    assert again.status_code == 409
+
+
+def test_master_update_and_delete(client):
+    master_id = client.post('/academy/api/master', json={
+        'full_name': 'استاد آزمایشی', 'department': 'sales', 'experience': [{'position': 'مدرس'}]
+    }).get_json()['master_id']
+
+    assert client.put(f'/academy/api/master/{master_id}', json={'expertise': 'مذاکره'}).status_code == 200
+    master = client.get(f'/academy/api/master/{master_id}').get_json()['master']
+    assert master['expertise'] == 'مذاکره'
+    assert master['experience'] == [{'position': 'مدرس'}]
+
+    assert client.delete(f'/academy/api/master/{master_id}').status_code == 200
+    assert client.get(f'/academy/api/master/{master_id}').status_code == 404
+    assert client.put(f'/academy/api/master/{master_id}', json={'bio': 'x'}).status_code == 404
@@ -0,0 +1,55 @@
+# tests/test_analysis_codec.py
+"""فشرده‌سازی full_analysis: بایت نسخه، بازگشت بدون تغییر و باز کردن سطر"""
+import json
+import pytest
+from modules import analysis_codec
+from modules.analysis_codec import FORMAT_ZLIB, FORMAT_ZSTD, compress_json, decompress_text, unpack_row
+
+DATA = {'فیلدهای_عددی': {'امتیاز_کل': 81}, 'لیست_ها': {'نقاط_قوت': ['پیگیری منظم'] * 50}}
+
+
+def test_zlib_round_trip():
+    blob = compress_json(DATA, 'zlib')
+    assert blob[0] == FORMAT_ZLIB
+    assert json.loads(decompress_text(blob)) == DATA
+
+
+@pytest.mark.skipif(analysis_codec.zstandard is None, reason='پکیج zstandard نصب نیست')
+def test_zstd_round_trip():
+    blob = compress_json(DATA, 'zstd')
+    assert blob[0] == FORMAT_ZSTD
+    assert json.loads(decompress_text(blob)) == DATA
+
+
+def test_zstd_without_package_falls_back_to_zlib(monkeypatch):
+    monkeypatch.setattr(analysis_codec, 'zstandard', None)
+    blob = compress_json(DATA, 'zstd')
+    assert blob[0] == FORMAT_ZLIB
+    assert json.loads(decompress_text(blob)) == DATA
+
+
+def test_zstd_blob_without_package_raises(monkeypatch):
+    monkeypatch.setattr(analysis_codec, 'zstandard', None)
+    with pytest.raises(RuntimeError):
+        decompress_text(bytes([FORMAT_ZSTD]) + b'payload')
+
+
+def test_unknown_version_raises():
+    with pytest.raises(ValueError):
+        decompress_text(b'\x07payload')
+
+
+def test_text_and_bytes_are_stored_as_is():
+    text = '{"a": "ب"}'
+    assert decompress_text(compress_json(text, 'zlib')) == text
+    assert decompress_text(compress_json(text.encode('utf-8'), 'zlib')) == text
+
+
+def test_unpack_row():
+    row = {'id': 1, 'full_analysis': None, 'full_analysis_z': compress_json(DATA, 'zlib')}
+    assert json.loads(unpack_row(row)['full_analysis']) == DATA
+    assert 'full_analysis_z' not in row
+
+    plain = {'id': 2, 'full_analysis': '{}', 'full_analysis_z': None}
+    assert unpack_row(plain) == {'id': 2, 'full_analysis': '{}'}
+    assert unpack_row(None) is None
@@ -0,0 +1,184 @@
+# tests/test_chunked_analysis.py
+"""تقسیم محتوا به تکه‌ها و ادغام نتایج جزئی CRM و ارجاعیات"""
+import re
+from modules import crm_stats
+from modules.chunked_analysis import (
+    merge_crm_results, merge_partials, merge_referral_results, retry_failed, run_chunks, split_content
+)
+from modules.llm_usage import CHARS_PER_TOKEN
+from modules.prompt_compaction import LEGEND, compact_rows
+
+_DEFINITION = re.compile(r'@\d+\t')
+_CODE = re.compile(r'@\d+')
+
+
+def _codes(chunk):
+    """(کدهای تعریف‌شده، کدهای به کار رفته) در یک تکه"""
+    lines = chunk.split('\n')
+    defined = {line.split('\t', 1)[0] for line in lines if _DEFINITION.match(line)}
+    used = {field for line in lines if not _DEFINITION.match(line)
+            for field in line.split('\t') if _CODE.fullmatch(field)}
+    return defined, used
+
+
+def test_small_content_is_one_chunk():
+    assert split_content('سرستون\nسطر یک', 1000) == ['سرستون\nسطر یک']
+
+
+def test_split_repeats_header_and_keeps_every_row():
+    rows = [f'تماس {i} با مشتری شماره {i}' for i in range(200)]
+    content = 'ردیف\tنام\tوضعیت\n' + '\n'.join(rows)
+    chunks = split_content(content, 100)
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk.startswith('ردیف\tنام\tوضعیت\n')
+        assert len(chunk) <= 100 * CHARS_PER_TOKEN
+    body = [line for chunk in chunks for line in chunk.splitlines()[1:]]
+    assert body == rows
+
+
+def test_compacted_chunks_define_their_codes():
+    rows = [['ردیف', 'کاربر', 'وضعیت', 'شرح']]
+    rows += [[i, f'کارشناس شماره {i % 7}', 'اتمام کار', f'شرح تماس {i}'] for i in range(300)]
+    content = compact_rows(rows)
+    chunks = split_content(content, 400)
+
+    assert len(chunks) > 1
+    body = []
+    for chunk in chunks:
+        defined, used = _codes(chunk)
+        assert used and used <= defined
+        assert chunk.startswith(LEGEND)
+        lines = chunk.split('\n')
+        header = lines[lines.index('---') + 1]
+        assert header == 'ردیف\tکاربر\tوضعیت\tشرح'
+        body.extend(lines[lines.index('---') + 2:])
+    assert len(body) == 300
+
+
+def test_sample_report_chunks_define_their_codes(crm_sample):
+    calls = crm_stats.from_file(crm_sample)['calls']
+    chunks = split_content(calls, 1500)
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        defined, used = _codes(chunk)
+        assert used <= defined
+        assert 'ردیف\tکاربر\tثبت\tنوع\tاشتراک\tمشتری\tشرح' in chunk.split('\n')
+        assert len(chunk) <= 1500 * CHARS_PER_TOKEN
+
+
+def test_split_breaks_long_lines_on_spaces():
+    words = ['کلمه'] * 400
+    chunks = split_content(' '.join(words), 50)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 50 * CHARS_PER_TOKEN for chunk in chunks)
+    assert sum(len(chunk.split()) for chunk in chunks) == len(words)
+
+
+def test_run_chunks_keeps_order():
+    results = run_chunks(['a', 'b', 'c'], lambda chunk, index, total: {'chunk': chunk, 'of': total}, 3)
+    assert results == [{'chunk': 'a', 'of': 3}, {'chunk': 'b', 'of': 3}, {'chunk': 'c', 'of': 3}]
+
+
+def test_retry_failed_reruns_only_failed_chunks():
+    calls = []
+
+    def analyze(chunk, index, total):
+        calls.append(index)
+        return {'chunk': chunk}
+
+    partials = [{'chunk': 'a'}, {'error': True}, {'chunk': 'c'}]
+    retry_failed(['a', 'b', 'c'], partials, analyze, 2, retries=1)
+
+    assert calls == [1]
+    assert partials == [{'chunk': 'a'}, {'chunk': 'b'}, {'chunk': 'c'}]
+
+
+def test_merge_partials_marks_partial_results():
+    partials = [{'n': 1}, {'error': True, 'message': 'x'}, {'n': 2}]
+    merged = merge_partials(partials, lambda ok: {'total': sum(p['n'] for p in ok)})
+
+    assert merged['total'] == 3
+    assert merged['partial'] is True
+    assert merged['failed_chunks'] == [2]
+
+
+def test_merge_partials_all_failed_returns_first_error():
+    partials = [{'error': True, 'message': 'اول'}, {'error': True, 'message': 'دوم'}]
+    assert merge_partials(partials, lambda ok: {}) == partials[0]
+
+
+def test_merge_crm_results_sums_counts_and_weights_scores():
+    partials = [
+        {
+            'فیلدهای_عددی': {'امتیاز_کل': 80, 'تعداد_اعتراض': 2},
+            'فیلدهای_متنی': {'نام_فروشنده': 'رضایی'},
+            'آمار': {
+                'تعداد_کل_تماس_ها': 30, 'تماس_های_موفق': 20,
+                'کاربران_فعال': [{'نام': 'رضایی', 'تعداد_تماس': 30}],
+                'انواع_تماس': {'ورودی': 10}
+            },
+            'لیست_ها': {'نقاط_قوت': ['پیگیری', 'لحن']}
+        },
+        {
+            'فیلدهای_عددی': {'امتیاز_کل': 40, 'تعداد_اعتراض': 3},
+            'فیلدهای_متنی': {'نام_فروشنده': 'احمدی'},
+            'آمار': {
+                'تعداد_کل_تماس_ها': 10, 'تماس_های_موفق': 5,
+                'کاربران_فعال': [{'نام': 'احمدی', 'تعداد_تماس': 6}, {'نام': 'رضایی', 'تعداد_تماس': 4}],
+                'انواع_تماس': {'ورودی': 2, 'خروجی': 8}
+            },
+            'لیست_ها': {'نقاط_قوت': ['لحن']}
+        }
+    ]
+    merged = merge_crm_results(partials)
+
+    assert merged['فیلدهای_عددی'] == {'امتیاز_کل': 70.0, 'تعداد_اعتراض': 5}
+    assert merged['آمار']['تعداد_کل_تماس_ها'] == 40
+    assert merged['آمار']['تماس_های_موفق'] == 25
+    assert merged['آمار']['کاربران_فعال'][0] == {'نام': 'رضایی', 'تعداد_تماس': 34}
+    assert merged['آمار']['انواع_تماس'] == {'ورودی': 12, 'خروجی': 8}
+    assert merged['لیست_ها']['نقاط_قوت'] == ['لحن', 'پیگیری']
+    assert merged['فیلدهای_متنی']['نام_فروشنده'] == 'رضایی، احمدی'
+    assert merged['بهترین_ها']['بهترین_فروشنده']['نام'] == 'رضایی'
+
+
+def test_merge_crm_results_prefers_exact_stats():
+    exact = {'تعداد_کل_تماس_ها': 114, 'کاربران_فعال': [], 'مشتریان_پرتماس': []}
+    partials = [{'آمار': {'تعداد_کل_تماس_ها': 50}}, {'آمار': {'تعداد_کل_تماس_ها': 60}}]
+    assert merge_crm_results(partials, stats=exact)['آمار'] is exact
+
+
+def test_single_partial_is_returned_unchanged():
+    partial = {'آمار': {'تعداد_کل_تماس_ها': 3}}
+    assert merge_crm_results([partial]) is partial
+    assert merge_referral_results([partial]) is partial
+
+
+def test_merge_referral_results_recomputes_percentages():
+    partials = [
+        {
+            'status_analysis': {'status_distribution': {'اتمام کار': 6, 'بررسی نشده': 2}},
+            'subject_analysis': {'unique_subjects': [{'subject': 'نصب', 'count': 5}, 'نامعتبر']},
+            'comprehensive_insights': {'workflow_health_score': 80, 'recommendations_fa': ['پیگیری روزانه']}
+        },
+        {
+            'status_analysis': {'status_distribution': {'اتمام کار': 1, 'بررسی نشده': 1}},
+            'subject_analysis': {'unique_subjects': [{'subject': 'نصب', 'count': 1}, {'subject': 'خرابی', 'count': 1}]},
+            'comprehensive_insights': {'workflow_health_score': 30, 'recommendations_fa': ['پیگیری روزانه']}
+        }
+    ]
+    merged = merge_referral_results(partials)
+    status = merged['status_analysis']
+
+    assert status['status_distribution'] == {'اتمام کار': 7, 'بررسی نشده': 3}
+    assert status['percent_completed'] == 70.0
+    assert status['percent_pending'] == 30.0
+    assert status['most_frequent_status'] == 'اتمام کار'
+    assert merged['subject_analysis']['most_frequent_subject'] == 'نصب'
+    assert merged['subject_analysis']['subject_frequency'] == 6
+    assert merged['comprehensive_insights']['workflow_health_score'] == 70.0
+    assert merged['comprehensive_insights']['recommendations_fa'] == ['پیگیری روزانه']
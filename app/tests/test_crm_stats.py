@@ -0,0 +1,56 @@
+# tests/test_crm_stats.py
+"""جدول و آمار محلی گزارش CRM روی فایل نمونه RTF در uploaded_files"""
+import pytest
+from modules import crm_stats
+from modules.schemas import validate
+
+
+@pytest.fixture
+def table(crm_sample):
+    result = crm_stats.from_file(crm_sample)
+    assert result is not None
+    return result
+
+
+def test_call_counts(table):
+    stats = table['stats']
+    assert table['rows'] == 114
+    assert stats['تعداد_کل_تماس_ها'] == 114
+    assert stats['تماس_های_موفق'] == 87
+    assert stats['تماس_های_بی_پاسخ'] == 27
+    assert stats['تماس_های_ارجاعی'] == 19
+    assert stats['انواع_تماس'] == {crm_stats.UNTYPED: 75, 'Erja': 18, 'Reminder': 18, 'Repair': 3}
+
+
+def test_active_users(table):
+    users = table['stats']['کاربران_فعال']
+    assert users[0]['نام'] == 'فنی-اداری1'
+    assert users[0]['تعداد_تماس'] == 34
+    assert [user['تعداد_تماس'] for user in users] == sorted((user['تعداد_تماس'] for user in users), reverse=True)
+    assert sum(user['تعداد_تماس'] for user in users) == 114
+
+
+def test_matches_crm_stats_schema(table):
+    data, problems = validate('crm', {'آمار': table['stats']})
+    assert [problem for problem in problems if problem.startswith('crm.آمار')] == []
+    assert data['آمار']['تعداد_کل_تماس_ها'] == 114
+
+
+def test_calls_text_is_compacted(table):
+    calls = table['calls']
+    assert calls.startswith('# جدول TSV')
+    assert 'ردیف\tکاربر\tثبت\tنوع\tاشتراک\tمشتری\tشرح' in calls
+
+
+def test_merge_insights_keeps_local_stats(table):
+    merged = crm_stats.merge_insights(table, {'فیلدهای_عددی': {'امتیاز_کل': 70}, 'آمار': {'تعداد_کل_تماس_ها': 1}})
+    assert merged['آمار'] is table['stats']
+    assert merged['local_stats'] == {'rows': 114}
+    assert merged['فیلدهای_عددی'] == {'امتیاز_کل': 70}
+
+
+def test_unsupported_files(tmp_path):
+    assert crm_stats.from_file(str(tmp_path / 'calls.pdf')) is None
+    path = tmp_path / 'calls.rtf'
+    path.write_text('{\\rtf1 متن بدون جدول}')
+    assert crm_stats.from_file(str(path)) is None
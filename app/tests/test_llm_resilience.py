@@ -0,0 +1,122 @@
+# tests/test_llm_resilience.py
+"""حالت‌های circuit breaker و تلاش مجدد call_with_resilience"""
+import httpx
+import openai
+import pytest
+from modules import llm_resilience
+from modules.config import Config
+from modules.llm_resilience import CircuitBreaker, CircuitOpenError, call_with_resilience
+
+
+@pytest.fixture(autouse=True)
+def fresh_endpoints(monkeypatch):
+    monkeypatch.setattr(Config, 'LLM_BREAKER_FAILURES', 2)
+    monkeypatch.setattr(Config, 'LLM_BREAKER_RESET', 60)
+    monkeypatch.setattr(Config, 'LLM_MAX_RETRIES', 3)
+    monkeypatch.setattr(llm_resilience.time, 'sleep', lambda seconds: None)
+    llm_resilience.reset()
+    yield
+    llm_resilience.reset()
+
+
+def _connection_error():
+    return openai.APIConnectionError(request=httpx.Request('POST', 'http://test/v1/chat/completions'))
+
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+    assert 0 < breaker.retry_in() <= 60
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+
+
+def test_half_open_allows_a_single_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == 'open'
+
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_trial_reopens():
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=0)
+    breaker.state = 'open'
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.trial_running
+
+
+def test_transient_errors_are_retried():
+    attempts = []
+
+    def call(timeout):
+        attempts.append(timeout)
+        if len(attempts) == 1:
+            raise _connection_error()
+        return 'ok'
+
+    assert call_with_resilience('analysis', call) == 'ok'
+    assert len(attempts) == 2
+    stats = llm_resilience.snapshot()['analysis']
+    assert stats['state'] == 'closed'
+    assert stats['retries'] == 1
+
+
+def test_circuit_opens_and_short_circuits():
+    def call(timeout):
+        raise _connection_error()
+
+    with pytest.raises(openai.APIConnectionError):
+        call_with_resilience('analysis', call)
+    with pytest.raises(CircuitOpenError):
+        call_with_resilience('analysis', call)
+    stats = llm_resilience.snapshot()['analysis']
+    assert stats['state'] == 'open'
+    assert stats['short_circuited'] == 1
+
+
+def test_unexpected_error_in_half_open_releases_trial(monkeypatch):
+    monkeypatch.setattr(Config, 'LLM_BREAKER_RESET', 0)
+    breaker, _ = llm_resilience._endpoint('chat')
+    breaker.state = 'open'
+
+    def broken(timeout):
+        raise ValueError('پاسخ نامعتبر')
+
+    with pytest.raises(ValueError):
+        call_with_resilience('chat', broken)
+    assert not breaker.trial_running
+    assert call_with_resilience('chat', lambda timeout: 'ok') == 'ok'
+    assert breaker.state == 'closed'
+
+
+def test_retry_after_headers():
+    response = httpx.Response(429, headers={'retry-after-ms': '1500'},
+                              request=httpx.Request('POST', 'http://test'))
+    error = openai.RateLimitError('limited', response=response, body=None)
+    assert llm_resilience.retry_after(error) == 1.5
+
+    response = httpx.Response(429, headers={'x-ratelimit-reset-requests': '1m30s',
+                                            'x-ratelimit-reset-tokens': '250ms'},
+                              request=httpx.Request('POST', 'http://test'))
+    error = openai.RateLimitError('limited', response=response, body=None)
+    assert llm_resilience.retry_after(error) == 90
@@ -0,0 +1,84 @@
+# tests/test_models.py
+"""ذخیره و خواندن تحلیل‌ها روی بک‌اند SQLite (modules/sqlite_backend.py)"""
+import json
+from modules.database import execute_query
+from modules.models import AnalysisModel, ReferralAnalysisModel
+
+ANALYSIS = {
+    'فیلدهای_عددی': {'امتیاز_کل': 72, 'امتیاز_نیازسنجی': 8, 'disc_d': 40},
+    'فیلدهای_متنی': {'نام_فروشنده': 'رضایی', 'نام_مشتری': 'شرکت نمونه'},
+    'آمار': {
+        'تعداد_کل_تماس_ها': 12,
+        'تماس_های_موفق': 9,
+        'کاربران_فعال': [{'نام': 'رضایی', 'تعداد_تماس': 7, 'یادداشت_عملکرد': 'فعال'}],
+        'مشتریان_پرتماس': [{'نام': 'شرکت نمونه', 'تعداد_تماس': 3, 'کیفیت_تعامل': 'خوب'}]
+    },
+    'لیست_ها': {'نقاط_قوت': ['پیگیری منظم', ''], 'اعتراضات': ['قیمت بالا']}
+}
+
+FILE_INFO = {'name': 'calls.rtf', 'path': '/tmp/calls.rtf', 'size': 1024, 'type': 'rtf'}
+
+
+def _children(table, column, analysis_id):
+    rows = execute_query(f"SELECT {column} FROM {table} WHERE analysis_id = %s", (analysis_id,), fetch_all=True)
+    return [row[column] for row in rows]
+
+
+def test_save_and_get_by_id():
+    analysis_id = AnalysisModel.save(FILE_INFO, ANALYSIS)
+    row = AnalysisModel.get_by_id(analysis_id)
+
+    assert row['file_name'] == 'calls.rtf'
+    assert row['score_total'] == 72
+    assert row['seller_name'] == 'رضایی'
+    assert row['total_calls'] == 12
+    assert row['successful_calls'] == 9
+    assert 'full_analysis_z' not in row
+    full = json.loads(row['full_analysis'])
+    assert full['فیلدهای_عددی']['امتیاز_کل'] == 72
+
+    assert _children('strengths', 'strength', analysis_id) == ['پیگیری منظم']
+    assert _children('objections', 'objection', analysis_id) == ['قیمت بالا']
+    assert _children('active_users', 'user_name', analysis_id) == ['رضایی']
+    assert _children('top_customers', 'customer_name', analysis_id) == ['شرکت نمونه']
+
+
+def test_get_by_id_missing():
+    assert AnalysisModel.get_by_id(987654) is None
+
+
+def test_update_replaces_values_and_children():
+    analysis_id = AnalysisModel.save(FILE_INFO, ANALYSIS)
+    changed = dict(ANALYSIS, فیلدهای_عددی={'امتیاز_کل': 55}, لیست_ها={'نقاط_قوت': ['لحن مناسب']})
+
+    assert AnalysisModel.update(analysis_id, changed) is True
+    row = AnalysisModel.get_by_id(analysis_id)
+    assert row['score_total'] == 55
+    assert row['file_name'] == 'calls.rtf'
+    assert _children('strengths', 'strength', analysis_id) == ['لحن مناسب']
+    assert _children('objections', 'objection', analysis_id) == []
+
+    assert AnalysisModel.update(987654, changed) is False
+
+
+def test_delete_removes_children():
+    analysis_id = AnalysisModel.save(FILE_INFO, ANALYSIS)
+
+    assert AnalysisModel.delete(analysis_id) == '/tmp/calls.rtf'
+    assert AnalysisModel.get_by_id(analysis_id) is None
+    assert _children('strengths', 'strength', analysis_id) == []
+    assert _children('active_users', 'user_name', analysis_id) == []
+    assert AnalysisModel.delete(analysis_id) is None
+
+
+def test_referral_save_and_get_by_id():
+    analysis = {'status_analysis': {'status_distribution': {'اتمام کار': 3, 'بررسی نشده': 1}}}
+    analysis_id = ReferralAnalysisModel.save({'name': 'referrals.xlsx', 'path': '', 'size': 10}, analysis)
+    row = ReferralAnalysisModel.get_by_id(analysis_id)
+
+    assert row['file_name'] == 'referrals.xlsx'
+    assert row['total_referrals'] == 4
+    assert row['completed_count'] == 3
+    assert row['pending_count'] == 1
+    assert row['completion_rate'] == 75
+    assert json.loads(row['full_analysis'])['status_analysis']['status_distribution']['اتمام کار'] == 3
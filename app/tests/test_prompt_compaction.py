@@ -0,0 +1,109 @@
+# tests/test_prompt_compaction.py
+"""فشرده‌سازی جدول‌ها به TSV با فرهنگ مقادیر تکراری (compact_rows) و متن ساده (compact_text)"""
+from datetime import datetime
+import pytest
+from modules.config import Config
+from modules.prompt_compaction import DICTIONARY_PREFIX, LEGEND, compact, compact_rows, compact_text
+
+TITLE = ['گزارش سوابق ارتباط با مشترک', None, None, None, None]
+HEADER = ['ردیف', 'کاربر', 'ثبت', 'وضعیت', 'خالی']
+
+
+@pytest.fixture(autouse=True)
+def dictionary_settings(monkeypatch):
+    monkeypatch.setattr(Config, 'PROMPT_DICT_MIN_COUNT', 3)
+    monkeypatch.setattr(Config, 'PROMPT_DICT_MIN_LENGTH', 6)
+
+
+def _expand(text):
+    """بازگرداندن خروجی compact_rows به سطرها (کدهای @n باز و ×n تکرار می‌شوند)"""
+    lines = text.split('\n')
+    codes = {}
+    if lines[0] == LEGEND:
+        end = lines.index('---')
+        codes = dict(line.split('\t', 1) for line in lines[1:end])
+        lines = lines[end + 1:]
+    rows = []
+    for line in lines:
+        fields = line.split('\t')
+        count = 1
+        if fields[-1].startswith('×'):
+            count = int(fields.pop()[1:])
+        rows.extend([[codes.get(field, field) for field in fields]] * count)
+    return rows
+
+
+def _calls(count):
+    rows = []
+    for i in range(1, count + 1):
+        rows.append([i, 'کارشناس فروش مرکزی', datetime(2025, 12, i % 28 + 1), 'اتمام کار', None])
+        rows.append([f'توضیح تماس {i}', None, None, None, None])
+    return rows
+
+
+def test_repeated_values_get_dictionary_codes():
+    text = compact_rows([TITLE, HEADER] + _calls(10))
+    lines = text.split('\n')
+
+    assert lines[0] == LEGEND
+    assert f'{DICTIONARY_PREFIX}1\tکارشناس فروش مرکزی' in lines
+    assert text.count('کارشناس فروش مرکزی') == 1
+    assert 'خالی' not in text
+
+
+def test_round_trip_keeps_rows_in_order():
+    calls = _calls(10)
+    expanded = _expand(compact_rows([TITLE, HEADER] + calls))
+
+    assert expanded[0] == ['گزارش سوابق ارتباط با مشترک']
+    assert expanded[1] == ['ردیف', 'کاربر', 'ثبت', 'وضعیت']
+    body = expanded[2:]
+    assert len(body) == len(calls)
+    assert body[0] == ['1', 'کارشناس فروش مرکزی', '2025-12-02', 'اتمام کار']
+    assert body[1] == ['توضیح تماس 1']
+    assert body[-1] == ['توضیح تماس 10']
+
+
+def test_page_headers_appear_once():
+    page = [TITLE, HEADER]
+    rows = page + _calls(3) + page + _calls(3)
+    text = compact_rows(rows)
+
+    assert text.count('گزارش سوابق ارتباط با مشترک') == 1
+    assert text.count('ردیف\t') == 1
+
+
+def test_only_consecutive_duplicates_collapse():
+    rows = [HEADER,
+            [1, 'علی', 'x', 'بی پاسخ', None], [1, 'علی', 'x', 'بی پاسخ', None],
+            ['یادداشت'],
+            [2, 'رضا', 'y', 'موفق', None],
+            ['یادداشت']]
+    expanded = _expand(compact_rows(rows))
+
+    assert expanded == [
+        ['ردیف', 'کاربر', 'ثبت', 'وضعیت'],
+        ['1', 'علی', 'x', 'بی پاسخ'], ['1', 'علی', 'x', 'بی پاسخ'],
+        ['یادداشت'],
+        ['2', 'رضا', 'y', 'موفق'],
+        ['یادداشت']
+    ]
+
+
+def test_single_column_content_falls_back_to_text():
+    assert compact_rows([['سطر اول'], ['سطر  اول'], [None], ['سطر دوم']]) == 'سطر اول ×2\nسطر دوم'
+
+
+def test_compact_text():
+    assert compact_text('الف   ب\n\nالف ب\nج\t\tد\n') == 'الف ب ×2\nج د'
+
+
+def test_compact_report():
+    rows = [TITLE, HEADER] + _calls(40)
+    raw = '\n'.join('\t'.join('' if cell is None else str(cell) for cell in row) for row in rows)
+    compacted, report = compact(raw, rows)
+
+    assert report['mode'] == 'table'
+    assert report['chars_after'] == len(compacted) < report['chars_before']
+    assert report['tokens_after'] < report['tokens_before']
+    assert report['saved_percent'] > 0
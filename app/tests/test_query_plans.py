@@ -0,0 +1,45 @@
+# tests/test_query_plans.py
+"""scripts/check_query_plans.py همه ثابت‌های کوئری برنامه را بررسی می‌کند و هر کوئری روی schema فعلی اجراشدنی است"""
+import importlib.util
+import os
+import pytest
+from modules import models, llm_cache, job_queue, llm_usage
+from modules.routes import main as main_routes
+from modules.auth import models as auth_models
+from modules.academy import models as academy_models
+from modules.database import execute_query
+
+_spec = importlib.util.spec_from_file_location(
+    'check_query_plans', os.path.join(os.path.dirname(__file__), '..', 'scripts', 'check_query_plans.py')
+)
+check_query_plans = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(check_query_plans)
+
+SOURCES = (models, main_routes, auth_models, academy_models, llm_cache, job_queue, llm_usage)
+
+
+def _constants(module):
+    """(نام، متن) ثابت‌های *_QUERY و اعضای *_QUERIES یک ماژول"""
+    for name, value in vars(module).items():
+        if name.endswith('_QUERY'):
+            yield f'{module.__name__}.{name}', value
+        elif name.endswith('_QUERIES'):
+            for index, sql in enumerate(value):
+                yield f'{module.__name__}.{name}[{index}]', sql
+
+
+def test_every_query_constant_is_checked():
+    registered = {query['sql'] for query in check_query_plans.QUERIES}
+    missing = [name for module in SOURCES for name, sql in _constants(module) if sql not in registered]
+    assert missing == []
+
+
+def test_query_names_are_unique():
+    names = [query['name'] for query in check_query_plans.QUERIES]
+    assert len(names) == len(set(names))
+
+
+@pytest.mark.parametrize('query', check_query_plans.QUERIES, ids=lambda query: query['name'])
+def test_query_explains_on_current_schema(query):
+    plan = execute_query('EXPLAIN ' + check_query_plans.query_sql(query), query.get('params', ()), fetch_all=True)
+    assert plan
@@ -0,0 +1,75 @@
+# tests/test_referral_stats.py
+"""آمار محلی ارجاعیات روی فایل نمونه uploaded_files"""
+import json
+import openpyxl
+import pytest
+from modules import referral_stats
+from modules.schemas import validate
+
+
+@pytest.fixture
+def stats(referral_sample):
+    result = referral_stats.from_file(referral_sample)
+    assert result is not None
+    return result
+
+
+def test_status_counts(stats):
+    status = stats['status_analysis']
+    assert status['status_distribution'] == {
+        'بررسی نشده': 11, 'اتمام کار': 9, 'رویت شده': 5, 'درحال پیگیری': 2, 'قبول ارجاع': 1
+    }
+    assert sum(status['status_distribution'].values()) == stats['local_stats']['rows'] == 28
+    assert status['most_frequent_status'] == 'بررسی نشده'
+    assert status['percent_pending'] == 39.3
+    assert status['percent_completed'] == 32.1
+    assert status['status_with_lowest_frequency'] == 'قبول ارجاع'
+
+
+def test_subjects_sorted_by_count(stats):
+    subjects = stats['subject_analysis']
+    counts = [item['count'] for item in subjects['unique_subjects']]
+    assert counts == sorted(counts, reverse=True)
+    assert sum(counts) == 28
+    assert subjects['most_frequent_subject'] == 'دریافت بار از باربری'
+    assert subjects['subject_frequency'] == 4
+
+
+def test_matches_referral_schema(stats):
+    _, problems = validate('referral', {**stats, 'comprehensive_insights': {}})
+    assert [problem for problem in problems if not problem.startswith('referral.comprehensive_insights')] == []
+
+
+def test_repeatable(referral_sample, stats):
+    again = referral_stats.from_file(referral_sample)
+    again.pop('local_stats')
+    stats.pop('local_stats')
+    assert again == stats
+
+
+def test_summary_text_is_compact_json(stats):
+    text = referral_stats.summary_text(stats)
+    summary = json.loads(text)
+    assert 'local_stats' not in summary
+    assert len(summary['subject_analysis']['unique_subjects']) <= referral_stats.OPEN_ITEMS
+    assert '\n' not in text
+
+
+def test_merge_insights_adds_only_insights(stats):
+    merged = referral_stats.merge_insights(stats, {'comprehensive_insights': {'summary_fa': 'خلاصه'},
+                                                   'status_analysis': {}})
+    assert merged['comprehensive_insights'] == {'summary_fa': 'خلاصه'}
+    assert merged['status_analysis'] == stats['status_analysis']
+
+
+def test_non_table_files_fall_back_to_model(tmp_path):
+    assert referral_stats.from_file(str(tmp_path / 'notes.txt')) is None
+
+    path = tmp_path / 'other.xlsx'
+    workbook = openpyxl.Workbook()
+    workbook.active.append(['ستون', 'دیگر'])
+    workbook.active.append(['الف', 'ب'])
+    workbook.save(path)
+    with pytest.raises(referral_stats.ReferralFormatError):
+        referral_stats.load_referrals(str(path))
+    assert referral_stats.from_file(str(path)) is None
@@ -0,0 +1,69 @@
+# tests/test_schemas.py
+"""تطبیق پاسخ مدل با ساختار CRM / ارجاعیات (normalize، validate، encode)"""
+from modules.schemas import SCHEMAS, default, encode, normalize, response_format, validate
+
+
+def test_empty_response_gets_full_shape():
+    data = normalize('crm', {})
+    assert data == default(SCHEMAS['crm'])
+    assert data['فیلدهای_عددی']['امتیاز_کل'] == 0
+    assert data['فیلدهای_متنی']['نام_فروشنده'] == ''
+    assert data['لیست_ها']['نقاط_قوت'] == []
+    assert data['آمار']['انواع_تماس'] == {}
+
+
+def test_numbers_from_strings():
+    data = normalize('crm', {
+        'فیلدهای_عددی': {'امتیاز_کل': '۷۵', 'کیفیت_لید_درصد': '60%', 'disc_d': 'نامشخص'},
+        'آمار': {'تعداد_کل_تماس_ها': '1,204', 'تماس_های_موفق': 9.6}
+    })
+    assert data['فیلدهای_عددی']['امتیاز_کل'] == 75
+    assert data['فیلدهای_عددی']['کیفیت_لید_درصد'] == 60
+    assert data['فیلدهای_عددی']['disc_d'] == 0
+    assert data['آمار']['تعداد_کل_تماس_ها'] == 1204
+    assert data['آمار']['تماس_های_موفق'] == 10
+
+
+def test_loose_shapes_are_coerced():
+    data = normalize('crm', {
+        'لیست_ها': {'نقاط_قوت': 'پیگیری، لحن مناسب'},
+        'فیلدهای_متنی': {'disc_شواهد': 'سریع حرف می‌زند', 'محصول': ['UPS', 'استابلایزر']},
+        'بهترین_ها': {'بهترین_فروشنده': 'رضایی'},
+        'آمار': {'انواع_تماس': [{'key': 'ورودی', 'value': '4'}]}
+    })
+    assert data['لیست_ها']['نقاط_قوت'] == ['پیگیری', 'لحن مناسب']
+    assert data['فیلدهای_متنی']['disc_شواهد'] == ['سریع حرف می‌زند']
+    assert data['فیلدهای_متنی']['محصول'] == 'UPS، استابلایزر'
+    assert data['بهترین_ها']['بهترین_فروشنده'] == {'نام': 'رضایی', 'دلیل': ''}
+    assert data['آمار']['انواع_تماس'] == {'ورودی': 4}
+
+
+def test_extra_keys_are_kept():
+    data = normalize('crm', {'analyzed_at': '2026-01-01', 'file_name': 'a.rtf'})
+    assert data['analyzed_at'] == '2026-01-01'
+    assert data['file_name'] == 'a.rtf'
+
+
+def test_validate_reports_problems():
+    data, problems = validate('referral', {'status_analysis': {'percent_pending': 'زیاد'}})
+    assert data['status_analysis']['percent_pending'] == 0
+    assert any(problem.startswith('referral.status_analysis.percent_pending') for problem in problems)
+    assert any('subject_analysis' in problem for problem in problems)
+
+    complete = encode('referral', {})
+    assert validate('referral', complete)[1] == []
+
+
+def test_encode_round_trip():
+    data = normalize('referral', {'status_analysis': {'status_distribution': {'اتمام کار': 3, 'بررسی نشده': 1}}})
+    encoded = encode('referral', data)
+    assert encoded['status_analysis']['status_distribution'] == [
+        {'key': 'اتمام کار', 'value': 3}, {'key': 'بررسی نشده', 'value': 1}
+    ]
+    assert normalize('referral', encoded) == data
+
+
+def test_insights_schemas_are_subsets():
+    assert 'آمار' not in SCHEMAS['crm_insights']
+    assert list(SCHEMAS['referral_insights']) == ['comprehensive_insights']
+    assert response_format('crm')['type'] == 'json_schema'
@@ -0,0 +1,26 @@
+# tests/test_streaming.py
+"""مسیرهای تحلیل SSE: پنجره read-your-writes قبل از شروع جریان در کوکی session ثبت می‌شود"""
+import io
+import time
+import pytest
+from app import app
+from modules.config import Config
+from modules.routes import analysis, referral
+
+
+@pytest.mark.parametrize('url, routes', [
+    ('/api/analyze/stream', analysis),
+    ('/api/analyze-referral/stream', referral)
+])
+def test_stream_marks_write_before_headers(monkeypatch, tmp_path, url, routes):
+    monkeypatch.setattr(routes.file_handler, 'upload_folder', str(tmp_path))
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+
+    response = client.post(url, data={'file': (io.BytesIO('کوتاه'.encode()), 'empty.txt')})
+    body = response.get_data(as_text=True)
+
+    assert 'event: error' in body
+    with client.session_transaction() as session:
+        assert session['_db_last_write'] > time.time() + Config.LLM_TIMEOUTS['analysis'] - 60
@@ -0,0 +1,86 @@
+# worker.py
+"""
+کارگر صف تحلیل‌ها (modules/job_queue.py).
+
+    python worker.py                 # JOB_WORKER_THREADS کارگر همزمان
+    python worker.py --threads 4
+    python worker.py --once          # پردازش کارهای موجود و خروج
+
+روی هر تعداد نود قابل اجراست؛ قفل سطرها با SKIP LOCKED از برداشتن تکراری جلوگیری می‌کند.
+"""
+import argparse
+import sys
+import threading
+import time
+from modules.config import Config
+from modules.file_handler import FileHandler
+from modules.openai_client import OpenAIClient
+from modules.job_queue import JobQueue, LeaseKeeper, PermanentJobError, process_job, worker_name
+
+
+def run_worker(index, stop, once=False):
+    """حلقه یک کارگر: برداشتن، پردازش و ثبت نتیجه کارها"""
+    name = worker_name(str(index))
+    ai_client = OpenAIClient()
+    file_handler = FileHandler(Config.UPLOAD_FOLDER)
+    print(f"👷 کارگر {name} شروع شد")
+
+    while not stop.is_set():
+        try:
+            job = JobQueue.claim(name)
+        except Exception as e:
+            print(f"❌ خطا در برداشتن کار: {e}")
+            stop.wait(Config.JOB_POLL_INTERVAL)
+            continue
+
+        if not job:
+            if once:
+                break
+            stop.wait(Config.JOB_POLL_INTERVAL)
+            continue
+
+        print(f"▶️ کار {job['id']} ({job['job_type']}، تلاش {job['attempts']}/{job['max_attempts']}): {job['file_name']}")
+        started = time.monotonic()
+        try:
+            with LeaseKeeper(job['id'], name):
+                result_id = process_job(job, ai_client, file_handler)
+            JobQueue.complete(job['id'], name, result_id)
+            print(f"✅ کار {job['id']} در {time.monotonic() - started:.1f} ثانیه انجام شد (تحلیل {result_id})")
+        except Exception as e:
+            permanent = isinstance(e, PermanentJobError)
+            try:
+                retry = JobQueue.fail(job, name, str(e), permanent=permanent)
+            except Exception as db_error:
+                print(f"❌ خطا در ثبت شکست کار {job['id']}: {db_error}")
+                continue
+            print(f"{'🔁' if retry else '❌'} کار {job['id']}: {e}")
+
+    print(f"👋 کارگر {name} متوقف شد")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='کارگر صف تحلیل‌ها')
+    parser.add_argument('--threads', type=int, default=Config.JOB_WORKER_THREADS, help='تعداد کارگر همزمان')
+    parser.add_argument('--once', action='store_true', help='پردازش کارهای موجود و خروج')
+    args = parser.parse_args()
+
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=run_worker, args=(i, stop, args.once), daemon=True)
+        for i in range(max(args.threads, 1))
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        print("⏹️ توقف کارگرها بعد از اتمام کارهای جاری...")
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())